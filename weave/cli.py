@@ -74,6 +74,25 @@ def serve(
         )
 
 
+@cli.command(
+    "cache-ops",
+    help="Precompute the code capture of the ops defined in MODULES, so that processes sharing the cache don't have to.",
+)
+@click.argument("modules", nargs=-1, required=True)
+@click.option(
+    "--path",
+    envvar="WEAVE_CODE_CAPTURE_CACHE_PATH",
+    required=True,
+    help="SQLite database of the cache. Defaults to $WEAVE_CODE_CAPTURE_CACHE_PATH.",
+)
+def cache_ops(modules: typing.Tuple[str, ...], path: str) -> None:
+    from weave.trace import code_capture_cache
+
+    code_capture_cache.set_code_capture_cache(code_capture_cache.CodeCaptureCache(path))
+    n_ops = code_capture_cache.warm_code_capture_cache(modules)
+    print(f"Cached the code of {n_ops} ops in {path}")
+
+
 @cli.group(help="Deploy weave models.")
 def deploy() -> None:
     pass
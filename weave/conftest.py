@@ -387,6 +387,10 @@ class TestOnlyUserInjectingExternalTraceServer(
         req.start.wb_user_id = self._user_id
         return super().call_start(req)
 
+    def call_complete(self, req: tsi.CallCompleteReq) -> tsi.CallCompleteRes:
+        req.complete.wb_user_id = self._user_id
+        return super().call_complete(req)
+
     def calls_delete(self, req: tsi.CallsDeleteReq) -> tsi.CallsDeleteRes:
         req.wb_user_id = self._user_id
         return super().calls_delete(req)
@@ -401,7 +405,7 @@ class TestOnlyUserInjectingExternalTraceServer(
 
 
 @pytest.fixture()
-def client(request) -> Generator[weave_client.WeaveClient, None, None]:
+def client(request, tmp_path) -> Generator[weave_client.WeaveClient, None, None]:
     inited_client = None
     weave_server_flag = request.config.getoption("--weave-server")
     server: tsi.TraceServerInterface
@@ -416,6 +420,14 @@ def client(request) -> Generator[weave_client.WeaveClient, None, None]:
         server = TestOnlyUserInjectingExternalTraceServer(
             sqlite_server, DummyIdConverter(), entity
         )
+    elif weave_server_flag == "duckdb":
+        from weave.trace_server import duckdb_trace_server
+
+        duckdb_server = duckdb_trace_server.DuckDBTraceServer(str(tmp_path / "trace"))
+        duckdb_server.setup_tables()
+        server = TestOnlyUserInjectingExternalTraceServer(
+            duckdb_server, DummyIdConverter(), entity
+        )
     elif weave_server_flag == "clickhouse":
         ch_server = clickhouse_trace_server_batched.ClickHouseTraceServer.from_env(
             use_async_insert=False
@@ -442,3 +454,7 @@ def client(request) -> Generator[weave_client.WeaveClient, None, None]:
         yield inited_client.client
     finally:
         inited_client.reset()
+        if weave_server_flag == "sqlite":
+            # The database is shared: buffered calls must not be written
+            # into the next test's
+            sqlite_server.flush()
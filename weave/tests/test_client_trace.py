@@ -13,12 +13,13 @@ import wandb
 from pydantic import BaseModel, ValidationError
 
 import weave
-from weave import weave_client
+from weave import call_context, weave_client
 from weave.legacy import context_state
 from weave.trace.vals import MissingSelfInstanceError, WeaveObject
 from weave.trace_server.sqlite_trace_server import SqliteTraceServer
 
 from ..trace_server import trace_server_interface as tsi
+from ..trace_server.errors import InvalidRequest
 from ..trace_server.trace_server_interface_util import (
     TRACE_REF_SCHEME,
     WILDCARD_ARTIFACT_VERSION_AND_PATH,
@@ -190,6 +191,79 @@ def test_trace_server_call_start_and_end(client):
     }
 
 
+def test_trace_server_call_complete(client):
+    call_id = generate_id()
+    started_at = datetime.datetime.now(tz=datetime.timezone.utc) - datetime.timedelta(
+        seconds=1
+    )
+    ended_at = datetime.datetime.now(tz=datetime.timezone.utc)
+    complete = tsi.CompletedCallSchemaForInsert(
+        project_id=client._project_id(),
+        id=call_id,
+        op_name="test_name",
+        trace_id="test_trace_id",
+        parent_id="test_parent_id",
+        started_at=started_at,
+        attributes={"a": 5},
+        inputs={"b": 5},
+        ended_at=ended_at,
+        summary={"c": 5},
+        output={"d": 5},
+    )
+    res = client.server.call_complete(tsi.CallCompleteReq(complete=complete))
+    assert res.id == call_id
+    assert res.trace_id == "test_trace_id"
+
+    call = client.server.call_read(
+        tsi.CallReadReq(project_id=client._project_id(), id=call_id)
+    ).call
+    assert call.op_name == "test_name"
+    assert call.parent_id == "test_parent_id"
+    assert abs((call.started_at - started_at).total_seconds()) < 0.001
+    assert abs((call.ended_at - ended_at).total_seconds()) < 0.001
+    assert call.attributes == {"a": 5}
+    assert call.inputs == {"b": 5}
+    assert call.output == {"d": 5}
+    assert call.summary == {"c": 5}
+    assert call.exception is None
+
+
+def test_trace_server_calls_query_columns(client):
+    call_id = generate_id()
+    complete = tsi.CompletedCallSchemaForInsert(
+        project_id=client._project_id(),
+        id=call_id,
+        op_name="test_name",
+        trace_id="test_trace_id",
+        started_at=datetime.datetime.now(tz=datetime.timezone.utc),
+        attributes={"a": 5},
+        inputs={"b": 5},
+        ended_at=datetime.datetime.now(tz=datetime.timezone.utc),
+        summary={"c": 5},
+        output={"score": 0.5, "explanation": "long text"},
+        display_name="my call",
+    )
+    client.server.call_complete(tsi.CallCompleteReq(complete=complete))
+
+    res = client.server.calls_query(
+        tsi.CallsQueryReq(
+            project_id=client._project_id(),
+            columns=["output.score", "display_name"],
+        )
+    )
+    assert len(res.calls) == 1
+    call = res.calls[0]
+    assert call.id == call_id
+    assert call.op_name == "test_name"
+    assert call.trace_id == "test_trace_id"
+    assert call.started_at is not None
+    assert call.display_name == "my call"
+    assert call.output == {"score": 0.5}
+    assert call.inputs == {}
+    assert call.attributes == {}
+    assert call.summary is None
+
+
 def test_graph_call_ordering(client):
     @weave.op()
     def my_op(a: int) -> int:
@@ -2204,3 +2278,126 @@ def test_sort_and_filter_through_refs(client):
         )
 
         assert inner_res.count == count
+
+
+def test_calls_stats(client):
+    @weave.op
+    def llm(prompt_tokens: int) -> dict:
+        return {
+            "model": "model-a",
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": 1,
+                "total_tokens": prompt_tokens + 1,
+            },
+        }
+
+    @weave.op
+    def fails() -> None:
+        raise ValueError("fail")
+
+    for i in range(3):
+        llm(i)
+    for _ in range(2):
+        try:
+            fails()
+        except ValueError:
+            pass
+
+    server = get_client_trace_server(client)
+    res = server.calls_stats(
+        tsi.CallsStatsReq(
+            project_id=get_client_project_id(client),
+            token_costs={
+                "model-a": tsi.TokenCost(
+                    prompt_token_cost=0.5, completion_token_cost=1.0
+                )
+            },
+        )
+    )
+    assert len(res.groups) == 2
+    fails_group, llm_group = sorted(res.groups, key=lambda g: g.call_count)
+    assert fails_group.op_name.startswith(
+        f"{TRACE_REF_SCHEME}:///{client.entity}/{client.project}/op/fails:"
+    )
+    assert (fails_group.call_count, fails_group.error_count) == (2, 2)
+    assert fails_group.error_rate == 1.0
+    assert fails_group.usage == {}
+    assert fails_group.cost == 0.0
+
+    assert (llm_group.call_count, llm_group.error_count) == (3, 0)
+    assert llm_group.latency_ms_p50 >= 0
+    assert llm_group.usage == {
+        "model-a": tsi.CallsStatsUsage(
+            requests=3, prompt_tokens=3, completion_tokens=3, total_tokens=6
+        )
+    }
+    assert llm_group.cost == 4.5
+
+    res = server.calls_stats(
+        tsi.CallsStatsReq(
+            project_id=get_client_project_id(client),
+            op_names=[llm_group.op_name],
+            group_by_op_name=False,
+            bucket_seconds=3600,
+        )
+    )
+    (group,) = res.groups
+    assert group.op_name is None
+    assert group.bucket_start.minute == 0
+    assert group.call_count == 3
+    assert group.cost is None
+
+    with pytest.raises(InvalidRequest):
+        server.calls_stats(
+            tsi.CallsStatsReq(
+                project_id=get_client_project_id(client), bucket_seconds=90
+            )
+        )
+
+
+def test_trace_read(client):
+    @weave.op
+    def leaf(x: int) -> int:
+        return x
+
+    @weave.op
+    def branch(x: int) -> int:
+        return leaf(x) + leaf(x + 1)
+
+    @weave.op
+    def root(x: int) -> int:
+        return branch(x) + branch(x + 10)
+
+    with call_context.set_call_stack([]):
+        root(1)
+    (root_call,) = list(client.calls(tsi._CallsFilter(trace_roots_only=True)))
+
+    (tree,) = client.trace(root_call.trace_id)
+    names = [
+        (node.depth, node.call.op_name.split("/")[-1].split(":")[0])
+        for node in tree.walk()
+    ]
+    assert names == [
+        (0, "root"),
+        (1, "branch"),
+        (2, "leaf"),
+        (2, "leaf"),
+        (1, "branch"),
+        (2, "leaf"),
+        (2, "leaf"),
+    ]
+    assert [node.call.inputs["x"] for node in tree.children[1].children] == [11, 12]
+
+    (tree,) = client.trace(root_call.trace_id, max_depth=1, columns=["output"])
+    assert [node.depth for node in tree.walk()] == [0, 1, 1]
+    assert tree.call.output == 26
+    assert tree.children[0].call.inputs == {}
+
+    res = get_client_trace_server(client).trace_read(
+        tsi.TraceReadReq(
+            project_id=get_client_project_id(client), trace_id=root_call.trace_id
+        )
+    )
+    assert res.calls[0].id == root_call.id
+    assert len(res.calls) == 7
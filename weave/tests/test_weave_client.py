@@ -1,9 +1,13 @@
 import asyncio
 import dataclasses
+import datetime
 import json
 import re
 import signal
+import threading
+import time
 
+import pyarrow.parquet as pq
 import pydantic
 import pytest
 import requests
@@ -11,19 +15,25 @@ from pydantic import BaseModel
 
 import weave
 import weave.trace_server.trace_server_interface as tsi
-from weave import Evaluation, weave_client
+from weave import Evaluation, call_context, weave_client
 from weave.legacy import op_def
-from weave.trace import refs
+from weave.trace import refs, serialize
+from weave.trace.errors import OpCallError
+from weave.trace.ingestion_queue import IngestionQueue
 from weave.trace.isinstance import weave_isinstance
 from weave.trace.op import Op
+from weave.trace.op_extensions.accumulator import add_accumulator
 from weave.trace.refs import (
     DICT_KEY_EDGE_NAME,
     LIST_INDEX_EDGE_NAME,
     OBJECT_ATTR_EDGE_NAME,
     TABLE_ROW_ID_EDGE_NAME,
 )
+from weave.trace.sampling import SamplingPolicy
+from weave.trace.serialize import SerializeLimits
 from weave.trace.serializer import get_serializer_for_obj, register_serializer
 from weave.trace.tests.testutil import ObjectRefStrMatcher
+from weave.trace_server.errors import InvalidRequest
 from weave.trace_server.trace_server_interface import (
     FileContentReadReq,
     FileCreateReq,
@@ -32,6 +42,7 @@ from weave.trace_server.trace_server_interface import (
     TableQueryReq,
     TableSchemaForInsert,
 )
+from weave.trace_server.trace_server_interface_util import bytes_digest
 
 pytestmark = pytest.mark.trace
 
@@ -67,6 +78,86 @@ def test_table_create(client):
     assert result.rows[2].val["val"] == 3
 
 
+def test_table_create_incremental(client):
+    project_id = "test/test-project"
+    rows = [{TABLE_ROW_ID_EDGE_NAME: i, "val": i} for i in range(3)]
+    res = client.server.table_create(
+        TableCreateReq(table=TableSchemaForInsert(project_id=project_id, rows=rows))
+    )
+    row_digests = [r.digest for r in _table_rows(client, project_id, res.digest)]
+
+    new_row = {TABLE_ROW_ID_EDGE_NAME: 3, "val": 3}
+    missing = client.server.table_rows_missing(
+        tsi.TableRowsMissingReq(
+            project_id=project_id, row_digests=row_digests + ["not-a-digest"]
+        )
+    )
+    assert missing.row_digests == ["not-a-digest"]
+    created = client.server.table_rows_create(
+        tsi.TableRowsCreateReq(project_id=project_id, rows=[new_row])
+    )
+
+    from_digests = client.server.table_create_from_digests(
+        tsi.TableCreateFromDigestsReq(
+            project_id=project_id, row_digests=row_digests + created.row_digests
+        )
+    )
+    appended = client.server.table_append(
+        tsi.TableAppendReq(
+            project_id=project_id, base_digest=res.digest, rows=[new_row]
+        )
+    )
+    full = client.server.table_create(
+        TableCreateReq(
+            table=TableSchemaForInsert(project_id=project_id, rows=rows + [new_row])
+        )
+    )
+    assert from_digests.digest == appended.digest == full.digest
+    assert [r.val["val"] for r in _table_rows(client, project_id, full.digest)] == [
+        0,
+        1,
+        2,
+        3,
+    ]
+
+    with pytest.raises(InvalidRequest):
+        client.server.table_create_from_digests(
+            tsi.TableCreateFromDigestsReq(
+                project_id=project_id, row_digests=["not-a-digest"]
+            )
+        )
+
+
+def _table_rows(client, project_id, digest):
+    return client.server.table_query(
+        TableQueryReq(project_id=project_id, digest=digest)
+    ).rows
+
+
+def test_save_table_uploads_only_missing_rows(client):
+    uploaded = []
+    table_rows_create = client.server.table_rows_create
+
+    def counting_table_rows_create(req):
+        uploaded.extend(req.rows)
+        return table_rows_create(req)
+
+    client.server.table_rows_create = counting_table_rows_create
+
+    rows = [{"id": i, "val": i} for i in range(weave_client.MIN_INCREMENTAL_TABLE_ROWS)]
+    ref = weave.publish(weave.Dataset(rows=rows), "my-dataset")
+    assert len(uploaded) == len(rows)
+
+    uploaded.clear()
+    rows[5] = {"id": 5, "val": "edited"}
+    ref2 = weave.publish(weave.Dataset(rows=rows), "my-dataset")
+    assert uploaded == [{"id": 5, "val": "edited"}]
+    assert ref2.digest != ref.digest
+
+    ds = ref2.get()
+    assert [r["val"] for r in ds.rows][4:7] == [4, "edited", 6]
+
+
 @pytest.mark.skip()
 def test_table_append(server):
     table_ref = server.new_table([1, 2, 3])
@@ -245,6 +336,117 @@ def test_calls_query(client):
     client.finish_call(call0, None)
 
 
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_calls_iter_pages_by_cursor(client, prefetch):
+    # Calls sharing a started_at are ordered by id, so a page boundary falling
+    # between them must neither skip nor repeat any of them.
+    started_at = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    call_ids = []
+    for i in range(10):
+        call_id = weave_client.generate_id()
+        call_ids.append(call_id)
+        client.server.call_complete(
+            tsi.CallCompleteReq(
+                complete=tsi.CompletedCallSchemaForInsert(
+                    project_id=client._project_id(),
+                    id=call_id,
+                    op_name="x",
+                    trace_id=call_id,
+                    started_at=started_at + datetime.timedelta(seconds=i // 4),
+                    attributes={},
+                    inputs={"i": i},
+                    ended_at=started_at + datetime.timedelta(seconds=5),
+                    summary={},
+                    output=i,
+                )
+            )
+        )
+
+    calls_iter = weave_client.CallsIter(
+        client.server,
+        client._project_id(),
+        weave_client._CallsFilter(),
+        page_size=3,
+        prefetch=prefetch,
+    )
+    result = list(calls_iter)
+    assert len(result) == 10
+    assert sorted(c.id for c in result) == sorted(call_ids)
+    assert [c.inputs["i"] // 4 for c in result] == sorted(i // 4 for i in range(10))
+    assert calls_iter[9].id == result[9].id
+
+    with pytest.raises(ValueError):
+        list(
+            client.server.calls_query_stream(
+                tsi.CallsQueryReq(
+                    project_id=client._project_id(),
+                    after=tsi._CallsCursor(started_at=started_at, id=call_ids[0]),
+                    sort_by=[tsi._SortBy(field="id", direction="asc")],
+                )
+            )
+        )
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_calls_iter_falls_back_to_offset_paging(client, prefetch):
+    @weave.op()
+    def f(i: int) -> int:
+        return i
+
+    for i in range(7):
+        f(i)
+
+    # A server predating cursors ignores `after`
+    calls_query = client.server.calls_query
+    client.server.calls_query = lambda req: calls_query(
+        req.model_copy(update={"after": None})
+    )
+    calls_iter = weave_client.CallsIter(
+        client.server,
+        client._project_id(),
+        weave_client._CallsFilter(),
+        page_size=3,
+        prefetch=prefetch,
+    )
+    assert [c.inputs["i"] for c in calls_iter] == list(range(7))
+
+
+def test_calls_to_arrow(client, tmp_path):
+    @weave.op()
+    def score(x: int, meta: dict) -> dict:
+        return {"score": x / 2 if x else "n/a", "tags": ["a", "b"]}
+
+    for i in range(3):
+        score(i, {"source": f"s{i}"})
+
+    table = client.calls_to_arrow(batch_size=2)
+    assert table.num_rows == 3
+    for col in ["id", "op_name", "started_at", "inputs.x", "inputs.meta.source"]:
+        assert col in table.column_names
+    rows = sorted(table.to_pylist(), key=lambda r: r["inputs.x"])
+    assert [r["inputs.meta.source"] for r in rows] == ["s0", "s1", "s2"]
+    # Mixed types across batches end up as strings
+    assert [r["output.score"] for r in rows] == ["n/a", "0.5", "1"]
+    assert rows[0]["output.tags"] == '["a", "b"]'
+
+    table = client.calls_to_arrow(columns=["id", "inputs.x", "output.score"])
+    assert table.column_names == ["id", "inputs.x", "output.score"]
+    assert sorted(table.column("inputs.x").to_pylist()) == [0, 1, 2]
+
+    path = str(tmp_path / "calls.parquet")
+    client.calls_to_parquet(path, columns=["id", "inputs"])
+    table = pq.read_table(path)
+    assert table.num_rows == 3
+    assert set(table.column_names) == {"id", "inputs.x", "inputs.meta.source"}
+
+    # Streamed one batch at a time, with the same columns as calls_to_arrow
+    client.calls_to_parquet(path, batch_size=2)
+    table = pq.read_table(path)
+    assert table.schema == client.calls_to_arrow(batch_size=2).schema
+    rows = sorted(table.to_pylist(), key=lambda r: r["inputs.x"])
+    assert [r["output.score"] for r in rows] == ["n/a", "0.5", "1"]
+
+
 def test_calls_delete(client):
     call0 = client.create_call("x", {"a": 5, "b": 10})
     call0_child1 = client.create_call("x", {"a": 5, "b": 11}, call0)
@@ -308,6 +510,20 @@ def test_calls_delete_cascade(client):
     assert len(result) == 0
 
 
+def test_calls_delete_deep_trace(client):
+    root = client.create_call("x", {}, use_stack=False)
+    parent = root
+    for depth in range(10):
+        parent = client.create_call("x", {"depth": depth}, parent, use_stack=False)
+        for i in range(3):
+            client.create_call("y", {"i": i}, parent, use_stack=False)
+    other = client.create_call("x", {}, use_stack=False)
+
+    client.delete_call(root)
+
+    assert [call.id for call in client.calls()] == [other.id]
+
+
 def test_call_display_name(client):
     call0 = client.create_call("x", {"a": 5, "b": 10})
 
@@ -514,6 +730,66 @@ def test_saveload_customtype(client, strict_op_saving):
     assert obj2.b == "x"
 
 
+def test_upload_cache_skips_unchanged_objects(client):
+    created = []
+    obj_create = client.server.obj_create
+
+    def recording_obj_create(req):
+        created.append(req.obj.object_id)
+        return obj_create(req)
+
+    client.server.obj_create = recording_obj_create
+
+    class Config(weave.Object):
+        temperature: float
+
+    @weave.op()
+    def run(config: Config) -> float:
+        return config.temperature
+
+    run(Config(temperature=0.5))
+    run(Config(temperature=0.5))
+    assert created.count("Config") == 1
+    run(Config(temperature=0.7))
+    assert created.count("Config") == 2
+
+    calls = list(client.calls())
+    assert calls[0].inputs["config"].ref == calls[1].inputs["config"].ref
+
+
+def test_upload_cache_skips_unchanged_files(client):
+    class MyCustomObj:
+        def __init__(self, a):
+            self.a = a
+
+    def custom_obj_save(obj, artifact, name) -> None:
+        with artifact.new_file(f"{name}.json") as f:
+            json.dump({"a": obj.a}, f)
+
+    def custom_obj_load(artifact, name):
+        with artifact.open(f"{name}.json") as f:
+            return MyCustomObj(json.load(f)["a"])
+
+    register_serializer(MyCustomObj, custom_obj_save, custom_obj_load)
+
+    uploaded = []
+    file_create = client.server.file_create
+
+    def recording_file_create(req):
+        uploaded.append(req.name)
+        return file_create(req)
+
+    client.server.file_create = recording_file_create
+
+    ref = client._save_object(MyCustomObj(5), "my-obj")
+    assert "obj.json" in uploaded
+    uploaded.clear()
+    ref2 = client._save_object(MyCustomObj(5), "my-obj")
+    assert uploaded == []
+    assert ref.digest == ref2.digest
+    assert client.get(ref2).a == 5
+
+
 def test_save_unknown_type(client):
     class SomeUnknownThing:
         def __init__(self, a):
@@ -768,6 +1044,28 @@ def test_refs_read_batch_dataset_rows(client):
     assert res.vals[1] == 6
 
 
+def test_refs_read_batch_table_refs(client):
+    saved = client.save(weave.Dataset(rows=[{"a": 5}, {"a": 6}]), "my-dataset")
+    # The dataset's rows attribute holds the table ref
+    table_uri = client.server.refs_read_batch(
+        RefsReadBatchReq(refs=[saved.rows.ref.uri()])
+    ).vals[0]
+    assert table_uri.startswith("weave:///shawn/test-project/table/")
+    row_digests = [row.ref.extra[-1] for row in saved.rows]
+    res = client.server.refs_read_batch(
+        RefsReadBatchReq(
+            refs=[
+                table_uri,
+                f"{table_uri}/id/{row_digests[1]}",
+                f"{table_uri}/id/{row_digests[0]}/key/a",
+                saved.rows[0]["a"].ref.uri(),
+            ]
+        )
+    )
+    assert sorted(r["a"] for r in res.vals[0]) == [5, 6]
+    assert res.vals[1:] == [{"a": 6}, 5, 5]
+
+
 def test_large_files(client):
     class CoolCustomThing:
         a: str
@@ -802,6 +1100,369 @@ def test_server_file(client):
     assert f_bytes == read_res.content
 
 
+def test_server_file_parts(client):
+    project_id = "shawn/test-project"
+    chunk_size = tsi.FILE_CHUNK_SIZE
+    f_bytes = bytes(i % 251 for i in range(2 * chunk_size + 5))
+    digest = bytes_digest(f_bytes)
+
+    def parts_missing():
+        return client.server.file_parts_missing(
+            tsi.FilePartsMissingReq(
+                project_id=project_id, digest=digest, size=len(f_bytes)
+            )
+        ).offsets
+
+    def create_part(offset, end):
+        client.server.file_create_part(
+            tsi.FileCreatePartReq(
+                project_id=project_id,
+                name="my-file",
+                digest=digest,
+                size=len(f_bytes),
+                offset=offset,
+                content=f_bytes[offset:end],
+            )
+        )
+
+    assert parts_missing() == [0, chunk_size, 2 * chunk_size]
+    create_part(2 * chunk_size, len(f_bytes))
+    assert parts_missing() == [0, chunk_size]
+    with pytest.raises(InvalidRequest):
+        create_part(5, chunk_size)
+    create_part(0, 2 * chunk_size)
+    assert parts_missing() == []
+    # Completing the file again (eg. a retried or concurrent request) is a no-op
+    create_part(2 * chunk_size, len(f_bytes))
+    assert parts_missing() == []
+
+    chunks = list(
+        client.server.file_content_read_stream(
+            FileContentReadReq(project_id=project_id, digest=digest)
+        )
+    )
+    assert b"".join(chunks) == f_bytes
+
+
+def test_call_end_carries_op_name_and_started_at(client):
+    ends = []
+    call_end = client.server.call_end
+
+    def recording_call_end(req):
+        ends.append(req.end)
+        return call_end(req)
+
+    client.server.call_end = recording_call_end
+    started_at = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    call = client.create_call("x", {}, started_at=started_at)
+    client.finish_call(call, 1)
+
+    (end,) = ends
+    assert end.op_name == call.op_name
+    assert end.started_at == started_at
+
+
+def test_save_custom_object_in_file_parts(client, monkeypatch):
+    monkeypatch.setattr(serialize, "FILE_UPLOAD_PART_SIZE", tsi.FILE_CHUNK_SIZE)
+    uploaded_offsets = []
+    file_create_part = client.server.file_create_part
+
+    def recording_file_create_part(req):
+        uploaded_offsets.append(req.offset)
+        return file_create_part(req)
+
+    client.server.file_create_part = recording_file_create_part
+
+    f_bytes = bytes(i % 251 for i in range(3 * tsi.FILE_CHUNK_SIZE))
+    digest = serialize._create_file(
+        client._project_id(), client.server, "my-file", f_bytes
+    )
+    assert digest == bytes_digest(f_bytes)
+    assert sorted(uploaded_offsets) == [0, tsi.FILE_CHUNK_SIZE, 2 * tsi.FILE_CHUNK_SIZE]
+    read_res = client.server.file_content_read(
+        FileContentReadReq(project_id=client._project_id(), digest=digest)
+    )
+    assert read_res.content == f_bytes
+
+    # Uploading the same file again sends nothing
+    uploaded_offsets.clear()
+    serialize._create_file(client._project_id(), client.server, "my-file", f_bytes)
+    assert uploaded_offsets == []
+
+
+def test_save_nested_objects_concurrently(client):
+    class Tool(weave.Object):
+        index: int
+
+    class Agent(weave.Object):
+        tools: list[Tool]
+        shared: Tool
+
+    created = []
+    obj_create = client.server.obj_create
+
+    def recording_obj_create(req):
+        created.append((req.obj.object_id, threading.current_thread().name))
+        return obj_create(req)
+
+    client.server.obj_create = recording_obj_create
+
+    shared = Tool(index=-1)
+    agent = Agent(tools=[Tool(index=i) for i in range(10)] + [shared], shared=shared)
+    client._save_nested_objects(agent, name="agent")
+
+    # Every tool (the shared one once) is saved before the agent, off the caller's thread
+    assert [object_id for object_id, _ in created] == ["Tool"] * 11 + ["agent"]
+    assert all(thread.startswith("weave-save") for _, thread in created)
+    assert agent.ref is not None
+    assert all(tool.ref is not None for tool in agent.tools)
+
+    agent2 = client.get(agent.ref)
+    assert [tool.index for tool in agent2.tools] == list(range(10)) + [-1]
+    assert agent2.shared.index == -1
+
+
+def test_save_nested_objects_raises_errors(client):
+    class Tool(weave.Object):
+        index: int
+
+    obj_create = client.server.obj_create
+
+    def failing_obj_create(req):
+        if req.obj.val["index"] == 3:
+            raise ValueError("boom")
+        return obj_create(req)
+
+    client.server.obj_create = failing_obj_create
+
+    with pytest.raises(ValueError, match="boom"):
+        client._save_nested_objects([Tool(index=i) for i in range(5)])
+
+
+def test_save_nested_objects_rejects_cycles(client):
+    class Node(weave.Object):
+        children: list = []
+
+    a = Node()
+    b = Node(children=[a])
+    a.children.append(b)
+
+    with pytest.raises(ValueError, match="reference cycle"):
+        client._save_nested_objects(a, name="a")
+
+
+def test_sampling_drops_whole_traces(client):
+    @weave.op()
+    def child(x):
+        return x + 1
+
+    @weave.op()
+    def parent(x):
+        return child(x) * 2
+
+    # Start from an empty stack, so that `parent` is a root call
+    with call_context.set_call_stack([]):
+        client.set_sampling_policy(SamplingPolicy(rate=0.0))
+        assert parent(1) == 4
+        assert len(list(client.calls())) == 0
+
+        client.set_sampling_policy(SamplingPolicy())
+        assert parent(1) == 4
+        assert len(list(client.calls())) == 2
+
+
+def test_sampling_keeps_errors(client):
+    @weave.op()
+    def child(x):
+        return x
+
+    @weave.op()
+    def fails(x):
+        child(x)
+        raise ValueError("boom")
+
+    client.set_sampling_policy(SamplingPolicy(rate=0.0))
+    with call_context.set_call_stack([]), pytest.raises(ValueError, match="boom"):
+        fails(1)
+
+    # The failing call is kept, without its descendants
+    calls = client.server.calls_query(
+        tsi.CallsQueryReq(project_id=client._project_id())
+    ).calls
+    assert len(calls) == 1
+    assert calls[0].inputs == {"x": 1}
+    assert "boom" in calls[0].exception
+
+
+def test_sampling_dropped_call_errors(client):
+    ran = []
+
+    @weave.op()
+    def fails(x):
+        ran.append(x)
+        raise ValueError("boom")
+
+    client.set_sampling_policy(SamplingPolicy(rate=0.0))
+    # Inputs are bound before running, as for traced calls
+    with call_context.set_call_stack([]), pytest.raises(OpCallError):
+        fails()
+    assert ran == []
+
+    def failing_call_start(req):
+        raise ConnectionError("server down")
+
+    client.server.call_start = failing_call_start
+    # The op's own exception is raised, not the error logging it
+    with call_context.set_call_stack([]), pytest.raises(ValueError, match="boom"):
+        fails(1)
+    assert ran == [1]
+
+
+def test_sampling_async_op(client):
+    @weave.op()
+    async def slow(x):
+        return x
+
+    client.set_sampling_policy(SamplingPolicy(rate=0.0, slow_call_seconds=0.0))
+    with call_context.set_call_stack([]):
+        assert asyncio.run(slow(1)) == 1
+    calls = list(client.calls())
+    assert len(calls) == 1
+    assert calls[0].output == 1
+
+
+def test_sampling_generator_op(client):
+    @weave.op()
+    def child(x):
+        return x
+
+    @weave.op()
+    def stream(n):
+        for i in range(n):
+            yield child(i)
+
+    @weave.op()
+    async def astream(n):
+        for i in range(n):
+            yield child(i)
+
+    async def consume_async():
+        return [x async for x in astream(2)]
+
+    client.set_sampling_policy(SamplingPolicy(rate=0.0, slow_call_seconds=0.0))
+    with call_context.set_call_stack([]):
+        assert list(stream(3)) == [0, 1, 2]
+        assert asyncio.run(consume_async()) == [0, 1]
+
+    # The calls are finished with what they yielded, once consumed. Their
+    # children, called while they were consumed, are dropped.
+    calls = list(client.calls())
+    assert sorted(c.output for c in calls) == [[0, 1], [0, 1, 2]]
+
+    # Or by their output handler
+    add_accumulator(stream, lambda inputs: lambda acc, x: (acc or 0) + x)
+    with call_context.set_call_stack([]):
+        assert list(stream(4)) == [0, 1, 2, 3]
+    calls = list(client.calls())
+    assert len(calls) == 3
+    assert 6 in [c.output for c in calls]
+
+
+def test_call_inputs_are_redacted_and_bounded(client):
+    client.serialize_limits = SerializeLimits(max_string_bytes=10)
+
+    @weave.op()
+    def summarize(doc, api_key):
+        return doc
+
+    summarize("x" * 100, api_key="secret")
+
+    call = client.server.calls_query(
+        tsi.CallsQueryReq(project_id=client._project_id())
+    ).calls[0]
+    assert call.inputs == {
+        "doc": "x" * 10 + "...[truncated 90 bytes]",
+        "api_key": "REDACTED",
+    }
+    assert call.attributes[weave_client.ELIDED_KEY] == ["inputs.doc"]
+    assert call.output == "x" * 10 + "...[truncated 90 bytes]"
+    assert call.summary[weave_client.ELIDED_KEY] == ["output"]
+
+
+def test_async_ops_do_not_block_the_event_loop(client):
+    call_start = client.server.call_start
+
+    def slow_call_start(req):
+        time.sleep(0.2)
+        return call_start(req)
+
+    client.server.call_start = slow_call_start
+
+    @weave.op()
+    async def child(x):
+        return x + 1
+
+    @weave.op()
+    async def parent(x):
+        await asyncio.sleep(0)
+        return await child(x)
+
+    async def main():
+        return await asyncio.gather(*[parent(i) for i in range(5)])
+
+    start = time.monotonic()
+    with call_context.set_call_stack([]):
+        assert asyncio.run(main()) == [1, 2, 3, 4, 5]
+    # Each call starts in 0.2s, so sequentially this takes at least 2s
+    assert time.monotonic() - start < 1.5
+
+    calls = list(client.calls())
+    assert len(calls) == 10
+    parents = {c.id for c in calls if "parent" in c.op_name}
+    assert len(parents) == 5
+    assert all(c.parent_id in parents for c in calls if "child" in c.op_name)
+
+
+def test_async_op_logging_errors(client):
+    def failing_call_start(req):
+        raise ConnectionError("server down")
+
+    client.server.call_start = failing_call_start
+
+    @weave.op()
+    async def add_one(x):
+        return x + 1
+
+    @weave.op()
+    async def fails(x):
+        raise ValueError("boom")
+
+    # The op's result and exception are returned, not the errors logging them
+    with call_context.set_call_stack([]):
+        assert asyncio.run(add_one(1)) == 2
+        with pytest.raises(ValueError, match="boom"):
+            asyncio.run(fails(1))
+
+
+def test_call_inputs_are_snapshotted(client):
+    inputs = {"x": 1, "api_key": "secret"}
+    call = client.create_call("op", inputs, use_stack=False)
+    inputs["x"] = 2
+    client.finish_call(call, None)
+
+    assert call.inputs == {"x": 1, "api_key": "REDACTED"}
+    logged = client.server.calls_query(
+        tsi.CallsQueryReq(project_id=client._project_id())
+    ).calls[0]
+    assert logged.inputs == {"x": 1, "api_key": "REDACTED"}
+
+    # With the keys of the client's limits
+    client.serialize_limits = SerializeLimits(redact_keys=("token",))
+    call = client.create_call("op", {"api_key": "a", "token": "t"}, use_stack=False)
+    client.finish_call(call, None)
+    assert call.inputs == {"api_key": "a", "token": "REDACTED"}
+
+
 def test_isinstance_checks(client):
     class PydanticObjA(weave.Object):
         x: dict
@@ -954,3 +1615,98 @@ def test_weave_server(client):
     url = weave.serve(ref, thread=True)
     response = requests.post(url + "/predict", json={"input": "x"})
     assert response.json() == {"result": "input is: x"}
+
+
+def test_async_ingestion(client):
+    client._ingestion_queue = IngestionQueue(num_workers=2)
+    client._ingestion_queue.replay_fn = client._replay_spilled_call
+
+    @weave.op()
+    def child(x: int) -> int:
+        return x + 1
+
+    @weave.op()
+    def parent(x: int) -> int:
+        return child(x) * 2
+
+    for i in range(5):
+        assert parent(i) == (i + 1) * 2
+
+    assert client.flush(timeout=10)
+    stats = client.ingestion_stats()
+    assert stats is not None
+    assert stats.enqueued == 20
+    assert stats.processed == 20
+    assert stats.errors == 0
+
+    calls = list(client.calls())
+    assert len(calls) == 10
+    roots = [c for c in calls if "/op/parent:" in c.op_name]
+    assert sorted(c.output for c in roots) == [2, 4, 6, 8, 10]
+    for root in roots:
+        children = [c for c in calls if c.parent_id == root.id]
+        assert len(children) == 1
+        assert children[0].trace_id == root.trace_id
+
+
+def test_async_ingestion_spill_to_disk(client, tmp_path):
+    client._ingestion_queue = IngestionQueue(
+        num_workers=1,
+        max_queue_size=1,
+        backpressure="spill_to_disk",
+        spill_dir=str(tmp_path),
+        replay_fn=client._replay_spilled_call,
+    )
+
+    @weave.op()
+    def add_one(x: int) -> dict:
+        return {"x": x + 1}
+
+    for i in range(10):
+        add_one(i)
+
+    assert client.flush(timeout=10)
+    stats = client.ingestion_stats()
+    assert stats.errors == 0
+    calls = list(client.calls())
+    assert len(calls) == 10
+    assert sorted(c.output["x"] for c in calls) == list(range(1, 11))
+
+
+def test_async_ingestion_snapshots_inputs_and_output(client, tmp_path):
+    client._ingestion_queue = IngestionQueue(
+        num_workers=1,
+        max_queue_size=1,
+        backpressure="spill_to_disk",
+        spill_dir=str(tmp_path),
+        replay_fn=client._replay_spilled_call,
+    )
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait()
+
+    client._ingestion_queue.submit("blocker", blocker)
+    started.wait()
+
+    @weave.op()
+    def chat(messages: list) -> dict:
+        return {"messages": messages}
+
+    messages = [{"role": "user", "content": "hi"}]
+    # The start is queued, and the end spilled
+    res = chat(messages)
+    messages.append({"role": "user", "content": "changed"})
+    res["messages"].append({"role": "user", "content": "changed"})
+    release.set()
+
+    assert client.flush(timeout=10)
+    stats = client.ingestion_stats()
+    assert stats.spilled == 1
+    assert stats.errors == 0
+    calls = list(client.calls())
+    assert len(calls) == 1
+    assert calls[0].inputs["messages"] == [{"role": "user", "content": "hi"}]
+    assert calls[0].output == {"messages": [{"role": "user", "content": "hi"}]}
@@ -211,7 +211,7 @@ def pytest_addoption(parser):
         "--weave-server",
         action="store",
         default="sqlite",
-        help="Specify the client object to use: sqlite or clickhouse",
+        help="Specify the client object to use: sqlite, duckdb or clickhouse",
     )
 
 
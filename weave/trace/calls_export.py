@@ -0,0 +1,185 @@
+"""Columnar (Arrow / Parquet) export of calls.
+
+Calls are read from `calls_query_stream` and converted to Arrow one batch at a
+time, without building client-side `Call` objects. The free-form dictionaries
+(`attributes`, `inputs`, `output` and `summary`) are flattened into one column
+per leaf, named by its dot-separated path (eg. `output.score`). Lists are kept
+as JSON strings.
+"""
+
+import json
+import os
+import tempfile
+import typing
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from weave.trace_server import trace_server_interface as tsi
+
+DEFAULT_EXPORT_BATCH_SIZE = 1000
+
+_JSON_FIELDS = ("attributes", "inputs", "output", "summary")
+_TIMESTAMP_FIELDS = ("started_at", "ended_at", "deleted_at")
+_TIMESTAMP_TYPE = pa.timestamp("us", tz="UTC")
+
+
+def _flatten_into(
+    res: typing.Dict[str, typing.Any], prefix: str, value: typing.Any
+) -> None:
+    if isinstance(value, dict) and value:
+        for key, sub_value in value.items():
+            _flatten_into(res, f"{prefix}.{key}", sub_value)
+    elif isinstance(value, (dict, list)):
+        res[prefix] = json.dumps(value)
+    else:
+        res[prefix] = value
+
+
+def flatten_call(call: tsi.CallSchema) -> typing.Dict[str, typing.Any]:
+    """Returns the columns of `call`, with its dictionaries flattened."""
+    res: typing.Dict[str, typing.Any] = {}
+    for name in tsi.CallSchema.model_fields:
+        value = getattr(call, name)
+        if name in _JSON_FIELDS:
+            if value is not None:
+                _flatten_into(res, name, value)
+        else:
+            res[name] = value
+    return res
+
+
+def _is_selected(name: str, columns: typing.Optional[typing.List[str]]) -> bool:
+    if columns is None:
+        return True
+    return any(name == col or name.startswith(col + ".") for col in columns)
+
+
+def _to_array(name: str, values: typing.List[typing.Any]) -> pa.Array:
+    if name in _TIMESTAMP_FIELDS:
+        return pa.array(values, _TIMESTAMP_TYPE)
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed types within a column (eg. a score that is sometimes a string)
+        return pa.array(
+            [v if v is None or isinstance(v, str) else json.dumps(v) for v in values],
+            pa.string(),
+        )
+
+
+def calls_to_record_batch(
+    calls: typing.Sequence[tsi.CallSchema],
+    columns: typing.Optional[typing.List[str]] = None,
+) -> pa.RecordBatch:
+    rows = [flatten_call(call) for call in calls]
+    names: typing.Dict[str, None] = {}
+    for row in rows:
+        for name in row:
+            if _is_selected(name, columns):
+                names[name] = None
+    arrays = [_to_array(name, [row.get(name) for row in rows]) for name in names]
+    return pa.RecordBatch.from_arrays(arrays, names=list(names))
+
+
+def _record_batches(
+    calls: typing.Iterable[tsi.CallSchema],
+    columns: typing.Optional[typing.List[str]],
+    batch_size: int,
+) -> typing.Iterator[pa.RecordBatch]:
+    batch: typing.List[tsi.CallSchema] = []
+    produced = False
+    for call in calls:
+        batch.append(call)
+        if len(batch) >= batch_size:
+            yield calls_to_record_batch(batch, columns)
+            produced = True
+            batch = []
+    if batch or not produced:
+        yield calls_to_record_batch(batch, columns)
+
+
+def _unify_schemas(schemas: typing.List[pa.Schema]) -> pa.Schema:
+    try:
+        return pa.unify_schemas(schemas, promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+    # Some column has incompatible types across batches: store it as strings
+    types: typing.Dict[str, pa.DataType] = {}
+    conflicting: typing.Set[str] = set()
+    for schema in schemas:
+        for field in schema:
+            known = types.get(field.name)
+            if known is None or pa.types.is_null(known):
+                types[field.name] = field.type
+            elif not pa.types.is_null(field.type) and field.type != known:
+                conflicting.add(field.name)
+    return pa.schema(
+        [
+            (name, pa.string() if name in conflicting else type_)
+            for name, type_ in types.items()
+        ]
+    )
+
+
+def _conform(batch: pa.RecordBatch, schema: pa.Schema) -> pa.RecordBatch:
+    """Casts `batch` to `schema`, with nulls for the columns it doesn't have."""
+    arrays = []
+    for field in schema:
+        index = batch.schema.get_field_index(field.name)
+        if index == -1:
+            arrays.append(pa.nulls(batch.num_rows, field.type))
+        elif batch.column(index).type != field.type:
+            arrays.append(pc.cast(batch.column(index), field.type))
+        else:
+            arrays.append(batch.column(index))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def calls_to_arrow(
+    calls: typing.Iterable[tsi.CallSchema],
+    columns: typing.Optional[typing.List[str]] = None,
+    batch_size: int = DEFAULT_EXPORT_BATCH_SIZE,
+) -> pa.Table:
+    """Converts `calls` to a table, `batch_size` calls at a time.
+
+    If `columns` is set, only those columns (and the flattened columns below
+    them) are kept.
+    """
+    batches = list(_record_batches(calls, columns, batch_size))
+    schema = _unify_schemas([batch.schema for batch in batches])
+    return pa.Table.from_batches(
+        [_conform(batch, schema) for batch in batches], schema=schema
+    )
+
+
+def calls_to_parquet(
+    calls: typing.Iterable[tsi.CallSchema],
+    path: str,
+    columns: typing.Optional[typing.List[str]] = None,
+    batch_size: int = DEFAULT_EXPORT_BATCH_SIZE,
+) -> None:
+    """Writes `calls` to a Parquet file, holding one batch in memory at a time.
+
+    The columns are only known once every call has been seen, so the batches
+    are first written to temporary Arrow files, then cast to the combined
+    schema and written to `path` one row group at a time.
+    """
+    with tempfile.TemporaryDirectory(prefix="weave-export-") as tmp_dir:
+        batch_paths: typing.List[str] = []
+        schemas: typing.List[pa.Schema] = []
+        for batch in _record_batches(calls, columns, batch_size):
+            batch_path = os.path.join(tmp_dir, f"{len(batch_paths)}.arrow")
+            with pa.OSFile(batch_path, "wb") as sink:
+                with pa.ipc.new_file(sink, batch.schema) as writer:
+                    writer.write_batch(batch)
+            batch_paths.append(batch_path)
+            schemas.append(batch.schema)
+
+        schema = _unify_schemas(schemas)
+        with pq.ParquetWriter(path, schema) as parquet_writer:
+            for batch_path in batch_paths:
+                with pa.memory_map(batch_path) as source:
+                    batch = pa.ipc.open_file(source).get_batch(0)
+                    parquet_writer.write_batch(_conform(batch, schema))
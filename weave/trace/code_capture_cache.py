@@ -0,0 +1,135 @@
+"""Cache of the code captured when saving ops.
+
+Saving an op reads the source of its function (and of the functions it depends
+on) and parses it to find the variables it references. Both only depend on the
+source file, so they are cached:
+
+* sources, keyed by the function's file (path, modification time and size),
+  qualified name and first line number;
+* referenced variables, keyed by the digest of the source and the Python version.
+
+The values of the referenced variables are still resolved on every save, so a
+changed global or closure variable is always picked up.
+
+The cache is process-local by default. Setting `WEAVE_CODE_CAPTURE_CACHE_PATH`
+persists it to a SQLite database, which `warm_code_capture_cache` (or the
+`weave cache-ops` command) can populate at build time.
+"""
+
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import sqlite3
+import sys
+import threading
+import typing
+
+from weave.trace import env
+
+
+class CodeCaptureCache:
+    def __init__(self, path: typing.Optional[str] = None):
+        self._items: dict[str, typing.Any] = {}
+        self._lock = threading.Lock()
+        self._conn: typing.Optional[sqlite3.Connection] = None
+        if path is not None:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS code_capture_cache (key TEXT PRIMARY KEY, val TEXT)"
+            )
+            self._conn.commit()
+
+    def get(self, key: str) -> typing.Any:
+        """Returns the cached value, or None if it is not cached."""
+        with self._lock:
+            if key in self._items:
+                return self._items[key]
+            if self._conn is None:
+                return None
+            row = self._conn.execute(
+                "SELECT val FROM code_capture_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            val = json.loads(row[0])
+            self._items[key] = val
+            return val
+
+    def set(self, key: str, val: typing.Any) -> None:
+        with self._lock:
+            self._items[key] = val
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO code_capture_cache (key, val) VALUES (?, ?)",
+                    (key, json.dumps(val)),
+                )
+                self._conn.commit()
+
+
+_cache: typing.Optional[CodeCaptureCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_code_capture_cache() -> CodeCaptureCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CodeCaptureCache(env.get_code_capture_cache_path())
+        return _cache
+
+
+def set_code_capture_cache(cache: typing.Optional[CodeCaptureCache]) -> None:
+    """Replaces the global cache. If None, it is recreated from the environment
+    on next use."""
+    global _cache
+    with _cache_lock:
+        _cache = cache
+
+
+def source_key(fn: typing.Any) -> typing.Optional[str]:
+    """Returns the key of the source of `fn`, or None if it can't be cached
+    (eg. classes, or functions defined in a notebook)."""
+    # Like `inspect.getsource`, look through decorators
+    fn = inspect.unwrap(fn)
+    code = getattr(fn, "__code__", None)
+    if code is None:
+        return None
+    try:
+        stat = os.stat(code.co_filename)
+    except OSError:
+        return None
+    return "/".join(
+        (
+            "source",
+            code.co_filename,
+            str(stat.st_mtime_ns),
+            str(stat.st_size),
+            f"{fn.__module__}.{fn.__qualname__}",
+            str(code.co_firstlineno),
+        )
+    )
+
+
+def external_vars_key(source: str) -> str:
+    python_version = f"{sys.version_info.major}.{sys.version_info.minor}"
+    source_digest = hashlib.sha256(source.encode()).hexdigest()
+    return f"vars/{python_version}/{source_digest}"
+
+
+def warm_code_capture_cache(module_names: typing.Iterable[str]) -> int:
+    """Captures the code of every op defined in the given modules, filling the
+    cache. Returns the number of ops."""
+    from weave.trace import op_type
+    from weave.trace.custom_objs import MemTraceFilesArtifact
+    from weave.trace.op import Op
+
+    n_ops = 0
+    for module_name in module_names:
+        module = importlib.import_module(module_name)
+        for value in list(vars(module).values()):
+            if isinstance(value, Op) and value.resolve_fn.__module__ == module_name:
+                op_type.save_instance(value, MemTraceFilesArtifact(), "obj")
+                n_ops += 1
+    return n_ops
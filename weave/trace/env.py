@@ -1,7 +1,109 @@
 import os
+import typing
 
 WEAVE_PARALLELISM = "WEAVE_PARALLELISM"
 
 
 def get_weave_parallelism() -> int:
     return int(os.getenv(WEAVE_PARALLELISM, "20"))
+
+
+WEAVE_ASYNC_INGESTION = "WEAVE_ASYNC_INGESTION"
+WEAVE_ASYNC_INGESTION_WORKERS = "WEAVE_ASYNC_INGESTION_WORKERS"
+WEAVE_ASYNC_INGESTION_MAX_QUEUE_SIZE = "WEAVE_ASYNC_INGESTION_MAX_QUEUE_SIZE"
+WEAVE_ASYNC_INGESTION_BACKPRESSURE = "WEAVE_ASYNC_INGESTION_BACKPRESSURE"
+WEAVE_ASYNC_INGESTION_SPILL_DIR = "WEAVE_ASYNC_INGESTION_SPILL_DIR"
+
+
+def get_async_ingestion() -> bool:
+    return os.getenv(WEAVE_ASYNC_INGESTION, "false").lower() in ("1", "true", "yes")
+
+
+def get_async_ingestion_workers() -> int:
+    return int(os.getenv(WEAVE_ASYNC_INGESTION_WORKERS, "4"))
+
+
+def get_async_ingestion_max_queue_size() -> int:
+    return int(os.getenv(WEAVE_ASYNC_INGESTION_MAX_QUEUE_SIZE, "10000"))
+
+
+def get_async_ingestion_backpressure() -> str:
+    # One of "block", "drop_oldest" or "spill_to_disk"
+    return os.getenv(WEAVE_ASYNC_INGESTION_BACKPRESSURE, "block")
+
+
+def get_async_ingestion_spill_dir() -> typing.Optional[str]:
+    return os.getenv(WEAVE_ASYNC_INGESTION_SPILL_DIR)
+
+
+WEAVE_UPLOAD_CACHE = "WEAVE_UPLOAD_CACHE"
+WEAVE_UPLOAD_CACHE_PATH = "WEAVE_UPLOAD_CACHE_PATH"
+
+
+def get_upload_cache() -> bool:
+    return os.getenv(WEAVE_UPLOAD_CACHE, "true").lower() in ("1", "true", "yes")
+
+
+def get_upload_cache_path() -> typing.Optional[str]:
+    return os.getenv(WEAVE_UPLOAD_CACHE_PATH)
+
+
+WEAVE_SAVE_PARALLELISM = "WEAVE_SAVE_PARALLELISM"
+
+
+def get_save_parallelism() -> int:
+    # Number of nested objects saved concurrently; 1 saves them serially
+    return int(os.getenv(WEAVE_SAVE_PARALLELISM, "8"))
+
+
+WEAVE_CODE_CAPTURE_CACHE_PATH = "WEAVE_CODE_CAPTURE_CACHE_PATH"
+
+
+def get_code_capture_cache_path() -> typing.Optional[str]:
+    return os.getenv(WEAVE_CODE_CAPTURE_CACHE_PATH)
+
+
+WEAVE_TRACE_SAMPLE_RATE = "WEAVE_TRACE_SAMPLE_RATE"
+WEAVE_TRACE_KEEP_ERRORS = "WEAVE_TRACE_KEEP_ERRORS"
+WEAVE_TRACE_SLOW_CALL_SECONDS = "WEAVE_TRACE_SLOW_CALL_SECONDS"
+
+
+def get_trace_sample_rate() -> float:
+    return float(os.getenv(WEAVE_TRACE_SAMPLE_RATE, "1.0"))
+
+
+def get_trace_keep_errors() -> bool:
+    return os.getenv(WEAVE_TRACE_KEEP_ERRORS, "true").lower() in ("1", "true", "yes")
+
+
+def get_trace_slow_call_seconds() -> typing.Optional[float]:
+    val = os.getenv(WEAVE_TRACE_SLOW_CALL_SECONDS)
+    return float(val) if val else None
+
+
+WEAVE_SERIALIZE_MAX_STRING_BYTES = "WEAVE_SERIALIZE_MAX_STRING_BYTES"
+WEAVE_SERIALIZE_MAX_LIST_ITEMS = "WEAVE_SERIALIZE_MAX_LIST_ITEMS"
+WEAVE_SERIALIZE_MAX_ARRAY_ITEMS = "WEAVE_SERIALIZE_MAX_ARRAY_ITEMS"
+WEAVE_SERIALIZE_MAX_TOTAL_BYTES = "WEAVE_SERIALIZE_MAX_TOTAL_BYTES"
+
+
+def _get_optional_limit(name: str, default: int) -> typing.Optional[int]:
+    # 0 or a negative value disables the limit
+    val = int(os.getenv(name, str(default)))
+    return val if val > 0 else None
+
+
+def get_serialize_max_string_bytes() -> typing.Optional[int]:
+    return _get_optional_limit(WEAVE_SERIALIZE_MAX_STRING_BYTES, 100_000)
+
+
+def get_serialize_max_list_items() -> typing.Optional[int]:
+    return _get_optional_limit(WEAVE_SERIALIZE_MAX_LIST_ITEMS, 10_000)
+
+
+def get_serialize_max_array_items() -> typing.Optional[int]:
+    return _get_optional_limit(WEAVE_SERIALIZE_MAX_ARRAY_ITEMS, 1_000)
+
+
+def get_serialize_max_total_bytes() -> typing.Optional[int]:
+    return _get_optional_limit(WEAVE_SERIALIZE_MAX_TOTAL_BYTES, 10_000_000)
@@ -0,0 +1,307 @@
+import atexit
+import collections
+import dataclasses
+import logging
+import os
+import tempfile
+import threading
+import time
+import typing
+import zlib
+
+logger = logging.getLogger(__name__)
+
+BackpressurePolicy = typing.Literal["block", "drop_oldest", "spill_to_disk"]
+BACKPRESSURE_POLICIES = ("block", "drop_oldest", "spill_to_disk")
+
+Task = typing.Callable[[], None]
+# Produces a single-line, serialized version of the task's payload, or None if
+# the payload cannot be serialized without doing the task's work (eg. network
+# I/O). Only invoked when the queue is full and the policy is `spill_to_disk`,
+# on the caller's thread but without holding the shard's lock.
+SpillFn = typing.Callable[[], typing.Optional[str]]
+# Replays a line previously produced by a `SpillFn`.
+ReplayFn = typing.Callable[[str], None]
+
+# Seconds the exit hook waits for pending tasks before giving up on them
+EXIT_FLUSH_TIMEOUT = 30
+
+
+@dataclasses.dataclass
+class IngestionStats:
+    queue_depth: int
+    spilled_depth: int
+    in_flight: int
+    enqueued: int
+    processed: int
+    dropped: int
+    spilled: int
+    errors: int
+
+
+class _Shard:
+    """A single worker thread with its own bounded FIFO (and spill file)."""
+
+    def __init__(self, index: int, max_size: int) -> None:
+        self.index = index
+        self.max_size = max_size
+        # (key, task)
+        self.tasks: collections.deque[typing.Tuple[str, Task]] = collections.deque()
+        # Keys whose tasks are being dropped, most recent last
+        self.dropped_keys: collections.OrderedDict[str, None] = (
+            collections.OrderedDict()
+        )
+        self.cond = threading.Condition()
+        self.thread: typing.Optional[threading.Thread] = None
+        self.in_flight = 0
+        self.spill_path: typing.Optional[str] = None
+        self.spill_pending = 0
+
+    def is_idle(self) -> bool:
+        return not self.tasks and self.in_flight == 0 and self.spill_pending == 0
+
+
+class IngestionQueue:
+    """Bounded in-process pipeline that runs call ingestion work off the caller's thread.
+
+    Tasks are sharded by key across `num_workers` worker threads. Tasks that share
+    a key are always executed in submission order, so submitting with the trace id
+    as the key guarantees that a call's start is uploaded before its end and that
+    parents are uploaded before their children.
+
+    When a shard is full, `backpressure` decides what happens:
+        * `block`: the caller waits until the worker has made room.
+        * `drop_oldest`: every pending task sharing the key of the oldest
+          pending task of the shard is discarded, and so are the tasks submitted
+          with that key later on. With trace ids as keys, whole traces are
+          dropped rather than, say, a call's start without its end.
+        * `spill_to_disk`: the task's payload is serialized on the caller's
+          thread (via its `spill_fn`) and appended to a spill file which the
+          worker replays (via `replay_fn`) once it has drained its queue. Tasks
+          whose payload cannot be serialized are handled as with `block`.
+    """
+
+    def __init__(
+        self,
+        num_workers: int = 4,
+        max_queue_size: int = 10000,
+        backpressure: BackpressurePolicy = "block",
+        spill_dir: typing.Optional[str] = None,
+        replay_fn: typing.Optional[ReplayFn] = None,
+    ) -> None:
+        if num_workers < 1:
+            raise ValueError("num_workers must be at least 1")
+        if max_queue_size < 1:
+            raise ValueError("max_queue_size must be at least 1")
+        if backpressure not in BACKPRESSURE_POLICIES:
+            raise ValueError(
+                f"Unknown backpressure policy: {backpressure}. Expected one of {BACKPRESSURE_POLICIES}"
+            )
+        self.backpressure = backpressure
+        self.spill_dir = spill_dir
+        self.replay_fn = replay_fn
+        shard_size = max(1, max_queue_size // num_workers)
+        self._shards = [_Shard(i, shard_size) for i in range(num_workers)]
+        self._stats_lock = threading.Lock()
+        self._enqueued = 0
+        self._processed = 0
+        self._dropped = 0
+        self._spilled = 0
+        self._errors = 0
+        self._stopping = False
+        atexit.register(self._flush_at_exit)
+
+    def submit(
+        self,
+        key: str,
+        task: Task,
+        spill_fn: typing.Optional[SpillFn] = None,
+    ) -> None:
+        """Enqueues `task` to be run on the worker that owns `key`."""
+        shard = self._shards[zlib.crc32(key.encode()) % len(self._shards)]
+        with shard.cond:
+            self._ensure_worker(shard)
+            if key in shard.dropped_keys:
+                self._incr("_dropped")
+                return
+            # Once a shard starts spilling, keep spilling until the worker has
+            # caught up, otherwise newer tasks would overtake spilled ones.
+            full = len(shard.tasks) >= shard.max_size or shard.spill_pending
+            if full and self.backpressure == "drop_oldest":
+                self._drop_key(shard, shard.tasks[0][0])
+                if key in shard.dropped_keys:
+                    self._incr("_dropped")
+                    return
+            spill = (
+                full
+                and self.backpressure == "spill_to_disk"
+                and spill_fn is not None
+                and self.replay_fn is not None
+            )
+            if not spill:
+                self._append(shard, key, task)
+                return
+
+        # Serializing the payload may be slow, so the worker keeps draining
+        # the shard meanwhile
+        line = None
+        try:
+            line = spill_fn()  # type: ignore
+        except Exception:
+            logger.exception("Error while spilling ingestion task")
+        with shard.cond:
+            if line is not None:
+                self._spill(shard, line)
+                self._incr("_enqueued")
+                shard.cond.notify_all()
+            else:
+                # Not spillable - fall back to blocking
+                self._append(shard, key, task)
+
+    def flush(self, timeout: typing.Optional[float] = None) -> bool:
+        """Waits until every submitted task has been processed.
+
+        Returns False if `timeout` (in seconds) elapsed before the queue drained.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for shard in self._shards:
+            with shard.cond:
+                while not shard.is_idle():
+                    remaining = None
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return False
+                    shard.cond.wait(remaining)
+        return True
+
+    def stats(self) -> IngestionStats:
+        queue_depth = 0
+        spilled_depth = 0
+        in_flight = 0
+        for shard in self._shards:
+            with shard.cond:
+                queue_depth += len(shard.tasks)
+                spilled_depth += shard.spill_pending
+                in_flight += shard.in_flight
+        with self._stats_lock:
+            return IngestionStats(
+                queue_depth=queue_depth,
+                spilled_depth=spilled_depth,
+                in_flight=in_flight,
+                enqueued=self._enqueued,
+                processed=self._processed,
+                dropped=self._dropped,
+                spilled=self._spilled,
+                errors=self._errors,
+            )
+
+    def shutdown(self) -> None:
+        """Processes all pending tasks, then stops the worker threads."""
+        self.flush()
+        self._stopping = True
+        for shard in self._shards:
+            with shard.cond:
+                shard.cond.notify_all()
+            if shard.thread is not None:
+                shard.thread.join()
+                shard.thread = None
+        self._stopping = False
+
+    def _flush_at_exit(self) -> None:
+        if not self.flush(timeout=EXIT_FLUSH_TIMEOUT):
+            logger.warning(
+                f"Exiting with {self.stats().queue_depth} ingestion tasks not processed"
+            )
+
+    def _append(self, shard: _Shard, key: str, task: Task) -> None:
+        # Called with the shard lock held. Blocks until the shard has room, and
+        # until spilled tasks have been taken, so that the task does not
+        # overtake them.
+        while len(shard.tasks) >= shard.max_size or shard.spill_pending:
+            shard.cond.wait()
+        shard.tasks.append((key, task))
+        self._incr("_enqueued")
+        shard.cond.notify_all()
+
+    def _drop_key(self, shard: _Shard, key: str) -> None:
+        # Called with the shard lock held
+        kept = collections.deque(item for item in shard.tasks if item[0] != key)
+        self._incr("_dropped", len(shard.tasks) - len(kept))
+        shard.tasks = kept
+        shard.dropped_keys[key] = None
+        while len(shard.dropped_keys) > shard.max_size:
+            shard.dropped_keys.popitem(last=False)
+
+    def _incr(self, counter: str, n: int = 1) -> None:
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + n)
+
+    def _ensure_worker(self, shard: _Shard) -> None:
+        # Workers are started lazily so that a queue created before a fork is
+        # still usable in the child.
+        if shard.thread is None or not shard.thread.is_alive():
+            shard.thread = threading.Thread(
+                target=self._run_worker, args=(shard,), daemon=True
+            )
+            shard.thread.start()
+
+    def _spill(self, shard: _Shard, line: str) -> None:
+        if "\n" in line:
+            raise ValueError("Spilled payloads must be a single line")
+        if shard.spill_path is None:
+            spill_dir = self.spill_dir or tempfile.mkdtemp(prefix="weave-ingestion-")
+            os.makedirs(spill_dir, exist_ok=True)
+            shard.spill_path = os.path.join(
+                spill_dir, f"shard-{os.getpid()}-{id(self)}-{shard.index}.jsonl"
+            )
+        with open(shard.spill_path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+        shard.spill_pending += 1
+        self._incr("_spilled")
+
+    def _take_spilled(self, shard: _Shard) -> list[str]:
+        # Called with the shard lock held
+        if not shard.spill_pending or shard.spill_path is None:
+            return []
+        draining_path = shard.spill_path + ".draining"
+        os.replace(shard.spill_path, draining_path)
+        with open(draining_path, encoding="utf-8") as f:
+            lines = [line.rstrip("\n") for line in f if line.strip()]
+        os.remove(draining_path)
+        return lines
+
+    def _run_worker(self, shard: _Shard) -> None:
+        while True:
+            with shard.cond:
+                while not shard.tasks and not shard.spill_pending:
+                    if self._stopping:
+                        return
+                    shard.cond.wait()
+                tasks: list[Task]
+                if shard.tasks:
+                    tasks = [shard.tasks.popleft()[1]]
+                else:
+                    lines = self._take_spilled(shard)
+                    replay_fn = self.replay_fn
+                    tasks = [
+                        (lambda line=line: replay_fn(line))  # type: ignore
+                        for line in lines
+                    ]
+                    # Items taken from the spill file become in-flight work
+                    shard.spill_pending = 0
+                shard.in_flight += len(tasks)
+                # Wake up blocked producers now that there is room
+                shard.cond.notify_all()
+
+            for task in tasks:
+                try:
+                    task()
+                except Exception:
+                    logger.exception("Error while processing ingestion task")
+                    self._incr("_errors")
+                finally:
+                    self._incr("_processed")
+                    with shard.cond:
+                        shard.in_flight -= 1
+                        shard.cond.notify_all()
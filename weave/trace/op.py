@@ -1,5 +1,8 @@
+import datetime
 import functools
 import inspect
+import logging
+import time
 import typing
 from typing import (
     TYPE_CHECKING,
@@ -16,6 +19,7 @@ from typing_extensions import ParamSpec
 
 from weave import call_context, client_context
 from weave.legacy import box, context_state
+from weave.trace import sampling
 from weave.trace.context import call_attributes
 from weave.trace.errors import OpCallError
 from weave.trace.refs import ObjectRef
@@ -35,6 +39,8 @@ try:
 except ImportError:
     ANTHROPIC_NOT_GIVEN = None
 
+logger = logging.getLogger(__name__)
+
 
 def print_call_link(call: "Call") -> None:
     print(f"{TRACE_CALL_EMOJI} {call.ui_url}")
@@ -76,33 +82,147 @@ class Op:
 
     def __call__(self, *args: Any, **kwargs: Any) -> Any:
         maybe_client = client_context.weave_client.get_weave_client()
-        if maybe_client is None:
+        if maybe_client is None or sampling.in_dropped_call():
             return self.resolve_fn(*args, **kwargs)
 
+        sampler = maybe_client._sampler
+        if sampler is not None and not sampler.should_trace(
+            self.name, is_root=call_context.get_current_call() is None
+        ):
+            return self._execute_dropped_call(sampler, *args, **kwargs)
+
+        if self._on_output_handler is None and inspect.iscoroutinefunction(
+            self.resolve_fn
+        ):
+            return self._execute_call_async(*args, **kwargs)
+
         call = self._create_call(*args, **kwargs)
         return self._execute_call(call, *args, **kwargs)
 
-    def _create_call(self, *args: Any, **kwargs: Any) -> Any:
+    def _create_call(
+        self,
+        *args: Any,
+        started_at: Optional[datetime.datetime] = None,
+        **kwargs: Any,
+    ) -> Any:
         client = client_context.weave_client.require_weave_client()
 
+        # If/When we do memoization, this would be a good spot
+
+        return client.create_call(
+            self,
+            self._bind_inputs(*args, **kwargs),
+            call_context.get_current_call(),
+            attributes=call_attributes.get(),
+            started_at=started_at,
+        )
+
+    def _bind_inputs(self, *args: Any, **kwargs: Any) -> dict[str, Any]:
         try:
             inputs = self.signature.bind(*args, **kwargs).arguments
         except TypeError as e:
             raise OpCallError(f"Error calling {self.name}: {e}")
-        inputs_with_defaults = _apply_fn_defaults_to_inputs(self.resolve_fn, inputs)
+        return _apply_fn_defaults_to_inputs(self.resolve_fn, inputs)
 
-        # If/When we do memoization, this would be a good spot
+    async def _execute_call_async(self, *args: Any, **kwargs: Any) -> Any:
+        """Calls an async op, logging the call without blocking the event loop
+        (see `WeaveClient.create_call_async`)."""
+        client = client_context.weave_client.require_weave_client()
+        call = await client.create_call_async(
+            self,
+            self._bind_inputs(*args, **kwargs),
+            call_context.get_current_call(),
+            attributes=call_attributes.get(),
+        )
+
+        async def finish(
+            output: Any = None, exception: Optional[BaseException] = None
+        ) -> None:
+            try:
+                await client.finish_call_async(call, output, exception)
+            except Exception:
+                # Failing to log the call (or its start) must not replace its
+                # result or the exception it raised
+                logger.exception(f"Error logging call of {self.name}")
 
-        parent_call = call_context.get_current_call()
-        client._save_nested_objects(inputs_with_defaults)
+        try:
+            output = await self.resolve_fn(*args, **kwargs)
+        except BaseException as e:
+            await finish(exception=e)
+            raise
+        await finish(output)
+        if not call_context.get_current_call():
+            print_call_link(call)
+        return output
+
+    def _execute_dropped_call(
+        self, sampler: sampling.Sampler, *args: Any, **kwargs: Any
+    ) -> Any:
+        """Runs a call the sampler dropped, without tracing it or its
+        descendants. If the tail rules keep it, the call is traced once it has
+        finished."""
+        # Bound before running, like traced calls, so that the logged inputs
+        # are the ones the op was called with
+        inputs = self._bind_inputs(*args, **kwargs)
+        parent = call_context.get_current_call()
         attributes = call_attributes.get()
+        started_at = datetime.datetime.now(tz=datetime.timezone.utc)
+        start = time.monotonic()
 
-        return client.create_call(
-            self,
-            inputs_with_defaults,
-            parent_call,
-            attributes=attributes,
-        )
+        def finish(
+            output: Any = None, exception: Optional[BaseException] = None
+        ) -> None:
+            try:
+                if not sampler.should_keep(time.monotonic() - start, exception):
+                    return
+                client = client_context.weave_client.require_weave_client()
+                call = client.create_call(
+                    self,
+                    inputs,
+                    parent,
+                    attributes=attributes,
+                    started_at=started_at,
+                )
+                client.finish_call(call, output, exception)
+            except Exception:
+                # Failing to log the call must not replace its result or the
+                # exception it raised
+                logger.exception(f"Error logging sampled call of {self.name}")
+
+        def on_output(output: Any) -> Any:
+            # Descendants called while a stream is consumed are dropped too.
+            # The stream is finished once consumed: by the output handler if
+            # the op has one, otherwise with the items it yielded.
+            stream_finish = None if self._on_output_handler else finish
+            if inspect.isgenerator(output):
+                output = _iterate_dropped(output, stream_finish)
+            elif inspect.isasyncgen(output):
+                output = _aiterate_dropped(output, stream_finish)
+            elif not self._on_output_handler:
+                finish(output)
+            if self._on_output_handler:
+                return self._on_output_handler(output, finish, inputs)
+            return output
+
+        try:
+            with sampling.dropped_call():
+                res = self.resolve_fn(*args, **kwargs)
+        except BaseException as e:
+            finish(exception=e)
+            raise
+        if inspect.iscoroutine(res):
+
+            async def _call_async() -> Coroutine[Any, Any, Any]:
+                try:
+                    with sampling.dropped_call():
+                        output = await res
+                except BaseException as e:
+                    finish(exception=e)
+                    raise
+                return on_output(output)
+
+            return _call_async()
+        return on_output(res)
 
     def _execute_call(self, call: Any, *args: Any, **kwargs: Any) -> Any:
         client = client_context.weave_client.require_weave_client()
@@ -249,6 +369,64 @@ def value_is_sentinel(param: Any) -> bool:
     )
 
 
+def _iterate_dropped(
+    gen: typing.Generator, finish: Optional[FinishCallbackType]
+) -> typing.Generator:
+    """Runs the generator of a dropped call in the dropped context. If `finish`
+    is given, the call is finished with the items the generator yielded once
+    it is exhausted or closed."""
+    items = []
+    try:
+        while True:
+            with sampling.dropped_call():
+                try:
+                    item = next(gen)
+                except StopIteration:
+                    break
+            if finish is not None:
+                items.append(item)
+            yield item
+    except GeneratorExit:
+        gen.close()
+        if finish is not None:
+            finish(items, None)
+        raise
+    except BaseException as e:
+        if finish is not None:
+            finish(None, e)
+        raise
+    if finish is not None:
+        finish(items, None)
+
+
+async def _aiterate_dropped(
+    gen: typing.AsyncGenerator, finish: Optional[FinishCallbackType]
+) -> typing.AsyncGenerator:
+    """Like `_iterate_dropped`, for async generators."""
+    items = []
+    try:
+        while True:
+            with sampling.dropped_call():
+                try:
+                    item = await gen.__anext__()
+                except StopAsyncIteration:
+                    break
+            if finish is not None:
+                items.append(item)
+            yield item
+    except GeneratorExit:
+        await gen.aclose()
+        if finish is not None:
+            finish(items, None)
+        raise
+    except BaseException as e:
+        if finish is not None:
+            finish(None, e)
+        raise
+    if finish is not None:
+        finish(items, None)
+
+
 def _apply_fn_defaults_to_inputs(
     fn: typing.Callable, inputs: Mapping[str, typing.Any]
 ) -> dict[str, typing.Any]:
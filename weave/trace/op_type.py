@@ -8,6 +8,7 @@ import os
 import re
 import sys
 import textwrap
+import threading
 import types as py_types
 import typing
 from _ast import AsyncFunctionDef, ExceptHandler
@@ -18,7 +19,7 @@ from weave.trace.ipython import get_class_source, is_running_interactively
 from weave.trace.refs import ObjectRef
 
 from .. import environment, errors, storage
-from . import serializer
+from . import code_capture_cache, serializer
 from .op import Op
 
 WEAVE_OP_PATTERN = re.compile(r"@weave\.op(\(\))?")
@@ -192,12 +193,19 @@ class GetCodeDepsResult(typing.TypedDict):
 
 
 def get_source_notebook_safe(fn: typing.Callable) -> str:
+    cache = code_capture_cache.get_code_capture_cache()
+    key = code_capture_cache.source_key(fn)
+    if key is not None and (cached := cache.get(key)) is not None:
+        return cached
     # In ipython, we can't use inspect.getsource on classes defined in the notebook
     if is_running_interactively() and inspect.isclass(fn):
         src = get_class_source(fn)
     else:
         src = inspect.getsource(fn)
-    return textwrap.dedent(src)
+    src = textwrap.dedent(src)
+    if key is not None:
+        cache.set(key, src)
+    return src
 
 
 def reconstruct_signature(fn: typing.Callable) -> str:
@@ -257,6 +265,11 @@ def get_source_or_fallback(fn: typing.Callable) -> str:
     if isinstance(fn, Op):
         fn = fn.resolve_fn
 
+    try:
+        return get_source_notebook_safe(fn)
+    except OSError:
+        pass
+
     func_name = fn.__name__
     try:
         sig_str = reconstruct_signature(fn)
@@ -269,11 +282,36 @@ def get_source_or_fallback(fn: typing.Callable) -> str:
             ... # Code-capture unavailable for this op
         """
     )[1:]  # skip first newline char
+    return missing_code_template
+
+
+# Parsing in several threads at once can fail on some Python versions with
+# "SystemError: AST constructor recursion depth mismatch", and ops are saved
+# from threads (eg. by async ops)
+_ast_parse_lock = threading.Lock()
 
+
+def _ast_parse(source: str) -> ast.Module:
+    with _ast_parse_lock:
+        return ast.parse(source)
+
+
+def find_external_vars(source: str) -> Optional[list[str]]:
+    """Returns the external variables referenced by `source`, or None if it
+    can't be parsed."""
+    cache = code_capture_cache.get_code_capture_cache()
+    key = code_capture_cache.external_vars_key(source)
+    if (cached := cache.get(key)) is not None:
+        return cached
     try:
-        return get_source_notebook_safe(fn)
-    except OSError:
-        return missing_code_template
+        parsed = _ast_parse(source)
+    except SyntaxError:
+        return None
+    visitor = ExternalVariableFinder()
+    visitor.visit(parsed)
+    external_vars = list(visitor.external_vars)
+    cache.set(key, external_vars)
+    return external_vars
 
 
 def get_code_deps(
@@ -311,16 +349,11 @@ def get_code_deps(
         return {"import_code": [], "code": [], "warnings": warnings}
 
     source = get_source_or_fallback(fn)
-    try:
-        parsed = ast.parse(source)
-    except SyntaxError:
+    external_vars = find_external_vars(source)
+    if external_vars is None:
         warnings.append(f"Could not parse source of function {fn}.")
         return {"import_code": [], "code": [], "warnings": warnings}
 
-    visitor = ExternalVariableFinder()
-    visitor.visit(parsed)
-    external_vars = list(visitor.external_vars)
-
     import_code = []
     code = []
     for var_name in external_vars:
@@ -422,7 +455,7 @@ def find_last_weave_op_function(
     source_code: str,
 ) -> Union[ast.FunctionDef, ast.AsyncFunctionDef, None]:
     """Given a string of python source code, find the last function that is decorated with 'weave.op'."""
-    tree = ast.parse(source_code)
+    tree = _ast_parse(source_code)
 
     last_function = None
 
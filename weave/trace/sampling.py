@@ -0,0 +1,124 @@
+"""Sampling of traced calls.
+
+Tracing a call saves and serializes its inputs and outputs, so on high traffic
+services only a fraction of the calls may be worth tracing. Whether to trace a
+call is decided before any of that work happens:
+
+* Head sampling: a root call (one without a traced parent) is traced with
+  probability `rate`. The decision applies to the whole trace: the descendants
+  of a dropped call are not traced either.
+* Rate limits: at most `op_rate_limits[op_name]` calls per second of an op are
+  traced. A call dropped by its rate limit is dropped with its descendants.
+
+Tail rules then apply to dropped calls once they have run: a dropped call that
+raised (`keep_errors`) or that took at least `slow_call_seconds` is traced
+after the fact, without its descendants.
+"""
+
+import contextlib
+import contextvars
+import dataclasses
+import random
+import threading
+import time
+import typing
+
+from weave.trace import env
+
+# Set while a dropped call runs, so that its descendants are dropped too
+_dropped: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "weave_sampling_dropped", default=False
+)
+
+
+def in_dropped_call() -> bool:
+    return _dropped.get()
+
+
+@contextlib.contextmanager
+def dropped_call() -> typing.Iterator[None]:
+    token = _dropped.set(True)
+    try:
+        yield
+    finally:
+        _dropped.reset(token)
+
+
+@dataclasses.dataclass
+class SamplingPolicy:
+    # Fraction of the traces (root calls) that are traced
+    rate: float = 1.0
+    # Maximum number of traced calls per second, by op name
+    op_rate_limits: dict[str, float] = dataclasses.field(default_factory=dict)
+    # Trace dropped calls that raised an exception
+    keep_errors: bool = True
+    # Trace dropped calls that took at least this many seconds
+    slow_call_seconds: typing.Optional[float] = None
+
+    @classmethod
+    def from_env(cls) -> "SamplingPolicy":
+        return cls(
+            rate=env.get_trace_sample_rate(),
+            keep_errors=env.get_trace_keep_errors(),
+            slow_call_seconds=env.get_trace_slow_call_seconds(),
+        )
+
+    def traces_everything(self) -> bool:
+        return self.rate >= 1.0 and not self.op_rate_limits
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, clock: typing.Callable[[], float]):
+        self.rate = rate
+        # Allow bursts of up to one second worth of calls
+        self.capacity = max(rate, 1.0)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated_at = clock()
+
+    def take(self) -> bool:
+        now = self.clock()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+        if self.tokens < 1.0:
+            return False
+        self.tokens -= 1.0
+        return True
+
+
+class Sampler:
+    def __init__(
+        self,
+        policy: SamplingPolicy,
+        rand: typing.Callable[[], float] = random.random,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ):
+        self.policy = policy
+        self._rand = rand
+        self._clock = clock
+        self._buckets: dict[str, _TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def should_trace(self, op_name: str, is_root: bool) -> bool:
+        """Head decision, made before the call runs."""
+        if is_root and self.policy.rate < 1.0 and self._rand() >= self.policy.rate:
+            return False
+        limit = self.policy.op_rate_limits.get(op_name)
+        if limit is None:
+            return True
+        with self._lock:
+            bucket = self._buckets.get(op_name)
+            if bucket is None:
+                bucket = self._buckets[op_name] = _TokenBucket(limit, self._clock)
+            return bucket.take()
+
+    def should_keep(
+        self, duration_seconds: float, exception: typing.Optional[BaseException]
+    ) -> bool:
+        """Tail decision, made after a dropped call has run."""
+        if exception is not None and self.policy.keep_errors:
+            return True
+        slow_call_seconds = self.policy.slow_call_seconds
+        return slow_call_seconds is not None and duration_seconds >= slow_call_seconds
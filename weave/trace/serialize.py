@@ -1,46 +1,216 @@
+import dataclasses
+import datetime
+import math
 import typing
-from typing import Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from requests import HTTPError
 
 from weave.legacy import box
-from weave.trace import custom_objs
+from weave.trace import custom_objs, env
 from weave.trace.object_record import ObjectRecord
 from weave.trace.refs import ObjectRef, TableRef, parse_uri
+from weave.trace.upload_cache import UploadCache
 from weave.trace_server.trace_server_interface import (
+    FILE_CHUNK_SIZE,
     FileContentReadReq,
+    FileCreatePartReq,
     FileCreateReq,
+    FilePartsMissingReq,
     TraceServerInterface,
 )
+from weave.trace_server.trace_server_interface_util import bytes_digest
 
+REDACT_KEYS = ("api_key",)
+REDACTED_VALUE = "REDACTED"
+
+
+@dataclasses.dataclass
+class SerializeLimits:
+    """Bounds the size of the call inputs and outputs sent to the server.
+
+    Values over a limit are replaced by a shorter value in place, and their
+    path is recorded (see `to_json_bounded`). A limit of None disables it.
+    """
+
+    # Strings (and bytes) are truncated to this many bytes
+    max_string_bytes: Optional[int] = 100_000
+    # Lists and tuples are truncated to this many items
+    max_list_items: Optional[int] = 10_000
+    # Arrays and tensors with more elements are replaced by a summary of their
+    # type, shape and dtype
+    max_array_items: Optional[int] = 1_000
+    # Once the serialized value reaches this (approximate) size, the remaining
+    # values are elided
+    max_total_bytes: Optional[int] = 10_000_000
+    # Values of these dict keys are replaced by REDACTED_VALUE
+    redact_keys: tuple[str, ...] = REDACT_KEYS
+
+    @classmethod
+    def from_env(cls) -> "SerializeLimits":
+        return cls(
+            max_string_bytes=env.get_serialize_max_string_bytes(),
+            max_list_items=env.get_serialize_max_list_items(),
+            max_array_items=env.get_serialize_max_array_items(),
+            max_total_bytes=env.get_serialize_max_total_bytes(),
+        )
+
+
+# At most this many elided paths are recorded per value
+MAX_ELIDED_PATHS = 100
+
+
+class _BoundedWalk:
+    def __init__(self, limits: SerializeLimits):
+        self.limits = limits
+        self.remaining = limits.max_total_bytes
+        self.elided: list[str] = []
+
+    def spend(self, n_bytes: int) -> None:
+        if self.remaining is not None:
+            self.remaining -= n_bytes
+
+    def exhausted(self) -> bool:
+        return self.remaining is not None and self.remaining <= 0
+
+    def elide(self, path: str, replacement: Any) -> Any:
+        if len(self.elided) < MAX_ELIDED_PATHS:
+            self.elided.append(path)
+        return replacement
+
+
+def to_json(
+    obj: Any,
+    project_id: str,
+    server: TraceServerInterface,
+    upload_cache: Optional[UploadCache] = None,
+) -> Any:
+    return _Encoder(project_id, server, upload_cache, None).encode(obj, "")
+
+
+def to_json_bounded(
+    obj: Any,
+    project_id: str,
+    server: TraceServerInterface,
+    limits: SerializeLimits,
+    upload_cache: Optional[UploadCache] = None,
+    path: str = "",
+) -> tuple[Any, list[str]]:
+    """Like `to_json`, but redacts and bounds the result in the same walk.
+
+    Datetimes and numpy values are encoded natively (as ISO strings and
+    numbers) rather than by their repr. Call inputs and outputs are not
+    content-addressed, so unlike `to_json` this may change what they look like.
+
+    Returns the serialized value and the paths (eg. `doc.pages[3]`, prefixed
+    by `path`) of the values that were truncated, summarized or elided.
+    """
+    walk = _BoundedWalk(limits)
+    res = _Encoder(project_id, server, upload_cache, walk).encode(obj, path)
+    return res, walk.elided
+
+
+def _join_path(path: str, key: Any) -> str:
+    return f"{path}.{key}" if path else str(key)
+
+
+class _Encoder:
+    def __init__(
+        self,
+        project_id: str,
+        server: TraceServerInterface,
+        upload_cache: Optional[UploadCache],
+        walk: Optional[_BoundedWalk],
+    ):
+        self.project_id = project_id
+        self.server = server
+        self.upload_cache = upload_cache
+        self.walk = walk
+
+    def encode(self, obj: Any, path: str) -> Any:
+        walk = self.walk
+        if walk is not None:
+            if walk.exhausted():
+                return walk.elide(path, ELIDED_VALUE)
+            bounded = _bound_value(obj, walk, path)
+            if bounded is not _NOT_BOUNDED:
+                return bounded
+        obj_type = type(obj)
+        encode_fn = _ENCODERS_BY_TYPE.get(obj_type)
+        if encode_fn is None:
+            encode_fn = _resolve_encoder(obj_type)
+        return encode_fn(self, obj, path)
+
+    def encode_item(self, v: Any, k: Any, path: str) -> Any:
+        walk = self.walk
+        if walk is None:
+            return self.encode(v, "")
+        if k in walk.limits.redact_keys:
+            return REDACTED_VALUE
+        if isinstance(k, str):
+            walk.spend(len(k))
+        return self.encode(v, _join_path(path, k))
+
+
+def _encode_plain(encoder: _Encoder, obj: Any, path: str) -> Any:
+    return obj
+
+
+def _encode_ref(encoder: _Encoder, obj: Any, path: str) -> Any:
+    return obj.uri()
+
+
+def _encode_dict(encoder: _Encoder, obj: Any, path: str) -> Any:
+    encode_item = encoder.encode_item
+    return {k: encode_item(v, k, path) for k, v in obj.items()}
+
+
+def _encode_object_record(encoder: _Encoder, obj: Any, path: str) -> Any:
+    res = {"_type": obj._class_name}
+    for k, v in obj.__dict__.items():
+        res[k] = encoder.encode_item(v, k, path)
+    return res
+
+
+def _encode_namedtuple(encoder: _Encoder, obj: Any, path: str) -> Any:
+    return _encode_dict(encoder, obj._asdict(), path)
 
-def to_json(obj: Any, project_id: str, server: TraceServerInterface) -> Any:
-    if isinstance(obj, TableRef):
-        return obj.uri()
-    elif isinstance(obj, ObjectRef):
-        return obj.uri()
-    elif isinstance(obj, ObjectRecord):
-        res = {"_type": obj._class_name}
-        for k, v in obj.__dict__.items():
-            res[k] = to_json(v, project_id, server)
-        return res
-    elif isinstance_namedtuple(obj):
-        return {k: to_json(v, project_id, server) for k, v in obj._asdict().items()}
-    elif isinstance(obj, (list, tuple)):
-        return [to_json(v, project_id, server) for v in obj]
-    elif isinstance(obj, dict):
-        return {k: to_json(v, project_id, server) for k, v in obj.items()}
 
-    if isinstance(obj, (int, float, str, bool, box.BoxedNone)) or obj is None:
-        return obj
+def _encode_list(encoder: _Encoder, obj: Any, path: str) -> Any:
+    walk = encoder.walk
+    if walk is None:
+        encode = encoder.encode
+        return [encode(v, "") for v in obj]
 
+    max_items = walk.limits.max_list_items
+    n_items = len(obj) if max_items is None else min(len(obj), max_items)
+    res = []
+    for i in range(n_items):
+        if walk.exhausted():
+            break
+        res.append(encoder.encode(obj[i], f"{path}[{i}]"))
+    if len(res) < len(obj):
+        res.append(walk.elide(path, f"...[{len(obj) - len(res)} more items]"))
+    return res
+
+
+def _encode_custom(encoder: _Encoder, obj: Any, path: str) -> Any:
     encoded = custom_objs.encode_custom_obj(obj)
     if encoded is None:
-        return fallback_encode(obj)
+        if encoder.walk is not None:
+            native = _encode_native(obj)
+            if native is not _NOT_NATIVE:
+                return native
+        rep = fallback_encode(obj)
+        if encoder.walk is not None and isinstance(rep, str):
+            encoder.walk.spend(len(rep))
+        return rep
     file_digests = {}
     for name, val in encoded["files"].items():
-        file_response = server.file_create(
-            FileCreateReq(project_id=project_id, name=name, content=val)
+        file_digests[name] = _create_file(
+            encoder.project_id, encoder.server, name, val, encoder.upload_cache
         )
-        file_digests[name] = file_response.digest
     result = {
         "_type": encoded["_type"],
         "weave_type": encoded["weave_type"],
@@ -52,8 +222,204 @@ def to_json(obj: Any, project_id: str, server: TraceServerInterface) -> Any:
     return result
 
 
+_NOT_NATIVE = object()
+
+
+def _encode_native(obj: Any) -> Any:
+    """Encodes values that JSON encoders like orjson support natively, or
+    returns _NOT_NATIVE."""
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    # Numpy scalars and (small, see max_array_items) arrays
+    if type(obj).__module__ == "numpy" and hasattr(obj, "tolist"):
+        return obj.tolist()
+    return _NOT_NATIVE
+
+
+_EncodeFn = typing.Callable[[_Encoder, Any, str], Any]
+
+# Encoders by exact type. Checked before anything else, so that the common
+# types are encoded without a chain of isinstance checks.
+_ENCODERS_BY_TYPE: dict[type, _EncodeFn] = {
+    str: _encode_plain,
+    int: _encode_plain,
+    float: _encode_plain,
+    bool: _encode_plain,
+    type(None): _encode_plain,
+    box.BoxedNone: _encode_plain,
+    dict: _encode_dict,
+    list: _encode_list,
+    tuple: _encode_list,
+    ObjectRecord: _encode_object_record,
+    ObjectRef: _encode_ref,
+    TableRef: _encode_ref,
+}
+
+# Bounds the number of subclasses (which may be created dynamically) added to
+# _ENCODERS_BY_TYPE
+MAX_CACHED_ENCODER_TYPES = 1000
+
+
+def _resolve_encoder(obj_type: type) -> _EncodeFn:
+    # Subclasses, in the order the checks were made before the dispatch table
+    encode_fn: _EncodeFn
+    if issubclass(obj_type, (TableRef, ObjectRef)):
+        encode_fn = _encode_ref
+    elif issubclass(obj_type, ObjectRecord):
+        encode_fn = _encode_object_record
+    elif issubclass(obj_type, tuple) and hasattr(obj_type, "_asdict"):
+        encode_fn = _encode_namedtuple
+    elif issubclass(obj_type, (list, tuple)):
+        encode_fn = _encode_list
+    elif issubclass(obj_type, dict):
+        encode_fn = _encode_dict
+    elif issubclass(obj_type, (int, float, str, bool, box.BoxedNone)):
+        encode_fn = _encode_plain
+    else:
+        encode_fn = _encode_custom
+    if len(_ENCODERS_BY_TYPE) < MAX_CACHED_ENCODER_TYPES:
+        _ENCODERS_BY_TYPE[obj_type] = encode_fn
+    return encode_fn
+
+
+# Replaces the values serialized after the total size limit is reached
+ELIDED_VALUE = "...[elided]"
+
+_NOT_BOUNDED = object()
+
+
+def _bound_value(obj: Any, walk: _BoundedWalk, path: str) -> Any:
+    """Returns the bounded json value of `obj`, or _NOT_BOUNDED to serialize
+    it as usual."""
+    limits = walk.limits
+    if isinstance(obj, str):
+        max_bytes = limits.max_string_bytes
+        # A character is at most 4 bytes, so short strings are under the limit
+        if max_bytes is None or len(obj) * 4 <= max_bytes:
+            walk.spend(len(obj))
+            return _NOT_BOUNDED
+        encoded = obj.encode("utf-8")
+        if len(encoded) <= max_bytes:
+            walk.spend(len(encoded))
+            return _NOT_BOUNDED
+        walk.spend(max_bytes)
+        truncated = encoded[:max_bytes].decode("utf-8", errors="ignore")
+        return walk.elide(
+            path, f"{truncated}...[truncated {len(encoded) - max_bytes} bytes]"
+        )
+    if isinstance(obj, (int, float, bool, box.BoxedNone)) or obj is None:
+        walk.spend(8)
+        return _NOT_BOUNDED
+    if isinstance(obj, (bytes, bytearray)):
+        max_bytes = limits.max_string_bytes
+        if max_bytes is not None and len(obj) > max_bytes:
+            return walk.elide(path, f"<{type(obj).__name__}: {len(obj)} bytes>")
+        return _NOT_BOUNDED
+    n_items = _array_size(obj)
+    if n_items is not None and (
+        limits.max_array_items is not None and n_items > limits.max_array_items
+    ):
+        return walk.elide(
+            path,
+            {
+                "_type": "ArraySummary",
+                "type": f"{type(obj).__module__}.{type(obj).__qualname__}",
+                "shape": [int(d) for d in obj.shape],
+                "dtype": str(obj.dtype),
+            },
+        )
+    return _NOT_BOUNDED
+
+
+def _array_size(obj: Any) -> Optional[int]:
+    """Returns the number of elements of a numpy array, tensor or similar, or
+    None if `obj` is not one."""
+    shape = getattr(obj, "shape", None)
+    if shape is None or not hasattr(obj, "dtype"):
+        return None
+    try:
+        return math.prod(int(d) for d in shape)
+    except (TypeError, ValueError):
+        return None
+
+
 REP_LIMIT = 1000
 
+# Files larger than this are uploaded in parts of this size, in parallel
+FILE_UPLOAD_PART_SIZE = 50 * FILE_CHUNK_SIZE
+FILE_UPLOAD_WORKERS = 4
+
+
+def _create_file(
+    project_id: str,
+    server: TraceServerInterface,
+    name: str,
+    content: bytes,
+    upload_cache: Optional[UploadCache] = None,
+) -> str:
+    if upload_cache is None:
+        return _upload_file(project_id, server, name, content)
+    # Files are digested the same way on the server, so the digest doubles as
+    # the cache key.
+    digest = bytes_digest(content)
+    cache_key = upload_cache.key("file", project_id, digest)
+
+    def validate(cached_digest: str) -> bool:
+        try:
+            return not server.file_parts_missing(
+                FilePartsMissingReq(
+                    project_id=project_id, digest=cached_digest, size=len(content)
+                )
+            ).offsets
+        except Exception:
+            # Uploading again is always safe
+            return False
+
+    if upload_cache.get(cache_key, validate) is None:
+        upload_cache.set(cache_key, _upload_file(project_id, server, name, content))
+    return digest
+
+
+def _upload_file(
+    project_id: str, server: TraceServerInterface, name: str, content: bytes
+) -> str:
+    if len(content) <= FILE_UPLOAD_PART_SIZE:
+        return server.file_create(
+            FileCreateReq(project_id=project_id, name=name, content=content)
+        ).digest
+
+    digest = bytes_digest(content)
+    try:
+        # Parts uploaded by an earlier, interrupted attempt are skipped
+        missing = server.file_parts_missing(
+            FilePartsMissingReq(project_id=project_id, digest=digest, size=len(content))
+        ).offsets
+    except HTTPError as e:
+        if e.response is not None and e.response.status_code == 404:
+            return server.file_create(
+                FileCreateReq(project_id=project_id, name=name, content=content)
+            ).digest
+        raise
+    part_offsets = sorted({o - o % FILE_UPLOAD_PART_SIZE for o in missing})
+    view = memoryview(content)
+
+    def create_part(offset: int) -> None:
+        server.file_create_part(
+            FileCreatePartReq(
+                project_id=project_id,
+                name=name,
+                digest=digest,
+                size=len(content),
+                offset=offset,
+                content=bytes(view[offset : offset + FILE_UPLOAD_PART_SIZE]),
+            )
+        )
+
+    with ThreadPoolExecutor(max_workers=FILE_UPLOAD_WORKERS) as executor:
+        # Consume the results to surface the exceptions
+        list(executor.map(create_part, part_offsets))
+    return digest
+
 
 def fallback_encode(obj: Any) -> Any:
     rep = None
@@ -81,10 +447,11 @@ def _load_custom_obj_files(
 ) -> typing.Dict[str, bytes]:
     loaded_files: typing.Dict[str, bytes] = {}
     for name, digest in file_digests.items():
-        file_response = server.file_content_read(
-            FileContentReadReq(project_id=project_id, digest=digest)
+        loaded_files[name] = b"".join(
+            server.file_content_read_stream(
+                FileContentReadReq(project_id=project_id, digest=digest)
+            )
         )
-        loaded_files[name] = file_response.content
     return loaded_files
 
 
@@ -0,0 +1,69 @@
+import ast
+import textwrap
+
+from weave.trace import code_capture_cache, op_type
+from weave.trace.code_capture_cache import CodeCaptureCache
+
+
+def test_code_capture_cache_persists(tmp_path):
+    path = str(tmp_path / "code_capture.db")
+    CodeCaptureCache(path).set("vars/3.11/digest", ["json", "x"])
+    assert CodeCaptureCache(path).get("vars/3.11/digest") == ["json", "x"]
+    assert CodeCaptureCache(path).get("vars/3.11/other") is None
+
+
+def test_find_external_vars_parses_once(monkeypatch):
+    code_capture_cache.set_code_capture_cache(CodeCaptureCache())
+    parses = []
+    parse = ast.parse
+
+    def counting_parse(source, *args, **kwargs):
+        parses.append(source)
+        return parse(source, *args, **kwargs)
+
+    monkeypatch.setattr(ast, "parse", counting_parse)
+    source = "def f(a):\n    return json.dumps(a) + x\n"
+    try:
+        assert op_type.find_external_vars(source) == ["json", "x"]
+        assert op_type.find_external_vars(source) == ["json", "x"]
+        assert len(parses) == 1
+        assert op_type.find_external_vars("def f(:") is None
+    finally:
+        code_capture_cache.set_code_capture_cache(None)
+
+
+def test_warm_code_capture_cache(tmp_path, monkeypatch):
+    (tmp_path / "cached_ops_module.py").write_text(
+        textwrap.dedent(
+            """
+            import weave
+
+            SCALE = 2
+
+
+            def helper(x):
+                return x * SCALE
+
+
+            @weave.op()
+            def scaled(x: int) -> int:
+                return helper(x)
+            """
+        )
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    path = str(tmp_path / "code_capture.db")
+    code_capture_cache.set_code_capture_cache(CodeCaptureCache(path))
+    try:
+        assert code_capture_cache.warm_code_capture_cache(["cached_ops_module"]) == 1
+    finally:
+        code_capture_cache.set_code_capture_cache(None)
+
+    import cached_ops_module
+
+    # A fresh process (here: a fresh cache on the same file) reads the
+    # sources and referenced variables from the cache.
+    cache = CodeCaptureCache(path)
+    source = cache.get(code_capture_cache.source_key(cached_ops_module.helper))
+    assert source.startswith("def helper(x):")
+    assert cache.get(code_capture_cache.external_vars_key(source)) == ["SCALE"]
@@ -0,0 +1,145 @@
+import threading
+
+import pytest
+
+from weave.trace.ingestion_queue import IngestionQueue
+
+
+def test_ingestion_queue_runs_tasks_in_order_per_key():
+    q = IngestionQueue(num_workers=3)
+    results: dict[str, list[int]] = {"a": [], "b": []}
+    for i in range(100):
+        q.submit("a", lambda i=i: results["a"].append(i))
+        q.submit("b", lambda i=i: results["b"].append(i))
+    assert q.flush(timeout=10)
+    assert results["a"] == list(range(100))
+    assert results["b"] == list(range(100))
+    stats = q.stats()
+    assert stats.enqueued == 200
+    assert stats.processed == 200
+    assert stats.queue_depth == 0
+    q.shutdown()
+
+
+def test_ingestion_queue_counts_errors():
+    q = IngestionQueue(num_workers=1)
+
+    def fail():
+        raise ValueError("boom")
+
+    q.submit("a", fail)
+    q.submit("a", lambda: None)
+    assert q.flush(timeout=10)
+    stats = q.stats()
+    assert stats.errors == 1
+    assert stats.processed == 2
+    q.shutdown()
+
+
+def _block_worker(q: IngestionQueue) -> threading.Event:
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait()
+
+    q.submit("k", blocker)
+    started.wait()
+    return release
+
+
+def test_ingestion_queue_drop_oldest():
+    q = IngestionQueue(num_workers=1, max_queue_size=3, backpressure="drop_oldest")
+    release = _block_worker(q)
+    seen = []
+    q.submit("a", lambda: seen.append("a-start"))
+    q.submit("a", lambda: seen.append("a-end"))
+    q.submit("b", lambda: seen.append("b-start"))
+    # The queue is full: all of trace `a` is dropped to make room
+    q.submit("b", lambda: seen.append("b-end"))
+    assert q.stats().queue_depth == 2
+    # As are the tasks of `a` submitted afterwards
+    q.submit("a", lambda: seen.append("a-child"))
+    release.set()
+    assert q.flush(timeout=10)
+    assert seen == ["b-start", "b-end"]
+    assert q.stats().dropped == 3
+    q.shutdown()
+
+
+def test_ingestion_queue_spill_to_disk(tmp_path):
+    seen = []
+    q = IngestionQueue(
+        num_workers=1,
+        max_queue_size=2,
+        backpressure="spill_to_disk",
+        spill_dir=str(tmp_path),
+        replay_fn=lambda line: seen.append(("replayed", line)),
+    )
+    release = _block_worker(q)
+    for i in range(5):
+        q.submit(
+            "k", lambda i=i: seen.append(("direct", i)), spill_fn=lambda i=i: str(i)
+        )
+    stats = q.stats()
+    assert stats.queue_depth == 2
+    assert stats.spilled == 3
+    assert stats.spilled_depth == 3
+    release.set()
+    assert q.flush(timeout=10)
+    assert seen == [
+        ("direct", 0),
+        ("direct", 1),
+        ("replayed", "2"),
+        ("replayed", "3"),
+        ("replayed", "4"),
+    ]
+    assert q.stats().spilled_depth == 0
+    q.shutdown()
+
+
+def test_ingestion_queue_spills_without_holding_the_lock(tmp_path):
+    seen = []
+    q = IngestionQueue(
+        num_workers=1,
+        max_queue_size=1,
+        backpressure="spill_to_disk",
+        spill_dir=str(tmp_path),
+        replay_fn=lambda line: seen.append(("replayed", line)),
+    )
+    shard = q._shards[0]
+    release = _block_worker(q)
+    q.submit("k", lambda: seen.append(("direct", 0)))
+
+    def spill_fn() -> str:
+        # The worker can take tasks while the payload is being serialized
+        assert shard.cond.acquire(blocking=False)
+        shard.cond.release()
+        return "1"
+
+    q.submit("k", lambda: seen.append(("direct", 1)), spill_fn=spill_fn)
+    release.set()
+    # Not spillable: waits for the spilled task to be taken rather than
+    # overtaking it
+    q.submit("k", lambda: seen.append(("direct", 2)), spill_fn=lambda: None)
+    assert q.flush(timeout=10)
+    assert seen == [("direct", 0), ("replayed", "1"), ("direct", 2)]
+    stats = q.stats()
+    assert stats.spilled == 1
+    assert stats.enqueued == 4
+    q.shutdown()
+
+
+def test_ingestion_queue_flush_timeout():
+    q = IngestionQueue(num_workers=1)
+    release = _block_worker(q)
+    assert not q.flush(timeout=0.05)
+    release.set()
+    assert q.flush(timeout=10)
+    q.shutdown()
+
+
+def test_ingestion_queue_invalid_policy():
+    with pytest.raises(ValueError):
+        IngestionQueue(backpressure="nope")  # type: ignore
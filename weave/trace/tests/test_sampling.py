@@ -0,0 +1,41 @@
+from weave.trace.sampling import Sampler, SamplingPolicy
+
+
+def test_head_sampling_only_applies_to_roots():
+    sampler = Sampler(SamplingPolicy(rate=0.5), rand=lambda: 0.7)
+    assert not sampler.should_trace("op", is_root=True)
+    assert sampler.should_trace("op", is_root=False)
+
+    sampler = Sampler(SamplingPolicy(rate=0.5), rand=lambda: 0.2)
+    assert sampler.should_trace("op", is_root=True)
+
+
+def test_rate_limit():
+    now = 0.0
+    sampler = Sampler(SamplingPolicy(op_rate_limits={"limited": 2}), clock=lambda: now)
+    assert [sampler.should_trace("limited", is_root=True) for _ in range(3)] == [
+        True,
+        True,
+        False,
+    ]
+    assert sampler.should_trace("other", is_root=True)
+    now = 0.5
+    assert sampler.should_trace("limited", is_root=True)
+    assert not sampler.should_trace("limited", is_root=True)
+
+
+def test_tail_rules():
+    sampler = Sampler(SamplingPolicy(rate=0.0, slow_call_seconds=1.0))
+    assert sampler.should_keep(0.1, ValueError())
+    assert sampler.should_keep(2.0, None)
+    assert not sampler.should_keep(0.1, None)
+
+    sampler = Sampler(SamplingPolicy(rate=0.0, keep_errors=False))
+    assert not sampler.should_keep(0.1, ValueError())
+    assert not sampler.should_keep(100.0, None)
+
+
+def test_traces_everything():
+    assert SamplingPolicy().traces_everything()
+    assert not SamplingPolicy(rate=0.1).traces_everything()
+    assert not SamplingPolicy(op_rate_limits={"op": 1}).traces_everything()
@@ -0,0 +1,79 @@
+import datetime
+
+import numpy as np
+
+from weave.trace.serialize import (
+    ELIDED_VALUE,
+    REDACTED_VALUE,
+    SerializeLimits,
+    to_json_bounded,
+)
+
+
+def bounded(obj, **limits):
+    # Plain values never reach the server
+    return to_json_bounded(obj, "project", None, SerializeLimits(**limits))
+
+
+def test_small_values_are_unchanged():
+    obj = {"a": [1, 2.5, None, True], "b": {"c": "text"}}
+    assert bounded(obj) == (obj, [])
+
+
+def test_truncates_strings_and_lists():
+    res, elided = bounded(
+        {"doc": "é" * 10, "rows": list(range(5))},
+        max_string_bytes=4,
+        max_list_items=3,
+    )
+    assert res == {
+        "doc": "éé...[truncated 16 bytes]",
+        "rows": [0, 1, 2, "...[2 more items]"],
+    }
+    assert elided == ["doc", "rows"]
+
+
+def test_redacts_in_the_same_walk():
+    res, elided = bounded({"config": {"api_key": "secret", "model": "m"}})
+    assert res == {"config": {"api_key": REDACTED_VALUE, "model": "m"}}
+    assert elided == []
+
+
+def test_summarizes_large_arrays():
+    res, elided = bounded(
+        {"small": np.zeros(2), "embedding": np.zeros((2, 3), dtype=np.float32)},
+        max_array_items=5,
+    )
+    assert res["embedding"] == {
+        "_type": "ArraySummary",
+        "type": "numpy.ndarray",
+        "shape": [2, 3],
+        "dtype": "float32",
+    }
+    assert res["small"] == [0.0, 0.0]
+    assert elided == ["embedding"]
+
+
+def test_total_bytes():
+    res, elided = bounded(
+        {"a": "x" * 10, "b": ["y" * 10, "z" * 10], "c": 1},
+        max_total_bytes=15,
+    )
+    assert res == {
+        "a": "x" * 10,
+        "b": ["y" * 10, "...[1 more items]"],
+        "c": ELIDED_VALUE,
+    }
+    assert elided == ["b", "c"]
+
+
+def test_encodes_datetimes_and_numpy_natively():
+    res, _ = bounded(
+        {
+            "at": datetime.datetime(2024, 1, 2, 3, 4, 5),
+            "score": np.float32(0.5),
+            "count": np.int64(3),
+        }
+    )
+    assert res == {"at": "2024-01-02T03:04:05", "score": 0.5, "count": 3}
+    assert type(res["count"]) is int
@@ -0,0 +1,61 @@
+import sqlite3
+
+from weave.trace.upload_cache import UploadCache
+
+
+def test_upload_cache_is_bounded():
+    cache = UploadCache(max_entries=2)
+    cache.set(cache.key("obj", "a"), "1")
+    cache.set(cache.key("obj", "b"), "2")
+    # Touch `a` so that `b` is the least recently used
+    assert cache.get(cache.key("obj", "a")) == "1"
+    cache.set(cache.key("obj", "c"), "3")
+    assert cache.get(cache.key("obj", "b")) is None
+    assert len(cache) == 2
+
+
+def test_upload_cache_persists(tmp_path):
+    path = str(tmp_path / "upload_cache.db")
+    cache = UploadCache(path, namespace="https://server-a")
+    cache.set(cache.key("file", "entity/project", "digest"), "digest")
+
+    reopened = UploadCache(path, namespace="https://server-a")
+    assert reopened.get(reopened.key("file", "entity/project", "digest")) == "digest"
+    other_server = UploadCache(path, namespace="https://server-b")
+    assert (
+        other_server.get(other_server.key("file", "entity/project", "digest")) is None
+    )
+
+
+def test_upload_cache_validates_persisted_entries(tmp_path):
+    path = str(tmp_path / "upload_cache.db")
+    cache = UploadCache(path)
+    cache.set(cache.key("obj", "a"), "1")
+
+    # Eg. the server's database was reset since the entry was written
+    reopened = UploadCache(path)
+    assert reopened.get(reopened.key("obj", "a"), lambda digest: False) is None
+    assert UploadCache(path).get(reopened.key("obj", "a")) is None
+
+    cache.set(cache.key("obj", "b"), "2")
+    validated = []
+
+    def validate(digest):
+        validated.append(digest)
+        return True
+
+    reopened = UploadCache(path)
+    assert reopened.get(reopened.key("obj", "b"), validate) == "2"
+    assert reopened.get(reopened.key("obj", "b"), validate) == "2"
+    assert validated == ["2"]
+
+
+def test_upload_cache_tolerates_locked_database(tmp_path):
+    path = str(tmp_path / "upload_cache.db")
+    cache = UploadCache(path)
+    locker = sqlite3.connect(path)
+    locker.execute("BEGIN EXCLUSIVE")
+    cache._conn.execute("PRAGMA busy_timeout = 0")
+    cache.set(cache.key("obj", "a"), "1")
+    assert cache.get(cache.key("obj", "a")) == "1"
+    locker.rollback()
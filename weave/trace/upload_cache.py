@@ -0,0 +1,118 @@
+"""Client-side record of the content already uploaded to the trace server.
+
+Objects and files are content-addressed on the server, so uploading the same
+content twice is a no-op there. This cache maps a digest of the content the
+client is about to upload to the digest the server returned for it, which lets
+the client skip the upload entirely.
+
+The cache is process-local by default. When given a path, entries are also
+persisted to a SQLite database so they survive restarts; in that case the
+`namespace` (eg. the trace server URL) keeps entries of different servers apart.
+A server can still lose data the cache remembers (eg. a local server whose
+database was reset), so persisted entries are only trusted once `validate`
+confirms them with the server, at most once per entry and process.
+"""
+
+import collections
+import sqlite3
+import threading
+import typing
+
+DEFAULT_UPLOAD_CACHE_MAX_ENTRIES = 100_000
+
+
+class UploadCache:
+    def __init__(
+        self,
+        path: typing.Optional[str] = None,
+        namespace: str = "",
+        max_entries: int = DEFAULT_UPLOAD_CACHE_MAX_ENTRIES,
+    ):
+        """
+        Args:
+            path (Optional[str]): A SQLite database to persist the entries to.
+            namespace (str): Prepended to every key.
+            max_entries (int): Number of entries kept in memory.
+        """
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self._items: collections.OrderedDict[str, str] = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: typing.Optional[sqlite3.Connection] = None
+        if path is not None:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS upload_cache (key TEXT PRIMARY KEY, digest TEXT)"
+            )
+            self._conn.commit()
+
+    def key(self, *parts: str) -> str:
+        return "/".join((self.namespace, *parts))
+
+    def get(
+        self,
+        key: str,
+        validate: typing.Optional[typing.Callable[[str], bool]] = None,
+    ) -> typing.Optional[str]:
+        """Returns the digest uploaded for `key`, if any.
+
+        `validate` is called with the digest of entries read back from the
+        SQLite database, and should return whether the server still has it.
+        Entries it rejects are forgotten.
+        """
+        with self._lock:
+            digest = self._items.get(key)
+            if digest is not None:
+                self._items.move_to_end(key)
+                return digest
+            if self._conn is None:
+                return None
+            try:
+                row = self._conn.execute(
+                    "SELECT digest FROM upload_cache WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.OperationalError:
+                return None
+            if row is None:
+                return None
+        # Not holding the lock, validating may take a request to the server
+        if validate is not None and not validate(row[0]):
+            self._forget(key)
+            return None
+        with self._lock:
+            self._remember(key, row[0])
+        return row[0]
+
+    def set(self, key: str, digest: str) -> None:
+        with self._lock:
+            self._remember(key, digest)
+            if self._conn is not None:
+                # The database is a best effort, eg. it may be locked by
+                # another process
+                try:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO upload_cache (key, digest) VALUES (?, ?)",
+                        (key, digest),
+                    )
+                    self._conn.commit()
+                except sqlite3.OperationalError:
+                    pass
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+            if self._conn is not None:
+                try:
+                    self._conn.execute("DELETE FROM upload_cache WHERE key = ?", (key,))
+                    self._conn.commit()
+                except sqlite3.OperationalError:
+                    pass
+
+    def _remember(self, key: str, digest: str) -> None:
+        self._items[key] = digest
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._items)
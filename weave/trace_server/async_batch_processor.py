@@ -1,38 +1,118 @@
 import atexit
+import bisect
+import collections
+import logging
+import os
 import time
-from queue import Queue
-from threading import Event, Lock, Thread
-from typing import Callable, Generic, List, TypeVar
+from threading import Condition, Lock, Thread
+from typing import Callable, Deque, Generic, List, Optional, Sequence, Tuple, TypeVar
 
 T = TypeVar("T")
 
+logger = logging.getLogger(__name__)
+
+
+class Histogram:
+    """A fixed-bucket histogram, safe to update from multiple threads."""
+
+    def __init__(self, bounds: Sequence[float]) -> None:
+        """
+        Args:
+            bounds (Sequence[float]): Sorted upper bounds of the buckets. Values larger
+                than the last bound are counted in an extra overflow bucket.
+        """
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self._lock = Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.total += value
+            self.min = value if self.min is None else min(self.min, value)
+            self.max = value if self.max is None else max(self.max, value)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Returns the upper bound of the bucket containing the p-th percentile (0-100)."""
+        with self._lock:
+            if not self.count:
+                return None
+            rank = p / 100 * self.count
+            seen = 0
+            for i, bucket_count in enumerate(self.counts):
+                seen += bucket_count
+                if seen >= rank and bucket_count:
+                    return self.bounds[i] if i < len(self.bounds) else self.max
+            return self.max
+
+
+# Seconds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Items per batch
+SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+# Bytes per batch
+BYTES_BUCKETS = tuple(2**i for i in range(10, 28, 2))
+
 
 class AsyncBatchProcessor(Generic[T]):
-    """A class that asynchronously processes batches of items using a provided processor function."""
+    """A class that asynchronously processes batches of items using a provided processor function.
+
+    Flusher threads sleep until items arrive, then ship a batch as soon as any of
+    `max_batch_size` items, `max_batch_bytes` bytes or `max_linger` seconds (measured
+    from the oldest pending item) is reached.
+    """
 
     def __init__(
         self,
         processor_fn: Callable[[List[T]], None],
         max_batch_size: int = 100,
-        min_batch_interval: float = 1.0,
+        max_linger: float = 1.0,
+        max_batch_bytes: Optional[int] = None,
+        size_fn: Optional[Callable[[T], int]] = None,
+        num_workers: int = 1,
     ) -> None:
         """
         Initializes an instance of AsyncBatchProcessor.
 
         Args:
             processor_fn (Callable[[List[T]], None]): The function to process the batches of items.
-            max_batch_size (int, optional): The maximum size of each batch. Defaults to 100.
-            min_batch_interval (float, optional): The minimum interval between processing batches. Defaults to 1.0.
+            max_batch_size (int, optional): The maximum number of items in each batch. Defaults to 100.
+            max_linger (float, optional): The maximum number of seconds an item waits before its batch is processed. Defaults to 1.0.
+            max_batch_bytes (Optional[int], optional): The maximum number of bytes in each batch, as measured by `size_fn`. Defaults to None (unbounded).
+            size_fn (Optional[Callable[[T], int]], optional): Returns the size of an item in bytes. Required for `max_batch_bytes` to take effect.
+            num_workers (int, optional): The number of threads concurrently calling `processor_fn`. Defaults to 1.
         """
+        if num_workers < 1:
+            raise ValueError("num_workers must be at least 1")
         self.processor_fn = processor_fn
         self.max_batch_size = max_batch_size
-        self.min_batch_interval = min_batch_interval
-        self.queue: Queue[T] = Queue()
-        self.lock = Lock()
-        self.stop_event = Event()  # Use an event to signal stopping
-        self.processing_thread = Thread(target=self._process_batches)
-        self.processing_thread.daemon = True
-        self.processing_thread.start()
+        self.max_linger = max_linger
+        self.max_batch_bytes = max_batch_bytes
+        self.size_fn = size_fn
+        self.num_workers = num_workers
+
+        self.batch_latency = Histogram(LATENCY_BUCKETS)
+        self.batch_size = Histogram(SIZE_BUCKETS)
+        self.batch_bytes = Histogram(BYTES_BUCKETS)
+
+        # (enqueue time, item size, item)
+        self._queue: Deque[Tuple[float, int, T]] = collections.deque()
+        self._queued_bytes = 0
+        self._in_flight = 0
+        self._flush_waiters = 0
+        self._stopping = False
+        self._cond = Condition()
+        self._threads: List[Thread] = []
+        self._pid = os.getpid()
         atexit.register(self.wait_until_all_processed)  # Register cleanup function
 
     def enqueue(self, items: List[T]) -> None:
@@ -42,28 +122,142 @@ class AsyncBatchProcessor(Generic[T]):
         Args:
             items (List[T]): The items to be processed.
         """
-        with self.lock:
-            for item in items:
-                self.queue.put(item)
+        now = time.monotonic()
+        sized = [
+            (now, self.size_fn(item) if self.size_fn else 0, item) for item in items
+        ]
+        self._check_fork()
+        with self._cond:
+            self._ensure_workers()
+            self._queue.extend(sized)
+            self._queued_bytes += sum(size for _, size, _ in sized)
+            self._cond.notify_all()
 
-    def _process_batches(self) -> None:
-        """Internal method that continuously processes batches of items from the queue."""
-        while True:
-            current_batch: List[T] = []
-            while not self.queue.empty() and len(current_batch) < self.max_batch_size:
-                current_batch.append(self.queue.get())
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Processes all pending items immediately and waits for them to finish.
+
+        Returns:
+            bool: False if `timeout` seconds elapsed before all items were processed.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._check_fork()
+        with self._cond:
+            self._flush_waiters += 1
+            self._cond.notify_all()
+            try:
+                if self._queue:
+                    # Replaces workers that died, so the queue can't be stranded
+                    self._ensure_workers()
+                while self._queue or self._in_flight:
+                    remaining = None
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return False
+                    self._cond.wait(remaining)
+            finally:
+                self._flush_waiters -= 1
+        return True
+
+    def wait_until_all_processed(self) -> None:
+        """Waits until all enqueued items have been processed, then stops the worker threads.
 
-            if current_batch:
-                self.processor_fn(current_batch)
+        Workers are restarted on the next `enqueue`. In a forked child, items
+        enqueued by the parent are left to the parent.
+        """
+        self.flush()
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join()
+        with self._cond:
+            self._stopping = False
 
-            if self.stop_event.is_set() and self.queue.empty():
+    def _check_fork(self) -> None:
+        # After a fork, the child only has the thread that forked: the workers are
+        # gone, and the lock may have been held by one of them. The parent still
+        # owns and processes its pending items, so the child starts out empty.
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._cond = Condition()
+        self._queue = collections.deque()
+        self._queued_bytes = 0
+        self._in_flight = 0
+        self._flush_waiters = 0
+        self._stopping = False
+        self._threads = []
+
+    def _ensure_workers(self) -> None:
+        # Called with the lock held. Threads are started lazily so that a
+        # processor constructed before a fork works in the child process.
+        self._threads = [t for t in self._threads if t.is_alive()]
+        while len(self._threads) < self.num_workers:
+            thread = Thread(target=self._process_batches, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _batch_ready(self) -> bool:
+        if len(self._queue) >= self.max_batch_size:
+            return True
+        if (
+            self.max_batch_bytes is not None
+            and self._queued_bytes >= self.max_batch_bytes
+        ):
+            return True
+        if self._flush_waiters or self._stopping:
+            return True
+        return time.monotonic() - self._queue[0][0] >= self.max_linger
+
+    def _take_batch(self) -> Tuple[List[T], int]:
+        batch: List[T] = []
+        batch_bytes = 0
+        while self._queue and len(batch) < self.max_batch_size:
+            _, size, item = self._queue[0]
+            if (
+                batch
+                and self.max_batch_bytes is not None
+                and batch_bytes + size > self.max_batch_bytes
+            ):
                 break
+            self._queue.popleft()
+            batch.append(item)
+            batch_bytes += size
+        self._queued_bytes -= batch_bytes
+        return batch, batch_bytes
 
-            # Unless we are stopping, sleep for a the min_batch_interval
-            if not self.stop_event.is_set():
-                time.sleep(self.min_batch_interval)
+    def _process_batches(self) -> None:
+        """Internal method that continuously processes batches of items from the queue."""
+        while True:
+            with self._cond:
+                while not self._queue or not self._batch_ready():
+                    if self._stopping and not self._queue:
+                        return
+                    if self._queue:
+                        linger_left = self.max_linger - (
+                            time.monotonic() - self._queue[0][0]
+                        )
+                        self._cond.wait(max(linger_left, 0))
+                    else:
+                        self._cond.wait()
+                batch, batch_bytes = self._take_batch()
+                self._in_flight += 1
+                if self._queue:
+                    # Let another worker pick up the remainder
+                    self._cond.notify()
 
-    def wait_until_all_processed(self) -> None:
-        """Waits until all enqueued items have been processed."""
-        self.stop_event.set()
-        self.processing_thread.join()
+            start = time.monotonic()
+            try:
+                self.processor_fn(batch)
+            except Exception:
+                logger.exception(f"Error processing batch of {len(batch)} items")
+            finally:
+                self.batch_latency.observe(time.monotonic() - start)
+                self.batch_size.observe(len(batch))
+                if self.size_fn is not None:
+                    self.batch_bytes.observe(batch_bytes)
+                with self._cond:
+                    self._in_flight -= 1
+                    self._cond.notify_all()
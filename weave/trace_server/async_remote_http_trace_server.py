@@ -0,0 +1,428 @@
+"""An async client for the remote trace server, for clients running in an event
+loop (eg. async ops)."""
+
+import asyncio
+import json
+import typing as t
+import weakref
+
+import aiohttp
+import tenacity
+from pydantic import BaseModel, ValidationError
+
+from weave.trace_server import environment as wf_env
+
+from . import trace_server_interface as tsi
+from .calls_stream import NDJSON_CONTENT_TYPE
+from .remote_http_trace_server import (
+    REMOTE_REQUEST_RETRY_DURATION,
+    REMOTE_REQUEST_RETRY_MAX_INTERVAL,
+    RemoteHTTPTraceServer,
+    _compress,
+    _log_failure,
+    _log_retry,
+)
+
+
+def _is_retryable_exception(e: BaseException) -> bool:
+    # Same rules as the sync client
+    if isinstance(e, ValidationError):
+        return False
+    if isinstance(e, aiohttp.ClientResponseError):
+        if e.status // 100 == 4 and e.status != 429:
+            return False
+        if e.status == 500:
+            return False
+    return True
+
+
+_retry = tenacity.retry(
+    stop=tenacity.stop_after_delay(REMOTE_REQUEST_RETRY_DURATION),
+    wait=tenacity.wait_exponential_jitter(
+        initial=1, max=REMOTE_REQUEST_RETRY_MAX_INTERVAL
+    ),
+    retry=tenacity.retry_if_exception(_is_retryable_exception),
+    before_sleep=_log_retry,
+    retry_error_callback=_log_failure,
+    reraise=True,
+)
+
+
+async def _close_at_shutdown(
+    session: aiohttp.ClientSession,
+) -> t.AsyncGenerator[None, None]:
+    # Loops close the async generators they started before shutting down, and
+    # this one closes the session then
+    try:
+        yield
+    finally:
+        await session.close()
+
+
+_ReqT = t.TypeVar("_ReqT", bound=BaseModel)
+_ResT = t.TypeVar("_ResT", bound=BaseModel)
+
+
+class AsyncRemoteHTTPTraceServer(tsi.AsyncTraceServerInterface):
+    """Sends requests with aiohttp, without blocking the event loop.
+
+    Shares the URL, auth and compression settings of a `RemoteHTTPTraceServer`,
+    and its call batcher: when batching, starting and ending a call only
+    enqueues it, as in the sync client. Each event loop gets its own session
+    (and connection pool), since aiohttp sessions are bound to a loop. A
+    session is closed by `aclose`, or else when its loop shuts down its async
+    generators (eg. at the end of `asyncio.run`).
+    """
+
+    def __init__(self, remote: RemoteHTTPTraceServer):
+        self.remote = remote
+        # The session of each loop, and the async generator closing it
+        self._sessions: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop,
+            t.Tuple[aiohttp.ClientSession, t.AsyncGenerator[None, None]],
+        ] = weakref.WeakKeyDictionary()
+
+    async def _session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        entry = self._sessions.get(loop)
+        if entry is not None and not entry[0].closed:
+            return entry[0]
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.remote.pool_size)
+        )
+        closer = _close_at_shutdown(session)
+        await closer.__anext__()
+        self._sessions[loop] = (session, closer)
+        return session
+
+    async def aclose(self) -> None:
+        """Closes the session of the running event loop."""
+        entry = self._sessions.pop(asyncio.get_running_loop(), None)
+        if entry is not None:
+            await entry[1].aclose()
+
+    @property
+    def _auth(self) -> t.Optional[aiohttp.BasicAuth]:
+        if self.remote._auth is None:
+            return None
+        return aiohttp.BasicAuth(*self.remote._auth)
+
+    async def _flush_pending_calls(self) -> None:
+        # Waits for the batcher, so it runs in a thread
+        await asyncio.to_thread(self.remote._flush_pending_calls)
+
+    async def _post(
+        self,
+        url: str,
+        data: t.Any,
+        headers: t.Optional[t.Dict[str, str]] = None,
+    ) -> aiohttp.ClientResponse:
+        headers = dict(headers or {})
+        compression = self.remote.compression
+        if (
+            compression is not None
+            and isinstance(data, bytes)
+            and len(data) >= wf_env.wf_trace_server_compression_min_bytes()
+        ):
+            data = _compress(data, compression)
+            headers["Content-Encoding"] = compression
+        session = await self._session()
+        r = await session.post(
+            self.remote.trace_server_url + url,
+            data=data,
+            auth=self._auth,
+            headers=headers,
+        )
+        if r.status == 500:
+            reason_val = await r.text()
+            try:
+                reason_val = json.dumps(json.loads(reason_val), indent=2)
+            except json.JSONDecodeError:
+                reason_val = f"Reason: {reason_val}"
+            r.release()
+            raise aiohttp.ClientResponseError(
+                r.request_info,
+                r.history,
+                status=r.status,
+                message=f"Internal Server Error for url: {url}. {reason_val}",
+            )
+        if not r.ok:
+            r.release()
+        r.raise_for_status()
+        return r
+
+    @_retry
+    async def _generic_request(
+        self,
+        url: str,
+        req: t.Union[_ReqT, t.Dict[str, t.Any]],
+        req_model: t.Type[_ReqT],
+        res_model: t.Type[_ResT],
+    ) -> _ResT:
+        if isinstance(req, dict):
+            req = req_model.model_validate(req)
+        r = await self._post(
+            url,
+            # See RemoteHTTPTraceServer._generic_request_executor
+            req.model_dump_json(by_alias=True).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        async with r:
+            return res_model.model_validate_json(await r.read())
+
+    @_retry
+    async def _multipart_request(
+        self,
+        url: str,
+        fields: t.Dict[str, t.Any],
+        name: str,
+        content: bytes,
+        res_model: t.Type[_ResT],
+    ) -> _ResT:
+        form = aiohttp.FormData()
+        for k, v in fields.items():
+            form.add_field(k, str(v))
+        form.add_field("file", content, filename=name)
+        r = await self._post(url, form)
+        async with r:
+            return res_model.model_validate_json(await r.read())
+
+    # Call API
+    async def call_start(self, req: tsi.CallStartReq) -> tsi.CallStartRes:
+        if self.remote.should_batch:
+            # Only enqueues the call
+            return self.remote.call_start(req)
+        return await self._generic_request(
+            "/call/start", req, tsi.CallStartReq, tsi.CallStartRes
+        )
+
+    async def call_end(self, req: tsi.CallEndReq) -> tsi.CallEndRes:
+        if self.remote.should_batch:
+            return self.remote.call_end(req)
+        return await self._generic_request(
+            "/call/end", req, tsi.CallEndReq, tsi.CallEndRes
+        )
+
+    async def call_complete(self, req: tsi.CallCompleteReq) -> tsi.CallCompleteRes:
+        if self.remote.should_batch and self.remote.coalesce_calls:
+            return self.remote.call_complete(req)
+        return await super().call_complete(req)
+
+    async def call_read(self, req: tsi.CallReadReq) -> tsi.CallReadRes:
+        await self._flush_pending_calls()
+        return await self._generic_request(
+            "/call/read", req, tsi.CallReadReq, tsi.CallReadRes
+        )
+
+    async def calls_query(self, req: tsi.CallsQueryReq) -> tsi.CallsQueryRes:
+        await self._flush_pending_calls()
+        return await self._generic_request(
+            "/calls/query", req, tsi.CallsQueryReq, tsi.CallsQueryRes
+        )
+
+    async def calls_query_stream(
+        self, req: tsi.CallsQueryReq
+    ) -> t.AsyncIterator[tsi.CallSchema]:
+        await self._flush_pending_calls()
+        # Arrow is decoded from a file-like object, so only NDJSON is streamed
+        r = await self._post(
+            "/calls/stream_query",
+            req.model_dump_json(by_alias=True).encode("utf-8"),
+            headers={
+                "Content-Type": "application/json",
+                "Accept": NDJSON_CONTENT_TYPE,
+            },
+        )
+        async with r:
+            async for line in r.content:
+                line = line.strip()
+                if line:
+                    yield tsi.CallSchema.model_validate_json(line)
+
+    async def calls_delete(self, req: tsi.CallsDeleteReq) -> tsi.CallsDeleteRes:
+        await self._flush_pending_calls()
+        return await self._generic_request(
+            "/calls/delete", req, tsi.CallsDeleteReq, tsi.CallsDeleteRes
+        )
+
+    async def calls_query_stats(
+        self, req: tsi.CallsQueryStatsReq
+    ) -> tsi.CallsQueryStatsRes:
+        await self._flush_pending_calls()
+        return await self._generic_request(
+            "/calls/query_stats", req, tsi.CallsQueryStatsReq, tsi.CallsQueryStatsRes
+        )
+
+    async def calls_stats(self, req: tsi.CallsStatsReq) -> tsi.CallsStatsRes:
+        await self._flush_pending_calls()
+        return await self._generic_request(
+            "/calls/stats", req, tsi.CallsStatsReq, tsi.CallsStatsRes
+        )
+
+    async def trace_read(self, req: tsi.TraceReadReq) -> tsi.TraceReadRes:
+        await self._flush_pending_calls()
+        return await self._generic_request(
+            "/trace/read", req, tsi.TraceReadReq, tsi.TraceReadRes
+        )
+
+    async def call_update(self, req: tsi.CallUpdateReq) -> tsi.CallUpdateRes:
+        await self._flush_pending_calls()
+        return await self._generic_request(
+            "/call/update", req, tsi.CallUpdateReq, tsi.CallUpdateRes
+        )
+
+    # Op API
+    async def op_create(self, req: tsi.OpCreateReq) -> tsi.OpCreateRes:
+        return await self._generic_request(
+            "/op/create", req, tsi.OpCreateReq, tsi.OpCreateRes
+        )
+
+    async def op_read(self, req: tsi.OpReadReq) -> tsi.OpReadRes:
+        return await self._generic_request(
+            "/op/read", req, tsi.OpReadReq, tsi.OpReadRes
+        )
+
+    async def ops_query(self, req: tsi.OpQueryReq) -> tsi.OpQueryRes:
+        return await self._generic_request(
+            "/ops/query", req, tsi.OpQueryReq, tsi.OpQueryRes
+        )
+
+    # Obj API
+    async def obj_create(self, req: tsi.ObjCreateReq) -> tsi.ObjCreateRes:
+        return await self._generic_request(
+            "/obj/create", req, tsi.ObjCreateReq, tsi.ObjCreateRes
+        )
+
+    async def obj_read(self, req: tsi.ObjReadReq) -> tsi.ObjReadRes:
+        return await self._generic_request(
+            "/obj/read", req, tsi.ObjReadReq, tsi.ObjReadRes
+        )
+
+    async def objs_query(self, req: tsi.ObjQueryReq) -> tsi.ObjQueryRes:
+        return await self._generic_request(
+            "/objs/query", req, tsi.ObjQueryReq, tsi.ObjQueryRes
+        )
+
+    async def table_create(self, req: tsi.TableCreateReq) -> tsi.TableCreateRes:
+        return await self._generic_request(
+            "/table/create", req, tsi.TableCreateReq, tsi.TableCreateRes
+        )
+
+    async def table_rows_missing(
+        self, req: tsi.TableRowsMissingReq
+    ) -> tsi.TableRowsMissingRes:
+        return await self._generic_request(
+            "/table/rows_missing",
+            req,
+            tsi.TableRowsMissingReq,
+            tsi.TableRowsMissingRes,
+        )
+
+    async def table_rows_create(
+        self, req: tsi.TableRowsCreateReq
+    ) -> tsi.TableRowsCreateRes:
+        return await self._generic_request(
+            "/table/rows_create", req, tsi.TableRowsCreateReq, tsi.TableRowsCreateRes
+        )
+
+    async def table_create_from_digests(
+        self, req: tsi.TableCreateFromDigestsReq
+    ) -> tsi.TableCreateFromDigestsRes:
+        return await self._generic_request(
+            "/table/create_from_digests",
+            req,
+            tsi.TableCreateFromDigestsReq,
+            tsi.TableCreateFromDigestsRes,
+        )
+
+    async def table_append(self, req: tsi.TableAppendReq) -> tsi.TableAppendRes:
+        return await self._generic_request(
+            "/table/append", req, tsi.TableAppendReq, tsi.TableAppendRes
+        )
+
+    async def table_query(self, req: tsi.TableQueryReq) -> tsi.TableQueryRes:
+        return await self._generic_request(
+            "/table/query", req, tsi.TableQueryReq, tsi.TableQueryRes
+        )
+
+    async def refs_read_batch(self, req: tsi.RefsReadBatchReq) -> tsi.RefsReadBatchRes:
+        return await self._generic_request(
+            "/refs/read_batch", req, tsi.RefsReadBatchReq, tsi.RefsReadBatchRes
+        )
+
+    async def file_create(self, req: tsi.FileCreateReq) -> tsi.FileCreateRes:
+        return await self._multipart_request(
+            "/files/create",
+            {"project_id": req.project_id},
+            req.name,
+            req.content,
+            tsi.FileCreateRes,
+        )
+
+    async def file_create_part(
+        self, req: tsi.FileCreatePartReq
+    ) -> tsi.FileCreatePartRes:
+        return await self._multipart_request(
+            "/files/create_part",
+            {
+                "project_id": req.project_id,
+                "digest": req.digest,
+                "size": req.size,
+                "offset": req.offset,
+            },
+            req.name,
+            req.content,
+            tsi.FileCreatePartRes,
+        )
+
+    async def file_parts_missing(
+        self, req: tsi.FilePartsMissingReq
+    ) -> tsi.FilePartsMissingRes:
+        return await self._generic_request(
+            "/files/parts_missing",
+            req,
+            tsi.FilePartsMissingReq,
+            tsi.FilePartsMissingRes,
+        )
+
+    async def _file_content_response(
+        self, req: tsi.FileContentReadReq
+    ) -> aiohttp.ClientResponse:
+        return await self._post(
+            "/files/content",
+            json.dumps({"project_id": req.project_id, "digest": req.digest}).encode(
+                "utf-8"
+            ),
+            headers={"Content-Type": "application/json"},
+        )
+
+    @_retry
+    async def file_content_read(
+        self, req: tsi.FileContentReadReq
+    ) -> tsi.FileContentReadRes:
+        async with await self._file_content_response(req) as r:
+            return tsi.FileContentReadRes(content=await r.read())
+
+    async def file_content_read_stream(
+        self, req: tsi.FileContentReadReq
+    ) -> t.AsyncIterator[bytes]:
+        async with await self._file_content_response(req) as r:
+            async for chunk in r.content.iter_chunked(tsi.FILE_CHUNK_SIZE):
+                yield chunk
+
+    async def feedback_create(
+        self, req: tsi.FeedbackCreateReq
+    ) -> tsi.FeedbackCreateRes:
+        return await self._generic_request(
+            "/feedback/create", req, tsi.FeedbackCreateReq, tsi.FeedbackCreateRes
+        )
+
+    async def feedback_query(self, req: tsi.FeedbackQueryReq) -> tsi.FeedbackQueryRes:
+        return await self._generic_request(
+            "/feedback/query", req, tsi.FeedbackQueryReq, tsi.FeedbackQueryRes
+        )
+
+    async def feedback_purge(self, req: tsi.FeedbackPurgeReq) -> tsi.FeedbackPurgeRes:
+        return await self._generic_request(
+            "/feedback/purge", req, tsi.FeedbackPurgeReq, tsi.FeedbackPurgeRes
+        )
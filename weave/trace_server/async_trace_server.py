@@ -0,0 +1,148 @@
+"""Runs a (synchronous) trace server for clients running in an event loop."""
+
+import asyncio
+import typing
+
+from weave.trace_server import trace_server_interface as tsi
+
+_T = typing.TypeVar("_T")
+
+# Marks the end of an iterator in `_iterate_in_thread`
+_END = object()
+
+
+async def _iterate_in_thread(
+    it: typing.Iterator[_T],
+) -> typing.AsyncIterator[_T]:
+    while True:
+        item = await asyncio.to_thread(next, it, _END)
+        if item is _END:
+            return
+        yield typing.cast(_T, item)
+
+
+class ThreadedAsyncTraceServer(tsi.AsyncTraceServerInterface):
+    """Implements the async interface by running the methods of a
+    `TraceServerInterface` in the default executor, so that they don't block
+    the event loop."""
+
+    def __init__(self, server: tsi.TraceServerInterface):
+        self.server = server
+
+    async def call_start(self, req: tsi.CallStartReq) -> tsi.CallStartRes:
+        return await asyncio.to_thread(self.server.call_start, req)
+
+    async def call_end(self, req: tsi.CallEndReq) -> tsi.CallEndRes:
+        return await asyncio.to_thread(self.server.call_end, req)
+
+    async def call_complete(self, req: tsi.CallCompleteReq) -> tsi.CallCompleteRes:
+        return await asyncio.to_thread(self.server.call_complete, req)
+
+    async def call_read(self, req: tsi.CallReadReq) -> tsi.CallReadRes:
+        return await asyncio.to_thread(self.server.call_read, req)
+
+    async def calls_query(self, req: tsi.CallsQueryReq) -> tsi.CallsQueryRes:
+        return await asyncio.to_thread(self.server.calls_query, req)
+
+    async def calls_query_stream(
+        self, req: tsi.CallsQueryReq
+    ) -> typing.AsyncIterator[tsi.CallSchema]:
+        async for item in _iterate_in_thread(self.server.calls_query_stream(req)):
+            yield item
+
+    async def calls_delete(self, req: tsi.CallsDeleteReq) -> tsi.CallsDeleteRes:
+        return await asyncio.to_thread(self.server.calls_delete, req)
+
+    async def calls_query_stats(
+        self, req: tsi.CallsQueryStatsReq
+    ) -> tsi.CallsQueryStatsRes:
+        return await asyncio.to_thread(self.server.calls_query_stats, req)
+
+    async def calls_stats(self, req: tsi.CallsStatsReq) -> tsi.CallsStatsRes:
+        return await asyncio.to_thread(self.server.calls_stats, req)
+
+    async def trace_read(self, req: tsi.TraceReadReq) -> tsi.TraceReadRes:
+        return await asyncio.to_thread(self.server.trace_read, req)
+
+    async def call_update(self, req: tsi.CallUpdateReq) -> tsi.CallUpdateRes:
+        return await asyncio.to_thread(self.server.call_update, req)
+
+    async def op_create(self, req: tsi.OpCreateReq) -> tsi.OpCreateRes:
+        return await asyncio.to_thread(self.server.op_create, req)
+
+    async def op_read(self, req: tsi.OpReadReq) -> tsi.OpReadRes:
+        return await asyncio.to_thread(self.server.op_read, req)
+
+    async def ops_query(self, req: tsi.OpQueryReq) -> tsi.OpQueryRes:
+        return await asyncio.to_thread(self.server.ops_query, req)
+
+    async def obj_create(self, req: tsi.ObjCreateReq) -> tsi.ObjCreateRes:
+        return await asyncio.to_thread(self.server.obj_create, req)
+
+    async def obj_read(self, req: tsi.ObjReadReq) -> tsi.ObjReadRes:
+        return await asyncio.to_thread(self.server.obj_read, req)
+
+    async def objs_query(self, req: tsi.ObjQueryReq) -> tsi.ObjQueryRes:
+        return await asyncio.to_thread(self.server.objs_query, req)
+
+    async def table_create(self, req: tsi.TableCreateReq) -> tsi.TableCreateRes:
+        return await asyncio.to_thread(self.server.table_create, req)
+
+    async def table_rows_missing(
+        self, req: tsi.TableRowsMissingReq
+    ) -> tsi.TableRowsMissingRes:
+        return await asyncio.to_thread(self.server.table_rows_missing, req)
+
+    async def table_rows_create(
+        self, req: tsi.TableRowsCreateReq
+    ) -> tsi.TableRowsCreateRes:
+        return await asyncio.to_thread(self.server.table_rows_create, req)
+
+    async def table_create_from_digests(
+        self, req: tsi.TableCreateFromDigestsReq
+    ) -> tsi.TableCreateFromDigestsRes:
+        return await asyncio.to_thread(self.server.table_create_from_digests, req)
+
+    async def table_append(self, req: tsi.TableAppendReq) -> tsi.TableAppendRes:
+        return await asyncio.to_thread(self.server.table_append, req)
+
+    async def table_query(self, req: tsi.TableQueryReq) -> tsi.TableQueryRes:
+        return await asyncio.to_thread(self.server.table_query, req)
+
+    async def refs_read_batch(self, req: tsi.RefsReadBatchReq) -> tsi.RefsReadBatchRes:
+        return await asyncio.to_thread(self.server.refs_read_batch, req)
+
+    async def file_create(self, req: tsi.FileCreateReq) -> tsi.FileCreateRes:
+        return await asyncio.to_thread(self.server.file_create, req)
+
+    async def file_create_part(
+        self, req: tsi.FileCreatePartReq
+    ) -> tsi.FileCreatePartRes:
+        return await asyncio.to_thread(self.server.file_create_part, req)
+
+    async def file_parts_missing(
+        self, req: tsi.FilePartsMissingReq
+    ) -> tsi.FilePartsMissingRes:
+        return await asyncio.to_thread(self.server.file_parts_missing, req)
+
+    async def file_content_read(
+        self, req: tsi.FileContentReadReq
+    ) -> tsi.FileContentReadRes:
+        return await asyncio.to_thread(self.server.file_content_read, req)
+
+    async def file_content_read_stream(
+        self, req: tsi.FileContentReadReq
+    ) -> typing.AsyncIterator[bytes]:
+        async for item in _iterate_in_thread(self.server.file_content_read_stream(req)):
+            yield item
+
+    async def feedback_create(
+        self, req: tsi.FeedbackCreateReq
+    ) -> tsi.FeedbackCreateRes:
+        return await asyncio.to_thread(self.server.feedback_create, req)
+
+    async def feedback_query(self, req: tsi.FeedbackQueryReq) -> tsi.FeedbackQueryRes:
+        return await asyncio.to_thread(self.server.feedback_query, req)
+
+    async def feedback_purge(self, req: tsi.FeedbackPurgeReq) -> tsi.FeedbackPurgeRes:
+        return await asyncio.to_thread(self.server.feedback_purge, req)
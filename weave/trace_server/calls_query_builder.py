@@ -21,12 +21,15 @@ Outstanding Optimizations/Work:
         2. We define our own column definitions here, which might be
         able to use the ones in orm.py.
 
-* [ ] Implement column selection at interface level so that it can be used here
+* [x] Implement column selection at interface level so that it can be used here
 * [ ] Consider how we will do latency order/filter
 * [ ] Consider how we will do feedback fields
 
 """
 
+import datetime
+import hashlib
+import json
 import logging
 import typing
 
@@ -109,11 +112,21 @@ class CallsMergedDynamicField(CallsMergedAggField):
 
     def as_select_sql(self, pb: ParamBuilder, table_alias: str) -> str:
         if self.extra_path:
-            raise NotImplementedError(
-                "Dynamic fields cannot be selected directly, yet - implement me!"
-            )
+            # Selects the raw JSON of the sub-path ('' if it does not exist)
+            path_parts = []
+            for part in self.extra_path:
+                path_parts.append(", " + _param_slot(pb.add_param(part), "String"))
+            safe_path = "".join(path_parts)
+            return f"JSONExtractRaw({super().as_sql(pb, table_alias)}{safe_path}) AS {self.select_alias()}"
         return f"{super().as_sql(pb, table_alias)} AS {self.field}"
 
+    def select_alias(self) -> str:
+        if not self.extra_path:
+            return self.field
+        # The path is user-provided, so it can't be part of the alias directly
+        path_digest = hashlib.sha256(json.dumps(self.extra_path).encode()).hexdigest()
+        return f"{self.field}__{path_digest[:16]}"
+
     def with_path(self, path: list[str]) -> "CallsMergedDynamicField":
         extra_path = [*(self.extra_path or [])]
         extra_path.extend(path)
@@ -206,6 +219,29 @@ class HardCodedFilter(BaseModel):
         )
 
 
+class KeysetCursor(BaseModel):
+    """Restricts the query to calls strictly after a (`started_at`, `id`) position."""
+
+    cursor: tsi._CallsCursor
+
+    def as_sql(self, pb: ParamBuilder, table_alias: str) -> str:
+        started_at = self.cursor.started_at
+        if started_at.tzinfo is None:
+            started_at = started_at.replace(tzinfo=datetime.timezone.utc)
+        # Passed as integer milliseconds: a float timestamp could round to a
+        # slightly earlier time and make the last call of a page reappear.
+        started_at_ms = round(started_at.timestamp() * 1000)
+        started_at_param = pb.add_param(started_at_ms)
+        id_param = pb.add_param(self.cursor.id)
+        started_at_sql = get_field_by_name("started_at").as_sql(pb, table_alias)
+        id_sql = get_field_by_name("id").as_sql(pb, table_alias)
+        return (
+            f"(({started_at_sql}, {id_sql}) > "
+            f"(fromUnixTimestamp64Milli({_param_slot(started_at_param, 'Int64')}), "
+            f"{_param_slot(id_param, 'String')}))"
+        )
+
+
 class CallsQuery(BaseModel):
     """Critical to be injection safe!"""
 
@@ -213,6 +249,7 @@ class CallsQuery(BaseModel):
     select_fields: list[CallsMergedField] = Field(default_factory=list)
     query_conditions: list[Condition] = Field(default_factory=list)
     hardcoded_filter: typing.Optional[HardCodedFilter] = None
+    keyset_cursor: typing.Optional[KeysetCursor] = None
     order_fields: list[OrderField] = Field(default_factory=list)
     limit: typing.Optional[int] = None
     offset: typing.Optional[int] = None
@@ -246,6 +283,18 @@ class CallsQuery(BaseModel):
         )
         return self
 
+    def set_cursor(self, cursor: tsi._CallsCursor) -> "CallsQuery":
+        """Pages by keyset: results are ordered by (`started_at`, `id`) and
+        start right after `cursor`."""
+        if self.order_fields:
+            raise ValueError("Cannot combine a cursor with a custom sort order")
+        if self.keyset_cursor is not None:
+            raise ValueError("Cursor can only be set once")
+        self.keyset_cursor = KeysetCursor(cursor=cursor)
+        self.add_order("started_at", "ASC")
+        self.add_order("id", "ASC")
+        return self
+
     def set_limit(self, limit: int) -> "CallsQuery":
         if limit < 0:
             raise ValueError("Limit must be a positive integer")
@@ -269,6 +318,7 @@ class CallsQuery(BaseModel):
             query_conditions=self.query_conditions.copy(),
             order_fields=self.order_fields.copy(),
             hardcoded_filter=self.hardcoded_filter,
+            keyset_cursor=self.keyset_cursor,
             limit=self.limit,
             offset=self.offset,
         )
@@ -316,6 +366,8 @@ class CallsQuery(BaseModel):
                 2. No `HEAVY` fields in the FILTER_CONDITIONS
                 3. A `LIMIT` clause.
 
+            d. There is a keyset cursor (which is a condition on `LIGHT` fields)
+
         If any of the above are true, then we can push down the predicates into a subquery. This
         results in the following query:
 
@@ -377,8 +429,10 @@ class CallsQuery(BaseModel):
             and not has_heavy_order
         )
 
+        has_cursor = self.keyset_cursor is not None
+
         predicate_pushdown_possible = (
-            has_light_filter or has_light_query or has_light_order_filter
+            has_light_filter or has_light_query or has_light_order_filter or has_cursor
         )
 
         # Determine if we should optimize!
@@ -412,8 +466,9 @@ class CallsQuery(BaseModel):
             else:
                 filter_query.query_conditions.append(condition)
 
-        # Hardcoded Filter - always light
+        # Hardcoded Filter and Cursor - always light
         filter_query.hardcoded_filter = self.hardcoded_filter
+        filter_query.keyset_cursor = self.keyset_cursor
 
         # Order Fields:
         if has_light_order_filter:
@@ -452,6 +507,8 @@ class CallsQuery(BaseModel):
             )
         if self.hardcoded_filter is not None:
             having_conditions_sql.append(self.hardcoded_filter.as_sql(pb, table_alias))
+        if self.keyset_cursor is not None:
+            having_conditions_sql.append(self.keyset_cursor.as_sql(pb, table_alias))
 
         if len(having_conditions_sql) > 0:
             having_filter_sql = "HAVING " + combine_conditions(
@@ -0,0 +1,131 @@
+"""Wire formats used to stream the results of `calls_query_stream` over HTTP.
+
+Two formats are supported, negotiated with the `Accept` / `Content-Type`
+headers:
+
+* NDJSON (`application/jsonl`): one JSON encoded `CallSchema` per line.
+* Arrow IPC stream (`application/vnd.apache.arrow.stream`): record batches
+  following `CALLS_ARROW_SCHEMA`. The free-form fields (`attributes`, `inputs`,
+  `output` and `summary`) are JSON encoded strings.
+
+Both the encoders and the decoders are generators, so neither side ever holds
+more than a line (or a record batch) of calls in memory.
+"""
+
+import datetime
+import json
+import typing
+
+import pyarrow as pa
+
+from . import trace_server_interface as tsi
+
+NDJSON_CONTENT_TYPE = "application/jsonl"
+ARROW_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+
+STREAM_FORMAT_CONTENT_TYPES = {
+    "ndjson": NDJSON_CONTENT_TYPE,
+    "arrow": ARROW_CONTENT_TYPE,
+}
+
+DEFAULT_ARROW_BATCH_SIZE = 1000
+
+_JSON_FIELDS = ("attributes", "inputs", "output", "summary")
+_TIMESTAMP_FIELDS = ("started_at", "ended_at", "deleted_at")
+
+CALLS_ARROW_SCHEMA = pa.schema(
+    [
+        pa.field("id", pa.string(), nullable=False),
+        pa.field("project_id", pa.string(), nullable=False),
+        pa.field("op_name", pa.string(), nullable=False),
+        pa.field("display_name", pa.string()),
+        pa.field("trace_id", pa.string(), nullable=False),
+        pa.field("parent_id", pa.string()),
+        pa.field("started_at", pa.timestamp("us", tz="UTC"), nullable=False),
+        pa.field("attributes", pa.string(), nullable=False),
+        pa.field("inputs", pa.string(), nullable=False),
+        pa.field("ended_at", pa.timestamp("us", tz="UTC")),
+        pa.field("exception", pa.string()),
+        pa.field("output", pa.string()),
+        pa.field("summary", pa.string()),
+        pa.field("wb_user_id", pa.string()),
+        pa.field("wb_run_id", pa.string()),
+        pa.field("deleted_at", pa.timestamp("us", tz="UTC")),
+    ]
+)
+
+# End-of-stream marker of the Arrow IPC streaming format
+_ARROW_EOS = b"\xff\xff\xff\xff\x00\x00\x00\x00"
+
+
+def resolve_stream_format(stream_format: str) -> str:
+    """Returns the content type of `stream_format` ("ndjson" or "arrow")."""
+    if stream_format not in STREAM_FORMAT_CONTENT_TYPES:
+        raise ValueError(
+            f"Unknown stream format: {stream_format}. Expected one of {list(STREAM_FORMAT_CONTENT_TYPES)}"
+        )
+    return STREAM_FORMAT_CONTENT_TYPES[stream_format]
+
+
+def encode_calls_ndjson(
+    calls: typing.Iterable[tsi.CallSchema],
+) -> typing.Iterator[bytes]:
+    for call in calls:
+        yield call.model_dump_json().encode("utf-8") + b"\n"
+
+
+def decode_calls_ndjson(
+    lines: typing.Iterable[bytes],
+) -> typing.Iterator[tsi.CallSchema]:
+    for line in lines:
+        if line:
+            yield tsi.CallSchema.model_validate_json(line)
+
+
+def _utc(dt: typing.Optional[datetime.datetime]) -> typing.Optional[datetime.datetime]:
+    if dt is not None and dt.tzinfo is None:
+        return dt.replace(tzinfo=datetime.timezone.utc)
+    return dt
+
+
+def _calls_to_record_batch(calls: typing.List[tsi.CallSchema]) -> pa.RecordBatch:
+    columns: typing.Dict[str, typing.List[typing.Any]] = {
+        field.name: [] for field in CALLS_ARROW_SCHEMA
+    }
+    for call in calls:
+        for name, values in columns.items():
+            value = getattr(call, name)
+            if name in _JSON_FIELDS:
+                value = None if value is None else json.dumps(value)
+            elif name in _TIMESTAMP_FIELDS:
+                value = _utc(value)
+            values.append(value)
+    return pa.RecordBatch.from_pydict(columns, schema=CALLS_ARROW_SCHEMA)
+
+
+def encode_calls_arrow(
+    calls: typing.Iterable[tsi.CallSchema],
+    batch_size: int = DEFAULT_ARROW_BATCH_SIZE,
+) -> typing.Iterator[bytes]:
+    yield CALLS_ARROW_SCHEMA.serialize().to_pybytes()
+    batch: typing.List[tsi.CallSchema] = []
+    for call in calls:
+        batch.append(call)
+        if len(batch) >= batch_size:
+            yield _calls_to_record_batch(batch).serialize().to_pybytes()
+            batch = []
+    if batch:
+        yield _calls_to_record_batch(batch).serialize().to_pybytes()
+    yield _ARROW_EOS
+
+
+def decode_calls_arrow(source: typing.Any) -> typing.Iterator[tsi.CallSchema]:
+    """Decodes an Arrow IPC stream read from `source` (a readable file-like
+    object or a buffer), one record batch at a time."""
+    with pa.ipc.open_stream(source) as reader:
+        for record_batch in reader:
+            for row in record_batch.to_pylist():
+                for name in _JSON_FIELDS:
+                    if row[name] is not None:
+                        row[name] = json.loads(row[name])
+                yield tsi.CallSchema.model_validate(row)
@@ -24,12 +24,11 @@
 
 import dataclasses
 import datetime
-import hashlib
 import json
 import logging
+import math
 import threading
 import typing
-from collections import defaultdict
 from contextlib import contextmanager
 from zoneinfo import ZoneInfo
 
@@ -41,6 +40,8 @@ from clickhouse_connect.driver.summary import QuerySummary
 from pydantic import BaseModel
 
 from weave.trace_server.calls_query_builder import (
+    CallsMergedDynamicField,
+    CallsMergedField,
     CallsQuery,
     HardCodedFilter,
     combine_conditions,
@@ -50,6 +51,7 @@ from . import clickhouse_trace_server_migrator as wf_migrator
 from . import environment as wf_env
 from . import refs_internal
 from . import trace_server_interface as tsi
+from .digest_cache import DigestCache, DigestCacheStats
 from .emoji_util import detone_emojis
 from .errors import InvalidRequest, RequestTooLarge
 from .feedback import (
@@ -59,22 +61,49 @@ from .feedback import (
 )
 from .orm import ParamBuilder, Row
 from .trace_server_interface_util import (
+    CALL_JSON_COLUMNS,
+    CALLS_STATS_PERCENTILES,
+    CALLS_STATS_USAGE_KEYS,
+    REQUIRED_CALL_COLUMNS,
+    WILDCARD_ARTIFACT_VERSION_AND_PATH,
     assert_non_null_wb_user_id,
     bytes_digest,
+    calls_stats_cost,
     extract_refs_from_values,
+    file_part_chunks,
     generate_id,
+    read_trace,
+    set_json_path_value,
+    split_call_column,
     str_digest,
+    table_digest,
+    validate_calls_cursor_sort_by,
+    validate_calls_stats_req,
 )
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+T = typing.TypeVar("T")
+
 MAX_FLUSH_COUNT = 10000
 MAX_FLUSH_AGE = 15
 
-FILE_CHUNK_SIZE = 100000
+FILE_CHUNK_SIZE = tsi.FILE_CHUNK_SIZE
+# Number of file chunks fetched by a single query when reading a file
+FILE_READ_BATCH_CHUNKS = 100
 
-MAX_DELETE_CALLS_COUNT = 100
+MAX_DELETE_CALLS_COUNT = 1000
+# Maximum number of call ids looked up by a single query, or delete parts
+# inserted by a single batch, when deleting calls with their descendants
+DELETE_CALLS_CHUNK_SIZE = 10000
+MAX_REFS_READ_BATCH_SIZE = 100_000
+# Maximum number of objects (or table rows) fetched by a single query when
+# resolving refs
+REFS_READ_BATCH_CHUNK_SIZE = 1000
+# Maximum number of row digests looked up by a single query when checking
+# which table rows are already stored
+TABLE_ROWS_CHUNK_SIZE = 10000
 
 
 class NotFoundError(Exception):
@@ -107,6 +136,31 @@ class CallEndCHInsertable(BaseModel):
     output_dump: str
     input_refs: typing.List[str] = []  # sadly, this is required
     output_refs: typing.List[str]
+    # Read by `calls_stats_view`, which only sees the part being inserted
+    op_name: typing.Optional[str] = None
+    started_at: typing.Optional[datetime.datetime] = None
+
+
+class CallCompleteCHInsertable(BaseModel):
+    project_id: str
+    id: str
+    trace_id: str
+    parent_id: typing.Optional[str] = None
+    op_name: str
+    started_at: datetime.datetime
+    attributes_dump: str
+    inputs_dump: str
+    input_refs: typing.List[str]
+    display_name: typing.Optional[str] = None
+
+    ended_at: datetime.datetime
+    exception: typing.Optional[str] = None
+    summary_dump: str
+    output_dump: str
+    output_refs: typing.List[str]
+
+    wb_user_id: typing.Optional[str] = None
+    wb_run_id: typing.Optional[str] = None
 
 
 class CallDeleteCHInsertable(BaseModel):
@@ -137,6 +191,7 @@ class CallUpdateCHInsertable(BaseModel):
 CallCHInsertable = typing.Union[
     CallStartCHInsertable,
     CallEndCHInsertable,
+    CallCompleteCHInsertable,
     CallDeleteCHInsertable,
     CallUpdateCHInsertable,
 ]
@@ -235,6 +290,7 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
         password: str = "",
         database: str = "default",
         use_async_insert: bool = False,
+        digest_cache: typing.Optional[DigestCache] = None,
     ):
         super().__init__()
         self._thread_local = threading.local()
@@ -246,6 +302,11 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
         self._flush_immediately = True
         self._call_batch: typing.List[typing.List[typing.Any]] = []
         self._use_async_insert = use_async_insert
+        # Objects, table rows and files are immutable once written (they are
+        # keyed by their digest), so they are cached across requests.
+        self._digest_cache = (
+            digest_cache if digest_cache is not None else DigestCache.from_env()
+        )
 
     @classmethod
     def from_env(cls, use_async_insert: bool = False) -> "ClickHouseTraceServer":
@@ -299,6 +360,16 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
         # Returns the id of the newly created call
         return tsi.CallEndRes()
 
+    # Inserts a call that has already finished as a single call part,
+    # rather than separate start and end parts that need to be merged
+    def call_complete(self, req: tsi.CallCompleteReq) -> tsi.CallCompleteRes:
+        ch_call = _complete_call_for_insert_to_ch_insertable_complete_call(req.complete)
+        self._insert_call(ch_call)
+        return tsi.CallCompleteRes(
+            id=ch_call.id,
+            trace_id=ch_call.trace_id,
+        )
+
     def call_read(self, req: tsi.CallReadReq) -> tsi.CallReadRes:
         res = self.calls_query_stream(
             tsi.CallsQueryReq(
@@ -339,18 +410,101 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
             count = rows[0][0]
         return tsi.CallsQueryStatsRes(count=count)
 
+    def calls_stats(self, req: tsi.CallsStatsReq) -> tsi.CallsStatsRes:
+        """Returns aggregates of the finished calls. They are read from
+        `calls_stats`, which `calls_stats_view` fills as call parts are
+        inserted, rather than computed from `calls_merged`.
+        """
+        validate_calls_stats_req(req)
+        pb = ParamBuilder()
+        conditions = [f"project_id = {pb.add(req.project_id, param_type='String')}"]
+        if req.op_names:
+            op_conditions = []
+            names = [
+                name
+                for name in req.op_names
+                if not name.endswith(WILDCARD_ARTIFACT_VERSION_AND_PATH)
+            ]
+            if names:
+                op_conditions.append(
+                    f"op_name IN {pb.add(names, param_type='Array(String)')}"
+                )
+            for name in req.op_names:
+                if name.endswith(WILDCARD_ARTIFACT_VERSION_AND_PATH):
+                    like_name = name[: -len(WILDCARD_ARTIFACT_VERSION_AND_PATH)] + ":%"
+                    op_conditions.append(
+                        f"op_name LIKE {pb.add(like_name, param_type='String')}"
+                    )
+            conditions.append(combine_conditions(op_conditions, "OR"))
+        # `bucket_start` has a precision of a second, so bounds are rounded up
+        for op, bound in ((">=", req.started_after), ("<", req.started_before)):
+            bound = _ensure_datetimes_have_tz(bound)
+            if bound is not None:
+                ts = pb.add(math.ceil(bound.timestamp()), param_type="Int64")
+                conditions.append(f"bucket_start {op} toDateTime({ts})")
+
+        op_name_sql = "op_name" if req.group_by_op_name else "NULL"
+        bucket_sql = "NULL"
+        if req.bucket_seconds is not None:
+            seconds = pb.add(req.bucket_seconds, param_type="UInt32")
+            bucket_sql = f"toDateTime(intDiv(toUInt32(bucket_start), {seconds}) * {seconds}, 'UTC')"
+        percentiles = ", ".join(str(q) for q in CALLS_STATS_PERCENTILES)
+        query = f"""
+            SELECT {op_name_sql} AS group_op_name,
+                {bucket_sql} AS group_bucket_start,
+                sum(call_count),
+                sum(error_count),
+                quantilesTDigestMerge({percentiles})(latency_ms),
+                sumMap(requests),
+                sumMap(prompt_tokens),
+                sumMap(completion_tokens),
+                sumMap(total_tokens)
+            FROM calls_stats
+            WHERE {combine_conditions(conditions, "AND")}
+            GROUP BY group_op_name, group_bucket_start
+            ORDER BY group_op_name, group_bucket_start
+        """
+        raw_res = self._query(query, pb.get_params())
+
+        groups = []
+        for row in raw_res.result_rows:
+            op_name, bucket_start, call_count, error_count, latencies = row[:5]
+            usage: typing.Dict[str, tsi.CallsStatsUsage] = {}
+            for key, by_model in zip(CALLS_STATS_USAGE_KEYS, row[5:]):
+                for model, value in by_model.items():
+                    setattr(usage.setdefault(model, tsi.CallsStatsUsage()), key, value)
+            p50, p90, p95, p99 = latencies
+            groups.append(
+                tsi.CallsStatsGroup(
+                    op_name=op_name,
+                    bucket_start=_ensure_datetimes_have_tz(bucket_start),
+                    call_count=call_count,
+                    error_count=error_count,
+                    error_rate=error_count / call_count,
+                    latency_ms_p50=p50,
+                    latency_ms_p90=p90,
+                    latency_ms_p95=p95,
+                    latency_ms_p99=p99,
+                    usage=usage,
+                    cost=calls_stats_cost(usage, req.token_costs),
+                )
+            )
+        return tsi.CallsStatsRes(groups=groups)
+
+    def trace_read(self, req: tsi.TraceReadReq) -> tsi.TraceReadRes:
+        return read_trace(self.calls_query_stream, req)
+
     def calls_query_stream(
         self, req: tsi.CallsQueryReq
     ) -> typing.Iterator[tsi.CallSchema]:
         """Returns a stream of calls that match the given query."""
         cq = CallsQuery(project_id=req.project_id)
 
-        # TODO (Perf): By allowing a sub-selection of columns
-        # we will gain increased performance by not having to
-        # fetch all columns from the database. Currently all use
-        # cases call for every column to be fetched, so we have not
-        # implemented this yet.
-        columns = all_call_select_columns
+        # Only fetch the requested columns: the heavy JSON columns are what
+        # dominates the amount of data read and returned.
+        columns: typing.Iterable[str] = all_call_select_columns
+        if req.columns is not None:
+            columns = _calls_query_columns(req.columns)
         for col in columns:
             cq.add_field(col)
         if req.filter is not None:
@@ -359,7 +513,11 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
             cq.add_condition(req.query.expr_)
 
         # Sort with empty list results in no sorting
-        if req.sort_by is not None:
+        if req.after is not None:
+            # The cursor brings its own (started_at, id) order
+            validate_calls_cursor_sort_by(req.sort_by)
+            cq.set_cursor(req.after)
+        elif req.sort_by is not None:
             for sort_by in req.sort_by:
                 cq.add_order(sort_by.field, sort_by.direction)
         else:
@@ -375,9 +533,10 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
             pb.get_params(),
         )
 
+        select_fields = cq.select_fields
         for row in raw_res:
             yield tsi.CallSchema.model_validate(
-                _ch_call_dict_to_call_schema_dict(dict(zip(columns, row)))
+                _ch_call_row_to_call_schema_dict(select_fields, row)
             )
 
     def calls_delete(self, req: tsi.CallsDeleteReq) -> tsi.CallsDeleteRes:
@@ -387,56 +546,73 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
                 f"Cannot delete more than {MAX_DELETE_CALLS_COUNT} calls at once"
             )
 
-        # Note: i think this project condition is redundant
-        proj_cond = "calls_merged.project_id = {project_id: String}"
-        proj_params = {"project_id": req.project_id}
-
-        # get all parents
-        parents = list(
-            self.calls_query_stream(
-                tsi.CallsQueryReq(
-                    project_id=req.project_id,
-                    filter=tsi._CallsFilter(
-                        call_ids=req.call_ids,
-                    ),
-                )
-            )
-        )
-
-        # get all calls with trace_ids matching parents
-        all_calls = list(
-            self.calls_query_stream(
-                tsi.CallsQueryReq(
-                    project_id=req.project_id,
-                    filter=tsi._CallsFilter(
-                        trace_ids=[p.trace_id for p in parents],
-                    ),
-                )
-            )
-        )
-
-        all_descendants = find_call_descendants(
-            root_ids=req.call_ids,
-            all_calls=all_calls,
-        )
+        call_ids = self._call_descendant_ids(req.project_id, req.call_ids)
 
         deleted_at = datetime.datetime.now()
-        insertables = [
-            CallDeleteCHInsertable(
-                project_id=req.project_id,
-                id=call_id,
-                wb_user_id=req.wb_user_id,
-                deleted_at=deleted_at,
-            )
-            for call_id in all_descendants
-        ]
-
-        with self.call_batch():
-            for insertable in insertables:
-                self._insert_call(insertable)
+        for chunk in _chunked(call_ids, DELETE_CALLS_CHUNK_SIZE):
+            with self.call_batch():
+                for call_id in chunk:
+                    self._insert_call(
+                        CallDeleteCHInsertable(
+                            project_id=req.project_id,
+                            id=call_id,
+                            wb_user_id=req.wb_user_id,
+                            deleted_at=deleted_at,
+                        )
+                    )
 
         return tsi.CallsDeleteRes()
 
+    def _call_descendant_ids(
+        self, project_id: str, root_ids: typing.List[str]
+    ) -> typing.List[str]:
+        """Returns `root_ids` followed by the ids of all their descendants.
+
+        The tree is walked one level per query, reading only the `id`,
+        `trace_id` and `parent_id` columns. The start part of a call holds
+        both its `trace_id` and `parent_id`, so parts need not be merged to
+        find children.
+        """
+        trace_ids_res = self._query(
+            """
+            SELECT DISTINCT trace_id
+            FROM calls_merged
+            WHERE project_id = {project_id: String}
+                AND id IN {ids: Array(String)}
+                AND isNotNull(trace_id)
+            """,
+            {"project_id": project_id, "ids": root_ids},
+        )
+        trace_ids = [row[0] for row in trace_ids_res.result_rows]
+
+        call_ids = list(dict.fromkeys(root_ids))
+        seen = set(call_ids)
+        parent_ids = call_ids if trace_ids else []
+        while parent_ids:
+            child_ids = []
+            for chunk in _chunked(parent_ids, DELETE_CALLS_CHUNK_SIZE):
+                raw_res = self._query(
+                    """
+                    SELECT DISTINCT id
+                    FROM calls_merged
+                    WHERE project_id = {project_id: String}
+                        AND trace_id IN {trace_ids: Array(String)}
+                        AND parent_id IN {parent_ids: Array(String)}
+                    """,
+                    {
+                        "project_id": project_id,
+                        "trace_ids": trace_ids,
+                        "parent_ids": chunk,
+                    },
+                )
+                for (call_id,) in raw_res.result_rows:
+                    if call_id not in seen:
+                        seen.add(call_id)
+                        child_ids.append(call_id)
+            call_ids.extend(child_ids)
+            parent_ids = child_ids
+        return call_ids
+
     def _ensure_valid_update_field(self, req: tsi.CallUpdateReq) -> None:
         valid_update_fields = ["display_name"]
         for field in valid_update_fields:
@@ -570,49 +746,119 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
         return tsi.ObjQueryRes(objs=[_ch_obj_to_obj_schema(obj) for obj in objs])
 
     def table_create(self, req: tsi.TableCreateReq) -> tsi.TableCreateRes:
-        insert_rows = []
-        for r in req.table.rows:
+        row_digests = self._insert_table_rows(req.table.project_id, req.table.rows)
+        digest = self._insert_table(req.table.project_id, row_digests)
+        return tsi.TableCreateRes(digest=digest)
+
+    def table_rows_missing(
+        self, req: tsi.TableRowsMissingReq
+    ) -> tsi.TableRowsMissingRes:
+        existing = self._existing_table_row_digests(req.project_id, req.row_digests)
+        return tsi.TableRowsMissingRes(
+            row_digests=[d for d in dict.fromkeys(req.row_digests) if d not in existing]
+        )
+
+    def table_rows_create(self, req: tsi.TableRowsCreateReq) -> tsi.TableRowsCreateRes:
+        row_digests = self._insert_table_rows(req.project_id, req.rows)
+        return tsi.TableRowsCreateRes(row_digests=row_digests)
+
+    def table_create_from_digests(
+        self, req: tsi.TableCreateFromDigestsReq
+    ) -> tsi.TableCreateFromDigestsRes:
+        existing = self._existing_table_row_digests(req.project_id, req.row_digests)
+        missing = [d for d in req.row_digests if d not in existing]
+        if missing:
+            raise InvalidRequest(
+                f"Cannot create a table from {len(missing)} row digest(s) with no stored row, eg. {missing[0]}"
+            )
+        digest = self._insert_table(req.project_id, req.row_digests)
+        return tsi.TableCreateFromDigestsRes(digest=digest)
+
+    def table_append(self, req: tsi.TableAppendReq) -> tsi.TableAppendRes:
+        query_result = self._query(
+            """
+            SELECT row_digests
+            FROM tables
+            WHERE project_id = {project_id:String} AND digest = {digest:String}
+            LIMIT 1
+            """,
+            {"project_id": req.project_id, "digest": req.base_digest},
+        )
+        if not query_result.result_rows:
+            raise NotFoundError(f"Table {req.base_digest} not found")
+        base_row_digests = list(query_result.result_rows[0][0])
+        row_digests = self._insert_table_rows(req.project_id, req.rows)
+        digest = self._insert_table(req.project_id, base_row_digests + row_digests)
+        return tsi.TableAppendRes(digest=digest)
+
+    def _existing_table_row_digests(
+        self, project_id: str, row_digests: typing.List[str]
+    ) -> typing.Set[str]:
+        existing: typing.Set[str] = set()
+        for chunk in _chunked(list(dict.fromkeys(row_digests)), TABLE_ROWS_CHUNK_SIZE):
+            query_result = self._query(
+                """
+                SELECT DISTINCT digest
+                FROM table_rows
+                WHERE project_id = {project_id:String}
+                    AND digest IN {digests:Array(String)}
+                """,
+                {"project_id": project_id, "digests": chunk},
+            )
+            existing.update(row[0] for row in query_result.result_rows)
+        return existing
+
+    def _insert_table_rows(
+        self, project_id: str, rows: typing.List[typing.Any]
+    ) -> typing.List[str]:
+        """Inserts the rows that are not stored yet and returns the digest of
+        every row, in order."""
+        row_digests = []
+        row_inserts: typing.Dict[str, typing.Tuple] = {}
+        for r in rows:
             if not isinstance(r, dict):
                 raise ValueError(
                     f"""Validation Error: Encountered a non-dictionary row when creating a table. Please ensure that all rows are dictionaries. Violating row:\n{r}."""
                 )
             row_json = json.dumps(r)
             row_digest = str_digest(row_json)
-            insert_rows.append(
-                (
-                    req.table.project_id,
-                    row_digest,
-                    extract_refs_from_values(r),
-                    row_json,
-                )
+            row_digests.append(row_digest)
+            row_inserts[row_digest] = (
+                project_id,
+                row_digest,
+                extract_refs_from_values(r),
+                row_json,
             )
 
-        self._insert(
-            "table_rows",
-            data=insert_rows,
-            column_names=["project_id", "digest", "refs", "val_dump"],
-        )
-
-        row_digests = [r[1] for r in insert_rows]
-
-        table_hasher = hashlib.sha256()
-        for row_digest in row_digests:
-            table_hasher.update(row_digest.encode())
-        digest = table_hasher.hexdigest()
+        existing = self._existing_table_row_digests(project_id, list(row_inserts))
+        insert_rows = [v for d, v in row_inserts.items() if d not in existing]
+        if insert_rows:
+            self._insert(
+                "table_rows",
+                data=insert_rows,
+                column_names=["project_id", "digest", "refs", "val_dump"],
+            )
+        return row_digests
 
+    def _insert_table(self, project_id: str, row_digests: typing.List[str]) -> str:
+        digest = table_digest(row_digests)
         self._insert(
             "tables",
-            data=[(req.table.project_id, digest, row_digests)],
+            data=[(project_id, digest, row_digests)],
             column_names=["project_id", "digest", "row_digests"],
         )
-        return tsi.TableCreateRes(digest=digest)
+        return digest
 
     def table_query(self, req: tsi.TableQueryReq) -> tsi.TableQueryRes:
+        if not req.filter and not req.limit and not req.offset:
+            return tsi.TableQueryRes(
+                rows=self._read_whole_table(req.project_id, req.digest)
+            )
         conds = []
         parameters = {}
         if req.filter:
             if req.filter.row_digests:
-                conds.append("tr.digest IN {row_digets: Array(String)}")
+                conds.append("tr.digest IN {row_digests: Array(String)}")
                 parameters["row_digests"] = req.filter.row_digests
         else:
             conds.append("1 = 1")
@@ -622,9 +868,40 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
             conditions=conds,
             limit=req.limit,
             offset=req.offset,
+            parameters=parameters,
         )
         return tsi.TableQueryRes(rows=rows)
 
+    def _read_whole_table(
+        self, project_id: str, digest: str
+    ) -> typing.List[tsi.TableRowSchema]:
+        # A table is cached as the list of its row digests, pointing to the
+        # (shared) cached rows.
+        table_key = DigestCache.key("table", project_id, digest)
+        cached_table = self._cache_get_many([table_key])[0]
+        if cached_table is not None:
+            row_digests = json.loads(cached_table)
+            row_dumps = self._cache_get_many(
+                [DigestCache.key("row", project_id, d) for d in row_digests]
+            )
+            if all(dump is not None for dump in row_dumps):
+                return [
+                    tsi.TableRowSchema(digest=d, val=json.loads(dump))
+                    for d, dump in zip(row_digests, row_dumps)
+                    if dump is not None
+                ]
+        raw_rows = self._table_query_raw(project_id, digest, conditions=["1 = 1"])
+        to_cache = {
+            DigestCache.key("row", project_id, row_digest): val_dump.encode("utf-8")
+            for row_digest, val_dump in raw_rows
+        }
+        to_cache[table_key] = json.dumps([d for d, _ in raw_rows]).encode("utf-8")
+        self._cache_set_many(to_cache)
+        return [
+            tsi.TableRowSchema(digest=row_digest, val=json.loads(val_dump))
+            for row_digest, val_dump in raw_rows
+        ]
+
     def _table_query(
         self,
         project_id: str,
@@ -634,6 +911,23 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
         offset: typing.Optional[int] = None,
         parameters: typing.Optional[typing.Dict[str, typing.Any]] = None,
     ) -> typing.List[tsi.TableRowSchema]:
+        return [
+            tsi.TableRowSchema(digest=row_digest, val=json.loads(val_dump))
+            for row_digest, val_dump in self._table_query_raw(
+                project_id, digest, conditions, limit, offset, parameters
+            )
+        ]
+
+    def _table_query_raw(
+        self,
+        project_id: str,
+        digest: str,
+        conditions: typing.Optional[typing.List[str]] = None,
+        limit: typing.Optional[int] = None,
+        offset: typing.Optional[int] = None,
+        parameters: typing.Optional[typing.Dict[str, typing.Any]] = None,
+    ) -> typing.List[typing.Tuple[str, str]]:
+        """Returns the (row digest, val_dump) of the matching rows."""
         conds = ["project_id = {project_id: String}"]
         if conditions:
             conds.extend(conditions)
@@ -692,65 +986,105 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
             },
         )
 
-        return [
-            tsi.TableRowSchema(digest=r[0], val=json.loads(r[1]))
-            for r in query_result.result_rows
-        ]
+        return [(r[0], r[1]) for r in query_result.result_rows]
 
     def refs_read_batch(self, req: tsi.RefsReadBatchReq) -> tsi.RefsReadBatchRes:
-        # TODO: This reads one ref at a time, it should read them in batches
-        # where it can. Like it should group by object that we need to read.
-        # And it should also batch into table refs (like when we are reading a bunch
-        # of rows from a single Dataset)
-        if len(req.refs) > 1000:
-            raise ValueError("Too many refs")
-
-        parsed_raw_refs = [refs_internal.parse_internal_uri(r) for r in req.refs]
-        if any(isinstance(r, refs_internal.InternalTableRef) for r in parsed_raw_refs):
-            raise ValueError("Table refs not supported")
-        parsed_refs = typing.cast(
-            typing.List[refs_internal.InternalObjectRef], parsed_raw_refs
-        )
-
-        root_val_cache: typing.Dict[str, typing.Any] = {}
+        if len(req.refs) > MAX_REFS_READ_BATCH_SIZE:
+            raise RequestTooLarge(
+                f"Cannot read more than {MAX_REFS_READ_BATCH_SIZE} refs at once"
+            )
 
-        def make_ref_cache_key(ref: refs_internal.InternalObjectRef) -> str:
-            return f"{ref.project_id}/{ref.name}/{ref.version}"
+        parsed_refs = [refs_internal.parse_internal_uri(r) for r in req.refs]
 
-        def make_obj_cache_key(obj: SelectableCHObjSchema) -> str:
-            return f"{obj.project_id}/{obj.object_id}/{obj.digest}"
+        root_val_cache: typing.Dict[typing.Tuple[str, str, str], typing.Any] = {}
+        row_val_cache: typing.Dict[typing.Tuple[str, str], typing.Any] = {}
 
         def get_object_refs_root_val(
             refs: list[refs_internal.InternalObjectRef],
         ) -> typing.Any:
-            conds = []
-            parameters = {}
-            for ref_index, ref in enumerate(refs):
+            # Group the objects we still need by project, so that each project
+            # is read with one query per chunk of objects.
+            uncached: typing.Set[typing.Tuple[str, str, str]] = set()
+            for ref in refs:
                 if ref.version == "latest":
                     raise ValueError("Reading refs with `latest` is not supported")
+                if (ref.project_id, ref.name, ref.version) not in root_val_cache:
+                    uncached.add((ref.project_id, ref.name, ref.version))
+            uncached_list = sorted(uncached)
+            cached_dumps = self._cache_get_many(
+                [DigestCache.key("obj", *obj_key) for obj_key in uncached_list]
+            )
+            needed: typing.Dict[str, typing.Set[typing.Tuple[str, str]]] = {}
+            for obj_key, cached_dump in zip(uncached_list, cached_dumps):
+                if cached_dump is not None:
+                    root_val_cache[obj_key] = json.loads(cached_dump)
+                else:
+                    project_id, name, version = obj_key
+                    needed.setdefault(project_id, set()).add((name, version))
+
+            to_cache: typing.Dict[str, bytes] = {}
+            for project_id, keys in needed.items():
+                for chunk in _chunked(sorted(keys), REFS_READ_BATCH_CHUNK_SIZE):
+                    chunk_keys = set(chunk)
+                    # The two IN conditions select (a superset of) the wanted
+                    # (object_id, digest) pairs using the primary key. Pairs that
+                    # were not asked for are dropped below.
+                    objs = self._select_objs_query(
+                        project_id,
+                        conditions=[
+                            "object_id IN {object_ids: Array(String)}",
+                            "digest IN {digests: Array(String)}",
+                        ],
+                        parameters={
+                            "object_ids": sorted({name for name, _ in chunk}),
+                            "digests": sorted({version for _, version in chunk}),
+                        },
+                    )
+                    for obj in objs:
+                        if (obj.object_id, obj.digest) in chunk_keys:
+                            obj_key = (obj.project_id, obj.object_id, obj.digest)
+                            root_val_cache[obj_key] = json.loads(obj.val_dump)
+                            to_cache[DigestCache.key("obj", *obj_key)] = (
+                                obj.val_dump.encode("utf-8")
+                            )
+            self._cache_set_many(to_cache)
 
-                cache_key = make_ref_cache_key(ref)
-
-                if cache_key in root_val_cache:
-                    continue
+            return [
+                root_val_cache[(ref.project_id, ref.name, ref.version)] for ref in refs
+            ]
 
-                object_id_param_key = "object_id_" + str(ref_index)
-                version_param_key = "version_" + str(ref_index)
-                conds.append(
-                    f"object_id = {{{object_id_param_key}: String}} AND digest = {{{version_param_key}: String}}"
+        def get_table_rows_val(
+            project_id: str, table_digest: str, row_digests: typing.Set[str]
+        ) -> None:
+            uncached = sorted(
+                d for d in row_digests if (project_id, d) not in row_val_cache
+            )
+            cached_dumps = self._cache_get_many(
+                [DigestCache.key("row", project_id, d) for d in uncached]
+            )
+            needed = []
+            for row_digest, cached_dump in zip(uncached, cached_dumps):
+                if cached_dump is not None:
+                    row_val_cache[(project_id, row_digest)] = json.loads(cached_dump)
+                else:
+                    needed.append(row_digest)
+            for chunk in _chunked(needed, REFS_READ_BATCH_CHUNK_SIZE):
+                raw_rows = self._table_query_raw(
+                    project_id=project_id,
+                    digest=table_digest,
+                    conditions=["digest IN {digests: Array(String)}"],
+                    parameters={"digests": chunk},
                 )
-                parameters[object_id_param_key] = ref.name
-                parameters[version_param_key] = ref.version
-
-            if len(conds) > 0:
-                conditions = [combine_conditions(conds, "OR")]
-                objs = self._select_objs_query(
-                    ref.project_id, conditions=conditions, parameters=parameters
+                for row_digest, val_dump in raw_rows:
+                    row_val_cache[(project_id, row_digest)] = json.loads(val_dump)
+                self._cache_set_many(
+                    {
+                        DigestCache.key("row", project_id, row_digest): val_dump.encode(
+                            "utf-8"
+                        )
+                        for row_digest, val_dump in raw_rows
+                    }
                 )
-                for obj in objs:
-                    root_val_cache[make_obj_cache_key(obj)] = json.loads(obj.val_dump)
-
-            return [root_val_cache[make_ref_cache_key(ref)] for ref in refs]
 
         # Represents work left to do for resolving a ref
         @dataclasses.dataclass
@@ -810,9 +1144,15 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
         # Initialize the results with the parsed refs
         extra_results = [
             PartialRefResult(
-                remaining_extra=[],
-                unresolved_obj_ref=ref,
-                unresolved_table_ref=None,
+                remaining_extra=ref.extra
+                if isinstance(ref, refs_internal.InternalTableRef)
+                else [],
+                unresolved_obj_ref=ref
+                if isinstance(ref, refs_internal.InternalObjectRef)
+                else None,
+                unresolved_table_ref=ref
+                if isinstance(ref, refs_internal.InternalTableRef)
+                else None,
                 val=None,
             )
             for ref in parsed_refs
@@ -852,35 +1192,39 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
             table_queries: dict[
                 typing.Tuple[str, str], list[typing.Tuple[int, str]]
             ] = {}
+            whole_tables: dict[typing.Tuple[str, str], list[int]] = {}
             for i, extra_result in enumerate(extra_results):
                 if extra_result.unresolved_table_ref is not None:
                     table_ref = extra_result.unresolved_table_ref
+                    table_key = (table_ref.project_id, table_ref.digest)
                     if not extra_result.remaining_extra:
-                        raise ValueError("Table refs must have id extra")
+                        # A bare table ref resolves to all of its rows
+                        whole_tables.setdefault(table_key, []).append(i)
+                        continue
                     op, row_digest = (
                         extra_result.remaining_extra[0],
                         extra_result.remaining_extra[1],
                     )
                     if op != refs_internal.TABLE_ROW_ID_EDGE_NAME:
                         raise ValueError("Table refs must have id extra")
-                    table_queries.setdefault(
-                        (table_ref.project_id, table_ref.digest), []
-                    ).append((i, row_digest))
+                    table_queries.setdefault(table_key, []).append((i, row_digest))
             # Make the queries
             for (project_id, digest), index_digests in table_queries.items():
-                row_digests = [d for i, d in index_digests]
-                rows = self._table_query(
-                    project_id=project_id,
-                    digest=digest,
-                    conditions=["digest IN {digests: Array(String)}"],
-                    parameters={"digests": row_digests},
-                )
+                get_table_rows_val(project_id, digest, {d for _, d in index_digests})
                 # Unpack the results into the target rows
-                row_digest_vals = {r.digest: r.val for r in rows}
                 for index, row_digest in index_digests:
                     extra_results[index] = PartialRefResult(
                         remaining_extra=extra_results[index].remaining_extra[2:],
-                        val=row_digest_vals[row_digest],
+                        val=row_val_cache[(project_id, row_digest)],
+                        unresolved_obj_ref=None,
+                        unresolved_table_ref=None,
+                    )
+            for (project_id, digest), indexes in whole_tables.items():
+                rows = self._read_whole_table(project_id, digest)
+                for index in indexes:
+                    extra_results[index] = PartialRefResult(
+                        remaining_extra=[],
+                        val=[row.val for row in rows],
                         unresolved_obj_ref=None,
                         unresolved_table_ref=None,
                     )
@@ -896,22 +1240,102 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
 
     def file_create(self, req: tsi.FileCreateReq) -> tsi.FileCreateRes:
         digest = bytes_digest(req.content)
-        chunks = [
-            req.content[i : i + FILE_CHUNK_SIZE]
-            for i in range(0, len(req.content), FILE_CHUNK_SIZE)
-        ]
+        n_chunks = -(-len(req.content) // FILE_CHUNK_SIZE)
+        self._insert_file_chunks(
+            req.project_id, digest, req.name, req.content, 0, n_chunks
+        )
+        return tsi.FileCreateRes(digest=digest)
+
+    def file_create_part(self, req: tsi.FileCreatePartReq) -> tsi.FileCreatePartRes:
+        first_chunk_index, n_chunks = file_part_chunks(req)
+        # Parts are staged under another digest. The file only becomes
+        # readable under its own digest once all the parts were received and
+        # their content matches that digest. Concurrent requests may all see
+        # the last part: each of them writes the same (deduplicated) chunks,
+        # and the staged parts are left to the TTL of the files table, as
+        # other requests may still be reading them.
+        if self._file_is_complete(req.project_id, req.digest, n_chunks):
+            return tsi.FileCreatePartRes()
+        staging_digest = _staging_file_digest(req.digest)
+        self._insert_file_chunks(
+            req.project_id,
+            staging_digest,
+            req.name,
+            req.content,
+            first_chunk_index,
+            n_chunks,
+        )
+        if len(self._file_chunk_indexes(req.project_id, staging_digest)) < n_chunks:
+            return tsi.FileCreatePartRes()
+        content = b"".join(self._file_chunks(req.project_id, staging_digest))
+        if bytes_digest(content) != req.digest:
+            if self._file_is_complete(req.project_id, req.digest, n_chunks):
+                return tsi.FileCreatePartRes()
+            # Let the client upload every part again
+            self._delete_file_chunks(req.project_id, staging_digest)
+            raise InvalidRequest(f"File content does not match {req.digest}")
+        self._insert_file_chunks(
+            req.project_id, req.digest, req.name, content, 0, n_chunks
+        )
+        return tsi.FileCreatePartRes()
+
+    def file_parts_missing(
+        self, req: tsi.FilePartsMissingReq
+    ) -> tsi.FilePartsMissingRes:
+        n_chunks = -(-req.size // FILE_CHUNK_SIZE)
+        if self._file_is_complete(req.project_id, req.digest, n_chunks):
+            return tsi.FilePartsMissingRes(offsets=[])
+        uploaded = self._file_chunk_indexes(
+            req.project_id, _staging_file_digest(req.digest)
+        )
+        return tsi.FilePartsMissingRes(
+            offsets=[i * FILE_CHUNK_SIZE for i in range(n_chunks) if i not in uploaded]
+        )
+
+    def _file_is_complete(self, project_id: str, digest: str, n_chunks: int) -> bool:
+        return len(self._file_chunk_indexes(project_id, digest)) >= n_chunks
+
+    def _file_chunk_indexes(self, project_id: str, digest: str) -> typing.Set[int]:
+        query_result = self._query(
+            """
+            SELECT DISTINCT chunk_index
+            FROM files
+            WHERE project_id = {project_id:String} AND digest = {digest:String}
+            """,
+            {"project_id": project_id, "digest": digest},
+        )
+        return {row[0] for row in query_result.result_rows}
+
+    def _delete_file_chunks(self, project_id: str, digest: str) -> None:
+        self.ch_client.command(
+            """
+            DELETE FROM files
+            WHERE project_id = {project_id:String} AND digest = {digest:String}
+            """,
+            parameters={"project_id": project_id, "digest": digest},
+        )
+
+    def _insert_file_chunks(
+        self,
+        project_id: str,
+        digest: str,
+        name: str,
+        content: bytes,
+        first_chunk_index: int,
+        n_chunks: int,
+    ) -> None:
         self._insert(
             "files",
             data=[
                 (
-                    req.project_id,
+                    project_id,
                     digest,
-                    i,
-                    len(chunks),
-                    req.name,
-                    chunk,
+                    first_chunk_index + i,
+                    n_chunks,
+                    name,
+                    content[offset : offset + FILE_CHUNK_SIZE],
                 )
-                for i, chunk in enumerate(chunks)
+                for i, offset in enumerate(range(0, len(content), FILE_CHUNK_SIZE))
             ],
             column_names=[
                 "project_id",
@@ -922,33 +1346,84 @@ class ClickHouseTraceServer(tsi.TraceServerInterface):
                 "val_bytes",
             ],
         )
-        return tsi.FileCreateRes(digest=digest)
 
     def file_content_read(self, req: tsi.FileContentReadReq) -> tsi.FileContentReadRes:
-        # The subquery is responsible for deduplication of file chunks by digest
-        query_result = self.ch_client.query(
-            """
-            SELECT n_chunks, val_bytes
-            FROM (
-                SELECT *
+        file_key = DigestCache.key("file", req.project_id, req.digest)
+        cached_content = self._cache_get_many([file_key])[0]
+        if cached_content is not None:
+            return tsi.FileContentReadRes(content=cached_content)
+        content = b"".join(self._file_chunks(req.project_id, req.digest))
+        self._cache_set_many({file_key: content})
+        return tsi.FileContentReadRes(content=content)
+
+    def file_content_read_stream(
+        self, req: tsi.FileContentReadReq
+    ) -> typing.Iterator[bytes]:
+        file_key = DigestCache.key("file", req.project_id, req.digest)
+        cached_content = self._cache_get_many([file_key])[0]
+        if cached_content is not None:
+            yield cached_content
+            return
+        yield from self._file_chunks(req.project_id, req.digest)
+
+    def _file_chunks(self, project_id: str, digest: str) -> typing.Iterator[bytes]:
+        """Reads the chunks of a file, FILE_READ_BATCH_CHUNKS at a time."""
+        chunk_index = 0
+        n_chunks = None
+        while n_chunks is None or chunk_index < n_chunks:
+            # The subquery is responsible for deduplication of file chunks by digest
+            query_result = self.ch_client.query(
+                """
+                SELECT n_chunks, val_bytes
                 FROM (
-                        SELECT *,
-                            row_number() OVER (PARTITION BY project_id, digest, chunk_index) AS rn
-                        FROM files
-                        WHERE project_id = {project_id:String} AND digest = {digest:String}
-                    )
-                WHERE rn = 1
-                ORDER BY project_id, digest, chunk_index
+                    SELECT *
+                    FROM (
+                            SELECT *,
+                                row_number() OVER (PARTITION BY project_id, digest, chunk_index) AS rn
+                            FROM files
+                            WHERE project_id = {project_id:String} AND digest = {digest:String}
+                                AND chunk_index >= {first_chunk_index:UInt64}
+                                AND chunk_index < {last_chunk_index:UInt64}
+                        )
+                    WHERE rn = 1
+                    ORDER BY project_id, digest, chunk_index
+                )
+                WHERE project_id = {project_id:String} AND digest = {digest:String}""",
+                parameters={
+                    "project_id": project_id,
+                    "digest": digest,
+                    "first_chunk_index": chunk_index,
+                    "last_chunk_index": chunk_index + FILE_READ_BATCH_CHUNKS,
+                },
+                column_formats={"val_bytes": "bytes"},
             )
-            WHERE project_id = {project_id:String} AND digest = {digest:String}""",
-            parameters={"project_id": req.project_id, "digest": req.digest},
-            column_formats={"val_bytes": "bytes"},
-        )
-        n_chunks = query_result.result_rows[0][0]
-        chunks = [r[1] for r in query_result.result_rows]
-        if len(chunks) != n_chunks:
-            raise ValueError("Missing chunks")
-        return tsi.FileContentReadRes(content=b"".join(chunks))
+            if n_chunks is None:
+                if not query_result.result_rows:
+                    raise NotFoundError(f"File {digest} not found")
+                n_chunks = query_result.result_rows[0][0]
+            expected = min(FILE_READ_BATCH_CHUNKS, n_chunks - chunk_index)
+            if len(query_result.result_rows) != expected:
+                raise ValueError("Missing chunks")
+            for row in query_result.result_rows:
+                yield row[1]
+            chunk_index += expected
+
+    def digest_cache_stats(self) -> typing.Optional[DigestCacheStats]:
+        """Hit/miss counters of the cache of objects, table rows and files."""
+        if self._digest_cache is None:
+            return None
+        return self._digest_cache.stats()
+
+    def _cache_get_many(
+        self, keys: typing.List[str]
+    ) -> typing.List[typing.Optional[bytes]]:
+        if self._digest_cache is None or not keys:
+            return [None] * len(keys)
+        return self._digest_cache.get_many(keys)
+
+    def _cache_set_many(self, items: typing.Dict[str, bytes]) -> None:
+        if self._digest_cache is not None and items:
+            self._digest_cache.set_many(items)
 
     def feedback_create(self, req: tsi.FeedbackCreateReq) -> tsi.FeedbackCreateRes:
         assert_non_null_wb_user_id(req)
@@ -1334,6 +1809,44 @@ def _ch_call_to_call_schema(ch_call: SelectableCHCallSchema) -> tsi.CallSchema:
 
 
 # Keep in sync with `_ch_call_to_call_schema`. This copy is for performance
+def _chunked(items: typing.List[T], size: int) -> typing.Iterator[typing.List[T]]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def _calls_query_columns(columns: typing.List[str]) -> typing.List[str]:
+    res = list(REQUIRED_CALL_COLUMNS)
+    for column in columns:
+        base, path = split_call_column(column)
+        if base in CALL_JSON_COLUMNS and not path:
+            column = base + "_dump"
+        if column not in res:
+            res.append(column)
+    return res
+
+
+def _ch_call_row_to_call_schema_dict(
+    select_fields: typing.List[CallsMergedField], row: typing.Sequence
+) -> typing.Dict:
+    ch_call_dict = {}
+    path_values = []
+    for field, value in zip(select_fields, row):
+        if isinstance(field, CallsMergedDynamicField) and field.extra_path:
+            path_values.append((field, value))
+        else:
+            ch_call_dict[field.field] = value
+    res = _ch_call_dict_to_call_schema_dict(ch_call_dict)
+    for field, value in path_values:
+        base = field.field[: -len("_dump")]
+        if value == "" or ch_call_dict.get(field.field) is not None:
+            # Missing path, or the entire column was also requested
+            continue
+        res[base] = set_json_path_value(
+            res.get(base), field.extra_path or [], json.loads(value)
+        )
+    return res
+
+
 def _ch_call_dict_to_call_schema_dict(ch_call_dict: typing.Dict) -> typing.Dict:
     return dict(
         project_id=ch_call_dict.get("project_id"),
@@ -1343,8 +1856,8 @@ def _ch_call_dict_to_call_schema_dict(ch_call_dict: typing.Dict) -> typing.Dict:
         op_name=ch_call_dict.get("op_name"),
         started_at=_ensure_datetimes_have_tz(ch_call_dict.get("started_at")),
         ended_at=_ensure_datetimes_have_tz(ch_call_dict.get("ended_at")),
-        attributes=_dict_dump_to_dict(ch_call_dict["attributes_dump"]),
-        inputs=_dict_dump_to_dict(ch_call_dict["inputs_dump"]),
+        attributes=_dict_dump_to_dict(ch_call_dict.get("attributes_dump", "{}")),
+        inputs=_dict_dump_to_dict(ch_call_dict.get("inputs_dump", "{}")),
         output=_nullable_any_dump_to_any(ch_call_dict.get("output_dump")),
         summary=_nullable_dict_dump_to_dict(ch_call_dict.get("summary_dump")),
         exception=ch_call_dict.get("exception"),
@@ -1404,6 +1917,22 @@ def _end_call_for_insert_to_ch_insertable_end_call(
         summary_dump=_dict_value_to_dump(end_call.summary),
         output_dump=_any_value_to_dump(end_call.output),
         output_refs=extract_refs_from_values(end_call.output),
+        op_name=end_call.op_name,
+        started_at=end_call.started_at,
+    )
+
+
+def _complete_call_for_insert_to_ch_insertable_complete_call(
+    complete_call: tsi.CompletedCallSchemaForInsert,
+) -> CallCompleteCHInsertable:
+    start = _start_call_for_insert_to_ch_insertable_start_call(complete_call)
+    return CallCompleteCHInsertable(
+        **start.model_dump(exclude={"output_refs"}),
+        ended_at=complete_call.ended_at,
+        exception=complete_call.exception,
+        summary_dump=_dict_value_to_dump(complete_call.summary),
+        output_dump=_any_value_to_dump(complete_call.output),
+        output_refs=extract_refs_from_values(complete_call.output),
     )
 
 
@@ -1471,6 +2000,11 @@ def get_base_object_class(val: typing.Any) -> typing.Optional[str]:
     return None
 
 
+def _staging_file_digest(digest: str) -> str:
+    """The digest the parts of a file are stored under until it is complete."""
+    return f"{digest}.parts"
+
+
 def _digest_is_version_like(digest: str) -> typing.Tuple[bool, int]:
     if not digest.startswith("v"):
         return (False, -1)
@@ -1478,32 +2012,3 @@ def _digest_is_version_like(digest: str) -> typing.Tuple[bool, int]:
         return (True, int(digest[1:]))
     except ValueError:
         return (False, -1)
-
-
-def find_call_descendants(
-    root_ids: typing.List[str],
-    all_calls: typing.List[SelectableCHCallSchema],
-) -> typing.List[str]:
-    # make a map of call_id to children list
-    children_map = defaultdict(list)
-    for call in all_calls:
-        if call.parent_id is not None:
-            children_map[call.parent_id].append(call.id)
-
-    # do DFS to get all descendants
-    def find_all_descendants(root_ids: typing.List[str]) -> typing.Set[str]:
-        descendants = set()
-        stack = root_ids
-
-        while stack:
-            current_id = stack.pop()
-            if current_id not in descendants:
-                descendants.add(current_id)
-                stack += children_map.get(current_id, [])
-
-        return descendants
-
-    # Find descendants for each initial id
-    descendants = find_all_descendants(root_ids)
-
-    return list(descendants)
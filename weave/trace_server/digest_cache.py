@@ -0,0 +1,208 @@
+"""A cache for the content-addressed values read by the trace server.
+
+Object versions, table rows and files are keyed by the digest of their content,
+so once written they never change and can be cached without invalidation. The
+cache stores serialized bytes, which keeps its size accounting exact and lets
+the same entries be shared between processes through a redis-compatible
+backend.
+"""
+
+import abc
+import collections
+import dataclasses
+import logging
+import threading
+import typing
+import urllib.parse
+
+from weave.trace_server import environment as wf_env
+
+logger = logging.getLogger(__name__)
+
+
+class DigestCacheBackend(abc.ABC):
+    @abc.abstractmethod
+    def get_many(self, keys: typing.List[str]) -> typing.List[typing.Optional[bytes]]:
+        """Returns the cached value of each key, or None if it is not cached."""
+        ...
+
+    @abc.abstractmethod
+    def set_many(self, items: typing.Dict[str, bytes]) -> None: ...
+
+    def evictions(self) -> int:
+        return 0
+
+
+class LRUDigestCacheBackend(DigestCacheBackend):
+    """Thread-safe in-process LRU, bounded by the total size of its values."""
+
+    def __init__(self, max_bytes: int, max_item_bytes: typing.Optional[int] = None):
+        """
+        Args:
+            max_bytes (int): The total size of the cached values.
+            max_item_bytes (Optional[int]): Values larger than this are not cached.
+                Defaults to an eighth of `max_bytes`, so that a single large value
+                does not flush the whole cache.
+        """
+        self.max_bytes = max_bytes
+        self.max_item_bytes = (
+            max_item_bytes if max_item_bytes is not None else max_bytes // 8
+        )
+        self.bytes = 0
+        self._evictions = 0
+        self._items: collections.OrderedDict[str, bytes] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: typing.List[str]) -> typing.List[typing.Optional[bytes]]:
+        res: typing.List[typing.Optional[bytes]] = []
+        with self._lock:
+            for key in keys:
+                value = self._items.get(key)
+                if value is not None:
+                    self._items.move_to_end(key)
+                res.append(value)
+        return res
+
+    def set_many(self, items: typing.Dict[str, bytes]) -> None:
+        with self._lock:
+            for key, value in items.items():
+                if len(value) > self.max_item_bytes:
+                    continue
+                previous = self._items.pop(key, None)
+                if previous is not None:
+                    self.bytes -= len(previous)
+                self._items[key] = value
+                self.bytes += len(value)
+            while self.bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.bytes -= len(evicted)
+                self._evictions += 1
+
+    def evictions(self) -> int:
+        return self._evictions
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class RedisDigestCacheBackend(DigestCacheBackend):
+    """Stores entries in a redis-compatible server (redis, valkey, dragonfly, ...),
+    sharing them between trace server processes. Eviction is left to the
+    server's `maxmemory` policy."""
+
+    def __init__(
+        self,
+        client: typing.Any,
+        prefix: str = "weave:digest:",
+        ttl_seconds: typing.Optional[int] = None,
+    ):
+        """
+        Args:
+            client (Any): A client with the `mget` and `pipeline` methods of `redis.Redis`.
+            prefix (str): Prepended to every key.
+            ttl_seconds (Optional[int]): Expiry of the entries. Defaults to None (no expiry).
+        """
+        self.client = client
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisDigestCacheBackend":
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError(
+                "The redis package is required to use a redis digest cache: `pip install redis`"
+            ) from e
+        return cls(redis.Redis.from_url(url))
+
+    def get_many(self, keys: typing.List[str]) -> typing.List[typing.Optional[bytes]]:
+        if not keys:
+            return []
+        return self.client.mget([self.prefix + key for key in keys])
+
+    def set_many(self, items: typing.Dict[str, bytes]) -> None:
+        if not items:
+            return
+        pipeline = self.client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipeline.set(self.prefix + key, value, ex=self.ttl_seconds)
+        pipeline.execute()
+
+
+@dataclasses.dataclass
+class DigestCacheStats:
+    hits: int
+    misses: int
+    errors: int
+    evictions: int
+
+
+class DigestCache:
+    """Counts hits and misses in front of a `DigestCacheBackend`.
+
+    Keys are built from their parts (eg. `("row", project_id, row_digest)`),
+    which are escaped so that parts containing "/" cannot collide. Backend
+    errors are logged and treated as misses, so a cache outage never fails a
+    read.
+    """
+
+    def __init__(self, backend: DigestCacheBackend):
+        self.backend = backend
+        self._hits = 0
+        self._misses = 0
+        self._errors = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> typing.Optional["DigestCache"]:
+        """Returns the cache configured by the environment, or None if it is disabled."""
+        redis_url = wf_env.wf_trace_server_cache_redis_url()
+        if redis_url:
+            return cls(RedisDigestCacheBackend.from_url(redis_url))
+        max_bytes = wf_env.wf_trace_server_cache_max_bytes()
+        if max_bytes <= 0:
+            return None
+        return cls(LRUDigestCacheBackend(max_bytes))
+
+    @staticmethod
+    def key(*parts: str) -> str:
+        return "/".join(urllib.parse.quote(part, safe="") for part in parts)
+
+    def get_many(self, keys: typing.List[str]) -> typing.List[typing.Optional[bytes]]:
+        try:
+            values = self.backend.get_many(keys)
+        except Exception:
+            logger.exception("Error reading from the digest cache")
+            with self._lock:
+                self._errors += 1
+                self._misses += len(keys)
+            return [None] * len(keys)
+        hits = sum(1 for v in values if v is not None)
+        with self._lock:
+            self._hits += hits
+            self._misses += len(keys) - hits
+        return values
+
+    def get(self, key: str) -> typing.Optional[bytes]:
+        return self.get_many([key])[0]
+
+    def set_many(self, items: typing.Dict[str, bytes]) -> None:
+        try:
+            self.backend.set_many(items)
+        except Exception:
+            logger.exception("Error writing to the digest cache")
+            with self._lock:
+                self._errors += 1
+
+    def set(self, key: str, value: bytes) -> None:
+        self.set_many({key: value})
+
+    def stats(self) -> DigestCacheStats:
+        with self._lock:
+            return DigestCacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                errors=self._errors,
+                evictions=self.backend.evictions(),
+            )
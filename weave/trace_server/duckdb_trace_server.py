@@ -0,0 +1,604 @@
+"""Local trace server storing calls in Parquet files, queried with DuckDB.
+
+Like the ClickHouse server, calls are stored as append-only "parts": starting,
+ending, updating or deleting a call each write a part, and the parts of a call
+are merged by id when querying. Parts are buffered in memory and written to
+Parquet files partitioned by project:
+
+    <path>/calls/<quoted project_id>/<timestamp>-<uuid>.parquet
+
+A project's files are compacted (merged to one row per call, without deleted
+calls) once there are more than `MAX_PARQUET_FILES_PER_PROJECT` of them.
+Buffered parts are written after `MAX_FLUSH_COUNT` parts or `MAX_FLUSH_AGE`
+seconds (checked by a timer, so also when no more parts are inserted), on
+`flush()`, and when the server is garbage collected or the process exits.
+
+Objects, tables, files and feedback are looked up by digest or id rather than
+scanned, so they are stored in SQLite (`<path>/objects.db`) like
+`SqliteTraceServer` does.
+
+The files are owned by a single server: they must not be written to by
+several processes at once.
+"""
+
+import datetime
+import json
+import os
+import shutil
+import threading
+import time
+import urllib.parse
+import uuid
+import weakref
+from typing import Any, Iterator, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    import duckdb
+except ImportError as e:
+    raise ImportError(
+        "The duckdb package is required to use the DuckDB trace server: `pip install duckdb`"
+    ) from e
+
+from weave.trace_server.orm import ParamBuilder, quote_json_path
+from weave.trace_server.sqlite_trace_server import SqliteTraceServer
+from weave.trace_server.trace_server_interface_util import (
+    ALL_CALL_COLUMNS,
+    CALL_JSON_COLUMNS,
+    WILDCARD_ARTIFACT_VERSION_AND_PATH,
+    assert_non_null_wb_user_id,
+    extract_refs_from_values,
+    project_call_dict,
+    split_call_column,
+    validate_calls_cursor_sort_by,
+)
+
+from . import trace_server_interface as tsi
+from .interface import query as tsi_query
+
+MAX_FLUSH_COUNT = 10000
+MAX_FLUSH_AGE = 15
+
+MAX_PARQUET_FILES_PER_PROJECT = 32
+STREAM_BATCH_SIZE = 1000
+
+CALL_PARTS_SCHEMA = pa.schema(
+    [
+        pa.field("project_id", pa.string(), nullable=False),
+        pa.field("id", pa.string(), nullable=False),
+        pa.field("trace_id", pa.string()),
+        pa.field("parent_id", pa.string()),
+        pa.field("op_name", pa.string()),
+        pa.field("display_name", pa.string()),
+        pa.field("started_at", pa.timestamp("us", tz="UTC")),
+        pa.field("ended_at", pa.timestamp("us", tz="UTC")),
+        pa.field("exception", pa.string()),
+        # JSON encoded
+        pa.field("attributes", pa.string()),
+        pa.field("inputs", pa.string()),
+        pa.field("input_refs", pa.list_(pa.string())),
+        pa.field("output", pa.string()),
+        pa.field("output_refs", pa.list_(pa.string())),
+        pa.field("summary", pa.string()),
+        pa.field("wb_user_id", pa.string()),
+        pa.field("wb_run_id", pa.string()),
+        pa.field("deleted_at", pa.timestamp("us", tz="UTC")),
+        # When the part was written
+        pa.field("created_at", pa.timestamp("us", tz="UTC"), nullable=False),
+    ]
+)
+
+# How the parts of a call are merged, by column
+_MERGED_COLUMNS = {
+    "project_id": "any_value(project_id)",
+    "trace_id": "any_value(trace_id)",
+    "parent_id": "any_value(parent_id)",
+    "op_name": "any_value(op_name)",
+    # The latest one wins
+    "display_name": "arg_max(display_name, created_at) FILTER (WHERE display_name IS NOT NULL)",
+    "started_at": "any_value(started_at)",
+    "ended_at": "any_value(ended_at)",
+    "exception": "any_value(exception)",
+    "attributes": "any_value(attributes)",
+    "inputs": "any_value(inputs)",
+    "input_refs": "any_value(input_refs)",
+    "output": "any_value(output)",
+    "output_refs": "any_value(output_refs)",
+    "summary": "any_value(summary)",
+    "wb_user_id": "any_value(wb_user_id)",
+    "wb_run_id": "any_value(wb_run_id)",
+    "deleted_at": "max(deleted_at)",
+    "created_at": "max(created_at)",
+}
+
+# Needed to tell apart the calls to return, whatever the requested columns
+_FILTER_COLUMNS = ("id", "started_at", "deleted_at")
+
+_DUCKDB_CASTS = {"int": "BIGINT", "double": "DOUBLE", "bool": "BOOLEAN"}
+
+
+def _utc(dt: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+    if dt is not None and dt.tzinfo is None:
+        return dt.replace(tzinfo=datetime.timezone.utc)
+    return dt
+
+
+def _sql_str(val: str) -> str:
+    return "'" + val.replace("'", "''") + "'"
+
+
+def _write_parts(calls_path: str, pending: dict[str, list[dict[str, Any]]]) -> None:
+    """Writes the parts of each project to a new Parquet file."""
+    for project_id, parts in pending.items():
+        if not parts:
+            continue
+        project_path = os.path.join(calls_path, urllib.parse.quote(project_id, safe=""))
+        os.makedirs(project_path, exist_ok=True)
+        name = f"{time.time_ns()}-{uuid.uuid4().hex}.parquet"
+        # Readers never see a partially written file
+        tmp_path = os.path.join(project_path, "." + name)
+        pq.write_table(pa.Table.from_pylist(parts, schema=CALL_PARTS_SCHEMA), tmp_path)
+        os.replace(tmp_path, os.path.join(project_path, name))
+    pending.clear()
+
+
+def _flush_if_stale(server_ref: "weakref.ref[DuckDBTraceServer]") -> None:
+    # Holds a weak reference, so that a pending timer doesn't keep the server
+    # alive
+    server = server_ref()
+    if server is not None:
+        server._flush_if_stale()
+
+
+class _CallsQueryBuilder:
+    """Builds the SQL of a calls query over the merged parts of a project."""
+
+    def __init__(self, pb: ParamBuilder):
+        self.pb = pb
+        # Columns of the merged calls the query depends on
+        self.columns: set[str] = set(_FILTER_COLUMNS)
+
+    def param(self, val: Any) -> str:
+        return "$" + self.pb.add_param(val)
+
+    def field(self, name: str, cast: Optional[tsi_query.CastTo] = None) -> str:
+        base, path = split_call_column(name)
+        self.columns.add(base)
+        if base not in CALL_JSON_COLUMNS:
+            return self.cast(base, cast)
+        json_path = self.param(quote_json_path(".".join(path)) if path else "$")
+        if cast == "exists":
+            json_type = f"json_type({base}, {json_path})"
+            return f"({json_type} IS NOT NULL AND {json_type} != 'NULL')"
+        return self.cast(f"json_extract_string({base}, {json_path})", cast)
+
+    def cast(self, sql: str, cast: Optional[tsi_query.CastTo]) -> str:
+        if cast is None:
+            return sql
+        if cast == "exists":
+            return f"({sql} IS NOT NULL)"
+        if cast == "string":
+            return f"CAST({sql} AS VARCHAR)"
+        if cast in _DUCKDB_CASTS:
+            # Like SQLite, values that can't be converted are 0
+            sql_type = _DUCKDB_CASTS[cast]
+            return f"COALESCE(TRY_CAST({sql} AS {sql_type}), CASE WHEN {sql} IS NOT NULL THEN CAST(0 AS {sql_type}) END)"
+        raise ValueError(f"Unknown cast: {cast}")
+
+    def operation(self, operation: tsi_query.Operation) -> str:
+        if isinstance(operation, tsi_query.AndOperation):
+            if len(operation.and_) == 0:
+                raise ValueError("Empty AND operation")
+            parts = [self.operand(op) for op in operation.and_]
+            return f"({' AND '.join(parts)})"
+        elif isinstance(operation, tsi_query.OrOperation):
+            if len(operation.or_) == 0:
+                raise ValueError("Empty OR operation")
+            parts = [self.operand(op) for op in operation.or_]
+            return f"({' OR '.join(parts)})"
+        elif isinstance(operation, tsi_query.NotOperation):
+            return f"(NOT ({self.operand(operation.not_[0])}))"
+        elif isinstance(operation, tsi_query.EqOperation):
+            lhs = self.operand(operation.eq_[0])
+            rhs_operand = operation.eq_[1]
+            if (
+                isinstance(rhs_operand, tsi_query.LiteralOperation)
+                and rhs_operand.literal_ is None
+            ):
+                return f"({lhs} IS NULL)"
+            return f"({lhs} = {self.operand(rhs_operand)})"
+        elif isinstance(operation, tsi_query.GtOperation):
+            lhs = self.operand(operation.gt_[0])
+            return f"({lhs} > {self.operand(operation.gt_[1])})"
+        elif isinstance(operation, tsi_query.GteOperation):
+            lhs = self.operand(operation.gte_[0])
+            return f"({lhs} >= {self.operand(operation.gte_[1])})"
+        elif isinstance(operation, tsi_query.ContainsOperation):
+            lhs = f"CAST({self.operand(operation.contains_.input)} AS VARCHAR)"
+            rhs = f"CAST({self.operand(operation.contains_.substr)} AS VARCHAR)"
+            if operation.contains_.case_insensitive:
+                lhs, rhs = f"lower({lhs})", f"lower({rhs})"
+            return f"contains({lhs}, {rhs})"
+        raise ValueError(f"Unknown operation type: {operation}")
+
+    def operand(self, operand: tsi_query.Operand) -> str:
+        if isinstance(operand, tsi_query.LiteralOperation):
+            return self.param(operand.literal_)
+        elif isinstance(operand, tsi_query.GetFieldOperator):
+            return self.field(operand.get_field_)
+        elif isinstance(operand, tsi_query.ConvertOperation):
+            if isinstance(operand.convert_.input, tsi_query.GetFieldOperator):
+                return self.field(
+                    operand.convert_.input.get_field_, operand.convert_.to
+                )
+            return self.cast(self.operand(operand.convert_.input), operand.convert_.to)
+        return self.operation(operand)
+
+    def filter_conditions(self, filter: tsi._CallsFilter) -> list[str]:
+        conds: list[str] = []
+        if filter.op_names:
+            self.columns.add("op_name")
+            or_conditions: list[str] = []
+            names = [
+                name
+                for name in filter.op_names
+                if not name.endswith(WILDCARD_ARTIFACT_VERSION_AND_PATH)
+            ]
+            if names:
+                or_conditions.append(f"list_contains({self.param(names)}, op_name)")
+            for name in filter.op_names:
+                if name.endswith(WILDCARD_ARTIFACT_VERSION_AND_PATH):
+                    like_name = name[: -len(WILDCARD_ARTIFACT_VERSION_AND_PATH)] + ":%"
+                    or_conditions.append(f"op_name LIKE {self.param(like_name)}")
+            conds.append(f"({' OR '.join(or_conditions)})")
+        # Refs are list columns: no need to scan their JSON
+        if filter.input_refs:
+            self.columns.add("input_refs")
+            conds.append(f"list_has_any(input_refs, {self.param(filter.input_refs)})")
+        if filter.output_refs:
+            self.columns.add("output_refs")
+            conds.append(f"list_has_any(output_refs, {self.param(filter.output_refs)})")
+        for column, values in (
+            ("parent_id", filter.parent_ids),
+            ("trace_id", filter.trace_ids),
+            ("id", filter.call_ids),
+            ("wb_user_id", filter.wb_user_ids),
+            ("wb_run_id", filter.wb_run_ids),
+        ):
+            if values:
+                self.columns.add(column)
+                conds.append(f"list_contains({self.param(values)}, {column})")
+        if filter.trace_roots_only:
+            self.columns.add("parent_id")
+            conds.append("parent_id IS NULL")
+        return conds
+
+    def order_by(self, sort_by: list[tsi._SortBy]) -> str:
+        parts = []
+        for sort in sort_by:
+            direction = sort.direction.upper()
+            if direction not in ("ASC", "DESC"):
+                raise ValueError(f"Invalid order_by direction: {sort.direction}")
+            base, path = split_call_column(sort.field)
+            if path:
+                # Like ClickHouse: existing values first, then numbers, then strings
+                parts.append(f"{self.field(sort.field, 'exists')} DESC")
+                parts.append(f"{self.field(sort.field, 'double')} {direction}")
+            parts.append(f"{self.field(sort.field)} {direction}")
+        return ", ".join(parts)
+
+
+class DuckDBTraceServer(SqliteTraceServer):
+    def __init__(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        super().__init__(os.path.join(path, "objects.db"))
+        self.path = path
+        self._calls_path = os.path.join(path, "calls")
+        self._calls_lock = threading.RLock()
+        # Parts not written to Parquet yet, by project
+        self._pending: dict[str, list[dict[str, Any]]] = {}
+        self._n_pending = 0
+        self._pending_since = 0.0
+        # Number of running queries: files are only compacted when there is none
+        self._n_readers = 0
+        self._duckdb = duckdb.connect()
+        self._duckdb.execute("SET TimeZone = 'UTC'")
+        weakref.finalize(self, _write_parts, self._calls_path, self._pending)
+
+    def setup_tables(self) -> None:
+        super().setup_tables()
+        os.makedirs(self._calls_path, exist_ok=True)
+
+    def drop_tables(self) -> None:
+        super().drop_tables()
+        with self._calls_lock:
+            self._pending.clear()
+            self._n_pending = 0
+            shutil.rmtree(self._calls_path, ignore_errors=True)
+
+    def flush(self) -> None:
+        """Writes the buffered parts to Parquet."""
+        with self._calls_lock:
+            project_ids = [p for p, parts in self._pending.items() if parts]
+            _write_parts(self._calls_path, self._pending)
+            self._n_pending = 0
+            if self._n_readers == 0:
+                for project_id in project_ids:
+                    if (
+                        len(self._project_files(project_id))
+                        > MAX_PARQUET_FILES_PER_PROJECT
+                    ):
+                        self._compact(project_id)
+
+    def _insert_parts(self, parts: list[dict[str, Any]]) -> None:
+        created_at = datetime.datetime.now(datetime.timezone.utc)
+        with self._calls_lock:
+            if self._n_pending == 0:
+                self._pending_since = time.monotonic()
+                timer = threading.Timer(
+                    MAX_FLUSH_AGE, _flush_if_stale, args=(weakref.ref(self),)
+                )
+                timer.daemon = True
+                timer.start()
+            for part in parts:
+                part["created_at"] = created_at
+                self._pending.setdefault(part["project_id"], []).append(part)
+            self._n_pending += len(parts)
+            if (
+                self._n_pending >= MAX_FLUSH_COUNT
+                or time.monotonic() - self._pending_since >= MAX_FLUSH_AGE
+            ):
+                self.flush()
+
+    def _flush_if_stale(self) -> None:
+        with self._calls_lock:
+            if (
+                self._n_pending
+                and time.monotonic() - self._pending_since >= MAX_FLUSH_AGE
+            ):
+                self.flush()
+
+    def _project_files(self, project_id: str) -> list[str]:
+        project_path = os.path.join(
+            self._calls_path, urllib.parse.quote(project_id, safe="")
+        )
+        if not os.path.isdir(project_path):
+            return []
+        return sorted(
+            os.path.join(project_path, name)
+            for name in os.listdir(project_path)
+            if name.endswith(".parquet") and not name.startswith(".")
+        )
+
+    def _parts_sql(self, con: duckdb.DuckDBPyConnection, project_id: str) -> str:
+        """Returns the SQL selecting every part of the project's calls. Must be
+        called with the lock held."""
+        pending = pa.Table.from_pylist(
+            self._pending.get(project_id, []), schema=CALL_PARTS_SCHEMA
+        )
+        con.register("pending_parts", pending)
+        sql = "SELECT * FROM pending_parts"
+        files = self._project_files(project_id)
+        if files:
+            file_list = ", ".join(_sql_str(f) for f in files)
+            sql += f" UNION ALL BY NAME SELECT * FROM read_parquet([{file_list}])"
+        return sql
+
+    def _merged_sql(
+        self, parts_sql: str, columns: set[str], parts_cond: Optional[str] = None
+    ) -> str:
+        merged = ", ".join(
+            f"{_MERGED_COLUMNS[col]} AS {col}"
+            for col in _MERGED_COLUMNS
+            if col in columns
+        )
+        where = f" WHERE {parts_cond}" if parts_cond else ""
+        return f"SELECT id, {merged} FROM ({parts_sql}){where} GROUP BY id"
+
+    def _compact(self, project_id: str) -> None:
+        """Replaces the project's files with one holding a merged part per call.
+        Must be called with the lock held and no running query."""
+        files = self._project_files(project_id)
+        con = self._duckdb.cursor()
+        try:
+            file_list = ", ".join(_sql_str(f) for f in files)
+            merged_sql = self._merged_sql(
+                f"SELECT * FROM read_parquet([{file_list}])", set(_MERGED_COLUMNS)
+            )
+            table = con.execute(
+                f"SELECT * FROM ({merged_sql}) WHERE deleted_at IS NULL"
+            ).fetch_arrow_table()
+        finally:
+            con.close()
+        parts = table.select(CALL_PARTS_SCHEMA.names).cast(CALL_PARTS_SCHEMA)
+        _write_parts(self._calls_path, {project_id: parts.to_pylist()})
+        for f in files:
+            os.remove(f)
+
+    def _execute_calls_query(
+        self, req: tsi.CallsQueryReq, count: bool = False
+    ) -> Iterator[tuple]:
+        pb = ParamBuilder("p")
+        builder = _CallsQueryBuilder(pb)
+        conds = ["started_at IS NOT NULL", "deleted_at IS NULL"]
+        # Every part has the id of its call, so filtering on it happens before
+        # merging them
+        parts_cond = None
+        if req.filter and req.filter.call_ids:
+            parts_cond = f"list_contains({builder.param(req.filter.call_ids)}, id)"
+        if req.filter:
+            conds += builder.filter_conditions(req.filter)
+        if req.query:
+            conds.append(builder.operation(req.query.expr_))
+        if req.after is not None:
+            validate_calls_cursor_sort_by(req.sort_by)
+            started_at = builder.param(_utc(req.after.started_at))
+            after_id = builder.param(req.after.id)
+            conds.append(
+                f"(started_at > {started_at} OR (started_at = {started_at} AND id > {after_id}))"
+            )
+        sort_by = req.sort_by
+        if req.after is not None or not sort_by:
+            # Groups come out in no particular order
+            sort_by = [
+                tsi._SortBy(field="started_at", direction="asc"),
+                tsi._SortBy(field="id", direction="asc"),
+            ]
+        order_by = None if count else builder.order_by(sort_by)
+
+        if count:
+            select = "count(*)"
+        else:
+            selected = set(ALL_CALL_COLUMNS)
+            if req.columns is not None:
+                # Heavy JSON columns are only loaded when (part of) them is requested
+                requested_bases = {split_call_column(col)[0] for col in req.columns}
+                selected -= set(CALL_JSON_COLUMNS) - requested_bases
+            builder.columns |= selected
+            select = ", ".join(
+                col if col in selected else f"NULL AS {col}" for col in ALL_CALL_COLUMNS
+            )
+
+        with self._calls_lock:
+            con = self._duckdb.cursor()
+            parts_sql = self._parts_sql(con, req.project_id)
+            self._n_readers += 1
+        try:
+            sql = (
+                f"SELECT {select} FROM ({self._merged_sql(parts_sql, builder.columns, parts_cond)})"
+                f" WHERE {' AND '.join(conds)}"
+            )
+            if order_by:
+                sql += f" ORDER BY {order_by}"
+            if req.limit is not None:
+                sql += f" LIMIT {builder.param(req.limit)}"
+            if req.offset:
+                sql += f" OFFSET {builder.param(req.offset)}"
+            result = con.execute(sql, pb.get_params())
+            while rows := result.fetchmany(STREAM_BATCH_SIZE):
+                yield from rows
+        finally:
+            con.close()
+            with self._calls_lock:
+                self._n_readers -= 1
+
+    # Creates a new call
+    def call_start(self, req: tsi.CallStartReq) -> tsi.CallStartRes:
+        start = req.start
+        if start.trace_id is None:
+            raise ValueError("trace_id is required")
+        if start.id is None:
+            raise ValueError("id is required")
+        self._insert_parts([self._start_part(start)])
+        return tsi.CallStartRes(id=start.id, trace_id=start.trace_id)
+
+    def call_end(self, req: tsi.CallEndReq) -> tsi.CallEndRes:
+        self._insert_parts([self._end_part(req.end)])
+        return tsi.CallEndRes()
+
+    def call_complete(self, req: tsi.CallCompleteReq) -> tsi.CallCompleteRes:
+        complete = req.complete
+        if complete.trace_id is None:
+            raise ValueError("trace_id is required")
+        if complete.id is None:
+            raise ValueError("id is required")
+        self._insert_parts([{**self._start_part(complete), **self._end_part(complete)}])
+        return tsi.CallCompleteRes(id=complete.id, trace_id=complete.trace_id)
+
+    def _start_part(self, start: Any) -> dict[str, Any]:
+        return {
+            "project_id": start.project_id,
+            "id": start.id,
+            "trace_id": start.trace_id,
+            "parent_id": start.parent_id,
+            "op_name": start.op_name,
+            "display_name": start.display_name,
+            "started_at": _utc(start.started_at),
+            "attributes": json.dumps(start.attributes),
+            "inputs": json.dumps(start.inputs),
+            "input_refs": extract_refs_from_values(list(start.inputs.values())),
+            "wb_user_id": start.wb_user_id,
+            "wb_run_id": start.wb_run_id,
+        }
+
+    def _end_part(self, end: Any) -> dict[str, Any]:
+        parsable_output = end.output
+        if not isinstance(parsable_output, dict):
+            parsable_output = {"output": parsable_output}
+        return {
+            "project_id": end.project_id,
+            "id": end.id,
+            "ended_at": _utc(end.ended_at),
+            "exception": end.exception,
+            "output": json.dumps(end.output),
+            "output_refs": extract_refs_from_values(list(parsable_output.values())),
+            "summary": json.dumps(end.summary),
+        }
+
+    def calls_query(self, req: tsi.CallsQueryReq) -> tsi.CallsQueryRes:
+        return tsi.CallsQueryRes(calls=list(self.calls_query_stream(req)))
+
+    def calls_query_stream(self, req: tsi.CallsQueryReq) -> Iterator[tsi.CallSchema]:
+        for row in self._execute_calls_query(req):
+            call_dict = dict(zip(ALL_CALL_COLUMNS, row))
+            for col in CALL_JSON_COLUMNS:
+                if call_dict[col] is not None:
+                    call_dict[col] = json.loads(call_dict[col])
+            call_dict["attributes"] = call_dict["attributes"] or {}
+            call_dict["inputs"] = call_dict["inputs"] or {}
+            if call_dict["display_name"] == "":
+                call_dict["display_name"] = None
+            if req.columns is not None:
+                call_dict = project_call_dict(call_dict, req.columns)
+            yield tsi.CallSchema(**call_dict)
+
+    def calls_query_stats(self, req: tsi.CallsQueryStatsReq) -> tsi.CallsQueryStatsRes:
+        (row,) = self._execute_calls_query(
+            tsi.CallsQueryReq(
+                project_id=req.project_id, filter=req.filter, query=req.query
+            ),
+            count=True,
+        )
+        return tsi.CallsQueryStatsRes(count=row[0])
+
+    def calls_delete(self, req: tsi.CallsDeleteReq) -> tsi.CallsDeleteRes:
+        assert_non_null_wb_user_id(req)
+        children: dict[str, list[str]] = {}
+        for call in self.calls_query_stream(
+            tsi.CallsQueryReq(project_id=req.project_id, columns=["parent_id"])
+        ):
+            if call.parent_id is not None:
+                children.setdefault(call.parent_id, []).append(call.id)
+        # Deletes the calls and their descendants
+        to_delete = list(dict.fromkeys(req.call_ids))
+        seen = set(to_delete)
+        for call_id in to_delete:
+            for child_id in children.get(call_id, []):
+                if child_id not in seen:
+                    seen.add(child_id)
+                    to_delete.append(child_id)
+        deleted_at = datetime.datetime.now(datetime.timezone.utc)
+        self._insert_parts(
+            [
+                {"project_id": req.project_id, "id": call_id, "deleted_at": deleted_at}
+                for call_id in to_delete
+            ]
+        )
+        return tsi.CallsDeleteRes()
+
+    def call_update(self, req: tsi.CallUpdateReq) -> tsi.CallUpdateRes:
+        assert_non_null_wb_user_id(req)
+        if req.display_name is None:
+            raise ValueError("One of [display_name] is required for call update")
+        self._insert_parts(
+            [
+                {
+                    "project_id": req.project_id,
+                    "id": req.call_id,
+                    "display_name": req.display_name,
+                }
+            ]
+        )
+        return tsi.CallUpdateRes()
@@ -1,4 +1,5 @@
 import os
+import typing
 
 
 def wf_clickhouse_host() -> str:
@@ -26,6 +27,64 @@ def wf_clickhouse_database() -> str:
     return os.environ.get("WF_CLICKHOUSE_DATABASE", "default")
 
 
+def wf_trace_server_cache_max_bytes() -> int:
+    """The size of the in-process cache of objects, table rows and files read by the trace server (0 disables it)"""
+    return int(os.environ.get("WF_TRACE_SERVER_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+
+def wf_trace_server_cache_redis_url() -> typing.Optional[str]:
+    """If set, the trace server caches objects, table rows and files in this redis-compatible server instead"""
+    return os.environ.get("WF_TRACE_SERVER_CACHE_REDIS_URL")
+
+
 def wf_trace_server_url() -> str:
     """The url of the web server exposing the trace interface endpoints"""
     return os.environ.get("WF_TRACE_SERVER_URL", "https://trace.wandb.ai")
+
+
+def wf_trace_server_batch_max_linger() -> float:
+    """The maximum number of seconds a call start/end waits before its batch is sent"""
+    return float(os.environ.get("WF_TRACE_SERVER_BATCH_MAX_LINGER", 0.25))
+
+
+def wf_trace_server_batch_workers() -> int:
+    """The number of threads concurrently sending call batches to the trace server"""
+    return int(os.environ.get("WF_TRACE_SERVER_BATCH_WORKERS", 2))
+
+
+def wf_trace_server_pool_size() -> int:
+    """The maximum number of pooled keep-alive connections to the trace server"""
+    return int(os.environ.get("WF_TRACE_SERVER_POOL_SIZE", 20))
+
+
+def wf_trace_server_compression() -> str:
+    """Compression applied to request bodies sent to the trace server ("none", "gzip" or "zstd")"""
+    return os.environ.get("WF_TRACE_SERVER_COMPRESSION", "none").lower()
+
+
+def wf_trace_server_compression_min_bytes() -> int:
+    """Request bodies smaller than this are sent uncompressed"""
+    return int(os.environ.get("WF_TRACE_SERVER_COMPRESSION_MIN_BYTES", 1024))
+
+
+def wf_trace_server_spool_dir() -> typing.Optional[str]:
+    """If set, batched calls are written to a durable on-disk spool in this directory before being sent"""
+    return os.environ.get("WF_TRACE_SERVER_SPOOL_DIR")
+
+
+def wf_trace_server_spool_max_bytes() -> int:
+    """The maximum size of unsent data kept in the spool before the oldest data is dropped"""
+    return int(os.environ.get("WF_TRACE_SERVER_SPOOL_MAX_BYTES", 1024 * 1024 * 1024))
+
+
+def wf_trace_server_stream_format() -> str:
+    """The format calls are streamed in from the trace server ("ndjson" or "arrow")"""
+    return os.environ.get("WF_TRACE_SERVER_STREAM_FORMAT", "ndjson").lower()
+
+
+def wf_trace_server_coalesce_calls() -> bool:
+    """Whether to send the start and end of a call that are batched together as a single "complete" record"""
+    return os.environ.get("WF_TRACE_SERVER_COALESCE_CALLS", "false").lower() in (
+        "1",
+        "true",
+    )
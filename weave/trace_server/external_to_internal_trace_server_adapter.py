@@ -100,6 +100,18 @@ class ExternalTraceServer(tsi.TraceServerInterface):
         req.end.project_id = self._idc.ext_to_int_project_id(req.end.project_id)
         return self._ref_apply(self._internal_trace_server.call_end, req)
 
+    def call_complete(self, req: tsi.CallCompleteReq) -> tsi.CallCompleteRes:
+        req.complete.project_id = self._idc.ext_to_int_project_id(
+            req.complete.project_id
+        )
+        if req.complete.wb_run_id is not None:
+            req.complete.wb_run_id = self._idc.ext_to_int_run_id(req.complete.wb_run_id)
+        if req.complete.wb_user_id is not None:
+            req.complete.wb_user_id = self._idc.ext_to_int_user_id(
+                req.complete.wb_user_id
+            )
+        return self._ref_apply(self._internal_trace_server.call_complete, req)
+
     def call_read(self, req: tsi.CallReadReq) -> tsi.CallReadRes:
         original_project_id = req.project_id
         req.project_id = self._idc.ext_to_int_project_id(original_project_id)
@@ -192,6 +204,24 @@ class ExternalTraceServer(tsi.TraceServerInterface):
             # TODO: How do we correctly process user_id for the query filters?
         return self._ref_apply(self._internal_trace_server.calls_query_stats, req)
 
+    def calls_stats(self, req: tsi.CallsStatsReq) -> tsi.CallsStatsRes:
+        req.project_id = self._idc.ext_to_int_project_id(req.project_id)
+        return self._ref_apply(self._internal_trace_server.calls_stats, req)
+
+    def trace_read(self, req: tsi.TraceReadReq) -> tsi.TraceReadRes:
+        original_project_id = req.project_id
+        req.project_id = self._idc.ext_to_int_project_id(original_project_id)
+        res = self._ref_apply(self._internal_trace_server.trace_read, req)
+        for call in res.calls:
+            if call.project_id != req.project_id:
+                raise ValueError("Internal Error - Project Mismatch")
+            call.project_id = original_project_id
+            if call.wb_run_id is not None:
+                call.wb_run_id = self._idc.int_to_ext_run_id(call.wb_run_id)
+            if call.wb_user_id is not None:
+                call.wb_user_id = self._idc.int_to_ext_user_id(call.wb_user_id)
+        return res
+
     def call_update(self, req: tsi.CallUpdateReq) -> tsi.CallUpdateRes:
         req.project_id = self._idc.ext_to_int_project_id(req.project_id)
         if req.wb_user_id is not None:
@@ -248,6 +278,26 @@ class ExternalTraceServer(tsi.TraceServerInterface):
         req.table.project_id = self._idc.ext_to_int_project_id(req.table.project_id)
         return self._ref_apply(self._internal_trace_server.table_create, req)
 
+    def table_rows_missing(
+        self, req: tsi.TableRowsMissingReq
+    ) -> tsi.TableRowsMissingRes:
+        req.project_id = self._idc.ext_to_int_project_id(req.project_id)
+        return self._internal_trace_server.table_rows_missing(req)
+
+    def table_rows_create(self, req: tsi.TableRowsCreateReq) -> tsi.TableRowsCreateRes:
+        req.project_id = self._idc.ext_to_int_project_id(req.project_id)
+        return self._ref_apply(self._internal_trace_server.table_rows_create, req)
+
+    def table_create_from_digests(
+        self, req: tsi.TableCreateFromDigestsReq
+    ) -> tsi.TableCreateFromDigestsRes:
+        req.project_id = self._idc.ext_to_int_project_id(req.project_id)
+        return self._internal_trace_server.table_create_from_digests(req)
+
+    def table_append(self, req: tsi.TableAppendReq) -> tsi.TableAppendRes:
+        req.project_id = self._idc.ext_to_int_project_id(req.project_id)
+        return self._ref_apply(self._internal_trace_server.table_append, req)
+
     def table_query(self, req: tsi.TableQueryReq) -> tsi.TableQueryRes:
         req.project_id = self._idc.ext_to_int_project_id(req.project_id)
         return self._ref_apply(self._internal_trace_server.table_query, req)
@@ -265,6 +315,20 @@ class ExternalTraceServer(tsi.TraceServerInterface):
         # Special case where refs can never be part of the request
         return self._internal_trace_server.file_content_read(req)
 
+    def file_create_part(self, req: tsi.FileCreatePartReq) -> tsi.FileCreatePartRes:
+        req.project_id = self._idc.ext_to_int_project_id(req.project_id)
+        return self._internal_trace_server.file_create_part(req)
+
+    def file_parts_missing(
+        self, req: tsi.FilePartsMissingReq
+    ) -> tsi.FilePartsMissingRes:
+        req.project_id = self._idc.ext_to_int_project_id(req.project_id)
+        return self._internal_trace_server.file_parts_missing(req)
+
+    def file_content_read_stream(self, req: tsi.FileContentReadReq) -> Iterator[bytes]:
+        req.project_id = self._idc.ext_to_int_project_id(req.project_id)
+        return self._internal_trace_server.file_content_read_stream(req)
+
     def feedback_create(self, req: tsi.FeedbackCreateReq) -> tsi.FeedbackCreateRes:
         req.project_id = self._idc.ext_to_int_project_id(req.project_id)
         original_user_id = req.wb_user_id
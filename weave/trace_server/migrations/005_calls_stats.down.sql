@@ -0,0 +1,7 @@
+/*
+    Remove calls_stats_view
+    Remove calls_stats
+*/
+
+DROP VIEW calls_stats_view;
+DROP TABLE calls_stats;
@@ -0,0 +1,96 @@
+/*
+    Add calls_stats, the per op and per minute aggregates of finished calls
+    Backfill calls_stats from the calls already in calls_merged
+    Add calls_stats_view, which aggregates call parts as they are inserted
+
+    NOTE:
+    * The view only sees the call part being inserted: end parts are only
+      aggregated when their request carries the `op_name` and `started_at`
+      of the call, as the client's do *
+    * Deleted calls are not subtracted from the aggregates *
+    * The backfill runs before the view exists, so that no call is counted
+      by both. Calls finished while the migration runs, between the two,
+      are not counted *
+    * `op_name` is aliased to its non null value, so filters on the column
+      itself are qualified with the table name *
+    * `quantilesTDigestState` is NOT simple and must be queried with
+      `quantilesTDigestMerge` *
+*/
+
+CREATE TABLE calls_stats (
+    project_id String,
+    op_name String,
+    /*
+    `bucket_start`: The minute the calls started in.
+    */
+    bucket_start DateTime,
+    call_count SimpleAggregateFunction(sum, UInt64),
+    error_count SimpleAggregateFunction(sum, UInt64),
+    latency_ms AggregateFunction(quantilesTDigest(0.5, 0.9, 0.95, 0.99), Float64),
+    /*
+    Token usage by model, from `summary.usage`.
+    */
+    requests SimpleAggregateFunction(sumMap, Map(String, UInt64)),
+    prompt_tokens SimpleAggregateFunction(sumMap, Map(String, UInt64)),
+    completion_tokens SimpleAggregateFunction(sumMap, Map(String, UInt64)),
+    total_tokens SimpleAggregateFunction(sumMap, Map(String, UInt64))
+) ENGINE = AggregatingMergeTree
+ORDER BY (project_id, op_name, bucket_start);
+
+INSERT INTO calls_stats
+WITH ifNull(summary_dump, '{}') AS summary,
+    JSONExtractKeys(summary, 'usage') AS models
+SELECT project_id,
+    assumeNotNull(op_name) AS op_name,
+    toStartOfMinute(assumeNotNull(started_at)) AS bucket_start,
+    count() AS call_count,
+    countIf(isNotNull(exception)) AS error_count,
+    quantilesTDigestState(0.5, 0.9, 0.95, 0.99)(
+        toFloat64(dateDiff('millisecond', assumeNotNull(started_at), assumeNotNull(ended_at)))
+    ) AS latency_ms,
+    sumMap(mapFromArrays(models, arrayMap(m -> JSONExtractUInt(summary, 'usage', m, 'requests'), models))) AS requests,
+    sumMap(mapFromArrays(models, arrayMap(m -> JSONExtractUInt(summary, 'usage', m, 'prompt_tokens'), models))) AS prompt_tokens,
+    sumMap(mapFromArrays(models, arrayMap(m -> JSONExtractUInt(summary, 'usage', m, 'completion_tokens'), models))) AS completion_tokens,
+    sumMap(mapFromArrays(models, arrayMap(m -> JSONExtractUInt(summary, 'usage', m, 'total_tokens'), models))) AS total_tokens
+FROM (
+        SELECT project_id,
+            any(op_name) AS op_name,
+            any(started_at) AS started_at,
+            any(ended_at) AS ended_at,
+            any(exception) AS exception,
+            any(summary_dump) AS summary_dump,
+            any(deleted_at) AS deleted_at
+        FROM calls_merged
+        GROUP BY project_id,
+            id
+    ) AS merged
+WHERE isNotNull(ended_at)
+    AND isNotNull(merged.op_name)
+    AND isNotNull(started_at)
+    AND isNull(deleted_at)
+GROUP BY project_id,
+    op_name,
+    bucket_start;
+
+CREATE MATERIALIZED VIEW calls_stats_view TO calls_stats AS
+WITH ifNull(summary_dump, '{}') AS summary,
+    JSONExtractKeys(summary, 'usage') AS models
+SELECT project_id,
+    assumeNotNull(op_name) AS op_name,
+    toStartOfMinute(assumeNotNull(started_at)) AS bucket_start,
+    count() AS call_count,
+    countIf(isNotNull(exception)) AS error_count,
+    quantilesTDigestState(0.5, 0.9, 0.95, 0.99)(
+        toFloat64(dateDiff('millisecond', assumeNotNull(started_at), assumeNotNull(ended_at)))
+    ) AS latency_ms,
+    sumMap(mapFromArrays(models, arrayMap(m -> JSONExtractUInt(summary, 'usage', m, 'requests'), models))) AS requests,
+    sumMap(mapFromArrays(models, arrayMap(m -> JSONExtractUInt(summary, 'usage', m, 'prompt_tokens'), models))) AS prompt_tokens,
+    sumMap(mapFromArrays(models, arrayMap(m -> JSONExtractUInt(summary, 'usage', m, 'completion_tokens'), models))) AS completion_tokens,
+    sumMap(mapFromArrays(models, arrayMap(m -> JSONExtractUInt(summary, 'usage', m, 'total_tokens'), models))) AS total_tokens
+FROM call_parts
+WHERE isNotNull(ended_at)
+    AND isNotNull(call_parts.op_name)
+    AND isNotNull(started_at)
+GROUP BY project_id,
+    op_name,
+    bucket_start;
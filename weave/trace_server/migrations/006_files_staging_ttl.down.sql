@@ -0,0 +1,5 @@
+/*
+    Remove the TTL of files
+*/
+
+ALTER TABLE files REMOVE TTL;
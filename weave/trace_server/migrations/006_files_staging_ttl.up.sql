@@ -0,0 +1,11 @@
+/*
+    Add a TTL deleting the staged parts of files uploaded in parts
+
+    NOTE:
+    * Staged parts are stored under the `<digest>.parts` digest. They are not
+      deleted once the file is complete, as concurrent requests may still be
+      reading them *
+*/
+
+ALTER TABLE files
+    MODIFY TTL toDateTime(created_at) + INTERVAL 1 DAY DELETE WHERE endsWith(digest, '.parts');
@@ -21,9 +21,14 @@ TABLE_ROW_ID_EDGE_NAME = "id"
 class InternalTableRef:
     project_id: str
     digest: str
+    # eg. ["id", row_digest] to refer to a single row
+    extra: list[str] = dataclasses.field(default_factory=list)
 
     def uri(self) -> str:
-        return f"{WEAVE_INTERNAL_SCHEME}:///{self.project_id}/table/{self.digest}"
+        u = f"{WEAVE_INTERNAL_SCHEME}:///{self.project_id}/table/{self.digest}"
+        if self.extra:
+            u += "/" + "/".join(self.extra)
+        return u
 
 
 @dataclasses.dataclass
@@ -81,7 +86,9 @@ def parse_internal_uri(uri: str) -> Union[InternalObjectRef, InternalTableRef]:
     else:
         raise ValueError(f"Invalid URI: {uri}")
     if kind == "table":
-        return InternalTableRef(project_id=project_id, digest=remaining[0])
+        return InternalTableRef(
+            project_id=project_id, digest=remaining[0], extra=remaining[1:]
+        )
     elif kind == "object":
         name, version = remaining[0].split(":")
         return InternalObjectRef(
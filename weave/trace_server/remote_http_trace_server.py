@@ -1,17 +1,33 @@
-import io
+import atexit
+import gzip
 import json
 import logging
+import os
+import time
 import typing as t
 
 import requests
 import tenacity
 from pydantic import BaseModel, ValidationError
+from requests.adapters import HTTPAdapter
 
 from weave.legacy.wandb_interface import project_creator
 from weave.trace_server import environment as wf_env
 
 from . import trace_server_interface as tsi
 from .async_batch_processor import AsyncBatchProcessor
+from .calls_stream import (
+    ARROW_CONTENT_TYPE,
+    decode_calls_arrow,
+    decode_calls_ndjson,
+    resolve_stream_format,
+)
+from .spool import Spool
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore
 
 logger = logging.getLogger(__name__)
 
@@ -26,8 +42,68 @@ class EndBatchItem(BaseModel):
     req: tsi.CallEndReq
 
 
+class CompleteBatchItem(BaseModel):
+    mode: str = "complete"
+    req: tsi.CallCompleteReq
+
+
 class Batch(BaseModel):
-    batch: t.List[t.Union[StartBatchItem, EndBatchItem]]
+    batch: t.List[t.Union[StartBatchItem, EndBatchItem, CompleteBatchItem]]
+
+
+def coalesce_batch(batch: t.List) -> t.List:
+    """Merges the start and end of each call that are both in `batch` into a
+    single complete item, placed where the start was."""
+    ends = {item.req.end.id: item for item in batch if isinstance(item, EndBatchItem)}
+    coalesced_ids = set()
+    res: t.List = []
+    for item in batch:
+        if isinstance(item, StartBatchItem) and item.req.start.id in ends:
+            end = ends[item.req.start.id].req.end
+            res.append(
+                CompleteBatchItem(
+                    req=tsi.CallCompleteReq(
+                        complete=tsi.CompletedCallSchemaForInsert.from_start_and_end(
+                            item.req.start, end
+                        )
+                    )
+                )
+            )
+            coalesced_ids.add(end.id)
+        elif isinstance(item, EndBatchItem) and item.req.end.id in coalesced_ids:
+            continue
+        else:
+            res.append(item)
+    return res
+
+
+def _orjson_default(obj: t.Any) -> t.Any:
+    if isinstance(obj, BaseModel):
+        return obj.__dict__
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def encode_batch(batch: t.List) -> bytes:
+    """Encodes a batch of call items as JSON, like `Batch.model_dump_json`.
+
+    With orjson installed, the batch is encoded in a single pass over the
+    request models and the (already JSON-compatible) call values, without
+    dumping the models first. Anything orjson can't encode falls back to
+    pydantic.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(
+                {"batch": [{"mode": item.mode, "req": item.req} for item in batch]},
+                default=_orjson_default,
+                option=orjson.OPT_UTC_Z
+                | orjson.OPT_NON_STR_KEYS
+                | orjson.OPT_SERIALIZE_NUMPY,
+            )
+        except TypeError:
+            # orjson.JSONEncodeError is a TypeError
+            pass
+    return Batch(batch=batch).model_dump_json().encode("utf-8")
 
 
 class ServerInfoRes(BaseModel):
@@ -40,6 +116,8 @@ REMOTE_REQUEST_BYTES_LIMIT = (
 
 REMOTE_REQUEST_RETRY_DURATION = 60 * 60 * 36  # 36 hours
 REMOTE_REQUEST_RETRY_MAX_INTERVAL = 60 * 5  # 5 minutes
+# How long reads wait for the calls still queued to be sent
+PENDING_CALLS_FLUSH_TIMEOUT = 60  # 1 minute
 
 
 def _is_retryable_exception(e: Exception) -> bool:
@@ -66,6 +144,30 @@ def _is_retryable_exception(e: Exception) -> bool:
     return True
 
 
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=5)
+    if encoding == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor().compress(data)
+    raise ValueError(f"Unsupported compression: {encoding}")
+
+
+def _resolve_compression(encoding: str) -> t.Optional[str]:
+    if encoding in ("", "none"):
+        return None
+    if encoding == "zstd":
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            logger.warning("zstandard is not installed, falling back to gzip")
+            return "gzip"
+    elif encoding != "gzip":
+        raise ValueError(f"Unsupported compression: {encoding}")
+    return encoding
+
+
 def _log_retry(retry_state: tenacity.RetryCallState) -> None:
     logger.info(
         "retry_attempt",
@@ -92,14 +194,126 @@ def _log_failure(retry_state: tenacity.RetryCallState) -> t.Any:
 class RemoteHTTPTraceServer(tsi.TraceServerInterface):
     trace_server_url: str
 
-    # My current batching is not safe in notebooks, disable it for now
-    def __init__(self, trace_server_url: str, should_batch: bool = False):
+    def __init__(
+        self,
+        trace_server_url: str,
+        should_batch: bool = True,
+        pool_size: t.Optional[int] = None,
+        compression: t.Optional[str] = None,
+        spool_dir: t.Optional[str] = None,
+        coalesce_calls: t.Optional[bool] = None,
+        stream_format: t.Optional[str] = None,
+    ):
         super().__init__()
         self.trace_server_url = trace_server_url
         self.should_batch = should_batch
-        if self.should_batch:
-            self.call_processor = AsyncBatchProcessor(self._flush_calls)
+        self.pool_size = (
+            pool_size if pool_size is not None else wf_env.wf_trace_server_pool_size()
+        )
+        self.compression = _resolve_compression(
+            compression
+            if compression is not None
+            else wf_env.wf_trace_server_compression()
+        )
+        self.spool_dir = (
+            spool_dir if spool_dir is not None else wf_env.wf_trace_server_spool_dir()
+        )
+        # Requires a trace server that accepts "complete" batch items
+        self.coalesce_calls = (
+            coalesce_calls
+            if coalesce_calls is not None
+            else wf_env.wf_trace_server_coalesce_calls()
+        )
+        # Format requested for streamed calls: "ndjson" or "arrow"
+        self.stream_format = (
+            stream_format
+            if stream_format is not None
+            else wf_env.wf_trace_server_stream_format()
+        )
+        self._stream_content_type = resolve_stream_format(self.stream_format)
         self._auth: t.Optional[t.Tuple[str, str]] = None
+        self._init_process_state()
+
+    def _init_process_state(self) -> None:
+        # Sockets, locks and worker threads don't survive a fork, so both the
+        # connection pool and the call batcher are owned by a single process.
+        # A child re-creates them (and drops any calls the parent still had
+        # queued, since the parent is responsible for sending those).
+        self._pid = os.getpid()
+        self._session: t.Optional[requests.Session] = None
+        old_processor = getattr(self, "call_processor", None)
+        if old_processor is not None:
+            # Its exit hook would otherwise run in this process too
+            atexit.unregister(old_processor.wait_until_all_processed)
+        if self.should_batch:
+            self.call_processor = AsyncBatchProcessor(
+                self._flush_calls,
+                max_linger=wf_env.wf_trace_server_batch_max_linger(),
+                num_workers=wf_env.wf_trace_server_batch_workers(),
+            )
+        self._spool: t.Optional[Spool] = None
+        if self.should_batch and self.spool_dir:
+            # Batches are appended to the spool and sent (in order, with
+            # retries) by its drainer. Anything a previous process left
+            # unsent is replayed first.
+            self._spool = Spool(
+                self.spool_dir, max_bytes=wf_env.wf_trace_server_spool_max_bytes()
+            )
+            self._spool.start_drainer(
+                self._send_spooled_batch,
+                should_retry=_is_retryable_exception,
+                max_backoff=REMOTE_REQUEST_RETRY_MAX_INTERVAL,
+            )
+
+    def _check_pid(self) -> None:
+        if self._pid != os.getpid():
+            self._init_process_state()
+
+    @property
+    def session(self) -> requests.Session:
+        self._check_pid()
+        if self._session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=self.pool_size, pool_maxsize=self.pool_size
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._session = session
+        return self._session
+
+    def _post(self, url: str, data: bytes, **kwargs: t.Any) -> requests.Response:
+        headers = kwargs.pop("headers", {})
+        if (
+            self.compression is not None
+            and len(data) >= wf_env.wf_trace_server_compression_min_bytes()
+        ):
+            data = _compress(data, self.compression)
+            headers["Content-Encoding"] = self.compression
+        return self.session.post(
+            self.trace_server_url + url,
+            data=data,
+            auth=self._auth,
+            headers=headers,
+            **kwargs,
+        )
+
+    def _flush_pending_calls(self) -> None:
+        # Reads (and updates) of calls must observe calls that are still
+        # waiting in the batcher, otherwise e.g. a notebook cell querying the
+        # calls it just made would see nothing.
+        # The wait is bounded so that a server that is down doesn't block reads
+        # for as long as the batches are retried.
+        if self.should_batch:
+            self._check_pid()
+            deadline = time.monotonic() + PENDING_CALLS_FLUSH_TIMEOUT
+            flushed = self.call_processor.flush(timeout=PENDING_CALLS_FLUSH_TIMEOUT)
+            if flushed and self._spool is not None:
+                flushed = self._spool.flush(timeout=deadline - time.monotonic())
+            if not flushed:
+                logger.warning(
+                    "Timed out sending pending calls, results may not include them"
+                )
 
     def ensure_project_exists(self, entity: str, project: str) -> None:
         # TODO: This should happen in the wandb backend, not here, and it's slow
@@ -107,7 +321,7 @@ class RemoteHTTPTraceServer(tsi.TraceServerInterface):
         project_creator.ensure_project_exists(entity, project)
 
     @classmethod
-    def from_env(cls, should_batch: bool = False) -> "RemoteHTTPTraceServer":
+    def from_env(cls, should_batch: bool = True) -> "RemoteHTTPTraceServer":
         return cls(wf_env.wf_trace_server_url(), should_batch)
 
     def set_auth(self, auth: t.Tuple[str, str]) -> None:
@@ -132,8 +346,10 @@ class RemoteHTTPTraceServer(tsi.TraceServerInterface):
         if len(batch) == 0:
             return
 
-        data = Batch(batch=batch).model_dump_json()
-        encoded_data = data.encode("utf-8")
+        if self.coalesce_calls:
+            batch = coalesce_batch(batch)
+
+        encoded_data = encode_batch(batch)
         encoded_bytes = len(encoded_data)
 
         # Update target batch size (this allows us to have a dynamic batch size based on the size of the data being sent)
@@ -151,11 +367,15 @@ class RemoteHTTPTraceServer(tsi.TraceServerInterface):
             self._flush_calls(batch[split_idx:], _should_update_batch_size=False)
             return
 
-        r = requests.post(
-            self.trace_server_url + "/call/upsert_batch",
-            data=encoded_data,
-            auth=self._auth,
-        )
+        if self._spool is not None:
+            self._spool.append(encoded_data)
+            return
+
+        r = self._post("/call/upsert_batch", encoded_data)
+        r.raise_for_status()
+
+    def _send_spooled_batch(self, encoded_data: bytes) -> None:
+        r = self._post("/call/upsert_batch", encoded_data)
         r.raise_for_status()
 
     @tenacity.retry(
@@ -173,16 +393,17 @@ class RemoteHTTPTraceServer(tsi.TraceServerInterface):
         url: str,
         req: BaseModel,
         stream: bool = False,
+        headers: t.Optional[t.Dict[str, str]] = None,
     ) -> requests.Response:
-        r = requests.post(
-            self.trace_server_url + url,
+        r = self._post(
+            url,
             # `by_alias` is required since we have Mongo-style properties in the
             # query models that are aliased to conform to start with `$`. Without
             # this, the model_dump will use the internal property names which are
             # not valid for the `model_validate` step.
-            data=req.model_dump_json(by_alias=True).encode("utf-8"),
-            auth=self._auth,
+            req.model_dump_json(by_alias=True).encode("utf-8"),
             stream=stream,
+            headers=dict(headers or {}),
         )
         if r.status_code == 413 and "obj/create" in url:
             raise requests.HTTPError(
@@ -214,19 +435,26 @@ class RemoteHTTPTraceServer(tsi.TraceServerInterface):
         r = self._generic_request_executor(url, req)
         return res_model.model_validate(r.json())
 
-    def _generic_stream_request(
-        self,
-        url: str,
-        req: BaseModel,
-        req_model: t.Type[BaseModel],
-        res_model: t.Type[BaseModel],
-    ) -> t.Iterator[BaseModel]:
+    def _calls_stream_request(
+        self, url: str, req: t.Union[tsi.CallsQueryReq, t.Dict[str, t.Any]]
+    ) -> t.Iterator[tsi.CallSchema]:
         if isinstance(req, dict):
-            req = req_model.model_validate(req)
-        r = self._generic_request_executor(url, req, stream=True)
-        for line in r.iter_lines():
-            if line:
-                yield res_model.model_validate(json.loads(line))
+            req = tsi.CallsQueryReq.model_validate(req)
+        r = self._generic_request_executor(
+            url, req, stream=True, headers={"Accept": self._stream_content_type}
+        )
+        try:
+            # Servers that don't know the requested format answer with NDJSON
+            content_type = r.headers.get("Content-Type", "")
+            if content_type.startswith(ARROW_CONTENT_TYPE):
+                # Arrow reads the raw socket, so let urllib3 undo any
+                # transfer compression (as `iter_lines` does)
+                r.raw.decode_content = True
+                yield from decode_calls_arrow(r.raw)
+            else:
+                yield from decode_calls_ndjson(r.iter_lines())
+        finally:
+            r.close()
 
     @tenacity.retry(
         stop=tenacity.stop_after_delay(REMOTE_REQUEST_RETRY_DURATION),
@@ -239,7 +467,7 @@ class RemoteHTTPTraceServer(tsi.TraceServerInterface):
         reraise=True,
     )
     def server_info(self) -> ServerInfoRes:
-        r = requests.get(self.trace_server_url + "/server_info")
+        r = self.session.get(self.trace_server_url + "/server_info")
         r.raise_for_status()
         return ServerInfoRes.model_validate(r.json())
 
@@ -257,6 +485,7 @@ class RemoteHTTPTraceServer(tsi.TraceServerInterface):
                 raise ValueError(
                     "CallStartReq must have id and trace_id when batching."
                 )
+            self._check_pid()
             self.call_processor.enqueue([StartBatchItem(req=req_as_obj)])
             return tsi.CallStartRes(
                 id=req_as_obj.start.id, trace_id=req_as_obj.start.trace_id
@@ -274,13 +503,35 @@ class RemoteHTTPTraceServer(tsi.TraceServerInterface):
                 req_as_obj = tsi.CallEndReq.model_validate(req)
             else:
                 req_as_obj = req
+            self._check_pid()
             self.call_processor.enqueue([EndBatchItem(req=req_as_obj)])
             return tsi.CallEndRes()
         return self._generic_request("/call/end", req, tsi.CallEndReq, tsi.CallEndRes)
 
+    def call_complete(
+        self, req: t.Union[tsi.CallCompleteReq, t.Dict[str, t.Any]]
+    ) -> tsi.CallCompleteRes:
+        req_as_obj: tsi.CallCompleteReq
+        if isinstance(req, dict):
+            req_as_obj = tsi.CallCompleteReq.model_validate(req)
+        else:
+            req_as_obj = req
+        if self.should_batch and self.coalesce_calls:
+            if req_as_obj.complete.id == None or req_as_obj.complete.trace_id == None:
+                raise ValueError(
+                    "CallCompleteReq must have id and trace_id when batching."
+                )
+            self._check_pid()
+            self.call_processor.enqueue([CompleteBatchItem(req=req_as_obj)])
+            return tsi.CallCompleteRes(
+                id=req_as_obj.complete.id, trace_id=req_as_obj.complete.trace_id
+            )
+        return super().call_complete(req_as_obj)
+
     def call_read(
         self, req: t.Union[tsi.CallReadReq, t.Dict[str, t.Any]]
     ) -> tsi.CallReadRes:
+        self._flush_pending_calls()
         return self._generic_request(
             "/call/read", req, tsi.CallReadReq, tsi.CallReadRes
         )
@@ -288,25 +539,43 @@ class RemoteHTTPTraceServer(tsi.TraceServerInterface):
     def calls_query(
         self, req: t.Union[tsi.CallsQueryReq, t.Dict[str, t.Any]]
     ) -> tsi.CallsQueryRes:
+        self._flush_pending_calls()
         return self._generic_request(
             "/calls/query", req, tsi.CallsQueryReq, tsi.CallsQueryRes
         )
 
     def calls_query_stream(self, req: tsi.CallsQueryReq) -> t.Iterator[tsi.CallSchema]:
-        return self._generic_stream_request(
-            "/calls/stream_query", req, tsi.CallsQueryReq, tsi.CallSchema
-        )
+        self._flush_pending_calls()
+        return self._calls_stream_request("/calls/stream_query", req)
 
     def calls_query_stats(
         self, req: t.Union[tsi.CallsQueryStatsReq, t.Dict[str, t.Any]]
     ) -> tsi.CallsQueryStatsRes:
+        self._flush_pending_calls()
         return self._generic_request(
             "/calls/query_stats", req, tsi.CallsQueryStatsReq, tsi.CallsQueryStatsRes
         )
 
+    def calls_stats(
+        self, req: t.Union[tsi.CallsStatsReq, t.Dict[str, t.Any]]
+    ) -> tsi.CallsStatsRes:
+        self._flush_pending_calls()
+        return self._generic_request(
+            "/calls/stats", req, tsi.CallsStatsReq, tsi.CallsStatsRes
+        )
+
+    def trace_read(
+        self, req: t.Union[tsi.TraceReadReq, t.Dict[str, t.Any]]
+    ) -> tsi.TraceReadRes:
+        self._flush_pending_calls()
+        return self._generic_request(
+            "/trace/read", req, tsi.TraceReadReq, tsi.TraceReadRes
+        )
+
     def calls_delete(
         self, req: t.Union[tsi.CallsDeleteReq, t.Dict[str, t.Any]]
     ) -> tsi.CallsDeleteRes:
+        self._flush_pending_calls()
         return self._generic_request(
             "/calls/delete", req, tsi.CallsDeleteReq, tsi.CallsDeleteRes
         )
@@ -314,6 +583,7 @@ class RemoteHTTPTraceServer(tsi.TraceServerInterface):
     def call_update(
         self, req: t.Union[tsi.CallUpdateReq, t.Dict[str, t.Any]]
     ) -> tsi.CallUpdateRes:
+        self._flush_pending_calls()
         return self._generic_request(
             "/call/update", req, tsi.CallUpdateReq, tsi.CallUpdateRes
         )
@@ -363,6 +633,40 @@ class RemoteHTTPTraceServer(tsi.TraceServerInterface):
             "/table/create", req, tsi.TableCreateReq, tsi.TableCreateRes
         )
 
+    def table_rows_missing(
+        self, req: t.Union[tsi.TableRowsMissingReq, t.Dict[str, t.Any]]
+    ) -> tsi.TableRowsMissingRes:
+        return self._generic_request(
+            "/table/rows_missing",
+            req,
+            tsi.TableRowsMissingReq,
+            tsi.TableRowsMissingRes,
+        )
+
+    def table_rows_create(
+        self, req: t.Union[tsi.TableRowsCreateReq, t.Dict[str, t.Any]]
+    ) -> tsi.TableRowsCreateRes:
+        return self._generic_request(
+            "/table/rows_create", req, tsi.TableRowsCreateReq, tsi.TableRowsCreateRes
+        )
+
+    def table_create_from_digests(
+        self, req: t.Union[tsi.TableCreateFromDigestsReq, t.Dict[str, t.Any]]
+    ) -> tsi.TableCreateFromDigestsRes:
+        return self._generic_request(
+            "/table/create_from_digests",
+            req,
+            tsi.TableCreateFromDigestsReq,
+            tsi.TableCreateFromDigestsRes,
+        )
+
+    def table_append(
+        self, req: t.Union[tsi.TableAppendReq, t.Dict[str, t.Any]]
+    ) -> tsi.TableAppendRes:
+        return self._generic_request(
+            "/table/append", req, tsi.TableAppendReq, tsi.TableAppendRes
+        )
+
     def table_query(
         self, req: t.Union[tsi.TableQueryReq, t.Dict[str, t.Any]]
     ) -> tsi.TableQueryRes:
@@ -388,7 +692,7 @@ class RemoteHTTPTraceServer(tsi.TraceServerInterface):
         reraise=True,
     )
     def file_create(self, req: tsi.FileCreateReq) -> tsi.FileCreateRes:
-        r = requests.post(
+        r = self.session.post(
             self.trace_server_url + "/files/create",
             auth=self._auth,
             data={"project_id": req.project_id},
@@ -397,6 +701,41 @@ class RemoteHTTPTraceServer(tsi.TraceServerInterface):
         r.raise_for_status()
         return tsi.FileCreateRes.model_validate(r.json())
 
+    @tenacity.retry(
+        stop=tenacity.stop_after_delay(REMOTE_REQUEST_RETRY_DURATION),
+        wait=tenacity.wait_exponential_jitter(
+            initial=1, max=REMOTE_REQUEST_RETRY_MAX_INTERVAL
+        ),
+        retry=tenacity.retry_if_exception(_is_retryable_exception),
+        before_sleep=_log_retry,
+        retry_error_callback=_log_failure,
+        reraise=True,
+    )
+    def file_create_part(self, req: tsi.FileCreatePartReq) -> tsi.FileCreatePartRes:
+        r = self.session.post(
+            self.trace_server_url + "/files/create_part",
+            auth=self._auth,
+            data={
+                "project_id": req.project_id,
+                "digest": req.digest,
+                "size": req.size,
+                "offset": req.offset,
+            },
+            files={"file": (req.name, req.content)},
+        )
+        r.raise_for_status()
+        return tsi.FileCreatePartRes.model_validate(r.json())
+
+    def file_parts_missing(
+        self, req: t.Union[tsi.FilePartsMissingReq, t.Dict[str, t.Any]]
+    ) -> tsi.FilePartsMissingRes:
+        return self._generic_request(
+            "/files/parts_missing",
+            req,
+            tsi.FilePartsMissingReq,
+            tsi.FilePartsMissingRes,
+        )
+
     @tenacity.retry(
         stop=tenacity.stop_after_delay(REMOTE_REQUEST_RETRY_DURATION),
         wait=tenacity.wait_exponential_jitter(
@@ -408,17 +747,44 @@ class RemoteHTTPTraceServer(tsi.TraceServerInterface):
         reraise=True,
     )
     def file_content_read(self, req: tsi.FileContentReadReq) -> tsi.FileContentReadRes:
-        r = requests.post(
+        r = self.session.post(
+            self.trace_server_url + "/files/content",
+            json={"project_id": req.project_id, "digest": req.digest},
+            auth=self._auth,
+        )
+        r.raise_for_status()
+        return tsi.FileContentReadRes(content=r.content)
+
+    def file_content_read_stream(
+        self, req: tsi.FileContentReadReq
+    ) -> t.Iterator[bytes]:
+        r = self._open_file_content_stream(req)
+        with r:
+            yield from r.iter_content(chunk_size=tsi.FILE_CHUNK_SIZE)
+
+    # Only opening the stream is retried: once content has been yielded, the
+    # read can't be restarted without duplicating it
+    @tenacity.retry(
+        stop=tenacity.stop_after_delay(REMOTE_REQUEST_RETRY_DURATION),
+        wait=tenacity.wait_exponential_jitter(
+            initial=1, max=REMOTE_REQUEST_RETRY_MAX_INTERVAL
+        ),
+        retry=tenacity.retry_if_exception(_is_retryable_exception),
+        before_sleep=_log_retry,
+        retry_error_callback=_log_failure,
+        reraise=True,
+    )
+    def _open_file_content_stream(
+        self, req: tsi.FileContentReadReq
+    ) -> requests.Response:
+        r = self.session.post(
             self.trace_server_url + "/files/content",
             json={"project_id": req.project_id, "digest": req.digest},
             auth=self._auth,
+            stream=True,
         )
         r.raise_for_status()
-        # TODO: Should stream to disk rather than to memory
-        bytes = io.BytesIO()
-        bytes.writelines(r.iter_content())
-        bytes.seek(0)
-        return tsi.FileContentReadRes(content=bytes.read())
+        return r
 
     def feedback_create(
         self, req: t.Union[tsi.FeedbackCreateReq, t.Dict[str, t.Any]]
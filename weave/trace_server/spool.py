@@ -0,0 +1,407 @@
+"""A durable, append-only on-disk queue ("spool") of opaque records.
+
+Records are appended to numbered segment files and read back in order by
+a single drainer thread, which hands each record to a `send_fn`. A cursor
+file records how far the drainer got, so records that were written but not
+yet sent survive a crash or restart and are replayed (at least once) by the
+next process that opens the same spool directory.
+
+On-disk layout of a spool directory:
+
+    slot-<n>/                 One per concurrently running process
+        .lock                 flock()-ed for as long as a process owns the slot
+        cursor                "<segment number> <byte offset>" of the next unsent record
+        <segment number>.seg  Records, each framed as <len:u32><crc32:u32><payload>
+"""
+
+import atexit
+import logging
+import os
+import struct
+import threading
+import time
+import typing
+import weakref
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct("<II")
+_SEGMENT_SUFFIX = ".seg"
+_MAX_SLOTS = 64
+
+
+class SpoolRecordTooLarge(ValueError):
+    pass
+
+
+class Spool:
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 1024 * 1024 * 1024,
+        segment_bytes: int = 16 * 1024 * 1024,
+        fsync: bool = False,
+    ) -> None:
+        """
+        Args:
+            directory: Root directory of the spool. Created if missing.
+            max_bytes: Once unsent records exceed this many bytes, the oldest
+                segments are dropped to make room.
+            segment_bytes: Segments are rotated once they grow past this size.
+            fsync: Whether to fsync after every append. Without it, records
+                survive a process crash but not necessarily a machine crash.
+        """
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.dropped_records = 0
+        self.dropped_bytes = 0
+
+        self._cond = threading.Condition()
+        self._lock_file: typing.Optional[typing.IO] = None
+        self.directory = self._acquire_slot(directory)
+
+        segments = self._segment_numbers()
+        self._read_seq, self._read_offset = self._load_cursor(segments)
+        self._in_flight = False
+        # Always write to a fresh segment, so that segments left behind by a
+        # previous process are immutable and can be drained to their end.
+        self._write_seq = max(segments[-1] + 1 if segments else 0, self._read_seq)
+        self._write_fd: typing.Optional[int] = None
+        self._write_size = 0
+        self._rotate()
+        if self._read_seq not in segments:
+            self._read_seq, self._read_offset = self._write_seq - 1, 0
+        self._pending_bytes = self._compute_pending_bytes(segments)
+
+        self._drainer: typing.Optional[threading.Thread] = None
+        self._stopping = False
+        self._pid = os.getpid()
+
+    # Public API
+
+    def append(self, record: bytes) -> None:
+        """Durably appends a record to the spool."""
+        framed = _HEADER.pack(len(record), zlib.crc32(record)) + record
+        if len(framed) > self.max_bytes:
+            raise SpoolRecordTooLarge(
+                f"Record of {len(record)} bytes exceeds spool size of {self.max_bytes} bytes"
+            )
+        with self._cond:
+            if self._write_fd is None:
+                raise ValueError("Spool is closed")
+            if self._write_size >= self.segment_bytes:
+                self._rotate()
+            os.write(self._write_fd, framed)  # type: ignore
+            if self.fsync:
+                os.fsync(self._write_fd)
+            self._write_size += len(framed)
+            self._pending_bytes += len(framed)
+            self._enforce_size_cap()
+            self._cond.notify_all()
+
+    def pending_bytes(self) -> int:
+        with self._cond:
+            return self._pending_bytes
+
+    def start_drainer(
+        self,
+        send_fn: typing.Callable[[bytes], None],
+        should_retry: typing.Callable[[Exception], bool] = lambda e: True,
+        initial_backoff: float = 1.0,
+        max_backoff: float = 300.0,
+    ) -> None:
+        """Starts a daemon thread that sends every record, in order, to `send_fn`.
+
+        If `send_fn` raises, the record is retried with exponential backoff while
+        `should_retry` returns True for the exception, and dropped otherwise.
+        """
+        with self._cond:
+            if self._drainer is not None and self._drainer.is_alive():
+                return
+            self._drainer = threading.Thread(
+                target=self._drain_forever,
+                args=(send_fn, should_retry, initial_backoff, max_backoff),
+                daemon=True,
+            )
+            self._drainer.start()
+        self_ref = weakref.ref(self)
+
+        def close_at_exit() -> None:
+            spool = self_ref()
+            if spool is not None:
+                spool._close_at_exit()
+
+        atexit.register(close_at_exit)
+
+    def flush(self, timeout: typing.Optional[float] = None) -> bool:
+        """Waits until the drainer has sent every record appended so far.
+
+        Returns False if `timeout` seconds elapsed first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            target = (self._write_seq - 1, self._write_size)
+            while (self._read_seq, self._read_offset) < target or self._in_flight:
+                if self._drainer is None:
+                    return False
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                self._cond.wait(remaining)
+        return True
+
+    def compact(self) -> None:
+        """Removes fully sent segments and rewrites a partially sent segment
+        so that it only contains unsent records."""
+        with self._cond:
+            for seq in self._segment_numbers():
+                if seq < self._read_seq:
+                    os.remove(self._segment_path(seq))
+            if (
+                self._read_offset == 0
+                or self._read_seq == self._write_seq - 1
+                or self._in_flight
+            ):
+                # Nothing to trim, or the segment is still being written to.
+                return
+            path = self._segment_path(self._read_seq)
+            if not os.path.exists(path):
+                return
+            tmp_path = path + ".compact"
+            with open(path, "rb") as src, open(tmp_path, "wb") as dst:
+                src.seek(self._read_offset)
+                while chunk := src.read(1024 * 1024):
+                    dst.write(chunk)
+            os.replace(tmp_path, path)
+            self._read_offset = 0
+            self._save_cursor()
+
+    def close(self) -> None:
+        """Stops the drainer (without waiting for it to send pending records)."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            drainer = self._drainer
+        if drainer is not None and drainer is not threading.current_thread():
+            drainer.join()
+        with self._cond:
+            self._drainer = None
+            if self._write_fd is not None:
+                os.close(self._write_fd)
+                self._write_fd = None
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+    # Internals
+
+    def _close_at_exit(self) -> None:
+        if self._pid != os.getpid():
+            # Inherited through a fork: the slot and the drainer are the parent's
+            return
+        # Give the drainer a moment to send what it can; anything left is
+        # replayed by the next process using this spool.
+        self.flush(timeout=5)
+        self.close()
+
+    def _acquire_slot(self, root: str) -> str:
+        for i in range(_MAX_SLOTS):
+            slot = os.path.join(root, f"slot-{i}")
+            os.makedirs(slot, exist_ok=True)
+            if fcntl is None:
+                return slot
+            lock_file = open(os.path.join(slot, ".lock"), "a")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                continue
+            self._lock_file = lock_file
+            return slot
+        raise RuntimeError(f"No free spool slot in {root}")
+
+    def _segment_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"{seq:012d}{_SEGMENT_SUFFIX}")
+
+    def _segment_numbers(self) -> list[int]:
+        return sorted(
+            int(name[: -len(_SEGMENT_SUFFIX)])
+            for name in os.listdir(self.directory)
+            if name.endswith(_SEGMENT_SUFFIX)
+        )
+
+    def _cursor_path(self) -> str:
+        return os.path.join(self.directory, "cursor")
+
+    def _load_cursor(self, segments: list[int]) -> tuple[int, int]:
+        try:
+            with open(self._cursor_path()) as f:
+                seq_str, offset_str = f.read().split()
+                seq, offset = int(seq_str), int(offset_str)
+        except (OSError, ValueError):
+            return (segments[0] if segments else 0), 0
+        if segments and seq < segments[0]:
+            # The segment was dropped or compacted away
+            return segments[0], 0
+        return seq, offset
+
+    def _save_cursor(self) -> None:
+        tmp_path = self._cursor_path() + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(f"{self._read_seq} {self._read_offset}")
+        os.replace(tmp_path, self._cursor_path())
+
+    def _compute_pending_bytes(self, segments: list[int]) -> int:
+        total = 0
+        for seq in segments:
+            if seq >= self._read_seq:
+                total += os.path.getsize(self._segment_path(seq))
+        return total - self._read_offset
+
+    def _rotate(self) -> None:
+        if self._write_fd is not None:
+            os.close(self._write_fd)
+        self._write_fd = os.open(
+            self._segment_path(self._write_seq),
+            os.O_WRONLY | os.O_CREAT | os.O_APPEND,
+            0o600,
+        )
+        self._write_seq += 1
+        self._write_size = 0
+
+    def _enforce_size_cap(self) -> None:
+        # Drop whole segments, oldest first, but never the one being written.
+        dropped_any = False
+        while (
+            self._pending_bytes > self.max_bytes
+            and self._read_seq < self._write_seq - 1
+        ):
+            path = self._segment_path(self._read_seq)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            dropped = size - self._read_offset
+            records = self._count_records(path, self._read_offset)
+            if not self._in_flight:
+                os.remove(path)
+            self._pending_bytes -= dropped
+            self.dropped_bytes += dropped
+            self.dropped_records += records
+            logger.warning(
+                f"Trace spool exceeded {self.max_bytes} bytes, dropped {records} oldest records"
+            )
+            self._read_seq += 1
+            self._read_offset = 0
+            self._save_cursor()
+            dropped_any = True
+        if dropped_any:
+            # Also removes a dropped segment that was in flight: its record has
+            # already been read
+            self.compact()
+
+    @staticmethod
+    def _count_records(path: str, offset: int) -> int:
+        count = 0
+        try:
+            with open(path, "rb") as f:
+                f.seek(offset)
+                while header := f.read(_HEADER.size):
+                    if len(header) < _HEADER.size:
+                        break
+                    length, _ = _HEADER.unpack(header)
+                    f.seek(length, os.SEEK_CUR)
+                    count += 1
+        except OSError:
+            pass
+        return count
+
+    def _read_next(self) -> typing.Optional[tuple[bytes, int, int]]:
+        """Returns (record, segment, offset after record) for the next unsent record."""
+        while True:
+            if (self._read_seq, self._read_offset) >= (
+                self._write_seq - 1,
+                self._write_size,
+            ):
+                return None
+            path = self._segment_path(self._read_seq)
+            try:
+                with open(path, "rb") as f:
+                    f.seek(self._read_offset)
+                    header = f.read(_HEADER.size)
+                    if len(header) == _HEADER.size:
+                        length, crc = _HEADER.unpack(header)
+                        record = f.read(length)
+                        if len(record) == length and zlib.crc32(record) == crc:
+                            return (
+                                record,
+                                self._read_seq,
+                                self._read_offset + _HEADER.size + length,
+                            )
+                        logger.warning(f"Skipping corrupt tail of spool segment {path}")
+            except FileNotFoundError:
+                pass
+            if self._read_seq >= self._write_seq - 1:
+                # A torn write at the end of the active segment; nothing more to read.
+                return None
+            # Segment exhausted (or its torn tail skipped): move on and remove it.
+            if os.path.exists(path):
+                os.remove(path)
+            self._read_seq += 1
+            self._read_offset = 0
+            self._save_cursor()
+            self._cond.notify_all()
+
+    def _drain_forever(
+        self,
+        send_fn: typing.Callable[[bytes], None],
+        should_retry: typing.Callable[[Exception], bool],
+        initial_backoff: float,
+        max_backoff: float,
+    ) -> None:
+        backoff = initial_backoff
+        while True:
+            with self._cond:
+                while not self._stopping and (next_record := self._read_next()) is None:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                assert next_record is not None
+                record, seq, next_offset = next_record
+                self._in_flight = True
+
+            try:
+                send_fn(record)
+            except Exception as e:
+                if should_retry(e):
+                    logger.info(f"Failed to send spooled record, retrying: {e}")
+                    with self._cond:
+                        self._in_flight = False
+                        self._cond.notify_all()
+                        # While the server is unreachable, reclaim the space of
+                        # the records already sent
+                        self.compact()
+                        retry_at = time.monotonic() + backoff
+                        while not self._stopping and time.monotonic() < retry_at:
+                            self._cond.wait(retry_at - time.monotonic())
+                    backoff = min(backoff * 2, max_backoff)
+                    continue
+                logger.error(f"Dropping spooled record that could not be sent: {e}")
+            backoff = initial_backoff
+
+            with self._cond:
+                self._in_flight = False
+                if seq == self._read_seq:
+                    # Otherwise the segment was dropped by the size cap meanwhile
+                    self._pending_bytes -= next_offset - self._read_offset
+                    self._read_offset = next_offset
+                    self._save_cursor()
+                elif os.path.exists(self._segment_path(seq)):
+                    os.remove(self._segment_path(seq))
+                self._cond.notify_all()
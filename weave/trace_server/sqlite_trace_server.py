@@ -1,18 +1,19 @@
 # Sqlite Trace Server
 
-import contextvars
 import datetime
-import hashlib
 import json
+import os
 import sqlite3
 import threading
-from typing import Any, Iterator, Optional, cast
+import time
+import weakref
+from typing import Any, Iterator, Optional, Union, cast
 from zoneinfo import ZoneInfo
 
 import emoji
 
 from weave.trace_server.emoji_util import detone_emojis
-from weave.trace_server.errors import InvalidRequest
+from weave.trace_server.errors import InvalidRequest, RequestTooLarge
 from weave.trace_server.feedback import (
     TABLE_FEEDBACK,
     validate_feedback_create_req,
@@ -37,48 +38,164 @@ from weave.trace_server.trace_server_interface_util import (
 from . import trace_server_interface as tsi
 from .interface import query as tsi_query
 from .trace_server_interface_util import (
+    CALL_JSON_COLUMNS,
     assert_non_null_wb_user_id,
     bytes_digest,
+    calls_stats_from_calls,
     extract_refs_from_values,
+    file_part_chunks,
+    project_call_dict,
+    read_trace,
+    split_call_column,
     str_digest,
+    table_digest,
+    validate_calls_cursor_sort_by,
 )
 
 MAX_FLUSH_COUNT = 10000
 MAX_FLUSH_AGE = 15
 
+MAX_REFS_READ_BATCH_SIZE = 100_000
+# Stays below SQLite's limit on the number of bound parameters
+TABLE_ROWS_CHUNK_SIZE = 900
+
+# In table order
+SQLITE_CALLS_COLUMNS = (
+    "project_id",
+    "id",
+    "trace_id",
+    "parent_id",
+    "op_name",
+    "started_at",
+    "ended_at",
+    "exception",
+    "attributes",
+    "inputs",
+    "input_refs",
+    "output",
+    "output_refs",
+    "summary",
+    "wb_user_id",
+    "wb_run_id",
+    "deleted_at",
+    "display_name",
+)
+
 
 class NotFoundError(Exception):
     pass
 
 
-_conn_cursor: contextvars.ContextVar[
-    Optional[tuple[sqlite3.Connection, sqlite3.Cursor]]
-] = contextvars.ContextVar("conn_cursor", default=None)
+# Connections are kept open for the lifetime of their thread, keyed by database
+_local = threading.local()
 
 
 def get_conn_cursor(db_path: str) -> tuple[sqlite3.Connection, sqlite3.Cursor]:
-    # conn_cursor = _conn_cursor.get()
-    conn_cursor = None
+    conn_cursors: Optional[dict[str, tuple[sqlite3.Connection, sqlite3.Cursor]]]
+    conn_cursors = getattr(_local, "conn_cursors", None)
+    # A forked process gets a copy of the thread's connections, which must not
+    # be shared with the parent
+    if conn_cursors is None or _local.pid != os.getpid():
+        conn_cursors = _local.conn_cursors = {}
+        _local.pid = os.getpid()
+    conn_cursor = conn_cursors.get(db_path)
     if conn_cursor is None:
         conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        conn_cursor = (conn, cursor)
-        _conn_cursor.set(conn_cursor)
+        # Readers don't block the writer (and vice versa) in WAL mode. Both are
+        # ignored by in-memory databases.
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn_cursor = conn_cursors[db_path] = (conn, conn.cursor())
     return conn_cursor
 
 
+def _write_calls(db_path: str, pending: list[tuple[str, tuple]]) -> None:
+    """Commits the call writes still buffered by a collected server."""
+    if not pending:
+        return
+    conn, cursor = get_conn_cursor(db_path)
+    for sql, params in pending:
+        cursor.execute(sql, params)
+    conn.commit()
+    pending.clear()
+
+
+def _flush_calls_if_stale(server_ref: "weakref.ref[SqliteTraceServer]") -> None:
+    # Holds a weak reference, so that a pending timer doesn't keep the server
+    # alive
+    server = server_ref()
+    if server is not None:
+        server._flush_calls_if_stale()
+
+
 class SqliteTraceServer(tsi.TraceServerInterface):
     def __init__(self, db_path: str):
         self.lock = threading.Lock()
         self.db_path = db_path
+        # Call writes (statement, parameters) not committed yet
+        self._pending_calls: list[tuple[str, tuple]] = []
+        self._calls_pending_since = 0.0
+        weakref.finalize(self, _write_calls, db_path, self._pending_calls)
+
+    def flush(self) -> None:
+        """Commits the buffered call writes."""
+        conn, cursor = get_conn_cursor(self.db_path)
+        with self.lock:
+            self._write_pending_calls(cursor)
+            conn.commit()
+
+    def _insert_call(self, sql: str, params: tuple) -> None:
+        # Call writes are buffered and committed together, after
+        # `MAX_FLUSH_COUNT` writes or `MAX_FLUSH_AGE` seconds (checked by a
+        # timer), and before calls are read, updated or deleted.
+        with self.lock:
+            if not self._pending_calls:
+                self._calls_pending_since = time.monotonic()
+                timer = threading.Timer(
+                    MAX_FLUSH_AGE, _flush_calls_if_stale, args=(weakref.ref(self),)
+                )
+                timer.daemon = True
+                timer.start()
+            self._pending_calls.append((sql, params))
+            if len(self._pending_calls) < MAX_FLUSH_COUNT and (
+                time.monotonic() - self._calls_pending_since < MAX_FLUSH_AGE
+            ):
+                return
+            conn, cursor = get_conn_cursor(self.db_path)
+            self._write_pending_calls(cursor)
+            conn.commit()
+
+    def _flush_calls_if_stale(self) -> None:
+        conn, cursor = get_conn_cursor(self.db_path)
+        with self.lock:
+            if (
+                self._pending_calls
+                and time.monotonic() - self._calls_pending_since >= MAX_FLUSH_AGE
+            ):
+                self._write_pending_calls(cursor)
+                conn.commit()
+
+    def _write_pending_calls(self, cursor: sqlite3.Cursor) -> None:
+        # Called with the lock held, the caller commits
+        pending = list(self._pending_calls)
+        self._pending_calls.clear()
+        try:
+            for sql, params in pending:
+                cursor.execute(sql, params)
+        except BaseException:
+            cursor.connection.rollback()
+            raise
 
     def drop_tables(self) -> None:
         conn, cursor = get_conn_cursor(self.db_path)
+        with self.lock:
+            self._pending_calls.clear()
         cursor.execute(TABLE_FEEDBACK.drop_sql())
         cursor.execute("DROP TABLE IF EXISTS calls")
         cursor.execute("DROP TABLE IF EXISTS objects")
         cursor.execute("DROP TABLE IF EXISTS tables")
         cursor.execute("DROP TABLE IF EXISTS table_rows")
+        cursor.execute("DROP TABLE IF EXISTS file_chunks")
 
     def setup_tables(self) -> None:
         conn, cursor = get_conn_cursor(self.db_path)
@@ -147,52 +264,73 @@ class SqliteTraceServer(tsi.TraceServerInterface):
                 val BLOB)
             """
         )
+        # Chunks of files uploaded in parts, until every part is received
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS file_chunks (
+                project_id TEXT,
+                digest TEXT,
+                chunk_index INTEGER,
+                val BLOB,
+                UNIQUE (project_id, digest, chunk_index))
+            """
+        )
         cursor.execute(TABLE_FEEDBACK.create_sql())
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS calls_trace_id ON calls (project_id, trace_id)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS calls_parent_id ON calls (parent_id)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS calls_op_name ON calls (project_id, op_name)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS calls_started_at ON calls (project_id, started_at)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS objects_object_id ON objects (project_id, object_id)"
+        )
 
     # Creates a new call
     def call_start(self, req: tsi.CallStartReq) -> tsi.CallStartRes:
-        conn, cursor = get_conn_cursor(self.db_path)
         if req.start.trace_id is None:
             raise ValueError("trace_id is required")
         if req.start.id is None:
             raise ValueError("id is required")
-        with self.lock:
-            # Converts the user-provided call details into a clickhouse schema.
-            # This does validation and conversion of the input data as well
-            # as enforcing business rules and defaults
-            cursor.execute(
-                """INSERT INTO calls (
-                    project_id,
-                    id,
-                    trace_id,
-                    parent_id,
-                    op_name,
-                    display_name,
-                    started_at,
-                    attributes,
-                    inputs,
-                    input_refs,
-                    wb_user_id,
-                    wb_run_id
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    req.start.project_id,
-                    req.start.id,
-                    req.start.trace_id,
-                    req.start.parent_id,
-                    req.start.op_name,
-                    req.start.display_name,
-                    req.start.started_at.isoformat(),
-                    json.dumps(req.start.attributes),
-                    json.dumps(req.start.inputs),
-                    json.dumps(
-                        extract_refs_from_values(list(req.start.inputs.values()))
-                    ),
-                    req.start.wb_user_id,
-                    req.start.wb_run_id,
-                ),
-            )
-            conn.commit()
+        # Converts the user-provided call details into a clickhouse schema.
+        # This does validation and conversion of the input data as well
+        # as enforcing business rules and defaults
+        self._insert_call(
+            """INSERT INTO calls (
+                project_id,
+                id,
+                trace_id,
+                parent_id,
+                op_name,
+                display_name,
+                started_at,
+                attributes,
+                inputs,
+                input_refs,
+                wb_user_id,
+                wb_run_id
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (
+                req.start.project_id,
+                req.start.id,
+                req.start.trace_id,
+                req.start.parent_id,
+                req.start.op_name,
+                req.start.display_name,
+                req.start.started_at.isoformat(),
+                json.dumps(req.start.attributes),
+                json.dumps(req.start.inputs),
+                json.dumps(extract_refs_from_values(list(req.start.inputs.values()))),
+                req.start.wb_user_id,
+                req.start.wb_run_id,
+            ),
+        )
 
         # Returns the id of the newly created call
         return tsi.CallStartRes(
@@ -201,34 +339,81 @@ class SqliteTraceServer(tsi.TraceServerInterface):
         )
 
     def call_end(self, req: tsi.CallEndReq) -> tsi.CallEndRes:
-        conn, cursor = get_conn_cursor(self.db_path)
         parsable_output = req.end.output
         if not isinstance(parsable_output, dict):
             parsable_output = {"output": parsable_output}
         parsable_output = cast(dict, parsable_output)
-        with self.lock:
-            cursor.execute(
-                """UPDATE calls SET
+        self._insert_call(
+            """UPDATE calls SET
                     ended_at = ?,
                     exception = ?,
                     output = ?,
                     output_refs = ?,
                     summary = ?
                 WHERE id = ?""",
-                (
-                    req.end.ended_at.isoformat(),
-                    req.end.exception,
-                    json.dumps(req.end.output),
-                    json.dumps(
-                        extract_refs_from_values(list(parsable_output.values()))
-                    ),
-                    json.dumps(req.end.summary),
-                    req.end.id,
-                ),
-            )
-            conn.commit()
+            (
+                req.end.ended_at.isoformat(),
+                req.end.exception,
+                json.dumps(req.end.output),
+                json.dumps(extract_refs_from_values(list(parsable_output.values()))),
+                json.dumps(req.end.summary),
+                req.end.id,
+            ),
+        )
         return tsi.CallEndRes()
 
+    def call_complete(self, req: tsi.CallCompleteReq) -> tsi.CallCompleteRes:
+        complete = req.complete
+        if complete.trace_id is None:
+            raise ValueError("trace_id is required")
+        if complete.id is None:
+            raise ValueError("id is required")
+        parsable_output = complete.output
+        if not isinstance(parsable_output, dict):
+            parsable_output = {"output": parsable_output}
+        parsable_output = cast(dict, parsable_output)
+        self._insert_call(
+            """INSERT INTO calls (
+                    project_id,
+                    id,
+                    trace_id,
+                    parent_id,
+                    op_name,
+                    display_name,
+                    started_at,
+                    attributes,
+                    inputs,
+                    input_refs,
+                    wb_user_id,
+                    wb_run_id,
+                    ended_at,
+                    exception,
+                    output,
+                    output_refs,
+                    summary
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (
+                complete.project_id,
+                complete.id,
+                complete.trace_id,
+                complete.parent_id,
+                complete.op_name,
+                complete.display_name,
+                complete.started_at.isoformat(),
+                json.dumps(complete.attributes),
+                json.dumps(complete.inputs),
+                json.dumps(extract_refs_from_values(list(complete.inputs.values()))),
+                complete.wb_user_id,
+                complete.wb_run_id,
+                complete.ended_at.isoformat(),
+                complete.exception,
+                json.dumps(complete.output),
+                json.dumps(extract_refs_from_values(list(parsable_output.values()))),
+                json.dumps(complete.summary),
+            ),
+        )
+        return tsi.CallCompleteRes(id=complete.id, trace_id=complete.trace_id)
+
     def call_read(self, req: tsi.CallReadReq) -> tsi.CallReadRes:
         return tsi.CallReadRes(
             call=self.calls_query(
@@ -241,9 +426,11 @@ class SqliteTraceServer(tsi.TraceServerInterface):
         )
 
     def calls_query(self, req: tsi.CallsQueryReq) -> tsi.CallsQueryRes:
-        print("REQ", req)
+        self.flush()
         conn, cursor = get_conn_cursor(self.db_path)
         conds = []
+        # In the order of their placeholders in the query
+        params: list[Any] = [req.project_id]
         filter = req.filter
         if filter:
             if filter.op_names:
@@ -258,12 +445,15 @@ class SqliteTraceServer(tsi.TraceServerInterface):
                         non_wildcarded_names.append(name)
 
                 if non_wildcarded_names:
-                    in_expr = ", ".join((f"'{x}'" for x in non_wildcarded_names))
-                    or_conditions += [f"op_name IN ({', '.join({in_expr})})"]
+                    or_conditions.append(
+                        f"op_name IN ({_in_list(non_wildcarded_names)})"
+                    )
+                    params += non_wildcarded_names
 
-                for name_ndx, name in enumerate(wildcarded_names):
+                for name in wildcarded_names:
                     like_name = name[: -len(WILDCARD_ARTIFACT_VERSION_AND_PATH)] + "%"
-                    or_conditions.append(f"op_name LIKE '{like_name}'")
+                    or_conditions.append("op_name LIKE ?")
+                    params.append(like_name)
 
                 if or_conditions:
                     conds.append("(" + " OR ".join(or_conditions) + ")")
@@ -271,27 +461,29 @@ class SqliteTraceServer(tsi.TraceServerInterface):
             if filter.input_refs:
                 or_conditions = []
                 for ref in filter.input_refs:
-                    or_conditions.append(f"input_refs LIKE '%{ref}%'")
+                    or_conditions.append("input_refs LIKE ?")
+                    params.append(f"%{ref}%")
                 conds.append("(" + " OR ".join(or_conditions) + ")")
             if filter.output_refs:
                 or_conditions = []
                 for ref in filter.output_refs:
-                    or_conditions.append(f"output_refs LIKE '%{ref}%'")
+                    or_conditions.append("output_refs LIKE ?")
+                    params.append(f"%{ref}%")
                 conds.append("(" + " OR ".join(or_conditions) + ")")
             if filter.parent_ids:
-                in_expr = ", ".join((f"'{x}'" for x in filter.parent_ids))
-                conds += [f"parent_id IN ({in_expr})"]
+                conds.append(f"parent_id IN ({_in_list(filter.parent_ids)})")
+                params += filter.parent_ids
             if filter.trace_ids:
-                in_expr = ", ".join((f"'{x}'" for x in filter.trace_ids))
-                conds += [f"trace_id IN ({in_expr})"]
+                conds.append(f"trace_id IN ({_in_list(filter.trace_ids)})")
+                params += filter.trace_ids
             if filter.call_ids:
-                in_expr = ", ".join((f"'{x}'" for x in filter.call_ids))
-                conds += [f"id IN ({in_expr})"]
+                conds.append(f"id IN ({_in_list(filter.call_ids)})")
+                params += filter.call_ids
             if filter.trace_roots_only:
                 conds.append("parent_id IS NULL")
             if filter.wb_run_ids:
-                in_expr = ", ".join((f"'{x}'" for x in filter.wb_run_ids))
-                conds += [f"wb_run_id IN ({in_expr})"]
+                conds.append(f"wb_run_id IN ({_in_list(filter.wb_run_ids)})")
+                params += filter.wb_run_ids
 
         if req.query:
             # This is the mongo-style query
@@ -375,7 +567,23 @@ class SqliteTraceServer(tsi.TraceServerInterface):
 
             conds.append(filter_cond)
 
-        query = f"SELECT * FROM calls WHERE deleted_at IS NULL AND project_id = '{req.project_id}'"
+        if req.after is not None:
+            validate_calls_cursor_sort_by(req.sort_by)
+            # started_at is stored as an ISO string, which sorts chronologically
+            conds.append("(started_at, id) > (?, ?)")
+            params += [req.after.started_at.isoformat(), req.after.id]
+
+        select_columns = "*"
+        if req.columns is not None:
+            # Heavy JSON columns are only loaded when (part of) them is requested
+            requested_bases = {split_call_column(col)[0] for col in req.columns}
+            select_columns = ", ".join(
+                col
+                if col not in CALL_JSON_COLUMNS or col in requested_bases
+                else f"NULL AS {col}"
+                for col in SQLITE_CALLS_COLUMNS
+            )
+        query = f"SELECT {select_columns} FROM calls WHERE deleted_at IS NULL AND project_id = ?"
 
         conditions_part = " AND ".join(conds)
 
@@ -385,6 +593,8 @@ class SqliteTraceServer(tsi.TraceServerInterface):
         order_by = (
             None if not req.sort_by else [(s.field, s.direction) for s in req.sort_by]
         )
+        if req.after is not None:
+            order_by = [("started_at", "asc"), ("id", "asc")]
         if order_by is not None:
             order_parts = []
             for field, direction in order_by:
@@ -422,34 +632,34 @@ class SqliteTraceServer(tsi.TraceServerInterface):
             query += f" LIMIT {limit}"
         if req.offset:
             query += f" OFFSET {req.offset}"
-        print("QUERY", query)
 
-        cursor.execute(query)
+        cursor.execute(query, params)
 
         query_result = cursor.fetchall()
-        return tsi.CallsQueryRes(
-            calls=[
-                tsi.CallSchema(
-                    project_id=row[0],
-                    id=row[1],
-                    trace_id=row[2],
-                    parent_id=row[3],
-                    op_name=row[4],
-                    started_at=row[5],
-                    ended_at=row[6],
-                    exception=row[7],
-                    attributes=json.loads(row[8]),
-                    inputs=json.loads(row[9]),
-                    output=None if row[11] is None else json.loads(row[11]),
-                    output_refs=None if row[12] is None else json.loads(row[12]),
-                    summary=json.loads(row[13]) if row[13] else None,
-                    wb_user_id=row[14],
-                    wb_run_id=row[15],
-                    display_name=row[17] if row[17] != "" else None,
-                )
-                for row in query_result
-            ]
-        )
+        calls = []
+        for row in query_result:
+            call_dict = dict(
+                project_id=row[0],
+                id=row[1],
+                trace_id=row[2],
+                parent_id=row[3],
+                op_name=row[4],
+                started_at=row[5],
+                ended_at=row[6],
+                exception=row[7],
+                attributes=json.loads(row[8]) if row[8] else {},
+                inputs=json.loads(row[9]) if row[9] else {},
+                output=None if row[11] is None else json.loads(row[11]),
+                output_refs=None if row[12] is None else json.loads(row[12]),
+                summary=json.loads(row[13]) if row[13] else None,
+                wb_user_id=row[14],
+                wb_run_id=row[15],
+                display_name=row[17] if row[17] != "" else None,
+            )
+            if req.columns is not None:
+                call_dict = project_call_dict(call_dict, req.columns)
+            calls.append(tsi.CallSchema(**call_dict))
+        return tsi.CallsQueryRes(calls=calls)
 
     def calls_query_stream(self, req: tsi.CallsQueryReq) -> Iterator[tsi.CallSchema]:
         return iter(self.calls_query(req).calls)
@@ -466,11 +676,25 @@ class SqliteTraceServer(tsi.TraceServerInterface):
             count=len(calls),
         )
 
+    def calls_stats(self, req: tsi.CallsStatsReq) -> tsi.CallsStatsRes:
+        calls = self.calls_query_stream(
+            tsi.CallsQueryReq(
+                project_id=req.project_id,
+                filter=tsi._CallsFilter(op_names=req.op_names),
+                columns=["ended_at", "exception", "summary.usage"],
+            )
+        )
+        return calls_stats_from_calls(req, calls)
+
+    def trace_read(self, req: tsi.TraceReadReq) -> tsi.TraceReadRes:
+        return read_trace(self.calls_query_stream, req)
+
     def calls_delete(self, req: tsi.CallsDeleteReq) -> tsi.CallsDeleteRes:
         assert_non_null_wb_user_id(req)
         # update row with a deleted_at field set to now
         conn, cursor = get_conn_cursor(self.db_path)
         with self.lock:
+            self._write_pending_calls(cursor)
             recursive_query = """
                 WITH RECURSIVE Descendants AS (
                     SELECT id
@@ -500,7 +724,6 @@ class SqliteTraceServer(tsi.TraceServerInterface):
                 WHERE deleted_at is NULL AND
                     id IN ({})
             """.format(", ".join("?" * len(all_ids)))
-            print("MUTATION", delete_query)
             cursor.execute(delete_query, all_ids)
             conn.commit()
 
@@ -513,6 +736,7 @@ class SqliteTraceServer(tsi.TraceServerInterface):
 
         conn, cursor = get_conn_cursor(self.db_path)
         with self.lock:
+            self._write_pending_calls(cursor)
             cursor.execute(
                 "UPDATE calls SET display_name = ? WHERE id = ?",
                 (req.display_name, req.call_id),
@@ -537,7 +761,8 @@ class SqliteTraceServer(tsi.TraceServerInterface):
         req_obj = req.obj
         # TODO: version index isn't right here, what if we delete stuff?
         with self.lock:
-            cursor.execute("BEGIN TRANSACTION")
+            if not conn.in_transaction:
+                cursor.execute("BEGIN TRANSACTION")
             # first get version count
             cursor.execute(
                 """SELECT COUNT(*) FROM objects WHERE project_id = ? AND object_id = ?""",
@@ -575,14 +800,17 @@ class SqliteTraceServer(tsi.TraceServerInterface):
         return tsi.ObjCreateRes(digest=digest)
 
     def obj_read(self, req: tsi.ObjReadReq) -> tsi.ObjReadRes:
-        conds = [f"object_id = '{req.object_id}'"]
+        conds = ["object_id = ?"]
+        params = [req.object_id]
         if req.digest == "latest":
             conds.append("is_latest = 1")
         else:
-            conds.append(f"digest = '{req.digest}'")
+            conds.append("digest = ?")
+            params.append(req.digest)
         objs = self._select_objs_query(
             req.project_id,
             conditions=conds,
+            parameters=params,
         )
         if len(objs) == 0:
             raise NotFoundError(f"Obj {req.object_id}:{req.digest} not found")
@@ -591,6 +819,7 @@ class SqliteTraceServer(tsi.TraceServerInterface):
 
     def objs_query(self, req: tsi.ObjQueryReq) -> tsi.ObjQueryRes:
         conds: list[str] = []
+        params: list[Any] = []
         if req.filter:
             if req.filter.is_op is not None:
                 if req.filter.is_op:
@@ -598,50 +827,128 @@ class SqliteTraceServer(tsi.TraceServerInterface):
                 else:
                     conds.append("kind != 'op'")
             if req.filter.object_ids:
-                in_list = ", ".join([f"'{n}'" for n in req.filter.object_ids])
-                conds.append(f"object_id IN ({in_list})")
+                conds.append(f"object_id IN ({_in_list(req.filter.object_ids)})")
+                params += req.filter.object_ids
             if req.filter.latest_only:
                 conds.append("is_latest = 1")
             if req.filter.base_object_classes:
-                in_list = ", ".join([f"'{t}'" for t in req.filter.base_object_classes])
-                conds.append(f"base_object_class IN ({in_list})")
+                conds.append(
+                    f"base_object_class IN ({_in_list(req.filter.base_object_classes)})"
+                )
+                params += req.filter.base_object_classes
 
         objs = self._select_objs_query(
             req.project_id,
             conditions=conds,
+            parameters=params,
         )
 
         return tsi.ObjQueryRes(objs=objs)
 
     def table_create(self, req: tsi.TableCreateReq) -> tsi.TableCreateRes:
         conn, cursor = get_conn_cursor(self.db_path)
-        insert_rows = []
-        for r in req.table.rows:
-            if not isinstance(r, dict):
-                raise ValueError("All rows must be dictionaries")
-            row_json = json.dumps(r)
-            row_digest = str_digest(row_json)
-            insert_rows.append((req.table.project_id, row_digest, row_json))
         with self.lock:
-            cursor.executemany(
-                "INSERT OR IGNORE INTO table_rows (project_id, digest, val) VALUES (?, ?, ?)",
-                insert_rows,
+            row_digests = self._insert_table_rows(
+                cursor, req.table.project_id, req.table.rows
             )
+            digest = self._insert_table(cursor, req.table.project_id, row_digests)
+            conn.commit()
+
+        return tsi.TableCreateRes(digest=digest)
+
+    def table_rows_missing(
+        self, req: tsi.TableRowsMissingReq
+    ) -> tsi.TableRowsMissingRes:
+        conn, cursor = get_conn_cursor(self.db_path)
+        existing = self._existing_table_row_digests(
+            cursor, req.project_id, req.row_digests
+        )
+        return tsi.TableRowsMissingRes(
+            row_digests=[d for d in dict.fromkeys(req.row_digests) if d not in existing]
+        )
 
-            row_digests = [r[1] for r in insert_rows]
+    def table_rows_create(self, req: tsi.TableRowsCreateReq) -> tsi.TableRowsCreateRes:
+        conn, cursor = get_conn_cursor(self.db_path)
+        with self.lock:
+            row_digests = self._insert_table_rows(cursor, req.project_id, req.rows)
+            conn.commit()
+        return tsi.TableRowsCreateRes(row_digests=row_digests)
 
-            table_hasher = hashlib.sha256()
-            for row_digest in row_digests:
-                table_hasher.update(row_digest.encode())
-            digest = table_hasher.hexdigest()
+    def table_create_from_digests(
+        self, req: tsi.TableCreateFromDigestsReq
+    ) -> tsi.TableCreateFromDigestsRes:
+        conn, cursor = get_conn_cursor(self.db_path)
+        existing = self._existing_table_row_digests(
+            cursor, req.project_id, req.row_digests
+        )
+        missing = [d for d in req.row_digests if d not in existing]
+        if missing:
+            raise InvalidRequest(
+                f"Cannot create a table from {len(missing)} row digest(s) with no stored row, eg. {missing[0]}"
+            )
+        with self.lock:
+            digest = self._insert_table(cursor, req.project_id, req.row_digests)
+            conn.commit()
+        return tsi.TableCreateFromDigestsRes(digest=digest)
 
-            cursor.execute(
-                "INSERT OR IGNORE INTO tables (project_id, digest, row_digests) VALUES (?, ?, ?)",
-                (req.table.project_id, digest, json.dumps(row_digests)),
+    def table_append(self, req: tsi.TableAppendReq) -> tsi.TableAppendRes:
+        conn, cursor = get_conn_cursor(self.db_path)
+        cursor.execute(
+            "SELECT row_digests FROM tables WHERE project_id = ? AND digest = ?",
+            (req.project_id, req.base_digest),
+        )
+        query_result = cursor.fetchone()
+        if query_result is None:
+            raise NotFoundError(f"Table {req.base_digest} not found")
+        base_row_digests = json.loads(query_result[0])
+        with self.lock:
+            row_digests = self._insert_table_rows(cursor, req.project_id, req.rows)
+            digest = self._insert_table(
+                cursor, req.project_id, base_row_digests + row_digests
             )
             conn.commit()
+        return tsi.TableAppendRes(digest=digest)
+
+    def _existing_table_row_digests(
+        self, cursor: sqlite3.Cursor, project_id: str, row_digests: list[str]
+    ) -> set[str]:
+        existing: set[str] = set()
+        unique_digests = list(dict.fromkeys(row_digests))
+        for i in range(0, len(unique_digests), TABLE_ROWS_CHUNK_SIZE):
+            chunk = unique_digests[i : i + TABLE_ROWS_CHUNK_SIZE]
+            cursor.execute(
+                f"""SELECT digest FROM table_rows
+                WHERE project_id = ? AND digest IN ({", ".join("?" * len(chunk))})""",
+                (project_id, *chunk),
+            )
+            existing.update(row[0] for row in cursor.fetchall())
+        return existing
 
-        return tsi.TableCreateRes(digest=digest)
+    def _insert_table_rows(
+        self, cursor: sqlite3.Cursor, project_id: str, rows: list[Any]
+    ) -> list[str]:
+        insert_rows = []
+        for r in rows:
+            if not isinstance(r, dict):
+                raise ValueError("All rows must be dictionaries")
+            row_json = json.dumps(r)
+            row_digest = str_digest(row_json)
+            insert_rows.append((project_id, row_digest, row_json))
+        cursor.executemany(
+            "INSERT OR IGNORE INTO table_rows (project_id, digest, val) VALUES (?, ?, ?)",
+            insert_rows,
+        )
+        return [r[1] for r in insert_rows]
+
+    def _insert_table(
+        self, cursor: sqlite3.Cursor, project_id: str, row_digests: list[str]
+    ) -> str:
+        digest = table_digest(row_digests)
+        cursor.execute(
+            "INSERT OR IGNORE INTO tables (project_id, digest, row_digests) VALUES (?, ?, ?)",
+            (project_id, digest, json.dumps(row_digests)),
+        )
+        return digest
 
     def table_query(self, req: tsi.TableQueryReq) -> tsi.TableQueryRes:
         conds = []
@@ -658,28 +965,34 @@ class SqliteTraceServer(tsi.TraceServerInterface):
         # where it can. Like it should group by object that we need to read.
         # And it should also batch into table refs (like when we are reading a bunch
         # of rows from a single Dataset)
-        if len(req.refs) > 1000:
-            raise ValueError("Too many refs")
+        if len(req.refs) > MAX_REFS_READ_BATCH_SIZE:
+            raise RequestTooLarge(
+                f"Cannot read more than {MAX_REFS_READ_BATCH_SIZE} refs at once"
+            )
 
         parsed_refs = [parse_internal_uri(r) for r in req.refs]
-        if any(isinstance(r, InternalTableRef) for r in parsed_refs):
-            raise ValueError("Table refs not supported")
-        parsed_obj_refs = cast(list[InternalObjectRef], parsed_refs)
-
-        def read_ref(r: InternalObjectRef) -> Any:
-            conds = [
-                f"object_id = '{r.name}'",
-                f"digest = '{r.version}'",
-            ]
-            objs = self._select_objs_query(
-                r.project_id,
-                conditions=conds,
-            )
-            if len(objs) == 0:
-                raise NotFoundError(f"Obj {r.name}:{r.version} not found")
-            obj = objs[0]
-            val = obj.val
+
+        def read_ref(r: Union[InternalObjectRef, InternalTableRef]) -> Any:
             extra = r.extra
+            if isinstance(r, InternalTableRef):
+                # A bare table ref resolves to all of its rows. Row refs are
+                # resolved below, as if the table were the value of an object.
+                if not extra:
+                    rows = self._table_query(r.project_id, r.digest, ["1 = 1"])
+                    return [row.val for row in rows]
+                val: Any = InternalTableRef(
+                    project_id=r.project_id, digest=r.digest
+                ).uri()
+            else:
+                objs = self._select_objs_query(
+                    r.project_id,
+                    conditions=["object_id = ?", "digest = ?"],
+                    parameters=[r.name, r.version],
+                )
+                if len(objs) == 0:
+                    raise NotFoundError(f"Obj {r.name}:{r.version} not found")
+                obj = objs[0]
+                val = obj.val
             for extra_index in range(0, len(extra), 2):
                 op, arg = extra[extra_index], extra[extra_index + 1]
                 if op == DICT_KEY_EDGE_NAME:
@@ -709,7 +1022,7 @@ class SqliteTraceServer(tsi.TraceServerInterface):
                     raise ValueError(f"Unknown ref type: {extra[extra_index]}")
             return val
 
-        return tsi.RefsReadBatchRes(vals=[read_ref(r) for r in parsed_obj_refs])
+        return tsi.RefsReadBatchRes(vals=[read_ref(r) for r in parsed_refs])
 
     def feedback_create(self, req: tsi.FeedbackCreateReq) -> tsi.FeedbackCreateRes:
         assert_non_null_wb_user_id(req)
@@ -802,6 +1115,75 @@ class SqliteTraceServer(tsi.TraceServerInterface):
             conn.commit()
         return tsi.FileCreateRes(digest=digest)
 
+    def file_create_part(self, req: tsi.FileCreatePartReq) -> tsi.FileCreatePartRes:
+        first_chunk_index, n_chunks = file_part_chunks(req)
+        conn, cursor = get_conn_cursor(self.db_path)
+        with self.lock:
+            cursor.executemany(
+                "INSERT OR IGNORE INTO file_chunks (project_id, digest, chunk_index, val) VALUES (?, ?, ?, ?)",
+                [
+                    (
+                        req.project_id,
+                        req.digest,
+                        first_chunk_index + i,
+                        req.content[offset : offset + tsi.FILE_CHUNK_SIZE],
+                    )
+                    for i, offset in enumerate(
+                        range(0, len(req.content), tsi.FILE_CHUNK_SIZE)
+                    )
+                ],
+            )
+            cursor.execute(
+                "SELECT COUNT(*) FROM file_chunks WHERE project_id = ? AND digest = ?",
+                (req.project_id, req.digest),
+            )
+            if cursor.fetchone()[0] == n_chunks:
+                # Every part was received: move the file out of the staging table
+                cursor.execute(
+                    "SELECT val FROM file_chunks WHERE project_id = ? AND digest = ? ORDER BY chunk_index",
+                    (req.project_id, req.digest),
+                )
+                content = b"".join(row[0] for row in cursor.fetchall())
+                if bytes_digest(content) != req.digest:
+                    cursor.execute(
+                        "DELETE FROM file_chunks WHERE project_id = ? AND digest = ?",
+                        (req.project_id, req.digest),
+                    )
+                    conn.commit()
+                    raise InvalidRequest(f"File content does not match {req.digest}")
+                cursor.execute(
+                    "INSERT OR IGNORE INTO files (project_id, digest, val) VALUES (?, ?, ?)",
+                    (req.project_id, req.digest, content),
+                )
+                cursor.execute(
+                    "DELETE FROM file_chunks WHERE project_id = ? AND digest = ?",
+                    (req.project_id, req.digest),
+                )
+            conn.commit()
+        return tsi.FileCreatePartRes()
+
+    def file_parts_missing(
+        self, req: tsi.FilePartsMissingReq
+    ) -> tsi.FilePartsMissingRes:
+        conn, cursor = get_conn_cursor(self.db_path)
+        cursor.execute(
+            "SELECT 1 FROM files WHERE project_id = ? AND digest = ?",
+            (req.project_id, req.digest),
+        )
+        if cursor.fetchone() is not None:
+            return tsi.FilePartsMissingRes(offsets=[])
+        cursor.execute(
+            "SELECT chunk_index FROM file_chunks WHERE project_id = ? AND digest = ?",
+            (req.project_id, req.digest),
+        )
+        uploaded = {row[0] for row in cursor.fetchall()}
+        n_chunks = -(-req.size // tsi.FILE_CHUNK_SIZE)
+        return tsi.FilePartsMissingRes(
+            offsets=[
+                i * tsi.FILE_CHUNK_SIZE for i in range(n_chunks) if i not in uploaded
+            ]
+        )
+
     def file_content_read(self, req: tsi.FileContentReadReq) -> tsi.FileContentReadRes:
         conn, cursor = get_conn_cursor(self.db_path)
         cursor.execute(
@@ -813,6 +1195,11 @@ class SqliteTraceServer(tsi.TraceServerInterface):
             raise NotFoundError(f"File {req.digest} not found")
         return tsi.FileContentReadRes(content=query_result[0])
 
+    def file_content_read_stream(self, req: tsi.FileContentReadReq) -> Iterator[bytes]:
+        content = self.file_content_read(req).content
+        for offset in range(0, len(content), tsi.FILE_CHUNK_SIZE):
+            yield content[offset : offset + tsi.FILE_CHUNK_SIZE]
+
     def _table_query(
         self,
         project_id: str,
@@ -878,13 +1265,14 @@ class SqliteTraceServer(tsi.TraceServerInterface):
         project_id: str,
         conditions: Optional[list[str]] = None,
         limit: Optional[int] = None,
+        parameters: Optional[list[Any]] = None,
     ) -> list[tsi.ObjSchema]:
         conn, cursor = get_conn_cursor(self.db_path)
         pred = " AND ".join(conditions or ["1 = 1"])
         cursor.execute(
             """SELECT * FROM objects WHERE deleted_at IS NULL AND project_id = ? AND """
             + pred,
-            (project_id,),
+            (project_id, *(parameters or [])),
         )
         query_result = cursor.fetchall()
         result: list[tsi.ObjSchema] = []
@@ -906,6 +1294,10 @@ class SqliteTraceServer(tsi.TraceServerInterface):
         return result
 
 
+def _in_list(values: list[Any]) -> str:
+    return ", ".join("?" * len(values))
+
+
 def get_type(val: Any) -> str:
     if val == None:
         return "none"
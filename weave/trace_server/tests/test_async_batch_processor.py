@@ -0,0 +1,143 @@
+import os
+import threading
+import time
+
+import pytest
+
+from weave.trace_server.async_batch_processor import AsyncBatchProcessor, Histogram
+
+
+def test_flushes_on_max_batch_size():
+    batches = []
+    processor = AsyncBatchProcessor(batches.append, max_batch_size=3, max_linger=60)
+    processor.enqueue([1, 2, 3, 4])
+    deadline = time.monotonic() + 5
+    while not batches and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # The full batch ships right away, the remainder waits for its linger
+    assert batches == [[1, 2, 3]]
+    assert processor.flush(timeout=5)
+    assert batches == [[1, 2, 3], [4]]
+    processor.wait_until_all_processed()
+
+
+def test_flushes_on_max_linger():
+    batches = []
+    processor = AsyncBatchProcessor(batches.append, max_batch_size=100, max_linger=0.05)
+    start = time.monotonic()
+    processor.enqueue([1])
+    while not batches and time.monotonic() - start < 5:
+        time.sleep(0.005)
+    assert batches == [[1]]
+    assert time.monotonic() - start < 1
+    processor.wait_until_all_processed()
+
+
+def test_flushes_on_max_batch_bytes():
+    batches = []
+    processor = AsyncBatchProcessor(
+        batches.append,
+        max_batch_size=100,
+        max_linger=60,
+        max_batch_bytes=10,
+        size_fn=len,
+    )
+    processor.enqueue(["aaaa", "bbbb", "cccc"])
+    assert processor.flush(timeout=5)
+    assert batches == [["aaaa", "bbbb"], ["cccc"]]
+    assert processor.batch_bytes.count == 2
+    assert processor.batch_bytes.max == 8
+    processor.wait_until_all_processed()
+
+
+def test_multiple_workers_process_concurrently():
+    in_processor = 0
+    max_in_processor = 0
+    lock = threading.Lock()
+    processed = []
+
+    def process(batch):
+        nonlocal in_processor, max_in_processor
+        with lock:
+            in_processor += 1
+            max_in_processor = max(max_in_processor, in_processor)
+        time.sleep(0.05)
+        with lock:
+            in_processor -= 1
+            processed.extend(batch)
+
+    processor = AsyncBatchProcessor(
+        process, max_batch_size=1, max_linger=60, num_workers=4
+    )
+    processor.enqueue(list(range(8)))
+    assert processor.flush(timeout=5)
+    assert sorted(processed) == list(range(8))
+    assert max_in_processor > 1
+    assert processor.batch_size.count == 8
+    assert processor.batch_latency.count == 8
+    processor.wait_until_all_processed()
+
+
+def test_processor_errors_do_not_stop_processing():
+    processed = []
+
+    def process(batch):
+        if batch == [1]:
+            raise ValueError("boom")
+        processed.extend(batch)
+
+    processor = AsyncBatchProcessor(process, max_batch_size=1, max_linger=60)
+    processor.enqueue([1, 2])
+    assert processor.flush(timeout=5)
+    assert processed == [2]
+    processor.wait_until_all_processed()
+
+
+def test_restarts_after_wait_until_all_processed():
+    batches = []
+    processor = AsyncBatchProcessor(batches.append, max_linger=60)
+    processor.enqueue([1])
+    processor.wait_until_all_processed()
+    processor.enqueue([2])
+    processor.wait_until_all_processed()
+    assert batches == [[1], [2]]
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+def test_works_after_fork():
+    batches = []
+    release = threading.Event()
+
+    def process(batch):
+        release.wait()
+        batches.append(batch)
+
+    processor = AsyncBatchProcessor(process, max_batch_size=1, max_linger=60)
+    # One batch in flight and one queued while forking
+    processor.enqueue([1, 2])
+    time.sleep(0.1)
+    pid = os.fork()
+    if pid == 0:
+        release.set()
+        processor.enqueue([3])
+        ok = processor.flush(timeout=5) and batches == [[3]]
+        processor.wait_until_all_processed()
+        os._exit(0 if ok else 1)
+    release.set()
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    assert processor.flush(timeout=5)
+    assert batches == [[1], [2]]
+    processor.wait_until_all_processed()
+
+
+def test_histogram():
+    hist = Histogram([1, 10, 100])
+    for value in [0.5, 5, 5, 50, 500]:
+        hist.observe(value)
+    assert hist.count == 5
+    assert hist.counts == [1, 2, 1, 1]
+    assert hist.min == 0.5
+    assert hist.max == 500
+    assert hist.percentile(50) == 10
+    assert hist.percentile(100) == 500
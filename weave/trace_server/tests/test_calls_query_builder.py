@@ -1,3 +1,5 @@
+import datetime
+
 import sqlparse
 
 from weave.trace_server import trace_server_interface as tsi
@@ -24,6 +26,27 @@ def test_query_baseline() -> None:
     )
 
 
+def test_query_heavy_column_sub_path() -> None:
+    cq = CallsQuery(project_id="project")
+    cq.add_field("id")
+    cq.add_field("output.score")
+    assert_sql(
+        cq,
+        """
+        SELECT
+            calls_merged.id AS id,
+            JSONExtractRaw(any(calls_merged.output_dump), {pb_0:String}) AS output_dump__db895615185ff0ab
+        FROM calls_merged
+        WHERE project_id = {pb_1:String}
+        GROUP BY (project_id,id)
+        HAVING (
+            any(calls_merged.deleted_at) IS NULL
+        )
+        """,
+        {"pb_0": "score", "pb_1": "project"},
+    )
+
+
 def test_query_light_column() -> None:
     cq = CallsQuery(project_id="project")
     cq.add_field("id")
@@ -193,6 +216,49 @@ def test_query_heavy_column_simple_filter_with_order_and_limit() -> None:
     )
 
 
+def test_query_heavy_column_with_cursor_and_limit() -> None:
+    cq = CallsQuery(project_id="project")
+    cq.add_field("id")
+    cq.add_field("inputs")
+    cq.set_cursor(
+        tsi._CallsCursor(
+            started_at=datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc),
+            id="abc",
+        )
+    )
+    cq.set_limit(10)
+    assert_sql(
+        cq,
+        """
+        WITH filtered_calls AS (
+            SELECT
+                calls_merged.id AS id
+            FROM calls_merged
+            WHERE project_id = {pb_2:String}
+            GROUP BY (project_id,id)
+            HAVING (
+                ((any(calls_merged.deleted_at) IS NULL))
+            AND
+                (((any(calls_merged.started_at), calls_merged.id) > (fromUnixTimestamp64Milli({pb_0:Int64}), {pb_1:String})))
+            )
+            ORDER BY any(calls_merged.started_at) ASC, calls_merged.id ASC
+            LIMIT 10
+        )
+        SELECT
+            calls_merged.id AS id,
+            any(calls_merged.inputs_dump) AS inputs_dump
+        FROM calls_merged
+        WHERE
+            project_id = {pb_3:String}
+        AND
+            (id IN filtered_calls)
+        GROUP BY (project_id,id)
+        ORDER BY any(calls_merged.started_at) ASC, calls_merged.id ASC
+        """,
+        {"pb_0": 1704067200000, "pb_1": "abc", "pb_2": "project", "pb_3": "project"},
+    )
+
+
 def test_query_heavy_column_simple_filter_with_order_and_limit_and_mixed_query_conditions() -> (
     None
 ):
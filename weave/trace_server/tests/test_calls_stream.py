@@ -0,0 +1,51 @@
+import datetime
+import io
+
+from weave.trace_server import trace_server_interface as tsi
+from weave.trace_server.calls_stream import (
+    decode_calls_arrow,
+    decode_calls_ndjson,
+    encode_calls_arrow,
+    encode_calls_ndjson,
+)
+
+
+def make_calls(n: int) -> list[tsi.CallSchema]:
+    started_at = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    return [
+        tsi.CallSchema(
+            id=str(i),
+            project_id="project",
+            op_name="op",
+            display_name="name" if i == 0 else None,
+            trace_id="trace",
+            parent_id=None if i == 0 else "0",
+            started_at=started_at,
+            ended_at=started_at + datetime.timedelta(seconds=i),
+            attributes={"a": i},
+            inputs={"b": [i, {"c": None}]},
+            output=[i] if i % 2 else None,
+            summary={"d": i},
+            exception="boom" if i == 3 else None,
+        )
+        for i in range(n)
+    ]
+
+
+def test_arrow_round_trip_over_many_batches():
+    calls = make_calls(7)
+    chunks = list(encode_calls_arrow(calls, batch_size=3))
+    # Schema, 3 record batches, end of stream
+    assert len(chunks) == 5
+    assert list(decode_calls_arrow(io.BytesIO(b"".join(chunks)))) == calls
+
+
+def test_arrow_empty_stream():
+    data = b"".join(encode_calls_arrow([]))
+    assert list(decode_calls_arrow(io.BytesIO(data))) == []
+
+
+def test_ndjson_round_trip():
+    calls = make_calls(3)
+    data = b"".join(encode_calls_ndjson(calls))
+    assert list(decode_calls_ndjson(data.split(b"\n"))) == calls
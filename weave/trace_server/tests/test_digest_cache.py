@@ -0,0 +1,94 @@
+from weave.trace_server.digest_cache import (
+    DigestCache,
+    DigestCacheBackend,
+    LRUDigestCacheBackend,
+    RedisDigestCacheBackend,
+)
+
+
+def test_lru_is_bounded_by_bytes():
+    backend = LRUDigestCacheBackend(max_bytes=10, max_item_bytes=10)
+    backend.set_many({"a": b"1234", "b": b"1234"})
+    # Touch `a` so that `b` is the least recently used
+    assert backend.get_many(["a"]) == [b"1234"]
+    backend.set_many({"c": b"1234"})
+    assert backend.get_many(["a", "b", "c"]) == [b"1234", None, b"1234"]
+    assert backend.bytes == 8
+    assert backend.evictions() == 1
+
+
+def test_lru_skips_large_items():
+    backend = LRUDigestCacheBackend(max_bytes=80)
+    backend.set_many({"small": b"x" * 10, "large": b"x" * 11})
+    assert backend.get_many(["small", "large"]) == [b"x" * 10, None]
+
+
+def test_cache_key_parts_cannot_collide():
+    assert DigestCache.key("obj", "entity/project", "name") != DigestCache.key(
+        "obj", "entity", "project/name"
+    )
+
+
+def test_cache_stats():
+    cache = DigestCache(LRUDigestCacheBackend(max_bytes=100))
+    key = DigestCache.key("row", "project", "digest")
+    assert cache.get(key) is None
+    cache.set(key, b"{}")
+    assert cache.get_many([key, DigestCache.key("row", "project", "other")]) == [
+        b"{}",
+        None,
+    ]
+    stats = cache.stats()
+    assert stats.hits == 1
+    assert stats.misses == 2
+    assert stats.errors == 0
+
+
+class BrokenBackend(DigestCacheBackend):
+    def get_many(self, keys):
+        raise ConnectionError()
+
+    def set_many(self, items):
+        raise ConnectionError()
+
+
+def test_backend_errors_are_misses():
+    cache = DigestCache(BrokenBackend())
+    cache.set("a", b"1")
+    assert cache.get_many(["a", "b"]) == [None, None]
+    stats = cache.stats()
+    assert stats.misses == 2
+    assert stats.errors == 2
+
+
+class DictRedis:
+    """Implements the subset of the redis client used by the backend."""
+
+    def __init__(self):
+        self.data = {}
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        return DictRedisPipeline(self)
+
+
+class DictRedisPipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.pending = []
+
+    def set(self, key, value, ex=None):
+        self.pending.append((key, value))
+
+    def execute(self):
+        self.redis.data.update(self.pending)
+
+
+def test_redis_backend_prefixes_keys():
+    client = DictRedis()
+    cache = DigestCache(RedisDigestCacheBackend(client, prefix="test:"))
+    cache.set_many({"obj/p/n/d": b"1"})
+    assert client.data == {"test:obj/p/n/d": b"1"}
+    assert cache.get_many(["obj/p/n/d", "obj/p/n/e"]) == [b"1", None]
@@ -0,0 +1,123 @@
+import datetime
+import os
+import time
+
+import pytest
+
+from weave.trace_server import trace_server_interface as tsi
+
+duckdb_trace_server = pytest.importorskip("weave.trace_server.duckdb_trace_server")
+
+
+@pytest.fixture()
+def server(tmp_path):
+    server = duckdb_trace_server.DuckDBTraceServer(str(tmp_path))
+    server.setup_tables()
+    return server
+
+
+def start_call(server, call_id, parent_id=None, inputs=None) -> None:
+    server.call_start(
+        tsi.CallStartReq(
+            start=tsi.StartedCallSchemaForInsert(
+                project_id="entity/project",
+                id=call_id,
+                op_name="op",
+                trace_id="trace",
+                parent_id=parent_id,
+                started_at=datetime.datetime.now(datetime.timezone.utc),
+                attributes={},
+                inputs=inputs or {},
+            )
+        )
+    )
+
+
+def call_ids(server, **req) -> list[str]:
+    res = server.calls_query(tsi.CallsQueryReq(project_id="entity/project", **req))
+    return [c.id for c in res.calls]
+
+
+def test_calls_are_partitioned_by_project(server, tmp_path):
+    start_call(server, "a")
+    assert call_ids(server) == ["a"]
+    server.flush()
+    assert os.listdir(tmp_path / "calls") == ["entity%2Fproject"]
+    assert call_ids(server) == ["a"]
+
+
+def test_parts_are_written_after_max_flush_age(server, monkeypatch):
+    monkeypatch.setattr(duckdb_trace_server, "MAX_FLUSH_AGE", 0.1)
+    start_call(server, "a")
+    assert server._project_files("entity/project") == []
+    deadline = time.monotonic() + 5
+    while not server._project_files("entity/project") and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert len(server._project_files("entity/project")) == 1
+    assert call_ids(server) == ["a"]
+
+
+def test_parts_are_merged(server):
+    start_call(server, "a")
+    server.flush()
+    server.call_end(
+        tsi.CallEndReq(
+            end=tsi.EndedCallSchemaForInsert(
+                project_id="entity/project",
+                id="a",
+                ended_at=datetime.datetime.now(datetime.timezone.utc),
+                output={"score": 1},
+                summary={},
+            )
+        )
+    )
+    for display_name in ("first", "second"):
+        server.call_update(
+            tsi.CallUpdateReq(
+                project_id="entity/project",
+                call_id="a",
+                display_name=display_name,
+                wb_user_id="user",
+            )
+        )
+    (call,) = server.calls_query(tsi.CallsQueryReq(project_id="entity/project")).calls
+    assert call.output == {"score": 1}
+    assert call.display_name == "second"
+
+
+def test_filters(server):
+    ref = "weave:///entity/project/object/obj:digest"
+    start_call(server, "a", inputs={"x": 1, "obj": ref})
+    start_call(server, "b", parent_id="a", inputs={"x": "2"})
+    assert call_ids(server, filter=tsi._CallsFilter(input_refs=[ref])) == ["a"]
+    assert call_ids(server, filter=tsi._CallsFilter(trace_roots_only=True)) == ["a"]
+    query = {
+        "$expr": {
+            "$gt": [
+                {"$convert": {"input": {"$getField": "inputs.x"}, "to": "int"}},
+                {"$literal": 1},
+            ]
+        }
+    }
+    assert call_ids(server, query=query) == ["b"]
+    stats = server.calls_query_stats(
+        tsi.CallsQueryStatsReq(project_id="entity/project", query=query)
+    )
+    assert stats.count == 1
+
+
+def test_delete_descendants_and_compact(server, monkeypatch):
+    monkeypatch.setattr(duckdb_trace_server, "MAX_PARQUET_FILES_PER_PROJECT", 2)
+    start_call(server, "a")
+    server.flush()
+    start_call(server, "b", parent_id="a")
+    server.flush()
+    start_call(server, "c")
+    server.calls_delete(
+        tsi.CallsDeleteReq(
+            project_id="entity/project", call_ids=["a"], wb_user_id="user"
+        )
+    )
+    server.flush()
+    assert len(server._project_files("entity/project")) == 1
+    assert call_ids(server) == ["c"]
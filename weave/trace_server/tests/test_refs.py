@@ -1,4 +1,5 @@
 from weave.trace.refs import ObjectRef
+from weave.trace_server import refs_internal
 
 
 def test_isdescended_from():
@@ -6,3 +7,12 @@ def test_isdescended_from():
     b = ObjectRef(entity="e", project="p", name="n", digest="v", extra=["x1", "x2"])
     assert a.is_descended_from(b) == False
     assert b.is_descended_from(a) == True
+
+
+def test_internal_table_ref_extra_round_trip():
+    uri = "weave-trace-internal:///project/table/digest/id/row"
+    ref = refs_internal.parse_internal_uri(uri)
+    assert ref == refs_internal.InternalTableRef(
+        project_id="project", digest="digest", extra=["id", "row"]
+    )
+    assert ref.uri() == uri
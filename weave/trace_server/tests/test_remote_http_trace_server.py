@@ -1,13 +1,39 @@
+import asyncio
 import datetime
+import gzip
+import io
+import json
+import tempfile
+import threading
 import unittest
 import uuid
 from unittest.mock import patch
 
+import aiohttp
+import pytest
 import requests
+from aiohttp import web
+from aiohttp.test_utils import TestServer
 from pydantic import ValidationError
 
 from weave.trace_server import trace_server_interface as tsi
-from weave.trace_server.remote_http_trace_server import RemoteHTTPTraceServer
+from weave.trace_server.async_remote_http_trace_server import (
+    AsyncRemoteHTTPTraceServer,
+)
+from weave.trace_server.calls_stream import (
+    ARROW_CONTENT_TYPE,
+    NDJSON_CONTENT_TYPE,
+    encode_calls_arrow,
+    encode_calls_ndjson,
+)
+from weave.trace_server.remote_http_trace_server import (
+    Batch,
+    EndBatchItem,
+    RemoteHTTPTraceServer,
+    StartBatchItem,
+    coalesce_batch,
+    encode_batch,
+)
 
 
 def generate_id() -> str:
@@ -28,12 +54,56 @@ def generate_start(id) -> tsi.StartedCallSchemaForInsert:
     )
 
 
+def generate_end(id) -> tsi.EndedCallSchemaForInsert:
+    return tsi.EndedCallSchemaForInsert(
+        project_id="test",
+        id=id,
+        ended_at=datetime.datetime.now(tz=datetime.timezone.utc),
+        output={"c": 5},
+        summary={},
+    )
+
+
+def test_coalesce_batch():
+    a, b = generate_id(), generate_id()
+    batch = [
+        StartBatchItem(req=tsi.CallStartReq(start=generate_start(a))),
+        StartBatchItem(req=tsi.CallStartReq(start=generate_start(b))),
+        EndBatchItem(req=tsi.CallEndReq(end=generate_end(b))),
+    ]
+    coalesced = coalesce_batch(batch)
+    assert [item.mode for item in coalesced] == ["start", "complete"]
+    complete = coalesced[1].req.complete
+    assert complete.id == b
+    assert complete.inputs == {"b": 5}
+    assert complete.output == {"c": 5}
+    assert complete.start() == batch[1].req.start
+    assert complete.end() == batch[2].req.end
+
+
+def test_encode_batch_matches_pydantic():
+    a = generate_id()
+    start = generate_start(a)
+    start.inputs = {"messages": [{"role": "user", "content": "hi"}], "n": 1.5}
+    batch = [
+        StartBatchItem(req=tsi.CallStartReq(start=start)),
+        EndBatchItem(req=tsi.CallEndReq(end=generate_end(a))),
+    ]
+    expected = Batch(batch=batch).model_dump_json().encode("utf-8")
+    assert json.loads(encode_batch(batch)) == json.loads(expected)
+
+    # Values orjson can't encode fall back to pydantic
+    start.inputs = {"data": b"bytes"}
+    expected = Batch(batch=batch).model_dump_json().encode("utf-8")
+    assert encode_batch(batch) == expected
+
+
 class TestRemoteHTTPTraceServer(unittest.TestCase):
     def setUp(self):
         self.trace_server_url = "http://example.com"
-        self.server = RemoteHTTPTraceServer(self.trace_server_url)
+        self.server = RemoteHTTPTraceServer(self.trace_server_url, should_batch=False)
 
-    @patch("requests.post")
+    @patch("requests.Session.post")
     def test_ok(self, mock_post):
         call_id = generate_id()
         mock_post.return_value = requests.Response()
@@ -45,7 +115,7 @@ class TestRemoteHTTPTraceServer(unittest.TestCase):
         self.server.call_start(tsi.CallStartReq(start=start))
         mock_post.assert_called_once()
 
-    @patch("requests.post")
+    @patch("requests.Session.post")
     def test_400_500_no_retry(self, mock_post):
         call_id = generate_id()
         resp1 = requests.Response()
@@ -73,7 +143,7 @@ class TestRemoteHTTPTraceServer(unittest.TestCase):
         with self.assertRaises(ValidationError):
             self.server.call_start(tsi.CallStartReq(start={"invalid": "broken"}))
 
-    @patch("requests.post")
+    @patch("requests.Session.post")
     def test_502_503_504_429_retry(self, mock_post):
         call_id = generate_id()
 
@@ -99,7 +169,7 @@ class TestRemoteHTTPTraceServer(unittest.TestCase):
         start = generate_start(call_id)
         self.server.call_start(tsi.CallStartReq(start=start))
 
-    @patch("requests.post")
+    @patch("requests.Session.post")
     def test_other_error_retry(self, mock_post):
         call_id = generate_id()
 
@@ -119,6 +189,260 @@ class TestRemoteHTTPTraceServer(unittest.TestCase):
         start = generate_start(call_id)
         self.server.call_start(tsi.CallStartReq(start=start))
 
+    @patch("requests.Session.post")
+    def test_file_content_read_stream_retry(self, mock_post):
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.raw = io.BytesIO(b"content")
+        mock_post.side_effect = [ConnectionError(), resp]
+        req = tsi.FileContentReadReq(project_id="test", digest="digest")
+        assert b"".join(self.server.file_content_read_stream(req)) == b"content"
+        assert mock_post.call_count == 2
+
+    @patch("requests.Session.post")
+    def test_gzip_compression(self, mock_post):
+        server = RemoteHTTPTraceServer(
+            self.trace_server_url, should_batch=False, compression="gzip"
+        )
+        call_id = generate_id()
+        mock_post.return_value = requests.Response()
+        mock_post.return_value.json = lambda: dict(
+            tsi.CallStartRes(id=call_id, trace_id="test_trace_id")
+        )
+        mock_post.return_value.status_code = 200
+        start = generate_start(call_id)
+        start.inputs = {"b": "x" * 10000}
+        server.call_start(tsi.CallStartReq(start=start))
+        kwargs = mock_post.call_args.kwargs
+        assert kwargs["headers"]["Content-Encoding"] == "gzip"
+        body = json.loads(gzip.decompress(kwargs["data"]))
+        assert body["start"]["id"] == call_id
+
+    @patch("requests.Session.post")
+    def test_session_is_reused(self, mock_post):
+        mock_post.return_value = requests.Response()
+        mock_post.return_value.json = lambda: {"calls": []}
+        mock_post.return_value.status_code = 200
+        session = self.server.session
+        self.server.calls_query(tsi.CallsQueryReq(project_id="test"))
+        self.server.calls_query(tsi.CallsQueryReq(project_id="test"))
+        assert self.server.session is session
+        assert mock_post.call_count == 2
+
+    @patch("requests.Session.post")
+    def test_batched_calls_are_flushed_before_reads(self, mock_post):
+        server = RemoteHTTPTraceServer(self.trace_server_url, should_batch=True)
+        server.call_processor.max_linger = 60
+        mock_post.return_value = requests.Response()
+        mock_post.return_value.json = lambda: {"calls": []}
+        mock_post.return_value.status_code = 200
+
+        server.call_start(tsi.CallStartReq(start=generate_start(None)))
+        server.calls_query(tsi.CallsQueryReq(project_id="test"))
+        urls = [c.args[0] for c in mock_post.call_args_list]
+        assert urls == [
+            self.trace_server_url + "/call/upsert_batch",
+            self.trace_server_url + "/calls/query",
+        ]
+        server.call_processor.wait_until_all_processed()
+
+    def test_fork_resets_session_and_batcher(self):
+        server = RemoteHTTPTraceServer(self.trace_server_url, should_batch=True)
+        session = server.session
+        processor = server.call_processor
+        # Simulate running in a forked child process
+        server._pid = -1
+        with patch("atexit.unregister") as mock_unregister:
+            assert server.session is not session
+        assert server.call_processor is not processor
+        mock_unregister.assert_called_once_with(processor.wait_until_all_processed)
+        processor.wait_until_all_processed()
+
+    @patch(
+        "weave.trace_server.remote_http_trace_server.PENDING_CALLS_FLUSH_TIMEOUT", 0.1
+    )
+    @patch("requests.Session.post")
+    def test_reads_dont_wait_forever_for_pending_calls(self, mock_post):
+        server = RemoteHTTPTraceServer(self.trace_server_url, should_batch=True)
+        release = threading.Event()
+        flush_calls = server.call_processor.processor_fn
+
+        def blocked_flush_calls(batch):
+            release.wait()
+            flush_calls(batch)
+
+        server.call_processor.processor_fn = blocked_flush_calls
+        mock_post.return_value = requests.Response()
+        mock_post.return_value.json = lambda: {"calls": []}
+        mock_post.return_value.status_code = 200
+
+        server.call_start(tsi.CallStartReq(start=generate_start(None)))
+        server.calls_query(tsi.CallsQueryReq(project_id="test"))
+        release.set()
+        server.call_processor.wait_until_all_processed()
+
+    @patch("requests.Session.post")
+    def test_spooled_batches_survive_restart(self, mock_post):
+        with tempfile.TemporaryDirectory() as spool_dir:
+            mock_post.side_effect = ConnectionError()
+            server = RemoteHTTPTraceServer(
+                self.trace_server_url, should_batch=True, spool_dir=spool_dir
+            )
+            call_id = generate_id()
+            server.call_start(tsi.CallStartReq(start=generate_start(call_id)))
+            server.call_processor.flush()
+            assert server._spool.pending_bytes() > 0
+            # Simulate the process dying while the server is unreachable
+            server._spool.close()
+
+            mock_post.side_effect = None
+            mock_post.return_value = requests.Response()
+            mock_post.return_value.status_code = 200
+            restarted = RemoteHTTPTraceServer(
+                self.trace_server_url, should_batch=True, spool_dir=spool_dir
+            )
+            assert restarted._spool.flush(timeout=5)
+            body = json.loads(mock_post.call_args.kwargs["data"])
+            assert body["batch"][0]["req"]["start"]["id"] == call_id
+            restarted._spool.close()
+
+    @patch("requests.Session.post")
+    def test_coalesced_calls_are_sent_as_one_item(self, mock_post):
+        server = RemoteHTTPTraceServer(
+            self.trace_server_url, should_batch=True, coalesce_calls=True
+        )
+        server.call_processor.max_linger = 60
+        mock_post.return_value = requests.Response()
+        mock_post.return_value.status_code = 200
+
+        call_id = generate_id()
+        server.call_start(tsi.CallStartReq(start=generate_start(call_id)))
+        server.call_end(tsi.CallEndReq(end=generate_end(call_id)))
+        server.call_processor.flush()
+
+        mock_post.assert_called_once()
+        body = json.loads(mock_post.call_args.kwargs["data"])
+        assert [item["mode"] for item in body["batch"]] == ["complete"]
+        assert body["batch"][0]["req"]["complete"]["id"] == call_id
+        server.call_processor.wait_until_all_processed()
+
+    def _stream_response(self, content_type, chunks):
+        response = requests.Response()
+        response.status_code = 200
+        response.headers["Content-Type"] = content_type
+        response.raw = io.BytesIO(b"".join(chunks))
+        return response
+
+    @patch("requests.Session.post")
+    def test_calls_query_stream_formats(self, mock_post):
+        calls = [
+            tsi.CallSchema(
+                id=generate_id(),
+                project_id="test",
+                op_name="test_name",
+                trace_id=generate_id(),
+                started_at=datetime.datetime.now(tz=datetime.timezone.utc),
+                attributes={"a": 5},
+                inputs={"b": [1, 2]},
+                output={"c": 5} if i % 2 else None,
+            )
+            for i in range(5)
+        ]
+        req = tsi.CallsQueryReq(project_id="test")
+        for stream_format, content_type, encode in [
+            ("ndjson", NDJSON_CONTENT_TYPE, encode_calls_ndjson),
+            ("arrow", ARROW_CONTENT_TYPE, encode_calls_arrow),
+        ]:
+            server = RemoteHTTPTraceServer(
+                self.trace_server_url, should_batch=False, stream_format=stream_format
+            )
+            mock_post.return_value = self._stream_response(content_type, encode(calls))
+            assert list(server.calls_query_stream(req)) == calls
+            headers = mock_post.call_args.kwargs["headers"]
+            assert headers["Accept"] == content_type
+
+        # A server which doesn't support Arrow falls back to NDJSON
+        mock_post.return_value = self._stream_response(
+            NDJSON_CONTENT_TYPE, encode_calls_ndjson(calls)
+        )
+        assert list(server.calls_query_stream(req)) == calls
+
+    def test_unknown_stream_format(self):
+        with self.assertRaises(ValueError):
+            RemoteHTTPTraceServer(self.trace_server_url, stream_format="csv")
+
+
+def test_async_remote_server():
+    received = []
+
+    async def call_start(request):
+        received.append(tsi.CallStartReq.model_validate(await request.json()))
+        start = received[-1].start
+        return web.json_response({"id": start.id, "trace_id": start.trace_id})
+
+    async def obj_read(request):
+        return web.json_response({"detail": "not found"}, status=404)
+
+    async def stream_query(request):
+        assert request.headers["Accept"] == NDJSON_CONTENT_TYPE
+        return web.Response(
+            body=b"".join(encode_calls_ndjson(calls)),
+            content_type=NDJSON_CONTENT_TYPE,
+        )
+
+    calls = [
+        tsi.CallSchema(
+            id=generate_id(),
+            project_id="test",
+            op_name="test_name",
+            trace_id=generate_id(),
+            started_at=datetime.datetime.now(tz=datetime.timezone.utc),
+            attributes={},
+            inputs={"i": i},
+        )
+        for i in range(3)
+    ]
+    app = web.Application()
+    app.router.add_post("/call/start", call_start)
+    app.router.add_post("/obj/read", obj_read)
+    app.router.add_post("/calls/stream_query", stream_query)
+
+    async def main():
+        async with TestServer(app) as test_server:
+            remote = RemoteHTTPTraceServer(
+                str(test_server.make_url("")), should_batch=False
+            )
+            server = AsyncRemoteHTTPTraceServer(remote)
+            try:
+                start = generate_start(generate_id())
+                res = await server.call_start(tsi.CallStartReq(start=start))
+                assert res.id == start.id
+                assert received[0].start == start
+
+                # 4xx errors are not retried
+                with pytest.raises(aiohttp.ClientResponseError) as e:
+                    await server.obj_read(
+                        tsi.ObjReadReq(project_id="test", object_id="x", digest="d")
+                    )
+                assert e.value.status == 404
+
+                req = tsi.CallsQueryReq(project_id="test")
+                assert [c async for c in server.calls_query_stream(req)] == calls
+            finally:
+                await server.aclose()
+
+    asyncio.run(main())
+
+
+def test_async_remote_server_closes_sessions_at_loop_shutdown():
+    server = AsyncRemoteHTTPTraceServer(RemoteHTTPTraceServer("http://localhost"))
+
+    async def main():
+        return await server._session()
+
+    session = asyncio.run(main())
+    assert session.closed
+
 
 if __name__ == "__main__":
     unittest.main()
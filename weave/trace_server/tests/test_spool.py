@@ -0,0 +1,185 @@
+import os
+import threading
+
+from weave.trace_server.spool import Spool
+
+
+def _drain(spool: Spool, **kwargs) -> list[bytes]:
+    sent: list[bytes] = []
+    spool.start_drainer(sent.append, **kwargs)
+    assert spool.flush(timeout=5)
+    return sent
+
+
+def test_spool_sends_records_in_order(tmp_path):
+    spool = Spool(str(tmp_path), segment_bytes=64)
+    records = [f"record-{i}".encode() for i in range(50)]
+    for record in records:
+        spool.append(record)
+    assert _drain(spool) == records
+    assert spool.pending_bytes() == 0
+    spool.close()
+
+
+def test_spool_replays_unsent_records_after_restart(tmp_path):
+    spool = Spool(str(tmp_path), segment_bytes=64)
+    for i in range(10):
+        spool.append(f"record-{i}".encode())
+    spool.close()
+
+    spool = Spool(str(tmp_path), segment_bytes=64)
+    spool.append(b"after-restart")
+    assert _drain(spool) == [f"record-{i}".encode() for i in range(10)] + [
+        b"after-restart"
+    ]
+    spool.close()
+
+    # Nothing is replayed twice
+    spool = Spool(str(tmp_path))
+    assert _drain(spool) == []
+    spool.close()
+
+
+def test_spool_resumes_from_cursor(tmp_path):
+    spool = Spool(str(tmp_path))
+    for i in range(4):
+        spool.append(f"record-{i}".encode())
+    sent = []
+    in_flight = threading.Event()
+    release = threading.Event()
+
+    def send(record):
+        sent.append(record)
+        if len(sent) == 3:
+            in_flight.set()
+            release.wait()
+
+    spool.start_drainer(send)
+    assert in_flight.wait(5)
+    # Simulate a crash while the third record is being sent
+    spool._lock_file.close()
+
+    restarted = Spool(str(tmp_path))
+    assert restarted.directory == spool.directory
+    # The in-flight record is sent again (at least once delivery)
+    assert _drain(restarted) == [b"record-2", b"record-3"]
+    restarted.close()
+    release.set()
+
+
+def test_spool_skips_torn_write(tmp_path):
+    spool = Spool(str(tmp_path))
+    spool.append(b"complete")
+    spool.append(b"torn")
+    segment = spool._segment_path(spool._write_seq - 1)
+    spool.close()
+    with open(segment, "r+b") as f:
+        f.truncate(os.path.getsize(segment) - 2)
+
+    spool = Spool(str(tmp_path))
+    assert _drain(spool) == [b"complete"]
+    spool.close()
+
+
+def test_spool_drops_oldest_segments_over_size_cap(tmp_path):
+    spool = Spool(str(tmp_path), max_bytes=200, segment_bytes=50)
+    for i in range(20):
+        spool.append(f"record-{i:02d}".encode())
+    assert spool.pending_bytes() <= 200
+    assert spool.dropped_records > 0
+    sent = _drain(spool)
+    assert len(sent) + spool.dropped_records == 20
+    assert sent == [f"record-{i:02d}".encode() for i in range(20 - len(sent), 20)]
+    spool.close()
+
+
+def test_spool_retries_failed_sends(tmp_path):
+    spool = Spool(str(tmp_path))
+    spool.append(b"a")
+    spool.append(b"b")
+    attempts = []
+
+    def send(record):
+        attempts.append(record)
+        if len(attempts) < 3:
+            raise ConnectionError()
+
+    spool.start_drainer(send, initial_backoff=0.01)
+    assert spool.flush(timeout=5)
+    assert attempts == [b"a", b"a", b"a", b"b"]
+    spool.close()
+
+
+def test_spool_drops_non_retryable_records(tmp_path):
+    spool = Spool(str(tmp_path))
+    spool.append(b"bad")
+    spool.append(b"good")
+    sent = []
+
+    def send(record):
+        if record == b"bad":
+            raise ValueError()
+        sent.append(record)
+
+    spool.start_drainer(send, should_retry=lambda e: not isinstance(e, ValueError))
+    assert spool.flush(timeout=5)
+    assert sent == [b"good"]
+    spool.close()
+
+
+def test_spool_compact(tmp_path):
+    spool = Spool(str(tmp_path), segment_bytes=30)
+    for i in range(6):
+        spool.append(f"record-{i}".encode())
+    # Pretend the first record of the first segment has been sent
+    spool._read_offset = 8 + len(b"record-0")
+    spool.compact()
+    spool.close()
+
+    spool = Spool(str(tmp_path))
+    assert _drain(spool) == [f"record-{i}".encode() for i in range(1, 6)]
+    spool.close()
+
+
+def test_spool_compacts_while_retrying(tmp_path):
+    spool = Spool(str(tmp_path))
+    for i in range(4):
+        spool.append(f"record-{i}".encode())
+    segment = spool._segment_path(spool._write_seq - 1)
+    spool.close()
+
+    spool = Spool(str(tmp_path))
+    sent = []
+    failures = []
+
+    def send(record):
+        if record == b"record-1" and len(failures) < 2:
+            failures.append(os.path.getsize(segment))
+            raise ConnectionError()
+        sent.append(record)
+
+    spool.start_drainer(send, initial_backoff=0.01)
+    assert spool.flush(timeout=5)
+    assert sent == [f"record-{i}".encode() for i in range(4)]
+    # The sent record was trimmed from the segment before the second attempt
+    assert failures[1] == failures[0] - 8 - len(b"record-0")
+    spool.close()
+
+
+def test_spool_exit_hook_is_skipped_after_fork(tmp_path):
+    spool = Spool(str(tmp_path))
+    spool.start_drainer(lambda record: None)
+    # Simulate running in a forked child process
+    spool._pid = -1
+    spool._close_at_exit()
+    assert spool._drainer is not None
+    spool._pid = os.getpid()
+    spool.close()
+
+
+def test_spools_in_the_same_directory_use_separate_slots(tmp_path):
+    spool_a = Spool(str(tmp_path))
+    spool_b = Spool(str(tmp_path))
+    assert spool_a.directory != spool_b.directory
+    spool_a.close()
+    spool_b.close()
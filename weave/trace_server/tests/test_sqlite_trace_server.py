@@ -0,0 +1,88 @@
+import datetime
+import threading
+
+import pytest
+
+from weave.trace_server import sqlite_trace_server
+from weave.trace_server import trace_server_interface as tsi
+from weave.trace_server.sqlite_trace_server import SqliteTraceServer, get_conn_cursor
+
+
+@pytest.fixture()
+def server(tmp_path):
+    server = SqliteTraceServer(str(tmp_path / "trace.db"))
+    server.setup_tables()
+    return server
+
+
+def start_req(call_id: str, op_name: str = "op", parent_id=None) -> tsi.CallStartReq:
+    return tsi.CallStartReq(
+        start=tsi.StartedCallSchemaForInsert(
+            project_id="project",
+            id=call_id,
+            op_name=op_name,
+            trace_id="trace",
+            parent_id=parent_id,
+            started_at=datetime.datetime.now(datetime.timezone.utc),
+            attributes={},
+            inputs={},
+        )
+    )
+
+
+def call_ids(server: SqliteTraceServer, **filter) -> list[str]:
+    res = server.calls_query(
+        tsi.CallsQueryReq(project_id="project", filter=tsi._CallsFilter(**filter))
+    )
+    return [c.id for c in res.calls]
+
+
+def test_connections_are_per_thread(server):
+    conn, cursor = get_conn_cursor(server.db_path)
+    assert get_conn_cursor(server.db_path)[0] is conn
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    other = []
+    thread = threading.Thread(
+        target=lambda: other.append(get_conn_cursor(server.db_path)[0])
+    )
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+
+def test_calls_query_uses_indexes(server):
+    conn, cursor = get_conn_cursor(server.db_path)
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM calls WHERE project_id = ? AND trace_id = ?",
+        ("project", "trace"),
+    ).fetchall()
+    assert "calls_trace_id" in plan[0][-1]
+
+
+def test_filters_are_parameterized(server):
+    server.call_start(start_req("a", op_name="it's"))
+    server.call_start(start_req("b", parent_id="a"))
+    assert call_ids(server, op_names=["it's"]) == ["a"]
+    assert call_ids(server, parent_ids=["a", "' OR 1 = 1 --"]) == ["b"]
+
+
+def test_call_writes_are_committed_together(server, monkeypatch):
+    conn, cursor = get_conn_cursor(server.db_path)
+    statements: list[str] = []
+    conn.set_trace_callback(statements.append)
+    try:
+        for i in range(10):
+            server.call_start(start_req(f"c{i}"))
+        assert statements.count("COMMIT") == 0
+        # Reads see the buffered writes
+        assert len(call_ids(server)) == 10
+        assert statements.count("COMMIT") == 1
+
+        monkeypatch.setattr(sqlite_trace_server, "MAX_FLUSH_COUNT", 4)
+        for i in range(10, 20):
+            server.call_start(start_req(f"c{i}"))
+        assert statements.count("COMMIT") == 3
+    finally:
+        conn.set_trace_callback(None)
+    assert len(call_ids(server)) == 20
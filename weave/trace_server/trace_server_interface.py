@@ -98,6 +98,55 @@ class EndedCallSchemaForInsert(BaseModel):
     ## Summary: a summary of the call
     summary: typing.Dict[str, typing.Any]
 
+    ## The op and start time of the call, so that servers can aggregate the
+    ## end of a call without looking up its start
+    op_name: typing.Optional[str] = None
+    started_at: typing.Optional[datetime.datetime] = None
+
+
+# A call whose start and end are inserted together, in a single record.
+class CompletedCallSchemaForInsert(StartedCallSchemaForInsert):
+    ## End time is required
+    ended_at: datetime.datetime
+
+    ## Exception is present if the call failed
+    exception: typing.Optional[str] = None
+
+    ## Outputs
+    output: typing.Optional[typing.Any] = None
+
+    ## Summary: a summary of the call
+    summary: typing.Dict[str, typing.Any]
+
+    @classmethod
+    def from_start_and_end(
+        cls, start: StartedCallSchemaForInsert, end: EndedCallSchemaForInsert
+    ) -> "CompletedCallSchemaForInsert":
+        return cls(
+            **start.model_dump(),
+            ended_at=end.ended_at,
+            exception=end.exception,
+            output=end.output,
+            summary=end.summary,
+        )
+
+    def start(self) -> StartedCallSchemaForInsert:
+        return StartedCallSchemaForInsert.model_validate(
+            self.model_dump(include=set(StartedCallSchemaForInsert.model_fields))
+        )
+
+    def end(self) -> EndedCallSchemaForInsert:
+        if self.id is None:
+            raise ValueError("id is required")
+        return EndedCallSchemaForInsert(
+            project_id=self.project_id,
+            id=self.id,
+            ended_at=self.ended_at,
+            exception=self.exception,
+            output=self.output,
+            summary=self.summary,
+        )
+
 
 class ObjSchema(BaseModel):
     project_id: str
@@ -140,6 +189,15 @@ class CallEndRes(BaseModel):
     pass
 
 
+class CallCompleteReq(BaseModel):
+    complete: CompletedCallSchemaForInsert
+
+
+class CallCompleteRes(BaseModel):
+    id: str
+    trace_id: str
+
+
 class CallReadReq(BaseModel):
     project_id: str
     id: str
@@ -182,6 +240,12 @@ class _SortBy(BaseModel):
     direction: typing.Literal["asc", "desc"]
 
 
+class _CallsCursor(BaseModel):
+    # Position of the last call of the previous page
+    started_at: datetime.datetime
+    id: str
+
+
 class CallsQueryReq(BaseModel):
     project_id: str
     filter: typing.Optional[_CallsFilter] = None
@@ -190,6 +254,19 @@ class CallsQueryReq(BaseModel):
     # Sort by multiple fields
     sort_by: typing.Optional[typing.List[_SortBy]] = None
     query: typing.Optional[Query] = None
+    # Columns to return. Each should be a key of `CallSchema`; dictionary
+    # fields (`attributes`, `inputs`, `output`, `summary`) can be
+    # dot-separated to return only a sub-path (eg. `output.score`), which is
+    # returned nested in the same position of the call. `project_id`, `id`,
+    # `op_name`, `trace_id` and `started_at` are always returned. If not
+    # set, all columns are returned.
+    columns: typing.Optional[typing.List[str]] = None
+    # Keyset pagination: only return calls which come strictly after this
+    # (`started_at`, `id`) position. Results are then ordered by `started_at`,
+    # then `id`, so `sort_by` must be unset or be exactly that order (which is
+    # what the first page should be requested with). Unlike `offset`, the cost
+    # of fetching a page does not grow with the number of preceding calls.
+    after: typing.Optional[_CallsCursor] = None
 
 
 class CallsQueryRes(BaseModel):
@@ -206,6 +283,73 @@ class CallsQueryStatsRes(BaseModel):
     count: int
 
 
+class TokenCost(BaseModel):
+    # Price of a single token
+    prompt_token_cost: float = 0.0
+    completion_token_cost: float = 0.0
+
+
+# Aggregates of the finished calls of a project. Calls are bucketed by the
+# minute they started in: `started_after` and `started_before` apply to that
+# minute, and `bucket_seconds` must be a multiple of 60.
+class CallsStatsReq(BaseModel):
+    project_id: str
+    op_names: typing.Optional[typing.List[str]] = None
+    started_after: typing.Optional[datetime.datetime] = None
+    started_before: typing.Optional[datetime.datetime] = None
+    # Group the calls by op name, and/or by time bucket of this many seconds.
+    # Without either, a single group covering all the calls is returned.
+    group_by_op_name: bool = True
+    bucket_seconds: typing.Optional[int] = None
+    # Prices by model, used to compute the cost of the token usage. Models
+    # without a price do not add to the cost.
+    token_costs: typing.Optional[typing.Dict[str, TokenCost]] = None
+
+
+class CallsStatsUsage(BaseModel):
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+
+
+class CallsStatsGroup(BaseModel):
+    op_name: typing.Optional[str] = None
+    bucket_start: typing.Optional[datetime.datetime] = None
+    call_count: int
+    error_count: int
+    error_rate: float
+    latency_ms_p50: typing.Optional[float] = None
+    latency_ms_p90: typing.Optional[float] = None
+    latency_ms_p95: typing.Optional[float] = None
+    latency_ms_p99: typing.Optional[float] = None
+    # Token usage by model. The usage of a call includes the usage of its
+    # descendants (as in its summary).
+    usage: typing.Dict[str, CallsStatsUsage] = {}
+    # Only set if `token_costs` was requested
+    cost: typing.Optional[float] = None
+
+
+class CallsStatsRes(BaseModel):
+    groups: typing.List[CallsStatsGroup]
+
+
+class TraceReadReq(BaseModel):
+    project_id: str
+    trace_id: str
+    # Only return the calls at most this many levels below the roots of the
+    # trace (which are at depth 0)
+    max_depth: typing.Optional[int] = None
+    # Columns to return, as in `CallsQueryReq`. `parent_id` is always returned.
+    columns: typing.Optional[typing.List[str]] = None
+
+
+class TraceReadRes(BaseModel):
+    # Depth first: each call is followed by its children, ordered by
+    # `started_at` then `id`. Calls whose parent is not in the trace are roots.
+    calls: typing.List[CallSchema]
+
+
 class CallUpdateReq(BaseModel):
     # required for all updates
     project_id: str
@@ -301,6 +445,45 @@ class TableCreateRes(BaseModel):
     digest: str
 
 
+class TableRowsMissingReq(BaseModel):
+    project_id: str
+    row_digests: typing.List[str]
+
+
+class TableRowsMissingRes(BaseModel):
+    # The requested digests that have no stored row, in request order
+    row_digests: typing.List[str]
+
+
+class TableRowsCreateReq(BaseModel):
+    project_id: str
+    rows: list[typing.Any]
+
+
+class TableRowsCreateRes(BaseModel):
+    # The digest of each row, in request order
+    row_digests: typing.List[str]
+
+
+class TableCreateFromDigestsReq(BaseModel):
+    project_id: str
+    row_digests: typing.List[str]
+
+
+class TableCreateFromDigestsRes(BaseModel):
+    digest: str
+
+
+class TableAppendReq(BaseModel):
+    project_id: str
+    base_digest: str
+    rows: list[typing.Any]
+
+
+class TableAppendRes(BaseModel):
+    digest: str
+
+
 class _TableRowFilter(BaseModel):
     row_digests: typing.Optional[typing.List[str]] = None
 
@@ -402,6 +585,37 @@ class FileCreateRes(BaseModel):
     digest: str
 
 
+# Files are stored in chunks of this many bytes. Parts of a file uploaded with
+# `file_create_part` must start (and, except for the last one, end) on a chunk
+# boundary.
+FILE_CHUNK_SIZE = 100000
+
+
+class FileCreatePartReq(BaseModel):
+    project_id: str
+    name: str
+    # Digest and size of the whole file
+    digest: str
+    size: int
+    offset: int
+    content: bytes
+
+
+class FileCreatePartRes(BaseModel):
+    pass
+
+
+class FilePartsMissingReq(BaseModel):
+    project_id: str
+    digest: str
+    size: int
+
+
+class FilePartsMissingRes(BaseModel):
+    # Offsets of the chunks of the file that have not been uploaded yet
+    offsets: typing.List[int]
+
+
 class FileContentReadReq(BaseModel):
     project_id: str
     digest: str
@@ -424,6 +638,13 @@ class TraceServerInterface:
     def call_end(self, req: CallEndReq) -> CallEndRes:
         raise NotImplementedError()
 
+    def call_complete(self, req: CallCompleteReq) -> CallCompleteRes:
+        # Servers that can write a finished call in one go should override this
+        start_res = self.call_start(CallStartReq(start=req.complete.start()))
+        req.complete.id = start_res.id
+        self.call_end(CallEndReq(end=req.complete.end()))
+        return CallCompleteRes(id=start_res.id, trace_id=start_res.trace_id)
+
     @abc.abstractmethod
     def call_read(self, req: CallReadReq) -> CallReadRes:
         raise NotImplementedError()
@@ -444,6 +665,14 @@ class TraceServerInterface:
     def calls_query_stats(self, req: CallsQueryStatsReq) -> CallsQueryStatsRes:
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    def calls_stats(self, req: CallsStatsReq) -> CallsStatsRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def trace_read(self, req: TraceReadReq) -> TraceReadRes:
+        raise NotImplementedError()
+
     @abc.abstractmethod
     def call_update(self, req: CallUpdateReq) -> CallUpdateRes:
         raise NotImplementedError()
@@ -478,6 +707,24 @@ class TraceServerInterface:
     def table_create(self, req: TableCreateReq) -> TableCreateRes:
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    def table_rows_missing(self, req: TableRowsMissingReq) -> TableRowsMissingRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def table_rows_create(self, req: TableRowsCreateReq) -> TableRowsCreateRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def table_create_from_digests(
+        self, req: TableCreateFromDigestsReq
+    ) -> TableCreateFromDigestsRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def table_append(self, req: TableAppendReq) -> TableAppendRes:
+        raise NotImplementedError()
+
     @abc.abstractmethod
     def table_query(self, req: TableQueryReq) -> TableQueryRes:
         raise NotImplementedError()
@@ -490,10 +737,24 @@ class TraceServerInterface:
     def file_create(self, req: FileCreateReq) -> FileCreateRes:
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    def file_create_part(self, req: FileCreatePartReq) -> FileCreatePartRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def file_parts_missing(self, req: FilePartsMissingReq) -> FilePartsMissingRes:
+        raise NotImplementedError()
+
     @abc.abstractmethod
     def file_content_read(self, req: FileContentReadReq) -> FileContentReadRes:
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    def file_content_read_stream(
+        self, req: FileContentReadReq
+    ) -> typing.Iterator[bytes]:
+        raise NotImplementedError()
+
     @abc.abstractmethod
     def feedback_create(self, req: FeedbackCreateReq) -> FeedbackCreateRes:
         raise NotImplementedError()
@@ -507,6 +768,151 @@ class TraceServerInterface:
         raise NotImplementedError()
 
 
+class AsyncTraceServerInterface:
+    """The async counterpart of `TraceServerInterface`, for clients running in
+    an event loop. The streaming methods are async generators."""
+
+    # Call API
+    @abc.abstractmethod
+    async def call_start(self, req: CallStartReq) -> CallStartRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def call_end(self, req: CallEndReq) -> CallEndRes:
+        raise NotImplementedError()
+
+    async def call_complete(self, req: CallCompleteReq) -> CallCompleteRes:
+        # Servers that can write a finished call in one go should override this
+        start_res = await self.call_start(CallStartReq(start=req.complete.start()))
+        req.complete.id = start_res.id
+        await self.call_end(CallEndReq(end=req.complete.end()))
+        return CallCompleteRes(id=start_res.id, trace_id=start_res.trace_id)
+
+    @abc.abstractmethod
+    async def call_read(self, req: CallReadReq) -> CallReadRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def calls_query(self, req: CallsQueryReq) -> CallsQueryRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def calls_query_stream(
+        self, req: CallsQueryReq
+    ) -> typing.AsyncIterator[CallSchema]:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def calls_delete(self, req: CallsDeleteReq) -> CallsDeleteRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def calls_query_stats(self, req: CallsQueryStatsReq) -> CallsQueryStatsRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def calls_stats(self, req: CallsStatsReq) -> CallsStatsRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def trace_read(self, req: TraceReadReq) -> TraceReadRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def call_update(self, req: CallUpdateReq) -> CallUpdateRes:
+        raise NotImplementedError()
+
+    # Op API
+    @abc.abstractmethod
+    async def op_create(self, req: OpCreateReq) -> OpCreateRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def op_read(self, req: OpReadReq) -> OpReadRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def ops_query(self, req: OpQueryReq) -> OpQueryRes:
+        raise NotImplementedError()
+
+    # Obj API
+    @abc.abstractmethod
+    async def obj_create(self, req: ObjCreateReq) -> ObjCreateRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def obj_read(self, req: ObjReadReq) -> ObjReadRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def objs_query(self, req: ObjQueryReq) -> ObjQueryRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def table_create(self, req: TableCreateReq) -> TableCreateRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def table_rows_missing(self, req: TableRowsMissingReq) -> TableRowsMissingRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def table_rows_create(self, req: TableRowsCreateReq) -> TableRowsCreateRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def table_create_from_digests(
+        self, req: TableCreateFromDigestsReq
+    ) -> TableCreateFromDigestsRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def table_append(self, req: TableAppendReq) -> TableAppendRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def table_query(self, req: TableQueryReq) -> TableQueryRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def refs_read_batch(self, req: RefsReadBatchReq) -> RefsReadBatchRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def file_create(self, req: FileCreateReq) -> FileCreateRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def file_create_part(self, req: FileCreatePartReq) -> FileCreatePartRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def file_parts_missing(self, req: FilePartsMissingReq) -> FilePartsMissingRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def file_content_read(self, req: FileContentReadReq) -> FileContentReadRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def file_content_read_stream(
+        self, req: FileContentReadReq
+    ) -> typing.AsyncIterator[bytes]:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def feedback_create(self, req: FeedbackCreateReq) -> FeedbackCreateRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def feedback_query(self, req: FeedbackQueryReq) -> FeedbackQueryRes:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def feedback_purge(self, req: FeedbackPurgeReq) -> FeedbackPurgeRes:
+        raise NotImplementedError()
+
+
 # These symbols are used in the WB Trace Server and it is not safe
 # to remove them, else it will break the server. Once the server
 # is updated to use the new symbols, these can be removed.
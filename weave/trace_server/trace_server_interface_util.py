@@ -1,9 +1,13 @@
 import base64
+import datetime
 import hashlib
 import typing
 import uuid
+from collections import defaultdict
 
 from . import refs_internal
+from . import trace_server_interface as tsi
+from .errors import InvalidRequest
 
 TRACE_REF_SCHEME = "weave"
 ARTIFACT_REF_SCHEME = "wandb-artifact"
@@ -26,6 +30,31 @@ def str_digest(json_val: str) -> str:
     return bytes_digest(json_val.encode())
 
 
+def table_digest(row_digests: typing.Iterable[str]) -> str:
+    """The digest of a table is derived from the digests of its rows, in order."""
+    table_hasher = hashlib.sha256()
+    for row_digest in row_digests:
+        table_hasher.update(row_digest.encode())
+    return table_hasher.hexdigest()
+
+
+def file_part_chunks(req: tsi.FileCreatePartReq) -> typing.Tuple[int, int]:
+    """Returns the index of the first chunk of the part and the number of
+    chunks of the whole file."""
+    end = req.offset + len(req.content)
+    if (
+        req.offset < 0
+        or end > req.size
+        or req.offset % tsi.FILE_CHUNK_SIZE != 0
+        or (end != req.size and end % tsi.FILE_CHUNK_SIZE != 0)
+    ):
+        raise InvalidRequest(
+            f"File parts must be aligned to {tsi.FILE_CHUNK_SIZE} bytes chunks and lie within the file"
+        )
+    n_chunks = -(-req.size // tsi.FILE_CHUNK_SIZE)
+    return req.offset // tsi.FILE_CHUNK_SIZE, n_chunks
+
+
 def _order_dict(dictionary: typing.Dict) -> typing.Dict:
     return {
         k: _order_dict(v) if isinstance(v, dict) else v
@@ -89,3 +118,314 @@ def assert_non_null_wb_user_id(obj: typing.Any) -> None:
 def assert_null_wb_user_id(obj: typing.Any) -> None:
     if hasattr(obj, "wb_user_id") and obj.wb_user_id is not None:
         raise ValueError("wb_user_id must be None")
+
+
+# Columns of a call which hold free-form JSON and can be projected by path,
+# e.g. `output.score`.
+CALL_JSON_COLUMNS = ("inputs", "output", "attributes", "summary")
+
+# Columns which are always returned, even if they were not requested, so
+# that projected calls are still valid `CallSchema`s.
+REQUIRED_CALL_COLUMNS = ("project_id", "id", "op_name", "trace_id", "started_at")
+
+ALL_CALL_COLUMNS = (
+    "project_id",
+    "id",
+    "op_name",
+    "display_name",
+    "trace_id",
+    "parent_id",
+    "started_at",
+    "attributes",
+    "inputs",
+    "ended_at",
+    "exception",
+    "output",
+    "summary",
+    "wb_user_id",
+    "wb_run_id",
+    "deleted_at",
+)
+
+
+def split_call_column(column: str) -> typing.Tuple[str, typing.List[str]]:
+    """Splits a requested column like `output.score` into its base column
+    (`output`) and the JSON path inside of it (`["score"]`)."""
+    base, *path = column.split(".")
+    if base not in ALL_CALL_COLUMNS:
+        raise ValueError(f"Unknown call column: {column}")
+    if path and base not in CALL_JSON_COLUMNS:
+        raise ValueError(f"Column {base} does not support sub-paths: {column}")
+    return base, path
+
+
+def get_json_path_value(val: typing.Any, path: typing.List[str]) -> typing.Any:
+    """Returns the value at `path` within `val`, raising KeyError if missing."""
+    for part in path:
+        if isinstance(val, dict):
+            val = val[part]
+        elif isinstance(val, list):
+            try:
+                val = val[int(part)]
+            except (ValueError, IndexError):
+                raise KeyError(part)
+        else:
+            raise KeyError(part)
+    return val
+
+
+def set_json_path_value(
+    root: typing.Optional[typing.Dict[str, typing.Any]],
+    path: typing.List[str],
+    value: typing.Any,
+) -> typing.Dict[str, typing.Any]:
+    """Sets `value` at `path` within `root`, creating nested dicts as needed.
+
+    Numeric path parts are kept as string keys, so a projected list index
+    becomes a dict key."""
+    root = root if isinstance(root, dict) else {}
+    target = root
+    for part in path[:-1]:
+        if not isinstance(target.get(part), dict):
+            target[part] = {}
+        target = target[part]
+    target[path[-1]] = value
+    return root
+
+
+def project_call_dict(
+    call: typing.Dict[str, typing.Any], columns: typing.List[str]
+) -> typing.Dict[str, typing.Any]:
+    """Restricts a fully loaded call to the requested columns. Unrequested
+    required columns are kept, other unrequested columns are left unset."""
+    res: typing.Dict[str, typing.Any] = {
+        col: call.get(col) for col in REQUIRED_CALL_COLUMNS
+    }
+    res["attributes"] = {}
+    res["inputs"] = {}
+    paths: typing.List[typing.Tuple[str, typing.List[str]]] = []
+    for column in columns:
+        base, path = split_call_column(column)
+        if path:
+            paths.append((base, path))
+        else:
+            res[base] = call.get(base)
+    for base, path in paths:
+        if base in columns:
+            # Already returned in full
+            continue
+        try:
+            value = get_json_path_value(call.get(base), path)
+        except KeyError:
+            continue
+        res[base] = set_json_path_value(res.get(base), path, value)
+    return res
+
+
+# The only ordering keyset pagination (`CallsQueryReq.after`) supports
+CALLS_CURSOR_SORT_BY = [("started_at", "asc"), ("id", "asc")]
+
+
+def validate_calls_cursor_sort_by(
+    sort_by: typing.Optional[typing.List[tsi._SortBy]],
+) -> None:
+    """Raises if `sort_by` is incompatible with a cursor."""
+    if sort_by is None:
+        return
+    if [(s.field, s.direction) for s in sort_by] != CALLS_CURSOR_SORT_BY:
+        raise ValueError("A cursor requires sorting by started_at, then id (ascending)")
+
+
+# Calls stats are aggregated by the minute calls started in
+CALLS_STATS_RESOLUTION_SECONDS = 60
+CALLS_STATS_PERCENTILES = (0.5, 0.9, 0.95, 0.99)
+CALLS_STATS_USAGE_KEYS = tuple(tsi.CallsStatsUsage.model_fields)
+
+
+def validate_calls_stats_req(req: tsi.CallsStatsReq) -> None:
+    if req.bucket_seconds is not None and (
+        req.bucket_seconds <= 0 or req.bucket_seconds % CALLS_STATS_RESOLUTION_SECONDS
+    ):
+        raise InvalidRequest(
+            f"bucket_seconds must be a positive multiple of {CALLS_STATS_RESOLUTION_SECONDS}"
+        )
+
+
+def _as_utc(dt: datetime.datetime) -> datetime.datetime:
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=datetime.timezone.utc)
+    return dt.astimezone(datetime.timezone.utc)
+
+
+def _floor_datetime(dt: datetime.datetime, seconds: int) -> datetime.datetime:
+    ts = int(_as_utc(dt).timestamp())
+    return datetime.datetime.fromtimestamp(ts - ts % seconds, tz=datetime.timezone.utc)
+
+
+def _percentile(sorted_values: typing.List[float], q: float) -> float:
+    # Linear interpolation between the closest ranks
+    pos = (len(sorted_values) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def calls_stats_cost(
+    usage: typing.Dict[str, tsi.CallsStatsUsage],
+    token_costs: typing.Optional[typing.Dict[str, tsi.TokenCost]],
+) -> typing.Optional[float]:
+    if token_costs is None:
+        return None
+    cost = 0.0
+    for model, model_usage in usage.items():
+        price = token_costs.get(model)
+        if price is not None:
+            cost += model_usage.prompt_tokens * price.prompt_token_cost
+            cost += model_usage.completion_tokens * price.completion_token_cost
+    return cost
+
+
+def calls_stats_from_calls(
+    req: tsi.CallsStatsReq, calls: typing.Iterable[tsi.CallSchema]
+) -> tsi.CallsStatsRes:
+    """Aggregates `calls` (already filtered by `req.op_names`) the way
+    `calls_stats` does, for servers which do not pre-aggregate them.
+    Percentiles are exact rather than estimated."""
+    validate_calls_stats_req(req)
+    started_after = req.started_after and _as_utc(req.started_after)
+    started_before = req.started_before and _as_utc(req.started_before)
+
+    groups: typing.Dict[
+        typing.Tuple[typing.Optional[str], typing.Optional[datetime.datetime]],
+        typing.Dict[str, typing.Any],
+    ] = {}
+    for call in calls:
+        if call.ended_at is None:
+            continue
+        minute = _floor_datetime(call.started_at, CALLS_STATS_RESOLUTION_SECONDS)
+        if started_after is not None and minute < started_after:
+            continue
+        if started_before is not None and minute >= started_before:
+            continue
+        key = (
+            call.op_name if req.group_by_op_name else None,
+            _floor_datetime(minute, req.bucket_seconds)
+            if req.bucket_seconds is not None
+            else None,
+        )
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {"errors": 0, "latencies": [], "usage": {}}
+        if call.exception is not None:
+            group["errors"] += 1
+        latency = _as_utc(call.ended_at) - _as_utc(call.started_at)
+        group["latencies"].append(latency.total_seconds() * 1000)
+        usage = (call.summary or {}).get("usage")
+        if not isinstance(usage, dict):
+            continue
+        for model, model_usage in usage.items():
+            if not isinstance(model_usage, dict):
+                continue
+            totals = group["usage"].setdefault(model, tsi.CallsStatsUsage())
+            for k in CALLS_STATS_USAGE_KEYS:
+                v = model_usage.get(k)
+                if isinstance(v, (int, float)):
+                    setattr(totals, k, getattr(totals, k) + int(v))
+
+    res = []
+    for (op_name, bucket_start), group in sorted(
+        groups.items(), key=lambda item: (item[0][0] or "", item[0][1] or 0)
+    ):
+        latencies = sorted(group["latencies"])
+        p50, p90, p95, p99 = (
+            _percentile(latencies, q) for q in CALLS_STATS_PERCENTILES
+        )
+        res.append(
+            tsi.CallsStatsGroup(
+                op_name=op_name,
+                bucket_start=bucket_start,
+                call_count=len(latencies),
+                error_count=group["errors"],
+                error_rate=group["errors"] / len(latencies),
+                latency_ms_p50=p50,
+                latency_ms_p90=p90,
+                latency_ms_p95=p95,
+                latency_ms_p99=p99,
+                usage=group["usage"],
+                cost=calls_stats_cost(group["usage"], req.token_costs),
+            )
+        )
+    return tsi.CallsStatsRes(groups=res)
+
+
+def trace_display_order(
+    calls: typing.Iterable[tsi.CallSchema], max_depth: typing.Optional[int] = None
+) -> typing.List[tsi.CallSchema]:
+    """Orders the calls of a trace as `TraceReadRes.calls`, dropping the calls
+    deeper than `max_depth`."""
+    calls = sorted(calls, key=lambda call: (call.started_at, call.id))
+    ids = {call.id for call in calls}
+    children: typing.Dict[str, typing.List[tsi.CallSchema]] = defaultdict(list)
+    roots = []
+    for call in calls:
+        if call.parent_id is not None and call.parent_id in ids:
+            children[call.parent_id].append(call)
+        else:
+            roots.append(call)
+
+    res = []
+    stack = [(call, 0) for call in reversed(roots)]
+    while stack:
+        call, depth = stack.pop()
+        res.append(call)
+        if max_depth is None or depth < max_depth:
+            stack.extend((child, depth + 1) for child in reversed(children[call.id]))
+    return res
+
+
+def read_trace(
+    calls_query_stream: typing.Callable[
+        [tsi.CallsQueryReq], typing.Iterator[tsi.CallSchema]
+    ],
+    req: tsi.TraceReadReq,
+) -> tsi.TraceReadRes:
+    """Implements `trace_read` on top of `calls_query_stream`."""
+    columns = req.columns
+    if columns is not None and "parent_id" not in columns:
+        columns = [*columns, "parent_id"]
+    trace_filter = tsi._CallsFilter(trace_ids=[req.trace_id])
+    if req.max_depth is None:
+        calls = calls_query_stream(
+            tsi.CallsQueryReq(
+                project_id=req.project_id, filter=trace_filter, columns=columns
+            )
+        )
+        return tsi.TraceReadRes(calls=trace_display_order(calls))
+
+    # Resolve the tree over the light columns first, so that only the calls
+    # within the depth limit are read in full
+    tree = trace_display_order(
+        calls_query_stream(
+            tsi.CallsQueryReq(
+                project_id=req.project_id, filter=trace_filter, columns=["parent_id"]
+            )
+        ),
+        req.max_depth,
+    )
+    if not tree:
+        return tsi.TraceReadRes(calls=[])
+    calls_by_id = {
+        call.id: call
+        for call in calls_query_stream(
+            tsi.CallsQueryReq(
+                project_id=req.project_id,
+                filter=tsi._CallsFilter(
+                    trace_ids=[req.trace_id], call_ids=[call.id for call in tree]
+                ),
+                columns=columns,
+            )
+        )
+    }
+    return tsi.TraceReadRes(
+        calls=[calls_by_id[call.id] for call in tree if call.id in calls_by_id]
+    )
@@ -1,9 +1,15 @@
+import asyncio
+import contextvars
 import dataclasses
 import datetime
+import json
+import threading
 import typing
 import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Any, Dict, Optional, Sequence, TypedDict, Union
 
+import pyarrow as pa
 import pydantic
 from requests import HTTPError
 
@@ -11,6 +17,12 @@ from weave import call_context, client_context, trace_sentry, urls
 from weave.exception import exception_to_json_str
 from weave.feedback import FeedbackQuery, RefFeedbackQuery
 from weave.table import Table
+from weave.trace import calls_export, env
+from weave.trace.ingestion_queue import (
+    BackpressurePolicy,
+    IngestionQueue,
+    IngestionStats,
+)
 from weave.trace.object_record import (
     ObjectRecord,
     dataclass_object_record,
@@ -24,9 +36,24 @@ from weave.trace.refs import (
     Ref,
     TableRef,
 )
-from weave.trace.serialize import from_json, isinstance_namedtuple, to_json
+from weave.trace.sampling import Sampler, SamplingPolicy
+from weave.trace.serialize import (
+    REDACTED_VALUE,
+    SerializeLimits,
+    from_json,
+    isinstance_namedtuple,
+    to_json,
+    to_json_bounded,
+)
+from weave.trace.upload_cache import UploadCache
 from weave.trace.vals import WeaveObject, WeaveTable, make_trace_obj
+from weave.trace_server.async_remote_http_trace_server import (
+    AsyncRemoteHTTPTraceServer,
+)
+from weave.trace_server.async_trace_server import ThreadedAsyncTraceServer
+from weave.trace_server.remote_http_trace_server import RemoteHTTPTraceServer
 from weave.trace_server.trace_server_interface import (
+    AsyncTraceServerInterface,
     CallEndReq,
     CallSchema,
     CallsDeleteReq,
@@ -42,12 +69,19 @@ from weave.trace_server.trace_server_interface import (
     Query,
     RefsReadBatchReq,
     StartedCallSchemaForInsert,
+    TableCreateFromDigestsReq,
     TableCreateReq,
+    TableRowsCreateReq,
+    TableRowsMissingReq,
     TableSchemaForInsert,
+    TraceReadReq,
     TraceServerInterface,
+    _CallsCursor,
     _CallsFilter,
     _ObjectVersionFilter,
+    _SortBy,
 )
+from weave.trace_server.trace_server_interface_util import str_digest
 
 if typing.TYPE_CHECKING:
     from . import ref_base
@@ -142,6 +176,13 @@ class Call:
     _children: list["Call"] = dataclasses.field(default_factory=list)
 
     _feedback: Optional[RefFeedbackQuery] = None
+    # Sends the start of a call created by `create_call_async`
+    _start_task: Optional["asyncio.Future[None]"] = dataclasses.field(
+        default=None, repr=False, compare=False
+    )
+    _started_at: Optional[datetime.datetime] = dataclasses.field(
+        default=None, repr=False, compare=False
+    )
 
     @property
     def feedback(self) -> RefFeedbackQuery:
@@ -196,16 +237,81 @@ class Call:
         self.set_display_name(None)
 
 
+@dataclasses.dataclass
+class TraceNode:
+    """A call of a trace read by `WeaveClient.trace`, with its child calls."""
+
+    call: WeaveObject
+    depth: int
+    children: list["TraceNode"] = dataclasses.field(default_factory=list)
+
+    def walk(self) -> typing.Iterator["TraceNode"]:
+        """Yields this node and its descendants, depth first."""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+
+@dataclasses.dataclass(eq=False)
+class _NestedSave:
+    """An object, table or op waiting to be saved by `_save_nested_objects`."""
+
+    obj: Any
+    name: Optional[str]
+    # The record saved for pydantic objects and dataclasses
+    record: Optional[ObjectRecord]
+    pending_children: int = 0
+    parents: list["_NestedSave"] = dataclasses.field(default_factory=list)
+    # False while the objects nested in it are being collected
+    collected: bool = False
+
+
+# Set in the threads of the save executor. Saves started from those threads
+# (eg. an op saved while encoding a custom object) run serially, so that a
+# worker never waits on work queued behind it.
+_save_worker_state = threading.local()
+
+
+def _init_save_worker() -> None:
+    _save_worker_state.active = True
+
+
+DEFAULT_CALLS_PAGE_SIZE = 100
+
+# Tables with fewer rows are sent in a single `table_create` request
+MIN_INCREMENTAL_TABLE_ROWS = 100
+TABLE_ROWS_UPLOAD_BATCH_SIZE = 1000
+
+
 class CallsIter:
+    """Lazily iterates over the calls matching `filter`.
+
+    Pages are fetched by keyset (`started_at`, `id`) rather than by offset, so
+    iterating over all the calls of a project is linear in their number. While
+    a page is being consumed, the next one is fetched in the background unless
+    `prefetch` is False.
+    """
+
     server: TraceServerInterface
     filter: _CallsFilter
 
     def __init__(
-        self, server: TraceServerInterface, project_id: str, filter: _CallsFilter
+        self,
+        server: TraceServerInterface,
+        project_id: str,
+        filter: _CallsFilter,
+        page_size: int = DEFAULT_CALLS_PAGE_SIZE,
+        prefetch: bool = True,
     ) -> None:
+        if page_size < 1:
+            raise ValueError("page_size must be at least 1")
         self.server = server
         self.project_id = project_id
         self.filter = filter
+        self.page_size = page_size
+        self.prefetch = prefetch
 
     def __getitem__(self, key: Union[slice, int]) -> WeaveObject:
         if isinstance(key, slice):
@@ -215,28 +321,74 @@ class CallsIter:
                 return call
         raise IndexError(f"Index {key} out of range")
 
+    def _fetch_page(
+        self, after: Optional[_CallsCursor], offset: Optional[int]
+    ) -> list[CallSchema]:
+        response = self.server.calls_query(
+            CallsQueryReq(
+                project_id=self.project_id,
+                filter=self.filter,
+                sort_by=[
+                    _SortBy(field="started_at", direction="asc"),
+                    _SortBy(field="id", direction="asc"),
+                ],
+                after=after,
+                offset=offset,
+                limit=self.page_size,
+            )
+        )
+        return response.calls
+
     def __iter__(self) -> typing.Iterator[WeaveObject]:
-        page_index = 0
-        page_size = 10
         entity, project = self.project_id.split("/")
-        while True:
-            response = self.server.calls_query(
-                CallsQueryReq(
-                    project_id=self.project_id,
-                    filter=self.filter,
-                    offset=page_index * page_size,
-                    limit=page_size,
-                )
-            )
-            page_data = response.calls
-            for call in page_data:
-                # TODO: if we want to be able to refer to call outputs
-                # we need to yield a ref-tracking call here.
-                yield make_client_call(entity, project, call, self.server)
-                # yield make_trace_obj(call, ValRef(call.id), self.server, None)
-            if len(page_data) < page_size:
-                break
-            page_index += 1
+        executor = ThreadPoolExecutor(max_workers=1) if self.prefetch else None
+        next_page: Optional[Future[list[CallSchema]]] = None
+        after: Optional[_CallsCursor] = None
+        offset = 0
+        # Older servers ignore `after` and return the first page again: page
+        # through their calls by offset instead
+        by_offset = False
+        try:
+            while True:
+                if next_page is not None:
+                    page_data = next_page.result()
+                    next_page = None
+                elif by_offset:
+                    page_data = self._fetch_page(None, offset)
+                else:
+                    page_data = self._fetch_page(after, None)
+                if (
+                    after is not None
+                    and not by_offset
+                    and page_data
+                    and (page_data[0].started_at, page_data[0].id)
+                    <= (after.started_at, after.id)
+                ):
+                    by_offset = True
+                    page_data = self._fetch_page(None, offset)
+                offset += len(page_data)
+                is_last_page = len(page_data) < self.page_size
+                if not is_last_page:
+                    last_call = page_data[-1]
+                    after = _CallsCursor(
+                        started_at=last_call.started_at, id=last_call.id
+                    )
+                    if executor is not None:
+                        next_page = executor.submit(
+                            self._fetch_page,
+                            None if by_offset else after,
+                            offset if by_offset else None,
+                        )
+                for call in page_data:
+                    # TODO: if we want to be able to refer to call outputs
+                    # we need to yield a ref-tracking call here.
+                    yield make_client_call(entity, project, call, self.server)
+                    # yield make_trace_obj(call, ValRef(call.id), self.server, None)
+                if is_last_page:
+                    break
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False)
 
 
 def make_client_call(
@@ -284,6 +436,22 @@ class WeaveClient:
         project: The project name.
         server: The server to use for communication.
         ensure_project_exists: Whether to ensure the project exists on the server.
+        ingestion_queue: If provided, call starts and ends are serialized and sent
+            to the server by this queue's worker threads instead of on the caller's
+            thread. Defaults to a queue configured from the environment when
+            `WEAVE_ASYNC_INGESTION` is set, otherwise ingestion is synchronous.
+        upload_cache: Remembers the objects and files already uploaded, so that
+            unchanged values are not sent again. Defaults to a process-local
+            cache, unless `WEAVE_UPLOAD_CACHE` is disabled.
+        sampling_policy: Which op calls are traced. Defaults to a policy
+            configured from the environment (`WEAVE_TRACE_SAMPLE_RATE`, ...),
+            which traces every call unless set.
+        serialize_limits: Bounds the size of the logged call inputs and outputs,
+            and the keys to redact. Defaults to limits configured from the
+            environment (`WEAVE_SERIALIZE_MAX_STRING_BYTES`, ...).
+        async_server: The async counterpart of `server`, used to log the calls of
+            async ops. Defaults to an aiohttp client for a remote server, and to
+            running `server` in threads otherwise.
     """
 
     def __init__(
@@ -292,12 +460,40 @@ class WeaveClient:
         project: str,
         server: TraceServerInterface,
         ensure_project_exists: bool = True,
+        ingestion_queue: Optional[IngestionQueue] = None,
+        upload_cache: Optional[UploadCache] = None,
+        sampling_policy: Optional[SamplingPolicy] = None,
+        serialize_limits: Optional[SerializeLimits] = None,
+        async_server: Optional[AsyncTraceServerInterface] = None,
     ):
         self.entity = entity
         self.project = project
         self.server = server
         self._anonymous_ops: dict[str, Op] = {}
         self.ensure_project_exists = ensure_project_exists
+        # Cleared when the server does not support incremental table creation
+        self._incremental_tables = True
+        if upload_cache is None and env.get_upload_cache():
+            upload_cache = UploadCache()
+        self._upload_cache = upload_cache
+        self._save_executor: Optional[ThreadPoolExecutor] = None
+        self._save_executor_lock = threading.Lock()
+        self.set_sampling_policy(sampling_policy or SamplingPolicy.from_env())
+        self.serialize_limits = serialize_limits or SerializeLimits.from_env()
+        self._async_server = async_server
+
+        if ingestion_queue is None and env.get_async_ingestion():
+            ingestion_queue = IngestionQueue(
+                num_workers=env.get_async_ingestion_workers(),
+                max_queue_size=env.get_async_ingestion_max_queue_size(),
+                backpressure=typing.cast(
+                    BackpressurePolicy, env.get_async_ingestion_backpressure()
+                ),
+                spill_dir=env.get_async_ingestion_spill_dir(),
+            )
+        if ingestion_queue is not None and ingestion_queue.replay_fn is None:
+            ingestion_queue.replay_fn = self._replay_spilled_call
+        self._ingestion_queue = ingestion_queue
 
         if ensure_project_exists:
             self.server.ensure_project_exists(entity, project)
@@ -361,11 +557,58 @@ class WeaveClient:
     ################ Query API ################
 
     @trace_sentry.global_trace_sentry.watch()
-    def calls(self, filter: Optional[_CallsFilter] = None) -> CallsIter:
+    def calls(
+        self,
+        filter: Optional[_CallsFilter] = None,
+        page_size: int = DEFAULT_CALLS_PAGE_SIZE,
+    ) -> CallsIter:
         if filter is None:
             filter = _CallsFilter()
 
-        return CallsIter(self.server, self._project_id(), filter)
+        return CallsIter(self.server, self._project_id(), filter, page_size=page_size)
+
+    @trace_sentry.global_trace_sentry.watch()
+    def calls_to_arrow(
+        self,
+        filter: Optional[_CallsFilter] = None,
+        columns: Optional[list[str]] = None,
+        batch_size: int = calls_export.DEFAULT_EXPORT_BATCH_SIZE,
+    ) -> pa.Table:
+        """Returns the calls matching `filter` as an Arrow table.
+
+        Dictionary fields are flattened into one column per leaf (eg.
+        `output.score`). `columns` restricts both what the server sends and
+        the columns of the table, and may include such sub-paths.
+        """
+        stream = self.server.calls_query_stream(
+            CallsQueryReq(
+                project_id=self._project_id(),
+                filter=filter,
+                columns=columns,
+            )
+        )
+        return calls_export.calls_to_arrow(stream, columns, batch_size)
+
+    @trace_sentry.global_trace_sentry.watch()
+    def calls_to_parquet(
+        self,
+        path: str,
+        filter: Optional[_CallsFilter] = None,
+        columns: Optional[list[str]] = None,
+        batch_size: int = calls_export.DEFAULT_EXPORT_BATCH_SIZE,
+    ) -> None:
+        """Writes the calls matching `filter` to a Parquet file, see `calls_to_arrow`.
+
+        Unlike `calls_to_arrow`, the calls are not all held in memory at once.
+        """
+        stream = self.server.calls_query_stream(
+            CallsQueryReq(
+                project_id=self._project_id(),
+                filter=filter,
+                columns=columns,
+            )
+        )
+        calls_export.calls_to_parquet(stream, path, columns, batch_size)
 
     @trace_sentry.global_trace_sentry.watch()
     def call(self, call_id: str) -> WeaveObject:
@@ -380,6 +623,46 @@ class WeaveClient:
         response_call = response.calls[0]
         return make_client_call(self.entity, self.project, response_call, self.server)
 
+    @trace_sentry.global_trace_sentry.watch()
+    def trace(
+        self,
+        trace_id: str,
+        max_depth: Optional[int] = None,
+        columns: Optional[list[str]] = None,
+    ) -> list[TraceNode]:
+        """Reads the calls of a trace in a single request, and returns its
+        root calls with their descendants.
+
+        Args:
+            trace_id: The trace to read.
+            max_depth: Only read the calls at most this many levels below the
+                roots (which are at depth 0).
+            columns: The call fields to read, as in `calls_to_arrow`. Leaving
+                out the inputs and outputs makes large traces cheaper to read.
+        """
+        response = self.server.trace_read(
+            TraceReadReq(
+                project_id=self._project_id(),
+                trace_id=trace_id,
+                max_depth=max_depth,
+                columns=columns,
+            )
+        )
+        # Calls come depth first, so parents come before their children
+        nodes: dict[str, TraceNode] = {}
+        roots = []
+        for server_call in response.calls:
+            call = make_client_call(self.entity, self.project, server_call, self.server)
+            parent = nodes.get(server_call.parent_id) if server_call.parent_id else None
+            if parent is None:
+                node = TraceNode(call, 0)
+                roots.append(node)
+            else:
+                node = TraceNode(call, parent.depth + 1)
+                parent.children.append(node)
+            nodes[server_call.id] = node
+        return roots
+
     @trace_sentry.global_trace_sentry.watch()
     def create_call(
         self,
@@ -390,6 +673,7 @@ class WeaveClient:
         display_name: Optional[str] = None,
         *,
         use_stack: bool = True,
+        started_at: Optional[datetime.datetime] = None,
     ) -> Call:
         """Create, log, and push a call onto the runtime stack.
 
@@ -400,24 +684,115 @@ class WeaveClient:
             display_name: The display name for the call. Defaults to None.
             attributes: The attributes for the call. Defaults to None.
             use_stack: Whether to push the call onto the runtime stack. Defaults to True.
+            started_at: When the call started. Defaults to now.
 
         Returns:
             The created Call object.
         """
+        call, make_start_req = self._prepare_call(
+            self._op_str(op),
+            inputs,
+            parent,
+            attributes,
+            display_name,
+            use_stack=use_stack,
+            started_at=started_at,
+        )
+
+        if self._ingestion_queue is None:
+            self.server.call_start(make_start_req())
+        else:
+            self._ingestion_queue.submit(
+                call.trace_id,  # type: ignore
+                lambda: self.server.call_start(make_start_req()),
+                spill_fn=lambda: _spill_line("start", make_start_req, call.inputs),
+            )
+
+        if use_stack:
+            call_context.push_call(call)
+
+        return call
+
+    async def create_call_async(
+        self,
+        op: Union[str, Op],
+        inputs: dict,
+        parent: Optional[Call] = None,
+        attributes: Optional[dict] = None,
+        display_name: Optional[str] = None,
+        *,
+        use_stack: bool = True,
+    ) -> Call:
+        """Like `create_call`, but for callers running in an event loop: saving
+        the op and the inputs runs in a thread, and the call is sent with
+        `async_server`. Returns as soon as the call is created; the call is
+        sent in the background, before its end (see `finish_call_async`).
+        """
+        if isinstance(op, Op) and op.ref is None:
+            op_str = await asyncio.to_thread(self._op_str, op)
+        else:
+            op_str = self._op_str(op)
+        call, make_start_req = self._prepare_call(
+            op_str, inputs, parent, attributes, display_name, use_stack=use_stack
+        )
+
+        if self._ingestion_queue is None:
+
+            async def send_start() -> None:
+                req = await asyncio.to_thread(make_start_req)
+                await self.async_server.call_start(req)
+
+            call._start_task = asyncio.ensure_future(send_start())
+        else:
+            # Submitting to the queue does not block
+            self._ingestion_queue.submit(
+                call.trace_id,  # type: ignore
+                lambda: self.server.call_start(make_start_req()),
+                spill_fn=lambda: _spill_line("start", make_start_req, call.inputs),
+            )
+
+        if use_stack:
+            call_context.push_call(call)
+
+        return call
+
+    @property
+    def async_server(self) -> AsyncTraceServerInterface:
+        if self._async_server is None:
+            if isinstance(self.server, RemoteHTTPTraceServer):
+                self._async_server = AsyncRemoteHTTPTraceServer(self.server)
+            else:
+                self._async_server = ThreadedAsyncTraceServer(self.server)
+        return self._async_server
+
+    def _op_str(self, op: Union[str, Op]) -> str:
         if isinstance(op, str):
             if op not in self._anonymous_ops:
                 self._anonymous_ops[op] = _build_anonymous_op(op)
             op = self._anonymous_ops[op]
-        if isinstance(op, Op):
-            op_def_ref = self._save_op(op)
-            op_str = op_def_ref.uri()
-        else:
-            op_str = op
+        return self._save_op(op).uri()
 
-        inputs_redacted = redact_sensitive_keys(inputs)
-
-        self._save_nested_objects(inputs_redacted)
-        inputs_with_refs = map_to_refs(inputs_redacted)
+    def _prepare_call(
+        self,
+        op_str: str,
+        inputs: dict,
+        parent: Optional[Call],
+        attributes: Optional[dict],
+        display_name: Optional[str],
+        *,
+        use_stack: bool,
+        started_at: Optional[datetime.datetime] = None,
+    ) -> tuple[Call, typing.Callable[[], CallStartReq]]:
+        """Creates a call, and the function building the request that logs it."""
+        # With async ingestion, the request is built after the caller may have
+        # changed the inputs: snapshot their dicts and lists. Nested sensitive
+        # values are redacted when the inputs are serialized.
+        if self._ingestion_queue is not None:
+            inputs = _copy_containers(inputs)
+        redact_keys = self.serialize_limits.redact_keys
+        inputs = {
+            k: REDACTED_VALUE if k in redact_keys else v for k, v in inputs.items()
+        }
         call_id = generate_id()
 
         if parent is None and use_stack:
@@ -439,7 +814,7 @@ class WeaveClient:
             trace_id=trace_id,
             parent_id=parent_id,
             id=call_id,
-            inputs=inputs_with_refs,
+            inputs=inputs,
             display_name=display_name,
             attributes=attributes,
         )
@@ -448,33 +823,107 @@ class WeaveClient:
 
         current_wb_run_id = safe_current_wb_run_id()
         check_wandb_run_matches(current_wb_run_id, self.entity, self.project)
-        start = StartedCallSchemaForInsert(
-            project_id=self._project_id(),
-            id=call_id,
-            op_name=op_str,
-            display_name=display_name,
-            trace_id=trace_id,
-            started_at=datetime.datetime.now(tz=datetime.timezone.utc),
-            parent_id=parent_id,
-            inputs=to_json(inputs_with_refs, self._project_id(), self.server),
-            attributes=attributes,
-            wb_run_id=current_wb_run_id,
-        )
-        self.server.call_start(CallStartReq(start=start))
+        if started_at is None:
+            started_at = datetime.datetime.now(tz=datetime.timezone.utc)
+        call._started_at = started_at
+
+        def make_start_req() -> CallStartReq:
+            inputs_with_refs = self._save_and_map_to_refs(inputs)
+            # Workers leave the call as is, the caller may be reading it
+            if self._ingestion_queue is None:
+                call.inputs = inputs_with_refs
+            # Redacts sensitive keys and bounds the size of the inputs
+            inputs_json, elided = to_json_bounded(
+                inputs_with_refs,
+                self._project_id(),
+                self.server,
+                self.serialize_limits,
+                self._upload_cache,
+                path="inputs",
+            )
+            start = StartedCallSchemaForInsert(
+                project_id=self._project_id(),
+                id=call_id,
+                op_name=op_str,
+                display_name=display_name,
+                trace_id=trace_id,
+                started_at=started_at,
+                parent_id=parent_id,
+                inputs=inputs_json,
+                attributes=(
+                    {**attributes, ELIDED_KEY: elided} if elided else attributes
+                ),
+                wb_run_id=current_wb_run_id,
+            )
+            return CallStartReq(start=start)
 
-        if use_stack:
-            call_context.push_call(call)
+        return call, make_start_req
 
-        return call
+    def set_sampling_policy(self, policy: SamplingPolicy) -> None:
+        """Sets which op calls are traced. See `weave.trace.sampling`."""
+        self.sampling_policy = policy
+        self._sampler = None if policy.traces_everything() else Sampler(policy)
 
     @trace_sentry.global_trace_sentry.watch()
     def finish_call(
         self, call: Call, output: Any = None, exception: Optional[BaseException] = None
     ) -> None:
-        self._save_nested_objects(output)
+        make_end_req, summary = self._prepare_finish(call, output, exception)
+
+        if self._ingestion_queue is None:
+            self.server.call_end(make_end_req())
+        else:
+            self._ingestion_queue.submit(
+                call.trace_id,  # type: ignore
+                lambda: self.server.call_end(make_end_req()),
+                spill_fn=lambda: _spill_line("end", make_end_req, call.output),
+            )
+
+        # Descendent error tracking disabled til we fix UI
+        # Add this call's summary after logging the call, so that only
+        # descendents are included in what we log
+        # summary.setdefault("descendants", {}).setdefault(
+        #     call.op_name, {"successes": 0, "errors": 0}
+        # )["successes"] += 1
+        call.summary = summary
+        call_context.pop_call(call.id)
+
+    async def finish_call_async(
+        self, call: Call, output: Any = None, exception: Optional[BaseException] = None
+    ) -> None:
+        """Like `finish_call`, but for callers running in an event loop. Waits
+        until the call's start and end have been sent, without blocking the
+        loop: saving the output runs in a thread, and the end is sent with
+        `async_server`.
+        """
+        make_end_req, summary = self._prepare_finish(call, output, exception)
+        call.summary = summary
+        call_context.pop_call(call.id)
+
+        if self._ingestion_queue is not None:
+            self._ingestion_queue.submit(
+                call.trace_id,  # type: ignore
+                lambda: self.server.call_end(make_end_req()),
+                spill_fn=lambda: _spill_line("end", make_end_req, call.output),
+            )
+            return
+
+        # Calls created by `create_call` have already been sent
+        if call._start_task is not None:
+            await call._start_task
+            call._start_task = None
+        req = await asyncio.to_thread(make_end_req)
+        await self.async_server.call_end(req)
+
+    def _prepare_finish(
+        self, call: Call, output: Any, exception: Optional[BaseException]
+    ) -> tuple[typing.Callable[[], CallEndReq], dict]:
+        """Finishes a call, and returns the function building the request that
+        logs its end, with the call's summary."""
         original_output = output
-        output = map_to_refs(original_output)
-        call.output = output
+        if self._ingestion_queue is not None:
+            original_output = _copy_containers(output)
+        call.output = original_output
 
         # Summary handling
         summary = {}
@@ -507,33 +956,65 @@ class WeaveClient:
             exception_str = exception_to_json_str(exception)
             call.exception = exception_str
 
-        self.server.call_end(
-            CallEndReq(
+        ended_at = datetime.datetime.now(tz=datetime.timezone.utc)
+
+        def make_end_req() -> CallEndReq:
+            output_with_refs = self._save_and_map_to_refs(original_output)
+            if self._ingestion_queue is None:
+                call.output = output_with_refs
+            output_json, elided = to_json_bounded(
+                output_with_refs,
+                self._project_id(),
+                self.server,
+                self.serialize_limits,
+                self._upload_cache,
+                path="output",
+            )
+            return CallEndReq(
                 end=EndedCallSchemaForInsert(
                     project_id=self._project_id(),
                     id=call.id,  # type: ignore
-                    ended_at=datetime.datetime.now(tz=datetime.timezone.utc),
-                    output=to_json(output, self._project_id(), self.server),
-                    summary=summary,
+                    ended_at=ended_at,
+                    output=output_json,
+                    # Not added to call.summary, which parents sum up
+                    summary={**summary, ELIDED_KEY: elided} if elided else summary,
                     exception=exception_str,
+                    op_name=call.op_name,
+                    started_at=call._started_at,
                 )
             )
-        )
 
-        # Descendent error tracking disabled til we fix UI
-        # Add this call's summary after logging the call, so that only
-        # descendents are included in what we log
-        # summary.setdefault("descendants", {}).setdefault(
-        #     call.op_name, {"successes": 0, "errors": 0}
-        # )["successes"] += 1
-        call.summary = summary
-        call_context.pop_call(call.id)
+        return make_end_req, summary
 
     @trace_sentry.global_trace_sentry.watch()
     def fail_call(self, call: Call, exception: BaseException) -> None:
         """Fail a call with an exception. This is a convenience method for finish_call."""
         return self.finish_call(call, exception=exception)
 
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until all queued call starts and ends have been sent to the server.
+
+        This is a no-op when the client ingests calls synchronously.
+
+        Args:
+            timeout: Maximum number of seconds to wait. Defaults to waiting forever.
+
+        Returns:
+            False if the timeout elapsed before everything was sent, True otherwise.
+        """
+        if self._ingestion_queue is None:
+            return True
+        return self._ingestion_queue.flush(timeout)
+
+    def ingestion_stats(self) -> Optional[IngestionStats]:
+        """Queue depth and drop/spill/error counters of the background ingestion queue.
+
+        Returns None when the client ingests calls synchronously.
+        """
+        if self._ingestion_queue is None:
+            return None
+        return self._ingestion_queue.stats()
+
     @trace_sentry.global_trace_sentry.watch()
     def delete_call(self, call: Call) -> None:
         self.server.calls_delete(
@@ -631,6 +1112,30 @@ class WeaveClient:
         self._save_nested_objects(val, name=name)
         return self._save_object_basic(val, name, branch)
 
+    def _save_and_map_to_refs(self, val: Any) -> Any:
+        self._save_nested_objects(val)
+        return map_to_refs(val)
+
+    def _replay_spilled_call(self, line: str) -> None:
+        # Inverse of _spill_line
+        spilled = json.loads(line)
+        if spilled["mode"] == "start":
+            self.server.call_start(CallStartReq.model_validate(spilled["req"]))
+        elif spilled["mode"] == "end":
+            self.server.call_end(CallEndReq.model_validate(spilled["req"]))
+        else:
+            raise ValueError(f"Unknown spilled call mode: {spilled['mode']}")
+
+    def _obj_exists(self, name: str, digest: str) -> bool:
+        try:
+            self.server.obj_read(
+                ObjReadReq(project_id=self._project_id(), object_id=name, digest=digest)
+            )
+        except Exception:
+            # Uploading again is always safe
+            return False
+        return True
+
     def _save_object_basic(
         self, val: Any, name: str, branch: str = "latest"
     ) -> ObjectRef:
@@ -638,68 +1143,233 @@ class WeaveClient:
         val = map_to_refs(val)
         if isinstance(val, ObjectRef):
             return val
-        json_val = to_json(val, self._project_id(), self.server)
-
-        response = self.server.obj_create(
-            ObjCreateReq(
-                obj=ObjSchemaForInsert(
-                    project_id=self.entity + "/" + self.project,
-                    object_id=name,
-                    val=json_val,
+        json_val = to_json(val, self._project_id(), self.server, self._upload_cache)
+
+        cache_key = None
+        digest = None
+        if self._upload_cache is not None:
+            try:
+                content_digest = str_digest(json.dumps(json_val))
+            except TypeError:
+                pass
+            else:
+                cache_key = self._upload_cache.key(
+                    "obj", self._project_id(), name, content_digest
+                )
+                digest = self._upload_cache.get(
+                    cache_key, lambda d: self._obj_exists(name, d)
+                )
+        if digest is None:
+            response = self.server.obj_create(
+                ObjCreateReq(
+                    obj=ObjSchemaForInsert(
+                        project_id=self.entity + "/" + self.project,
+                        object_id=name,
+                        val=json_val,
+                    )
                 )
             )
-        )
+            digest = response.digest
+            if self._upload_cache is not None and cache_key is not None:
+                self._upload_cache.set(cache_key, digest)
         ref: Ref
         if is_opdef:
-            ref = OpRef(self.entity, self.project, name, response.digest)
+            ref = OpRef(self.entity, self.project, name, digest)
         else:
-            ref = ObjectRef(self.entity, self.project, name, response.digest)
+            ref = ObjectRef(self.entity, self.project, name, digest)
         # TODO: Try to put a ref onto val? Or should user code use a style like
         # save instead?
         return ref
 
     def _save_nested_objects(self, obj: Any, name: Optional[str] = None) -> Any:
+        """Saves the objects, tables and ops nested in `obj` (and `obj` itself).
+
+        An object can only be saved once the objects it contains have refs, so
+        the nested objects form a dependency graph. Independent objects are saved
+        concurrently, and each object is saved as soon as its children are.
+        """
+        saves: list[_NestedSave] = []
+        self._collect_nested_saves(obj, name, None, saves, {})
+        if (
+            len(saves) <= 1
+            or env.get_save_parallelism() <= 1
+            or getattr(_save_worker_state, "active", False)
+        ):
+            # Saves are collected children first, so they can run in order
+            for save in saves:
+                self._run_nested_save(save)
+            return
+
+        lock = threading.Lock()
+        done = threading.Event()
+        remaining = len(saves)
+        errors: list[BaseException] = []
+
+        def run(save: _NestedSave) -> None:
+            nonlocal remaining
+            try:
+                self._run_nested_save(save)
+            except BaseException as e:
+                errors.append(e)
+                done.set()
+                return
+            ready = []
+            with lock:
+                remaining -= 1
+                if remaining == 0:
+                    done.set()
+                for parent in save.parents:
+                    parent.pending_children -= 1
+                    if parent.pending_children == 0:
+                        ready.append(parent)
+            for parent in ready:
+                submit(parent)
+
+        def submit(save: _NestedSave) -> None:
+            try:
+                self._get_save_executor().submit(
+                    contextvars.copy_context().run, run, save
+                )
+            except BaseException as e:
+                # Eg. the executor was shut down; nothing else would set `done`
+                errors.append(e)
+                done.set()
+
+        for save in saves:
+            if save.pending_children == 0:
+                submit(save)
+        done.wait()
+        if errors:
+            raise errors[0]
+
+    def _collect_nested_saves(
+        self,
+        obj: Any,
+        name: Optional[str],
+        parent: Optional["_NestedSave"],
+        saves: list["_NestedSave"],
+        seen: dict[int, "_NestedSave"],
+    ) -> None:
         if get_ref(obj) is not None:
             return
-        if isinstance(obj, pydantic.BaseModel):
-            obj_rec = pydantic_object_record(obj)
-            for v in obj_rec.__dict__.values():
-                self._save_nested_objects(v)
-            ref = self._save_object_basic(obj_rec, name or get_obj_name(obj_rec))
-            obj.__dict__["ref"] = ref
-        elif dataclasses.is_dataclass(obj):
-            obj_rec = dataclass_object_record(obj)
-            for v in obj_rec.__dict__.values():
-                self._save_nested_objects(v)
-            ref = self._save_object_basic(obj_rec, name or get_obj_name(obj_rec))
-            obj.__dict__["ref"] = ref
-        elif isinstance(obj, Table):
-            table_ref = self._save_table(obj)
-            obj.ref = table_ref
+        if isinstance(obj, (pydantic.BaseModel, Table, Op)) or dataclasses.is_dataclass(
+            obj
+        ):
+            save = seen.get(id(obj))
+            if save is not None and not save.collected:
+                # The object contains itself: it could never be saved after its
+                # children
+                raise ValueError(
+                    f"Can't save {type(obj).__name__} object, it contains a reference cycle"
+                )
+            if save is None:
+                record = None
+                if isinstance(obj, pydantic.BaseModel):
+                    record = pydantic_object_record(obj)
+                elif dataclasses.is_dataclass(obj):
+                    record = dataclass_object_record(obj)
+                save = _NestedSave(obj=obj, name=name, record=record)
+                seen[id(obj)] = save
+                if record is not None:
+                    for v in record.__dict__.values():
+                        self._collect_nested_saves(v, None, save, saves, seen)
+                save.collected = True
+                saves.append(save)
+            if parent is not None:
+                save.parents.append(parent)
+                parent.pending_children += 1
         elif isinstance_namedtuple(obj):
             for v in obj._asdict().values():
-                self._save_nested_objects(v)
+                self._collect_nested_saves(v, None, parent, saves, seen)
         elif isinstance(obj, (list, tuple)):
             for v in obj:
-                self._save_nested_objects(v)
+                self._collect_nested_saves(v, None, parent, saves, seen)
         elif isinstance(obj, dict):
             for v in obj.values():
-                self._save_nested_objects(v)
-        elif isinstance(obj, Op):
+                self._collect_nested_saves(v, None, parent, saves, seen)
+
+    def _run_nested_save(self, save: "_NestedSave") -> None:
+        obj = save.obj
+        if save.record is not None:
+            ref = self._save_object_basic(
+                save.record, save.name or get_obj_name(save.record)
+            )
+            obj.__dict__["ref"] = ref
+        elif isinstance(obj, Table):
+            obj.ref = self._save_table(obj)
+        else:
             self._save_op(obj)
 
+    def _get_save_executor(self) -> ThreadPoolExecutor:
+        with self._save_executor_lock:
+            if self._save_executor is None:
+                self._save_executor = ThreadPoolExecutor(
+                    max_workers=env.get_save_parallelism(),
+                    thread_name_prefix="weave-save",
+                    initializer=_init_save_worker,
+                )
+            return self._save_executor
+
     @trace_sentry.global_trace_sentry.watch()
     def _save_table(self, table: Table) -> TableRef:
-        response = self.server.table_create(
-            TableCreateReq(
-                table=TableSchemaForInsert(
-                    project_id=self._project_id(), rows=table.rows
+        digest = None
+        if len(table.rows) >= MIN_INCREMENTAL_TABLE_ROWS and self._incremental_tables:
+            digest = self._save_table_incremental(table.rows)
+        if digest is None:
+            response = self.server.table_create(
+                TableCreateReq(
+                    table=TableSchemaForInsert(
+                        project_id=self._project_id(), rows=table.rows
+                    )
                 )
             )
-        )
-        return TableRef(
-            entity=self.entity, project=self.project, digest=response.digest
-        )
+            digest = response.digest
+        return TableRef(entity=self.entity, project=self.project, digest=digest)
+
+    def _save_table_incremental(self, rows: list) -> Optional[str]:
+        """Saves a table, uploading only the rows the server does not have yet.
+
+        Returns None if the rows can't be digested locally, or if the server
+        does not support incremental table creation.
+        """
+        project_id = self._project_id()
+        try:
+            row_digests = [str_digest(json.dumps(row)) for row in rows]
+        except TypeError:
+            return None
+        try:
+            missing = set(
+                self.server.table_rows_missing(
+                    TableRowsMissingReq(project_id=project_id, row_digests=row_digests)
+                ).row_digests
+            )
+            # The server digests rows after converting their refs to its internal
+            # form, so those rows are reported missing here and are mapped to the
+            # digests returned on upload.
+            server_digests = {d: d for d in row_digests}
+            missing_items = list(
+                {d: row for d, row in zip(row_digests, rows) if d in missing}.items()
+            )
+            for i in range(0, len(missing_items), TABLE_ROWS_UPLOAD_BATCH_SIZE):
+                batch = missing_items[i : i + TABLE_ROWS_UPLOAD_BATCH_SIZE]
+                response = self.server.table_rows_create(
+                    TableRowsCreateReq(
+                        project_id=project_id, rows=[row for _, row in batch]
+                    )
+                )
+                for (d, _), server_digest in zip(batch, response.row_digests):
+                    server_digests[d] = server_digest
+            return self.server.table_create_from_digests(
+                TableCreateFromDigestsReq(
+                    project_id=project_id,
+                    row_digests=[server_digests[d] for d in row_digests],
+                )
+            ).digest
+        except HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                self._incremental_tables = False
+                return None
+            raise
 
     @trace_sentry.global_trace_sentry.watch()
     def _op_calls(self, op: Op) -> CallsIter:
@@ -813,38 +1483,39 @@ def _build_anonymous_op(name: str, config: Optional[Dict] = None) -> Op:
     return op
 
 
-REDACT_KEYS = ("api_key",)
-REDACTED_VALUE = "REDACTED"
-
-
-def redact_sensitive_keys(obj: typing.Any) -> typing.Any:
-    # We should NEVER mutate reffed objects.
-    #
-    # 1. This code builds new objects that no longer have refs
-    # 2. Even if we did an in-place edit, that would invalidate the ref (since
-    # the ref is to the object's digest)
-    if get_ref(obj):
-        return obj
-
-    if isinstance(obj, dict):
-        dict_res = {}
-        for k, v in obj.items():
-            if k in REDACT_KEYS:
-                dict_res[k] = REDACTED_VALUE
-            else:
-                dict_res[k] = redact_sensitive_keys(v)
-        return dict_res
-
-    elif isinstance(obj, list):
-        list_res = []
-        for v in obj:
-            list_res.append(redact_sensitive_keys(v))
-        return list_res
-
-    elif isinstance(obj, tuple):
-        tuple_res = []
-        for v in obj:
-            tuple_res.append(redact_sensitive_keys(v))
-        return tuple(tuple_res)
-
-    return obj
+def _spill_line(
+    mode: str, make_req: typing.Callable[[], Union[CallStartReq, CallEndReq]], val: Any
+) -> Optional[str]:
+    # Spilling runs on the caller's thread: the request is only built if that
+    # does not save objects or upload files
+    if not _is_plain(val):
+        return None
+    return json.dumps({"mode": mode, "req": make_req().model_dump(mode="json")})
+
+
+def _is_plain(val: Any) -> bool:
+    if val is None or isinstance(val, (str, int, float, Ref)):
+        return True
+    if _get_direct_ref(val) is not None:
+        return True
+    if isinstance(val, dict):
+        return all(isinstance(k, str) and _is_plain(v) for k, v in val.items())
+    if isinstance(val, (list, tuple)):
+        return all(_is_plain(v) for v in val)
+    return False
+
+
+def _copy_containers(val: Any) -> Any:
+    # Copies the dicts and lists of `val`, but not the other objects
+    if type(val) is dict:
+        return {k: _copy_containers(v) for k, v in val.items()}
+    if type(val) is list:
+        return [_copy_containers(v) for v in val]
+    if type(val) is tuple:
+        return tuple(_copy_containers(v) for v in val)
+    return val
+
+
+# Records the paths (eg. `inputs.doc`) of the call inputs (in the attributes)
+# and output (in the summary) that were elided by the serialize limits
+ELIDED_KEY = "_weave_elided"
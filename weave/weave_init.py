@@ -3,6 +3,8 @@ import typing
 from weave import client_context
 
 from . import autopatch, errors, init_message, trace_sentry, weave_client
+from .trace import env
+from .trace.upload_cache import UploadCache
 from .trace_server import remote_http_trace_server, sqlite_trace_server
 
 _current_inited_client = None
@@ -103,8 +105,18 @@ def init_weave(
     # from .trace_server.clickhouse_trace_server_batched import ClickHouseTraceServer
 
     # server = ClickHouseTraceServer(host="localhost")
+    upload_cache = None
+    upload_cache_path = env.get_upload_cache_path()
+    if upload_cache_path and env.get_upload_cache():
+        upload_cache = UploadCache(
+            upload_cache_path, namespace=remote_server.trace_server_url
+        )
     client = weave_client.WeaveClient(
-        entity_name, project_name, remote_server, ensure_project_exists
+        entity_name,
+        project_name,
+        remote_server,
+        ensure_project_exists,
+        upload_cache=upload_cache,
     )
 
     _current_inited_client = InitializedClient(client)
@@ -167,6 +179,7 @@ def init_local() -> InitializedClient:
 def finish() -> None:
     global _current_inited_client
     if _current_inited_client is not None:
+        _current_inited_client.client.flush()
         _current_inited_client.reset()
         _current_inited_client = None
 